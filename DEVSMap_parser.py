@@ -4,14 +4,13 @@
 
 '''
 
-from parser_reading_files import *
-from generate_main_cpp import *
-from generate_coupled_model_hpp import *
-from generate_atomic_model_hpp import *
-from generate_simple_statements import *
+import argparse
+import sys
 
 ############################################################################
 # To use this parser, we must only set the input and output directories.
+# These are the defaults of the command line arguments: run 
+# "python ./DEVSMap_parser.py --help" for the list of arguments.
 
 # Set the input directory containing the DEVSMap json files
 # These are the files that will be parsed and converted to Cadmium code.
@@ -23,44 +22,262 @@ directory_json_input = './input/'
 # and the atomic/coupled model files into the "main/include" directory.
 directory_code_main_output = './output/main/'
 
+# Set to True to only regenerate the files whose DEVSMap inputs (or the generator 
+# itself) changed since the last run. Unchanged files are left untouched, so the 
+# C++ build only recompiles what changed. Set to False to delete and regenerate 
+# every file.
+incremental_generation = True
+
+# Set the number of worker processes used to generate the atomic and coupled 
+# models. 1 generates serially, and 0 uses one worker per CPU. This can also be 
+# set from the command line with "--jobs N".
+number_of_jobs = 1
+
+# Set to True to only read and generate the models that are reachable from the 
+# experiment's model_under_test (following the "components" of the coupled 
+# models). Set to False to generate every model in the input directory.
+prune_unreachable_models = True
+
+# Set to True to print the size and parse time of each input json file.
+report_json_files = False
+
+# Set to the path of a json file to record the wall time, CPU time and peak 
+# memory of each stage of the parser and of each model generated, and print a 
+# summary of the slowest models. Set profile_output to the path of a file to 
+# also profile the parser with cProfile. These can also be set from the command 
+# line with "--report PATH" and "--profile PATH".
+instrumentation_report = None
+profile_output = None
+
+# Set to True to keep the parser running, and regenerate the code whenever a 
+# json file in the input directory is added, modified or removed. Only the 
+# changed files are read again, and only the models that depend on them are 
+# regenerated. The input directory is checked every watch_interval seconds. 
+# This can also be set from the command line with "--watch" and "--interval".
+watch_input_directory = False
+watch_interval = 0.5
+
+# To generate many projects in one run, pass their input directories (or glob 
+# patterns of them) with "--batch DIR [DIR ...]". Each project is generated in a 
+# subdirectory of the output directory, the projects are spread over "--jobs" 
+# worker processes, and json files shared between projects are parsed once. 
+# A summary of each project is printed, and written to batch_summary if set 
+# (or with "--summary PATH").
+batch_summary = None
+
+# Set the logger of the generated simulation: 'stdout', 'csv', 'binary' (fixed-size 
+# records written in large blocks, which can be read with binary_log_reader.py; 
+# the states and messages are still stored as the text printed by their operator<<, 
+# since that is all Cadmium passes to a logger, so only the time, the ids and the 
+# framing of the records are binary), or 'none' (which compiles the simulation 
+# with NO_LOGGING). Set log_path to the 
+# path of the log file of the 'csv' and 'binary' loggers. None uses the "logger" 
+# of the experiment file (which is 'stdout' if it has none). These can also be 
+# set from the command line with "--logger TYPE" and "--log-path PATH".
+logger_type = None
+log_path = None
+
+# Set to True to generate the top model as a single coupled model of every atomic 
+# model instance, coupled directly to each other, instead of one coupled model 
+# per level of the hierarchy. This removes the coordinators of the nested coupled 
+# models from the simulation. This can also be set from the command line with 
+# "--flatten".
+flatten_hierarchy = False
+
+# Set to True to declare the fields of the state struct of each atomic model in 
+# order of decreasing alignment and size, which minimizes their padding (the logs 
+# keep the order of the DEVSMap file). Set report_state_layouts to True to print 
+# the estimated sizeof of each state struct, with and without packing. These can 
+# also be set from the command line with "--pack-states" and "--layout-report".
+pack_state_structs = False
+report_state_layouts = False
+
+# Set to True to generate a precompiled header of the standard and Cadmium headers, 
+# compiled once by CMake (3.16 or later) instead of once per source file. Set 
+# unity_chunks to a number above 0 to define the functions of the atomic models 
+# out of their .hpp files, and compile them in that many source files (unity 
+# chunks), which the compiler builds in parallel and only rebuilds when their 
+# models change. CMakeLists.txt is generated when either is enabled (or the 
+# logger is 'none'), unless it was written by hand: the options are then 
+# generated in devsmap_options.cmake, for the hand written CMakeLists.txt to 
+# include. These can also be set from the command line with "--pch" and 
+# "--unity-chunks N".
+precompiled_header = False
+unity_chunks = 0
+
+# Set replications above 1 (or give the experiment file a "runs" section) to run 
+# the simulation several times from one executable: the runs are spread over 
+# run_threads threads (0 uses every hardware thread), run i is seeded with 
+# run_seed + i, and each run writes its own log file. The "sweep" of the "runs" 
+# of the experiment file lists init states overriding those of the init_state 
+# file, and every sweep point is run replications times. None uses the "runs" of 
+# the experiment file. These can also be set from the command line with 
+# "--replications N", "--run-threads N" and "--seed N".
+replications = None
+run_threads = None
+run_seed = None
+
 ############################################################################
 # The remaining instructions are to run the parser, and no changes are 
-# required by the user
-
-# First, we construct the output filepath for the atomic/coupled models
-directory_code_include_output = directory_code_main_output + 'include/'
-
-# Next, we check that we have a valid set of input files.  This will check 
-# that we have exactly one init_state.json file, exactly one experiment.json 
-# file, at least one coupled.json file, and at least one atomic.json file.
-if check_file_counts(directory_json_input):
-
-    # If the json input files are a valid set of DEVSMap files, we will clean 
-    # the main and main/include directory of the previously generated files.
-    # This deletes the existing main.cpp file from the main directory, and 
-    # deletes all of the atomic and coupled model .hpp files from the 
-    # main/include directory.
-    clean_output_directory(directory_code_main_output)
-
-    # Next, we read the JSON files, and parse them into a Python dictionary 
-    # that contains a list for each type of file. For example, 
-    # "data['atomic_models']" will contain a list where each index holds 
-    # the data for one atomic model).
-    raw_data = read_json_files(directory_json_input)
-    data = sort_json_files(raw_data) 
-
-    # Then, we obtain some key information such as the number of seconds
-    # the simulation will run for, and obtain the name and data of the 
-    # top model.
-    simulation_time = get_simulation_time_in_seconds(data['experiment'])
-    top_model_name = get_top_model_name(data['experiment'])
-    top_model = get_top_model(data, top_model_name)
-
-    # Finally, we can generate the code for the main.cpp file, and each of 
-    # the atomic and coupled models.
-    generate_main_cpp(directory_code_main_output, top_model_name, simulation_time)
-    generate_coupled_models(directory_code_include_output, data)
-    generate_atomic_models(directory_code_include_output, data)
+# required by the user. Nothing runs when this file is imported: the parser 
+# can be called from Python with main([...]), or through the functions of 
+# devsmap_to_cadmium.py, which return the generated code without writing it.
+
+def parse_arguments(argv=None):
+    '''
+    Returns the command line arguments of the parser, with the settings above as defaults.
+
+    Args:
+        argv (list):    The command line arguments (without the program name). None uses sys.argv.
+    '''
+    argument_parser = argparse.ArgumentParser(description='Generates Cadmium C++ code from DEVSMap json files.')
+    argument_parser.add_argument('-i', '--input', default=directory_json_input,
+                                 help='directory of the DEVSMap json files')
+    argument_parser.add_argument('-o', '--output', default=directory_code_main_output,
+                                 help='"main" directory of the Cadmium project (the models are written to its "include" subdirectory)')
+    argument_parser.add_argument('--full', action='store_false', dest='incremental', default=incremental_generation,
+                                 help='delete and regenerate every file, instead of only the files whose inputs changed')
+    argument_parser.add_argument('--all-models', action='store_false', dest='prune', default=prune_unreachable_models,
+                                 help='generate every model in the input directory, not only those reachable from the experiment')
+    argument_parser.add_argument('--file-report', action='store_true', default=report_json_files,
+                                 help='print the size and parse time of each json file')
+    argument_parser.add_argument('-j', '--jobs', type=int, default=number_of_jobs,
+                                 help='number of worker processes (1 is serial, 0 uses every CPU)')
+    argument_parser.add_argument('--report', default=instrumentation_report,
+                                 help='json file to write the time and memory used by each stage and model to')
+    argument_parser.add_argument('--profile', default=profile_output,
+                                 help='file to write the cProfile statistics of the parser to')
+    argument_parser.add_argument('--watch', action='store_true', default=watch_input_directory,
+                                 help='regenerate the code whenever a json file in the input directory changes')
+    argument_parser.add_argument('--interval', type=float, default=watch_interval,
+                                 help='number of seconds between two checks of the input directory in watch mode')
+    argument_parser.add_argument('--logger', choices=['stdout', 'csv', 'binary', 'none'], default=logger_type,
+                                 help='logger of the generated simulation (the default is the "logger" of the experiment file, or stdout)')
+    argument_parser.add_argument('--log-path', default=log_path,
+                                 help='path of the log file written by the csv and binary loggers')
+    argument_parser.add_argument('--flatten', action='store_true', default=flatten_hierarchy,
+                                 help='generate the top model as a single coupled model of every atomic model instance')
+    argument_parser.add_argument('--pack-states', action='store_true', default=pack_state_structs,
+                                 help='declare the fields of the state structs in the order that minimizes their padding')
+    argument_parser.add_argument('--layout-report', action='store_true', default=report_state_layouts,
+                                 help='print the estimated sizeof of each state struct, with and without packing')
+    argument_parser.add_argument('--pch', action='store_true', default=precompiled_header,
+                                 help='generate a precompiled header of the standard and Cadmium headers, and a CMakeLists.txt (or devsmap_options.cmake) that uses it')
+    argument_parser.add_argument('--unity-chunks', type=int, default=unity_chunks, metavar='N',
+                                 help='define the functions of the atomic models in N source files compiled separately (0 keeps them in the headers)')
+    argument_parser.add_argument('--replications', type=int, default=replications, metavar='N',
+                                 help='number of runs of each sweep point of the simulation, run in parallel by the executable')
+    argument_parser.add_argument('--run-threads', type=int, default=run_threads, metavar='N',
+                                 help='maximum number of runs of the simulation at once (0 uses every hardware thread)')
+    argument_parser.add_argument('--seed', type=int, default=run_seed,
+                                 help='seed of the first run of the simulation (run i is seeded with seed + i)')
+    argument_parser.add_argument('--batch', nargs='+', metavar='DIR',
+                                 help='generate every project directory (or glob pattern) given, each in a subdirectory of the output directory')
+    argument_parser.add_argument('--summary', default=batch_summary,
+                                 help='json file to write the status and time of each project of a batch to')
+    return argument_parser.parse_args(argv)
+
+
+def main(argv=None):
+    '''
+    Runs the parser with the command line arguments, and returns the exit status 
+    (0 on success, 1 if the input directory is not a valid set of DEVSMap files, or 
+    if the json files have errors).
+
+    Args:
+        argv (list):    The command line arguments (without the program name). None uses sys.argv.
+    '''
+    arguments = parse_arguments(argv)
+    # The generation options are collected once, and passed unchanged to the generators (see get_generation_options()).
+    options = {'logger': {'type': arguments.logger, 'path': arguments.log_path},
+               'flatten_hierarchy': arguments.flatten,
+               'pack_state_structs': arguments.pack_states,
+               'build_options': {'precompiled_header': arguments.pch, 'unity_chunks': arguments.unity_chunks},
+               'runs': {'replications': arguments.replications, 'threads': arguments.run_threads, 'seed': arguments.seed}}
+
+    # In batch mode, each project directory is checked and generated separately, 
+    # and a summary of the projects is printed.
+    if arguments.batch:
+        return run_batch(arguments, options)
+
+    # The modules are imported here, so that importing this file (for example, 
+    # from the worker processes used for parallel generation) has no cost.
+    from parser_reading_files import check_file_counts
+
+    # First, we check that we have a valid set of input files. This will check 
+    # that we have exactly one init_state.json file, exactly one experiment.json 
+    # file, at least one coupled.json file, and at least one atomic.json file.
+    if not arguments.watch and not check_file_counts(arguments.input):
+        return 1
+
+    # In watch mode, the parsed json files and the generated files are kept in 
+    # memory, and the code is regenerated every time the input files change.
+    if arguments.watch:
+        from watch_mode import watch_directory
+        watch_directory(arguments.input, arguments.output, options, jobs=arguments.jobs, prune_unreachable_models=arguments.prune,
+                        interval=arguments.interval)
+        return 0
+
+    # Instrumentation is only enabled when a report or profile is requested.
+    instrumentation = None
+    if arguments.report or arguments.profile:
+        from pipeline_instrumentation import start_instrumentation
+        instrumentation = start_instrumentation(profile=bool(arguments.profile))
+
+    # Next, we read the JSON files, check them (every missing component, port or 
+    # state variable, and every coupling of ports of different types, is reported 
+    # with its file and JSON path, and nothing is generated), sort them by type 
+    # of file, and generate the code for the main.cpp file, and each of the 
+    # atomic and coupled models. 
+    # When generating incrementally, only the files whose inputs changed are 
+    # regenerated, and the files of models that no longer exist in the input 
+    # directory are removed. Otherwise, the previously generated files are 
+    # deleted first.
+    from devsmap_to_cadmium import generate_cadmium_project
+    from semantic_validation import DevsmapValidationError
+    try:
+        generate_cadmium_project(arguments.input, arguments.output, options, incremental_generation=arguments.incremental,
+                                 prune_unreachable_models=arguments.prune, jobs=arguments.jobs, report_json_files=arguments.file_report,
+                                 instrumentation=instrumentation, report_state_layouts=arguments.layout_report)
+    except DevsmapValidationError as e:
+        print(e)
+        return 1
+
+    if instrumentation is not None:
+        from pipeline_instrumentation import stop_instrumentation, write_instrumentation_report, print_instrumentation_summary
+        stop_instrumentation(instrumentation)
+        write_instrumentation_report(instrumentation, arguments.report, arguments.profile)
+        print_instrumentation_summary(instrumentation)
+    return 0
+
+
+def run_batch(arguments, options=None):
+    '''
+    Generates every project of the batch, prints a summary of the projects, and returns 
+    the exit status (0 if every project was generated, and 1 otherwise).
+
+    Args:
+        arguments (argparse.Namespace):     The arguments returned by parse_arguments().
+        options (dict):                     The generation options of the projects (see get_generation_options()).
+    '''
+    import time
+    from batch_generation import find_project_directories, generate_batch, print_batch_summary, write_batch_summary
+    start_time = time.perf_counter()
+    project_directories = find_project_directories(arguments.batch)
+    if not project_directories:
+        print("No project directories found.")
+        return 1
+    results = generate_batch(project_directories, arguments.output, options, jobs=arguments.jobs,
+                             incremental_generation=arguments.incremental, prune_unreachable_models=arguments.prune)
+    total_seconds = time.perf_counter() - start_time
+    print_batch_summary(results, total_seconds)
+    if arguments.summary:
+        write_batch_summary(arguments.summary, results, total_seconds)
+    return 0 if all(result['status'] == 'generated' for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
 
 
 ############################################################################
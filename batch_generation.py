@@ -0,0 +1,213 @@
+# Functions for generating the Cadmium code of many DEVSMap projects (one input directory
+# per project) in one process.
+#
+# The json files of every project are read first, and the files with identical contents
+# (for example, model files copied or linked between scenarios) are only parsed once.  The
+# projects are then generated in parallel, one project per task, on a pool of worker
+# processes.  Where worker processes are forked, they inherit the parsed files instead of
+# receiving a copy of them; otherwise, each worker reads the files of its projects again.
+
+import glob
+import json
+import os
+import time
+
+from parser_reading_files import check_file_counts, classify_json_filename, json_loads, read_json_files, scan_json_directory, select_reachable_json_data, sort_json_files
+from generation_cache import load_manifest, save_manifest
+from generate_project import generate_project_files, get_expected_filenames
+from parallel_generation import get_number_of_jobs
+from semantic_validation import format_validation_errors, validate_json_data
+
+# The parsed json files of each project, keyed by project directory.  This is filled in
+# the main process before the worker processes are started.
+_batch_json_data = {}
+
+
+def find_project_directories(patterns):
+    '''
+    Returns the sorted list of the project directories matching the glob patterns.
+
+    Args:
+        patterns (list):    Directory paths, or glob patterns of directory paths.
+    '''
+    project_directories = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern) or [pattern]:
+            if os.path.isdir(path):
+                project_directories.add(os.path.normpath(path))
+    return sorted(project_directories)
+
+
+def get_project_output_directories(project_directories, output_root):
+    '''
+    Returns the "main" output directory of each project, keyed by project directory.  Each
+    project is generated in a subdirectory of output_root named after the path of the project
+    relative to the common parent of all the projects.
+
+    Args:
+        project_directories (list):     The project directories.
+        output_root (str):              The directory under which the projects are generated.
+    '''
+    if len(project_directories) == 1:
+        return {project_directories[0]: os.path.join(output_root, os.path.basename(os.path.abspath(project_directories[0])), '')}
+    common_directory = os.path.commonpath([os.path.abspath(directory) for directory in project_directories])
+    return {directory: os.path.join(output_root, os.path.relpath(os.path.abspath(directory), common_directory), '')
+            for directory in project_directories}
+
+
+def read_batch_json_files(project_json_files, jobs=None):
+    '''
+    Returns the raw data of the json files of each project (see read_json_files()), keyed
+    by project directory.  Every file is read once, and files with identical contents are
+    only parsed once, so the projects share the same parsed data.
+
+    Args:
+        project_json_files (dict):  The result of scan_json_directory() for each project, keyed
+                                    by project directory.
+        jobs (int):                 The number of threads used to read the files.
+    '''
+    from concurrent.futures import ThreadPoolExecutor
+    file_paths = [os.path.join(directory, filename) for directory, json_files in project_json_files.items() for filename in json_files]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        contents = list(executor.map(_read_bytes, file_paths))
+
+    parsed_contents = {}
+    batch_json_data = {directory: {} for directory in project_json_files}
+    contents = iter(contents)
+    for directory, json_files in project_json_files.items():
+        for filename in json_files:
+            content = next(contents)
+            if content not in parsed_contents:
+                try:
+                    parsed_contents[content] = json_loads(content)
+                except ValueError as e:
+                    print(f"Error decoding JSON in file {os.path.join(directory, filename)}: {e}")
+                    parsed_contents[content] = None
+            if parsed_contents[content] is not None:
+                batch_json_data[directory][filename] = parsed_contents[content]
+    return batch_json_data
+
+
+def _read_bytes(file_path):
+    '''
+    Returns the contents of the file at file_path as bytes.
+    '''
+    with open(file_path, 'rb') as file:
+        return file.read()
+
+
+def generate_batch_project(project_directory, directory_code_main_output, options=None, incremental_generation=True, prune_unreachable_models=True):
+    '''
+    Generates the code of one project of the batch, and returns a dictionary with its
+    status ('generated', 'invalid' or 'failed'), the number of files it has, the error
+    (if it failed, or the errors in its json files if it is invalid, see validate_json_data())
+    and the time it took.  This must be a module level function so that it can be sent to the
+    worker processes.
+
+    Args:
+        project_directory (str):            The directory of the DEVSMap json files of the project.
+        directory_code_main_output (str):   The "main" output directory of the project.
+        options (dict):                     Optional generation options (see get_generation_options()).
+        incremental_generation (bool):      True to only regenerate the files whose inputs changed.
+        prune_unreachable_models (bool):    True to only generate the models reachable from the experiment.
+    '''
+    start_time = time.perf_counter()
+    result = {'project': project_directory, 'output': directory_code_main_output, 'status': 'generated', 'files': 0, 'error': None}
+    try:
+        raw_data = _batch_json_data.get(project_directory)
+        if raw_data is None:
+            raw_data = read_json_files(project_directory, jobs=1)
+        json_files = {filename: classify_json_filename(filename) for filename in raw_data}
+        if not check_file_counts(project_directory, json_files):
+            result['status'] = 'invalid'
+        else:
+            if prune_unreachable_models:
+                raw_data = select_reachable_json_data(raw_data, json_files)
+            errors = validate_json_data(raw_data, json_files)
+            if errors:
+                result['status'] = 'invalid'
+                result['error'] = format_validation_errors(errors)
+            else:
+                data = sort_json_files(raw_data, json_files)
+
+                directory_code_include_output = os.path.join(directory_code_main_output, 'include', '')
+                os.makedirs(directory_code_include_output, exist_ok=True)
+                manifest = load_manifest(directory_code_include_output) if incremental_generation else None
+                generate_project_files(data, directory_code_main_output, options, manifest=manifest)
+                if manifest is not None:
+                    save_manifest(directory_code_include_output, manifest)
+                result['files'] = len(get_expected_filenames(data, options))
+    except Exception as e:
+        # One broken project must not stop the rest of the batch.
+        result['status'] = 'failed'
+        result['error'] = repr(e)
+    result['seconds'] = time.perf_counter() - start_time
+    return result
+
+
+def generate_batch(project_directories, output_root, options=None, *, jobs=0, incremental_generation=True, prune_unreachable_models=True):
+    '''
+    Generates the code of every project in project_directories, and returns the list of
+    the results of the projects (see generate_batch_project()), in the same order.
+
+    Args:
+        project_directories (list):         The directories of the DEVSMap json files of the projects.
+        output_root (str):                  The directory under which the projects are generated
+                                            (see get_project_output_directories()).
+        options (dict):                     Optional generation options (see get_generation_options()).
+        jobs (int):                         The number of worker processes (see get_number_of_jobs()).
+        incremental_generation (bool):      True to only regenerate the files whose inputs changed.
+        prune_unreachable_models (bool):    True to only generate the models reachable from the experiment.
+    '''
+    output_directories = get_project_output_directories(project_directories, output_root)
+    project_json_files = {directory: scan_json_directory(directory) for directory in project_directories}
+    _batch_json_data.clear()
+    _batch_json_data.update(read_batch_json_files(project_json_files))
+
+    list_of_arguments = [(directory, output_directories[directory], options, incremental_generation, prune_unreachable_models)
+                         for directory in project_directories]
+    number_of_jobs = min(get_number_of_jobs(jobs), len(list_of_arguments))
+    try:
+        if number_of_jobs <= 1:
+            return [generate_batch_project(*arguments) for arguments in list_of_arguments]
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+        try:
+            with ProcessPoolExecutor(max_workers=number_of_jobs) as executor:
+                return list(executor.map(generate_batch_project, *zip(*list_of_arguments)))
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            print(f"Parallel generation is unavailable ({e}), generating serially.")
+            return [generate_batch_project(*arguments) for arguments in list_of_arguments]
+    finally:
+        _batch_json_data.clear()
+
+
+def print_batch_summary(results, total_seconds):
+    '''
+    Prints the status, number of files and generation time of each project of the batch.
+
+    Args:
+        results (list):         The results returned by generate_batch().
+        total_seconds (float):  The wall time of the whole batch, in seconds.
+    '''
+    for result in results:
+        line = f"\t{result['status']:<10}{result['seconds'] * 1000:10.2f} ms {result['files']:6} files   {result['project']}"
+        if result['error']:
+            line += '   ' + result['error']
+        print(line)
+    statuses = [result['status'] for result in results]
+    print(f"{statuses.count('generated')} generated, {statuses.count('invalid')} invalid, {statuses.count('failed')} failed "
+          f"({len(results)} projects in {total_seconds * 1000:.2f} ms)")
+
+
+def write_batch_summary(summary_filepath, results, total_seconds):
+    '''
+    Writes the results of the batch to a json file.
+
+    Args:
+        summary_filepath (str):     The path of the json file.
+        results (list):             The results returned by generate_batch().
+        total_seconds (float):      The wall time of the whole batch, in seconds.
+    '''
+    with open(summary_filepath, 'w') as file:
+        json.dump({'total_seconds': total_seconds, 'projects': results}, file, indent=4)
@@ -0,0 +1,89 @@
+# Benchmark of the code emission of a large atomic model: the time and peak memory
+# allocated while building the code of the .hpp file, and the time taken to write it.
+#
+# Usage (from the repository root):
+#     python benchmarks/benchmark_emission.py [number_of_state_variables] [number_of_conditions]
+
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from generate_atomic_model_hpp import generate_atomic_model_code, generate_atomic_model
+
+
+def build_large_atomic_model(number_of_state_variables, number_of_conditions):
+    '''
+    Returns a tuple (initialization_values, atomic_model) for a synthetic atomic model with
+    many state variables, ports and conditions.
+
+    Args:
+        number_of_state_variables (int):    The number of state variables (and of input and output ports).
+        number_of_conditions (int):         The number of conditions in delta_int, delta_ext and lambda.
+    '''
+    names = ['var' + str(i) for i in range(number_of_state_variables)]
+    types = ['int', 'double', 'bool']
+    model = {'s': {name: types[i % 3] for i, name in enumerate(names)},
+             'x': {'in' + str(i): 'int' for i in range(number_of_state_variables)},
+             'y': {'out' + str(i): 'int' for i in range(number_of_state_variables)},
+             'delta_int': {}, 'delta_ext': {}, 'lambda': {},
+             'ta': {'otherwise': names[0]}}
+    for i in range(number_of_conditions):
+        a, b = names[i % len(names)], names[(i * 7 + 3) % len(names)]
+        model['delta_int'][a + ' > ' + str(i)] = {a: a + ' + ' + b, b: 'inf'}
+        model['delta_ext']['in' + str(i % len(names)) + '.bagSize() != 0'] = {a: 'in' + str(i % len(names)) + '.bag(-1)'}
+        model['lambda'][b + ' == ' + str(i)] = {'out' + str(i % len(names)): a}
+    for function in ('delta_int', 'delta_ext', 'lambda'):
+        model[function]['otherwise'] = {}
+    initialization_values = {name: '0' for name in names}
+    return initialization_values, model
+
+
+def run_benchmark(number_of_state_variables=500, number_of_conditions=500, repeat=5):
+    '''
+    Returns the benchmark result with the best time and the peak memory of generating the
+    code of a large atomic model, and the best time of writing it to a file.
+
+    Args:
+        number_of_state_variables (int):    The number of state variables of the synthetic model.
+        number_of_conditions (int):         The number of conditions of the synthetic model.
+        repeat (int):                       The number of timed runs.
+    '''
+    initialization_values, model = build_large_atomic_model(number_of_state_variables, number_of_conditions)
+
+    generation_time = min(timeit.repeat(lambda: generate_atomic_model_code(initialization_values, 'large', model), number=1, repeat=repeat))
+    tracemalloc.start()
+    code = generate_atomic_model_code(initialization_values, 'large', model)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory += os.sep
+        write_time = min(timeit.repeat(lambda: generate_atomic_model(directory, initialization_values, 'large', model), number=1, repeat=repeat)) - generation_time
+
+    return {'number_of_state_variables': number_of_state_variables,
+            'number_of_conditions': number_of_conditions,
+            'code_length': len(code),
+            'generation_seconds': generation_time,
+            'peak_memory_bytes': peak_memory,
+            'write_seconds': max(write_time, 0)}
+
+
+def print_result(result):
+    '''
+    Prints the times and the peak memory of a benchmark result.
+
+    Args:
+        result (dict):  The benchmark result returned by run_benchmark().
+    '''
+    print(f"{result['number_of_state_variables']} state variables, {result['number_of_conditions']} conditions, {result['code_length']} characters of code")
+    print(f"\tgeneration:   {result['generation_seconds'] * 1000:.2f} ms, peak memory {result['peak_memory_bytes'] / 1024:.0f} KiB")
+    print(f"\twrite:        {result['write_seconds'] * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    arguments = [int(argument) for argument in sys.argv[1:3]]
+    print_result(run_benchmark(*arguments))
@@ -0,0 +1,152 @@
+# Benchmark of each stage of the generation pipeline on a synthetic DEVSMap project (see
+# synthetic_corpus.py).  The results are printed, and can be appended to a json file to
+# track regressions between versions of the generator.
+#
+# Usage (from the repository root):
+#     python benchmarks/benchmark_pipeline.py [--atomic-models N] [...] [--results results.json]
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from synthetic_corpus import synthesize_project, add_corpus_arguments, corpus_parameters, TOP_MODEL_NAME
+from parser_reading_files import read_json_files, sort_json_files
+from init_state_index import index_init_states, find_initialization_values_for_model
+from generate_atomic_model_hpp import generate_atomic_models
+from generate_coupled_model_hpp import generate_coupled_models
+from generate_main_cpp import generate_main_cpp
+from generate_simple_statements import get_simulation_time_in_seconds
+from generation_cache import generator_version
+
+
+def time_stage(stage_times, stage_name, function, *args):
+    '''
+    Calls function(*args), records its wall time in stage_times[stage_name] and returns its result.
+
+    Args:
+        stage_times (dict):     The wall time of each stage, in seconds.
+        stage_name (str):       The name of the stage.
+        function (func):        The function that runs the stage.
+    '''
+    start_time = time.perf_counter()
+    result = function(*args)
+    stage_times[stage_name] = time.perf_counter() - start_time
+    return result
+
+
+def find_all_initialization_values(data):
+    '''
+    Returns the initialization values of every atomic model, indexing the init states first.
+
+    Args:
+        data (dict):    The DEVSMap json data that has been sorted into a dictionary.
+    '''
+    init_state_index = index_init_states(data)
+    initialization_values = {}
+    for atomic_model_data in data['atomic_models']:
+        atomic_model_name = list(atomic_model_data.keys())[0]
+        atomic_model = atomic_model_data[atomic_model_name]
+        initialization_values[atomic_model_name] = find_initialization_values_for_model(init_state_index, atomic_model_name, atomic_model['s'].keys())
+    return initialization_values
+
+
+def run_pipeline(input_directory, output_directory, jobs=1):
+    '''
+    Runs every stage of the generation pipeline once, and returns the wall time of each stage.
+
+    Args:
+        input_directory (str):      The directory of the DEVSMap json files.
+        output_directory (str):     The "main" output directory (with an "include" subdirectory).
+        jobs (int):                 The number of worker processes used to generate the models.
+    '''
+    stage_times = {}
+    include_directory = os.path.join(output_directory, 'include', '')
+    os.makedirs(include_directory, exist_ok=True)
+
+    raw_data = time_stage(stage_times, 'read_json_files', read_json_files, input_directory)
+    data = time_stage(stage_times, 'sort_json_files', sort_json_files, raw_data)
+    time_stage(stage_times, 'find_initialization_values_for_model', find_all_initialization_values, data)
+    time_stage(stage_times, 'generate_atomic_models', generate_atomic_models, include_directory, data, None, jobs)
+    time_stage(stage_times, 'generate_coupled_models', generate_coupled_models, include_directory, data, None, jobs)
+    time_stage(stage_times, 'generate_main_cpp', generate_main_cpp, os.path.join(output_directory, ''),
+               TOP_MODEL_NAME, get_simulation_time_in_seconds(data['experiment']))
+    return stage_times
+
+
+def run_benchmark(parameters, jobs=1, repeat=3):
+    '''
+    Synthesizes a project with parameters, runs the pipeline repeat times, and returns the
+    benchmark result with the best time of each stage.
+
+    Args:
+        parameters (dict):  The keyword arguments of synthesize_project().
+        jobs (int):         The number of worker processes used to generate the models.
+        repeat (int):       The number of runs of the pipeline.
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        input_directory = os.path.join(directory, 'input')
+        output_directory = os.path.join(directory, 'output')
+        number_of_files = synthesize_project(input_directory, **parameters)
+        input_bytes = sum(entry.stat().st_size for entry in os.scandir(input_directory))
+        runs = [run_pipeline(input_directory, output_directory, jobs) for _ in range(repeat)]
+
+    best_times = {stage_name: min(run[stage_name] for run in runs) for stage_name in runs[0]}
+    return {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'generator_version': generator_version(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': dict(parameters, jobs=jobs, repeat=repeat),
+            'input_files': number_of_files,
+            'input_bytes': input_bytes,
+            'stages': best_times,
+            'total': sum(best_times.values())}
+
+
+def print_result(result):
+    '''
+    Prints the time of each stage of a benchmark result.
+
+    Args:
+        result (dict):  The benchmark result returned by run_benchmark().
+    '''
+    print(f"{result['input_files']} json files ({result['input_bytes']} bytes), {result['parameters']}")
+    for stage_name, seconds in result['stages'].items():
+        print(f"\t{stage_name:<40}{seconds * 1000:10.2f} ms")
+    print(f"\t{'total':<40}{result['total'] * 1000:10.2f} ms")
+
+
+def append_result(results_filepath, result):
+    '''
+    Appends a benchmark result to the list of results stored in a json file.
+
+    Args:
+        results_filepath (str):     The path of the json file.
+        result (dict):              The benchmark result returned by run_benchmark().
+    '''
+    results = []
+    if os.path.isfile(results_filepath):
+        with open(results_filepath, 'r') as file:
+            results = json.load(file)
+    results.append(result)
+    with open(results_filepath, 'w') as file:
+        json.dump(results, file, indent=4)
+
+
+if __name__ == '__main__':
+    argument_parser = argparse.ArgumentParser(description='Times each stage of the generation pipeline on a synthetic DEVSMap project.')
+    add_corpus_arguments(argument_parser)
+    argument_parser.add_argument('-j', '--jobs', type=int, default=1, help='number of worker processes used to generate the models')
+    argument_parser.add_argument('--repeat', type=int, default=3, help='number of runs of the pipeline (the best time of each stage is kept)')
+    argument_parser.add_argument('--results', help='json file to append the results to')
+    arguments = argument_parser.parse_args()
+
+    result = run_benchmark(corpus_parameters(arguments), arguments.jobs, arguments.repeat)
+    print_result(result)
+    if arguments.results:
+        append_result(arguments.results, result)
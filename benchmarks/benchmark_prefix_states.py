@@ -0,0 +1,113 @@
+# Benchmark of the prefixing of the state variables of models with hundreds of state variables
+# and long function bodies.  The state variables are prefixed with "state." by the expression
+# IR (see devsmap_expressions.py), which tokenizes each DEVSMap expression once, caches it, and
+# looks every identifier up in the set of state variable names.  It is compared with the
+# previous implementation, which ran two str.replace passes over the whole text of the function
+# for every state variable.  The IR is timed with an empty parse cache (the first model that
+# uses the expressions) and with a full one (the expressions shared by other models or runs).
+#
+# Usage (from the repository root):
+#     python benchmarks/benchmark_prefix_states.py [number_of_state_variables] [number_of_statements]
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from devsmap_expressions import emit_assignment, emit_condition, parse_expression
+
+
+def prefix_states_str_replace(text, list_of_state_variables):
+    '''
+    The implementation of the prefixing before the tokenizer and the expression IR, kept for comparison.
+    '''
+    for state_variable in list_of_state_variables:
+        text = text.replace(state_variable + ' ', 'state.' + state_variable + ' ')
+        text = text.replace(state_variable + ';', 'state.' + state_variable + ';')
+    return text
+
+
+def build_function_body(list_of_state_variables, number_of_statements, seed=0):
+    '''
+    Returns the list of the statements of a long if-else structure that reads and assigns
+    random state variables, as ('condition', expression) and ('assignment', target, expression)
+    tuples of DEVSMap expressions, like the delta_int/delta_ext bodies of a large model.
+
+    Args:
+        list_of_state_variables (list): The names of the state variables.
+        number_of_statements (int):     The number of assignment statements in the body.
+    '''
+    rng = random.Random(seed)
+    statements = []
+    for i in range(number_of_statements):
+        a, b, c = (rng.choice(list_of_state_variables) for _ in range(3))
+        if i % 4 == 0:
+            statements.append(('condition', a + ' > ' + str(i) + ' && ' + b + ' != 0'))
+        statements.append(('assignment', c, a + ' + ' + b + ' * 2'))
+    return statements
+
+
+def emit_function_body(statements, state_variables):
+    '''
+    Returns the C++ code of the statements of build_function_body(), emitted from the expression IR.
+    '''
+    fragments = []
+    for i, statement in enumerate(statements):
+        if statement[0] == 'condition':
+            fragments.append(('\t\t} else ' if i else '\t\t') + 'if (' + emit_condition(statement[1], state_variables, 'delta_int') + ') {\n')
+        else:
+            fragments.append('\t\t\t' + emit_assignment(statement[1], statement[2], state_variables, 'delta_int'))
+    return ''.join(fragments) + '\t\t}\n'
+
+
+def format_function_body(statements):
+    '''
+    Returns the C++ text of the statements of build_function_body(), before any prefixing.
+    '''
+    fragments = []
+    for i, statement in enumerate(statements):
+        if statement[0] == 'condition':
+            fragments.append(('\t\t} else ' if i else '\t\t') + 'if (' + statement[1] + ') {\n')
+        else:
+            fragments.append('\t\t\t' + statement[1] + ' = ' + statement[2] + ';\n')
+    return ''.join(fragments) + '\t\t}\n'
+
+
+def emit_with_empty_cache(statements, state_variables):
+    '''
+    Emits the function body from the expression IR, after emptying the parse cache.
+    '''
+    parse_expression.cache_clear()
+    return emit_function_body(statements, state_variables)
+
+
+def run_benchmark(number_of_state_variables=300, number_of_statements=2000, repeat=5):
+    '''
+    Prints the best time of each implementation of the prefixing over repeat runs.
+
+    Args:
+        number_of_state_variables (int):    The number of state variables of the synthetic model.
+        number_of_statements (int):         The number of statements in the synthetic function body.
+        repeat (int):                       The number of timed runs of each implementation.
+    '''
+    list_of_state_variables = ['var' + str(i) for i in range(number_of_state_variables)]
+    state_variables = frozenset(list_of_state_variables)
+    statements = build_function_body(list_of_state_variables, number_of_statements)
+    text = format_function_body(statements)
+
+    old_time = min(timeit.repeat(lambda: prefix_states_str_replace(text, list_of_state_variables), number=1, repeat=repeat))
+    cold_time = min(timeit.repeat(lambda: emit_with_empty_cache(statements, state_variables), number=1, repeat=repeat))
+    emit_function_body(statements, state_variables)
+    warm_time = min(timeit.repeat(lambda: emit_function_body(statements, state_variables), number=1, repeat=repeat))
+
+    print(f"{number_of_state_variables} state variables, {len(text)} characters of function body")
+    print(f"\tstr.replace passes:          {old_time * 1000:.2f} ms")
+    print(f"\texpression IR, empty cache:  {cold_time * 1000:.2f} ms  (speedup {old_time / cold_time:.1f}x)")
+    print(f"\texpression IR, full cache:   {warm_time * 1000:.2f} ms  (speedup {old_time / warm_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    arguments = [int(argument) for argument in sys.argv[1:3]]
+    run_benchmark(*arguments)
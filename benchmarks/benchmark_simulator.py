@@ -0,0 +1,105 @@
+# Benchmark of the reference simulator (see reference_simulator.py) on synthetic DEVSMap
+# projects of increasing size (see synthetic_corpus.py).  The size is the number of instances
+# of each atomic model, so the atomic models are compiled the same number of times at every
+# size, and the event throughput (transitions per second) shows how the scheduler scales with
+# the number of atomic model instances.  The results are printed, and can be appended to a
+# json file (see benchmark_pipeline.py).
+#
+# Usage (from the repository root):
+#     python benchmarks/benchmark_simulator.py [--sizes 1,4,16,64] [--atomic-models N] [...] [--results results.json]
+
+import argparse
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from synthetic_corpus import synthesize_project, add_corpus_arguments, corpus_parameters
+from benchmark_pipeline import append_result
+from parser_reading_files import read_json_files, sort_json_files
+from generate_simple_statements import get_simulation_time_in_seconds
+from generation_cache import generator_version
+from reference_simulator import build_simulation, run_simulation
+
+
+def run_simulator(input_directory, repeat=3):
+    '''
+    Builds and runs the simulation of a DEVSMap project repeat times, without logging, and returns
+    the best build and run times, with the statistics of the simulation (see run_simulation()).
+
+    Args:
+        input_directory (str):  The directory of the DEVSMap json files.
+        repeat (int):           The number of runs of the simulation.
+    '''
+    data = sort_json_files(read_json_files(input_directory))
+    time_span = float(get_simulation_time_in_seconds(data['experiment']))
+    build_times = []
+    run_times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        simulation = build_simulation(data)
+        build_times.append(time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        statistics = run_simulation(simulation, time_span)
+        run_times.append(time.perf_counter() - start_time)
+    return {'instances': len(simulation['models']),
+            'build': min(build_times),
+            'run': min(run_times),
+            'statistics': statistics,
+            'transitions_per_second': statistics['transitions'] / min(run_times) if min(run_times) > 0 else 0.0}
+
+
+def run_benchmark(parameters, sizes, repeat=3):
+    '''
+    Synthesizes a project with parameters for each size (number of instances of each atomic
+    model), runs its simulation, and returns the benchmark result with one entry per size.
+
+    Args:
+        parameters (dict):  The keyword arguments of synthesize_project() (except number_of_instances).
+        sizes (list):       The numbers of instances of each atomic model.
+        repeat (int):       The number of runs of each simulation (the best time is kept).
+    '''
+    entries = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            synthesize_project(directory, **dict(parameters, number_of_instances=size))
+            entries.append(dict(run_simulator(directory, repeat), size=size))
+    return {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'generator_version': generator_version(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': dict(parameters, sizes=sizes, repeat=repeat),
+            'sizes': entries}
+
+
+def print_result(result):
+    '''
+    Prints the build time, run time and event throughput of each size of a benchmark result.
+
+    Args:
+        result (dict):  The benchmark result returned by run_benchmark().
+    '''
+    print(result['parameters'])
+    print(f"\t{'instances':>10}{'transitions':>14}{'messages':>12}{'build (ms)':>14}{'run (ms)':>12}{'transitions/s':>16}")
+    for entry in result['sizes']:
+        print(f"\t{entry['instances']:>10}{entry['statistics']['transitions']:>14}{entry['statistics']['messages']:>12}"
+              f"{entry['build'] * 1000:>14.2f}{entry['run'] * 1000:>12.2f}{entry['transitions_per_second']:>16.0f}")
+
+
+if __name__ == '__main__':
+    argument_parser = argparse.ArgumentParser(description='Measures the event throughput of the reference simulator on synthetic DEVSMap projects of increasing size.')
+    add_corpus_arguments(argument_parser)
+    argument_parser.add_argument('--sizes', default='1,4,16,64', help='comma separated numbers of instances of each atomic model')
+    argument_parser.add_argument('--repeat', type=int, default=3, help='number of runs of each simulation (the best time is kept)')
+    argument_parser.add_argument('--results', help='json file to append the results to')
+    arguments = argument_parser.parse_args()
+
+    parameters = corpus_parameters(arguments)
+    del parameters['number_of_instances']
+    result = run_benchmark(parameters, [int(size) for size in arguments.sizes.split(',')], arguments.repeat)
+    print_result(result)
+    if arguments.results:
+        append_result(arguments.results, result)
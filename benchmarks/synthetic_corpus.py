@@ -0,0 +1,206 @@
+# Functions for synthesizing DEVSMap projects of a configurable size, to measure how the
+# generator scales.
+#
+# A synthetic project has number_of_atomic_models atomic models, grouped fan_out at a time
+# into "group" coupled models, with a chain of internal couplings inside each group.  Every
+# group is a component of each of the number_of_instances "system" coupled models, and the
+# systems are the components of the top model.  Each atomic model therefore has
+# number_of_instances instances in the init states.
+#
+# Usage (from the repository root):
+#     python benchmarks/synthetic_corpus.py output_directory [--atomic-models N] [...]
+
+import argparse
+import json
+import os
+import random
+
+TOP_MODEL_NAME = 'synthetic_top'
+
+STATE_VARIABLE_TYPES = ['int', 'double', 'bool']
+
+
+def synthesize_atomic_model(model_index, number_of_state_variables, condition_depth, rng):
+    '''
+    Returns the DEVSMap data of one synthetic atomic model.
+
+    Args:
+        model_index (int):                  The index of the atomic model, used in its name.
+        number_of_state_variables (int):    The number of state variables of the model.
+        condition_depth (int):              The depth of the nested conditions in delta_int,
+                                            delta_ext and lambda (0 is a single "otherwise").
+        rng (random.Random):                The random number generator used to pick the variables.
+    '''
+    names = ['v' + str(i) for i in range(max(1, number_of_state_variables - 1))] + ['sigma']
+    state_variables = {name: STATE_VARIABLE_TYPES[i % len(STATE_VARIABLE_TYPES)] for i, name in enumerate(names[:-1])}
+    state_variables['sigma'] = 'double'
+    numeric_names = [name for name, variable_type in state_variables.items() if variable_type != 'bool']
+
+    def assignments(function):
+        target, source = rng.choice(numeric_names), rng.choice(numeric_names)
+        if function == 'delta_ext':
+            return {target: 'in0.bag(-1)', 'sigma': '0.1'}
+        if function == 'lambda':
+            return {'out0': source}
+        return {target: source + ' + 1', 'sigma': '1.0'}
+
+    def conditions(function, depth):
+        if depth == 0:
+            return assignments(function)
+        variable = rng.choice(numeric_names)
+        block = {variable + ' > ' + str(rng.randint(0, 100)): conditions(function, depth - 1),
+                 variable + ' == ' + str(rng.randint(0, 100)): conditions(function, depth - 1)}
+        if depth == 1:
+            block['otherwise'] = {}
+        return block
+
+    def function_body(function):
+        if condition_depth == 0:
+            return {'otherwise': assignments(function)}
+        body = conditions(function, condition_depth)
+        if function == 'delta_ext':
+            body = {'in0.bagSize() != 0': body, 'otherwise': {}}
+        return body
+
+    return {'atomic_' + str(model_index): {
+        's': state_variables,
+        'x': {'in0': 'double'},
+        'y': {'out0': 'double'},
+        'delta_int': function_body('delta_int'),
+        'delta_ext': function_body('delta_ext'),
+        'lambda': function_body('lambda'),
+        'ta': {'otherwise': 'sigma'}},
+        'include_sets': ['default_sets.json'],
+        'parameters': {}}
+
+
+def synthesize_initial_values(atomic_model, rng):
+    '''
+    Returns random initial values for the state variables of an atomic model.
+
+    Args:
+        atomic_model (dict):        The DEVSMap data of the atomic model.
+        rng (random.Random):        The random number generator.
+    '''
+    values = {}
+    for name, variable_type in atomic_model['s'].items():
+        if variable_type == 'bool':
+            values[name] = rng.choice(['true', 'false'])
+        elif variable_type == 'int':
+            values[name] = str(rng.randint(0, 100))
+        else:
+            values[name] = str(rng.randint(1, 100) / 10)
+    return values
+
+
+def synthesize_project(directory, number_of_atomic_models=100, number_of_state_variables=10, condition_depth=2,
+                       fan_out=10, number_of_instances=1, time_span='100.0', seed=0):
+    '''
+    Writes a synthetic DEVSMap project to directory, and returns the number of json files written.
+
+    Args:
+        directory (str):                    The directory to write the json files to.
+        number_of_atomic_models (int):      The number of distinct atomic models.
+        number_of_state_variables (int):    The number of state variables of each atomic model.
+        condition_depth (int):              The depth of the nested conditions in each function.
+        fan_out (int):                      The number of components of each group coupled model.
+        number_of_instances (int):          The number of instances of each atomic model.
+        time_span (str):                    The time span of the experiment.
+        seed (int):                         The seed of the random number generator.
+    '''
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    files = {}
+
+    atomic_models = []
+    for i in range(number_of_atomic_models):
+        atomic_model_file = synthesize_atomic_model(i, number_of_state_variables, condition_depth, rng)
+        atomic_models.append(atomic_model_file)
+        files['atomic_' + str(i) + '_atomic.json'] = atomic_model_file
+
+    group_init_states = {}
+    group_names = []
+    for group_index, start in enumerate(range(0, number_of_atomic_models, max(1, fan_out))):
+        group_name = 'group_' + str(group_index)
+        group_names.append(group_name)
+        members = atomic_models[start:start + max(1, fan_out)]
+        components = {}
+        for atomic_model_file in members:
+            atomic_model_name = list(atomic_model_file.keys())[0]
+            components[atomic_model_name] = atomic_model_name + '_model'
+        component_ids = list(components.values())
+        internal_couplings = [{'port_from': 'out0', 'port_to': 'in0', 'component_from': component_ids[i], 'component_to': component_ids[i + 1]}
+                              for i in range(len(component_ids) - 1)]
+        files[group_name + '_coupled.json'] = {group_name: {'x': {}, 'y': {}, 'components': components, 'eic': [], 'eoc': [], 'ic': internal_couplings},
+                                               'include_sets': ['default_sets.json']}
+        group_init_states[group_name] = members
+
+    top_components = {}
+    top_init_states = {}
+    for instance in range(number_of_instances):
+        system_name = 'system_' + str(instance)
+        system_id = system_name + '_model'
+        top_components[system_name] = system_id
+        files[system_name + '_coupled.json'] = {system_name: {'x': {}, 'y': {}, 'components': {group_name: group_name + '_model' for group_name in group_names},
+                                                              'eic': [], 'eoc': [], 'ic': []},
+                                                'include_sets': ['default_sets.json']}
+        system_init_states = {}
+        for group_name in group_names:
+            group_values = {}
+            for atomic_model_file in group_init_states[group_name]:
+                atomic_model_name = list(atomic_model_file.keys())[0]
+                group_values[atomic_model_name + '_model'] = synthesize_initial_values(atomic_model_file[atomic_model_name], rng)
+            system_init_states[group_name + '_model'] = group_values
+        top_init_states[system_id] = system_init_states
+
+    files[TOP_MODEL_NAME + '_coupled.json'] = {TOP_MODEL_NAME: {'x': {}, 'y': {}, 'components': top_components, 'eic': [], 'eoc': [], 'ic': []},
+                                               'include_sets': ['default_sets.json']}
+    files[TOP_MODEL_NAME + '_init_state.json'] = {'init_states': {TOP_MODEL_NAME: top_init_states}}
+    files[TOP_MODEL_NAME + '_experiment.json'] = {'model_under_test': {'model': TOP_MODEL_NAME + '_coupled.json',
+                                                                       'initial_state': TOP_MODEL_NAME + '_init_state.json',
+                                                                       'parameters': ''},
+                                                  'experimental_frame': {}, 'cpic': {}, 'pocc': {}, 'time_span': time_span}
+
+    for filename, content in files.items():
+        with open(os.path.join(directory, filename), 'w') as file:
+            json.dump(content, file, indent=4)
+    return len(files)
+
+
+def add_corpus_arguments(argument_parser):
+    '''
+    Adds the size parameters of a synthetic project to an argparse.ArgumentParser.
+
+    Args:
+        argument_parser (argparse.ArgumentParser):  The argument parser.
+    '''
+    argument_parser.add_argument('--atomic-models', type=int, default=100, help='number of distinct atomic models')
+    argument_parser.add_argument('--state-variables', type=int, default=10, help='number of state variables per atomic model')
+    argument_parser.add_argument('--condition-depth', type=int, default=2, help='depth of the nested conditions in delta_int, delta_ext and lambda')
+    argument_parser.add_argument('--fan-out', type=int, default=10, help='number of components per group coupled model')
+    argument_parser.add_argument('--instances', type=int, default=1, help='number of instances of each atomic model in the init states')
+    argument_parser.add_argument('--seed', type=int, default=0, help='seed of the random number generator')
+
+
+def corpus_parameters(arguments):
+    '''
+    Returns the keyword arguments of synthesize_project() from the parsed command line arguments.
+
+    Args:
+        arguments (argparse.Namespace):     The arguments parsed by a parser set up with add_corpus_arguments().
+    '''
+    return {'number_of_atomic_models': arguments.atomic_models,
+            'number_of_state_variables': arguments.state_variables,
+            'condition_depth': arguments.condition_depth,
+            'fan_out': arguments.fan_out,
+            'number_of_instances': arguments.instances,
+            'seed': arguments.seed}
+
+
+if __name__ == '__main__':
+    argument_parser = argparse.ArgumentParser(description='Writes a synthetic DEVSMap project.')
+    argument_parser.add_argument('directory', help='directory to write the json files to')
+    add_corpus_arguments(argument_parser)
+    arguments = argument_parser.parse_args()
+    number_of_files = synthesize_project(arguments.directory, **corpus_parameters(arguments))
+    print(f"Wrote {number_of_files} json files to {arguments.directory}")
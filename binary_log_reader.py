@@ -0,0 +1,79 @@
+# Functions for reading the logs written by the binary logger of the generated simulations
+# (see generate_binary_logger_hpp.py for the format of the log).
+#
+# Usage:
+#     python binary_log_reader.py logfile.bin [logfile.csv]
+# converts the binary log to the CSV format of Cadmium's CSVLogger (to stdout if no CSV
+# file is given).
+
+import struct
+import sys
+
+from generate_binary_logger_hpp import RECORD_STATE, RECORD_OUTPUT, RECORD_MODEL_NAME, RECORD_PORT_NAME
+
+MAGIC = b'DEVSBIN1'
+HEADER_SIZE = 16
+
+# time, string offset, string length, model id, port id, kind
+RECORD_FORMAT = 'dQIiII'
+
+
+def read_binary_log(filepath):
+    '''
+    Yields a tuple (time, model_id, model_name, port_name, text) for each state and output
+    record of the binary log at filepath, in the order they were logged.  port_name is None
+    for the records of the states.
+
+    Args:
+        filepath (str):     The path of the binary log (its strings are read from filepath + ".strings").
+    '''
+    with open(filepath, 'rb') as file:
+        records = file.read()
+    with open(filepath + '.strings', 'rb') as file:
+        strings = file.read()
+    if records[:8] != MAGIC:
+        raise ValueError(f"{filepath} is not a binary log")
+    byte_order = '<' if struct.unpack('<I', records[8:12])[0] == 0x01020304 else '>'
+    record_size = struct.unpack(byte_order + 'I', records[12:16])[0]
+    record_struct = struct.Struct(byte_order + RECORD_FORMAT)
+    if record_size != record_struct.size:
+        raise ValueError(f"{filepath} has records of {record_size} bytes, expected {record_struct.size}")
+
+    model_names = {}
+    port_names = {}
+    number_of_records = (len(records) - HEADER_SIZE) // record_size
+    for time, offset, length, model_id, port_id, kind in record_struct.iter_unpack(records[HEADER_SIZE:HEADER_SIZE + number_of_records * record_size]):
+        text = strings[offset:offset + length].decode('utf-8', errors='replace')
+        if kind == RECORD_STATE:
+            yield time, model_id, model_names[model_id], None, text
+        elif kind == RECORD_OUTPUT:
+            yield time, model_id, model_names[model_id], port_names[port_id], text
+        elif kind == RECORD_MODEL_NAME:
+            model_names[model_id] = text
+        elif kind == RECORD_PORT_NAME:
+            port_names[port_id] = text
+
+
+def convert_binary_log_to_csv(filepath, csv_file, separator=';'):
+    '''
+    Writes the binary log at filepath to csv_file, with the columns of Cadmium's CSVLogger.
+
+    Args:
+        filepath (str):     The path of the binary log.
+        csv_file (file):    The text file to write the CSV log to.
+        separator (str):    The separator of the columns.
+    '''
+    csv_file.write(separator.join(['time', 'model_id', 'model_name', 'port_name', 'data']) + '\n')
+    for time, model_id, model_name, port_name, text in read_binary_log(filepath):
+        csv_file.write(separator.join([f'{time:g}', str(model_id), model_name, port_name or '', text]) + '\n')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python binary_log_reader.py logfile.bin [logfile.csv]")
+        sys.exit(1)
+    if len(sys.argv) == 3:
+        with open(sys.argv[2], 'w') as csv_file:
+            convert_binary_log_to_csv(sys.argv[1], csv_file)
+    else:
+        convert_binary_log_to_csv(sys.argv[1], sys.stdout)
@@ -0,0 +1,43 @@
+# Functions for writing the generated code to the output files.
+#
+# The generators build the code of each file as a list of fragments that is joined once,
+# and the file is written through a temporary file in the same directory that replaces
+# the output file in a single step.  A build system reading the output directory while
+# the code is being regenerated (or a crash partway through a run) therefore never sees
+# a truncated .hpp or main.cpp file: it sees either the previous file or the new one.
+
+import os
+
+
+def join_fragments(fragments):
+    '''
+    Returns the code of a file from its list of fragments.
+
+    Args:
+        fragments (list):   The strings that make up the file, in order.
+    '''
+    return ''.join(fragments)
+
+
+def write_file_atomically(filepath, text):
+    '''
+    Writes text to filepath through a temporary file in the same directory, which then
+    replaces filepath.  The temporary file is removed if writing fails.  The text is written
+    as UTF-8, with its line endings unchanged, so the file has the same bytes on every platform.
+
+    Args:
+        filepath (str): The path of the file to write.
+        text (str):     The contents of the file.
+    '''
+    directory = os.path.dirname(filepath) or '.'
+    temporary_path = os.path.join(directory, '.' + os.path.basename(filepath) + '.' + os.urandom(6).hex() + '.tmp')
+    # Created with the permissions that a file created with open() would have (0o666 less the umask).
+    file_descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(file_descriptor, 'wb') as file:
+            file.write(text.encode('utf-8'))
+        os.replace(temporary_path, filepath)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
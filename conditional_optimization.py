@@ -0,0 +1,198 @@
+# Functions for optimizing the if-else chains of the DEVSMap functions before they are emitted.
+#
+# A chain is the dictionary of a DEVSMap function (or of a nested block), whose keys are the
+# conditions of its branches, in order, and whose values are the bodies of the branches.  The
+# chain is turned into a list of branches (guards, body), where guards is the list of the
+# conditions that select body (joined by ||), or None for the "otherwise" branch:
+#
+#   1.  Branches whose guard is a constant ("true", "false", "1", "!false", "(true)", ...) are
+#       folded: a false branch is removed, and a true branch becomes the "otherwise" branch
+#       (the branches after it can never be taken).
+#   2.  Consecutive branches with the same body are merged into one branch, and the branches
+#       just before the "otherwise" branch with the same body as it are removed.  An empty
+#       "otherwise" branch is removed.  Only consecutive branches are merged, so that the
+#       priority of the conditions does not change.
+#   3.  A chain whose guards all compare the same integer (or enum) state variable to a
+#       constant ("mode == 2", "phase == Phase::Idle") is emitted as a switch, which the
+#       compiler turns into a jump table instead of a linear series of comparisons.
+#
+# The conditions of DEVSMap are expressions without side effects, so removing or merging the
+# evaluation of a condition does not change the behaviour of the model.  The exception is a
+# call to a random primitive, which draws from the random number generator of the model:
+# a branch whose guards draw a random number is never removed, so the draws do not change.
+
+import re
+
+from devsmap_expressions import uses_random
+
+# The minimum number of case values for a chain to be emitted as a switch.
+SWITCH_MIN_CASES = 3
+
+# The C++ types of the state variables that can be the value of a switch.
+SWITCH_TYPES = frozenset(['char', 'signed char', 'unsigned char', 'short', 'unsigned short', 'int', 'unsigned', 'unsigned int',
+                          'long', 'unsigned long', 'long long', 'unsigned long long', 'size_t', 'std::size_t',
+                          'int8_t', 'uint8_t', 'int16_t', 'uint16_t', 'int32_t', 'uint32_t', 'int64_t', 'uint64_t',
+                          'std::int8_t', 'std::uint8_t', 'std::int16_t', 'std::uint16_t', 'std::int32_t', 'std::uint32_t',
+                          'std::int64_t', 'std::uint64_t'])
+
+# The built-in types named by a single identifier that cannot be the value of a switch.
+NON_SWITCH_TYPES = frozenset(['bool', 'float', 'double', 'string'])
+
+CONSTANT_PATTERN = r"-?\s*(?:0[xX][0-9a-fA-F]+|[0-9]+)[uUlL]*|'(?:\\.|[^'\\])'|[A-Za-z_]\w*(?:::[A-Za-z_]\w*)+"
+EQUALITY_PATTERN = re.compile(r'^\s*(?:(?P<variable>[A-Za-z_]\w*)\s*==\s*(?P<constant>' + CONSTANT_PATTERN + r')'
+                              r'|(?P<constant_first>' + CONSTANT_PATTERN + r')\s*==\s*(?P<variable_last>[A-Za-z_]\w*))\s*$')
+CONSTANT_CONDITIONS = {'true': True, 'false': False}
+
+
+def fold_condition(condition):
+    '''
+    Returns True or False if the DEVSMap condition is a constant (a boolean or integer literal,
+    possibly negated with "!" and in parentheses), and None otherwise.
+
+    Args:
+        condition (str):    The DEVSMap condition.
+    '''
+    condition = condition.strip()
+    while condition.startswith('(') and condition.endswith(')') and _is_wrapped(condition):
+        condition = condition[1:-1].strip()
+    if condition.startswith('!'):
+        value = fold_condition(condition[1:])
+        return None if value is None else not value
+    if condition in CONSTANT_CONDITIONS:
+        return CONSTANT_CONDITIONS[condition]
+    if re.fullmatch(r'[0-9]+', condition):
+        return int(condition) != 0
+    return None
+
+
+def _is_wrapped(condition):
+    '''
+    Returns True if the opening parenthesis at the start of condition is closed at its end.
+    '''
+    depth = 0
+    for i, character in enumerate(condition):
+        if character == '(':
+            depth += 1
+        elif character == ')':
+            depth -= 1
+            if depth == 0:
+                return i == len(condition) - 1
+    return False
+
+
+def optimize_branches(data):
+    '''
+    Returns the list of the branches (guards, body) of a DEVSMap chain, after folding the
+    constant guards and merging the branches with the same body (see the top of this file).
+    guards is the list of the conditions of the branch, or None for the "otherwise" branch,
+    which is always last.
+
+    Args:
+        data (dict):    The DEVSMap dictionary with the conditions of the chain as keys, and the
+                        bodies of the branches as values.
+    '''
+    branches = []
+    for condition, body in data.items():
+        if condition == 'otherwise':
+            branches.append((None, body))
+            break
+        value = fold_condition(condition)
+        if value is False:
+            continue
+        if value is True:
+            branches.append((None, body))
+            break
+        if branches and branches[-1][1] == body:
+            branches[-1] = (branches[-1][0] + [condition], body)
+        else:
+            branches.append(([condition], body))
+
+    if branches and branches[-1][0] is None:
+        otherwise_body = branches[-1][1]
+        while len(branches) > 1 and branches[-2][1] == otherwise_body and not any(uses_random(guard) for guard in branches[-2][0]):
+            del branches[-2]
+        if not otherwise_body:
+            branches.pop()
+    return branches
+
+
+def find_switch(branches, state_variable_types):
+    '''
+    Returns the tuple (variable, cases, default) if every guard of branches compares the same
+    integer or enum state variable to a constant, with at least SWITCH_MIN_CASES distinct
+    constants, and None otherwise.  cases is the list of (constants, body) of each branch, and
+    default is the body of the "otherwise" branch (or None).  A constant that was already
+    compared by an earlier branch is dropped, since that branch is always taken first.
+
+    Args:
+        branches (list):                The branches returned by optimize_branches().
+        state_variable_types (dict):    The C++ type of each state variable of the atomic model.
+    '''
+    if not state_variable_types:
+        return None
+    variable = None
+    cases = []
+    default = None
+    seen_constants = set()
+    for guards, body in branches:
+        if guards is None:
+            default = body
+            continue
+        constants = []
+        for guard in guards:
+            match = EQUALITY_PATTERN.match(guard)
+            if match is None:
+                return None
+            guard_variable = match.group('variable') or match.group('variable_last')
+            constant = re.sub(r'^-\s+', '-', match.group('constant') or match.group('constant_first'))
+            if variable is None:
+                variable = guard_variable
+                if not _is_switch_type(state_variable_types.get(variable)):
+                    return None
+            if guard_variable != variable or not _is_switch_constant(constant, state_variable_types[variable]):
+                return None
+            value = _constant_value(constant)
+            if value not in seen_constants:
+                seen_constants.add(value)
+                constants.append(constant)
+        if constants:
+            cases.append((constants, body))
+    if len(seen_constants) < SWITCH_MIN_CASES:
+        return None
+    return variable, cases, default
+
+
+def _is_switch_type(variable_type):
+    '''
+    Returns True if a state variable of the C++ type variable_type can be the value of a switch:
+    an integer type, or a user defined type named by a single identifier (an enum, whose cases 
+    must then be members of the enum, see _is_switch_constant()).
+    '''
+    if variable_type is None:
+        return False
+    variable_type = ' '.join(variable_type.split())
+    return variable_type in SWITCH_TYPES or (re.fullmatch(r'[A-Za-z_]\w*', variable_type) is not None
+                                             and variable_type not in NON_SWITCH_TYPES)
+
+
+def _is_switch_constant(constant, variable_type):
+    '''
+    Returns True if constant can be a case of a switch on a variable of the C++ type variable_type:
+    an integer or character literal for an integer type, and a member of the enum for an enum.
+    '''
+    variable_type = ' '.join(variable_type.split())
+    if variable_type in SWITCH_TYPES:
+        return '::' not in constant
+    return constant.startswith(variable_type + '::') and constant.count('::') == 1
+
+
+def _constant_value(constant):
+    '''
+    Returns the value of an integer or character literal (so that "1", "0x1" and "1u" are the
+    same case of a switch), or the constant itself for a member of an enum.
+    '''
+    if constant.startswith("'"):
+        return ord(constant[1]) if len(constant) == 3 else constant
+    if '::' in constant:
+        return constant
+    return int(constant.rstrip('uUlL'), 0) if not re.fullmatch(r'-?0[0-9]+[uUlL]*', constant) else int(constant.rstrip('uUlL'), 8)
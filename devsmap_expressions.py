@@ -0,0 +1,334 @@
+# Functions for parsing the DEVSMap expression strings (conditions and the right hand
+# side of assignments) into a small intermediate representation (IR), and for emitting
+# the C++ code of each expression from that IR.
+#
+# Each distinct expression string is only parsed once: the parse is memoized across all
+# of the models being generated, since model libraries reuse the same guards and
+# assignments in many models.  The emitted C++ depends on the function being generated
+# (delta_int, delta_ext, lambda or ta), so emission is a separate walk over the IR.
+#
+# The IR of an expression is a tuple of nodes, where each node is a tuple whose first
+# item is one of the node kinds below:
+#     (TEXT, text)                    Operators, literals and whitespace, copied unchanged.
+#     (IDENTIFIER, name)              A name that is prefixed with "state." if it is a state variable.
+#     (MEMBER, name)                  A name after ".", "->" or "::" (a member of another object), copied unchanged.
+#     (INFINITY,)                     The DEVSMap keyword "inf".
+#     (BAG_EMPTY, port, is_empty)     "port.bagSize() == 0" (is_empty) or "port.bagSize() != 0" / "> 0",
+#                                     when the comparison is a whole operand of the condition.
+#     (BAG_SIZE, port)                "port.bagSize()" anywhere else.
+#     (BAG_ITEM, port, index)         "port.bag(index)", where -1 is the last message in the bag.
+#     (RANDOM, function)              A call to a random primitive (see RANDOM_FUNCTIONS), without its arguments.
+#
+# In the external transition function, the bag of each input port that is used is looked
+# up once, into a local const reference declared at the top of the function (see
+# emit_bag_declarations()), and the bag operations are emitted on those references.  The
+# DEVSMap key "for message in port.bag()" iterates over every message in the bag of port.
+#
+# The random primitives (and rand() of the C library) are calls on the random number
+# generator of the instance, which is stored in its state (see generate_random_hpp.py),
+# so that every instance draws from its own stream, seeded from the run.
+
+import re
+from functools import lru_cache
+
+from generate_simple_statements import infinity
+
+TEXT = 'text'
+IDENTIFIER = 'identifier'
+MEMBER = 'member'
+INFINITY = 'infinity'
+BAG_EMPTY = 'bag_empty'
+BAG_SIZE = 'bag_size'
+BAG_ITEM = 'bag_item'
+RANDOM = 'random'
+
+# The DEVSMap random primitives, and the method of DevsmapRandom each one calls.
+RANDOM_FUNCTIONS = {'rand': 'rand',
+                    'uniform_int': 'uniformInt',
+                    'uniform_real': 'uniformReal',
+                    'exponential': 'exponential',
+                    'normal': 'normal',
+                    'bernoulli': 'bernoulli'}
+
+# The DEVSMap functions that expressions are emitted for.  Bag operators are only valid
+# in the external transition function, because it is the only function with input messages.
+FUNCTION_KINDS = ('delta_int', 'delta_ext', 'lambda', 'ta')
+
+# Splits a DEVSMap expression into tokens, in a single pass.  This is the only tokenizer of the
+# expressions: the reference simulator (see reference_expressions.py) splits the TEXT nodes of
+# the IR with it too.  Numbers are matched before identifiers, so that the exponent in "1e5"
+# is not mistaken for an identifier.
+TOKEN_PATTERN = re.compile(r'''
+      (?P<string>"(?:\\.|[^"\\])*")
+    | (?P<character>'(?:\\.|[^'\\])*')
+    | (?P<number>\.?[0-9](?:[eEpP][+-]|[\w.])*)
+    | (?P<identifier>[A-Za-z_]\w*)
+    | (?P<whitespace>\s+)
+    | (?P<operator>->|::|<<|>>|==|!=|<=|>=|&&|\|\||[^\w\s])
+''', re.VERBOSE)
+
+# A comparison of the size of a bag with 0 is only folded into a test of whether the bag is
+# empty if it is a whole operand: it starts the expression or follows one of these tokens, and
+# it is followed by the end of the expression, ")", "&&" or "||".  In "n + p.bagSize() != 0"
+# or "p.bagSize() == 0 + 1", the size is an operand of an arithmetic operator instead.
+BAG_SIZE_COMPARISON_PATTERN = re.compile(r'\s*(==|!=|>)\s*0(?![\w.])(?=\s*(?:$|\)|&&|\|\|))')
+OPERAND_START_TOKENS = (None, '(', '&&', '||', '!')
+BAG_INDEX_PATTERN = re.compile(r'\s*(-?\s*[0-9]+)\s*\)')
+FOR_EACH_PATTERN = re.compile(r'\s*for\s+([A-Za-z_]\w*)\s+in\s+([A-Za-z_]\w*)\.bag\(\)\s*$')
+CALL_PATTERN = re.compile(r'\s*\(')
+
+
+@lru_cache(maxsize=None)
+def parse_expression(expression):
+    '''
+    Returns the IR of a DEVSMap expression string, as a tuple of nodes.  The result is
+    memoized, so each distinct expression string is only parsed once per process.
+
+    Args:
+        expression (str):   The DEVSMap expression (for example, a condition such as
+                            "increment_in.bagSize() != 0", or the value of an assignment).
+    '''
+    nodes = []
+    position = 0
+    length = len(expression)
+    previous_token = None
+    while position < length:
+        match = TOKEN_PATTERN.match(expression, position)
+        if match is None:
+            raise ValueError(f'Unable to parse the DEVSMap expression "{expression}" at position {position}.')
+        kind = match.lastgroup
+        token = match.group(0)
+
+        if kind == 'identifier' and previous_token in ('.', '->', '::'):
+            nodes.append((MEMBER, token))
+        elif kind == 'identifier' and expression.startswith('.bagSize()', match.end()):
+            end = match.end() + len('.bagSize()')
+            comparison = BAG_SIZE_COMPARISON_PATTERN.match(expression, end)
+            if comparison is not None and previous_token in OPERAND_START_TOKENS:
+                nodes.append((BAG_EMPTY, token, comparison.group(1) == '=='))
+                end = comparison.end()
+            else:
+                nodes.append((BAG_SIZE, token))
+            position = end
+            previous_token = ')'
+            continue
+        elif kind == 'identifier' and expression.startswith('.bag(', match.end()):
+            index = BAG_INDEX_PATTERN.match(expression, match.end() + len('.bag('))
+            if index is None:
+                raise ValueError(f'The bag index of "{token}" must be an integer in the DEVSMap expression "{expression}".')
+            nodes.append((BAG_ITEM, token, int(index.group(1).replace(' ', ''))))
+            position = index.end()
+            previous_token = ')'
+            continue
+        elif kind == 'identifier' and token == 'inf':
+            nodes.append((INFINITY,))
+        elif kind == 'identifier' and token in RANDOM_FUNCTIONS and CALL_PATTERN.match(expression, match.end()):
+            nodes.append((RANDOM, token))
+        elif kind == 'identifier':
+            nodes.append((IDENTIFIER, token))
+        elif nodes and nodes[-1][0] == TEXT:
+            nodes[-1] = (TEXT, nodes[-1][1] + token)
+        else:
+            nodes.append((TEXT, token))
+
+        if kind != 'whitespace':
+            previous_token = token
+        position = match.end()
+    return tuple(nodes)
+
+
+def uses_random(expression):
+    '''
+    Returns True if the DEVSMap expression calls a random primitive (see RANDOM_FUNCTIONS).
+
+    Args:
+        expression (str):   The DEVSMap expression.
+    '''
+    return any(node[0] == RANDOM for node in parse_expression(expression))
+
+
+def model_uses_random(model):
+    '''
+    Returns True if any expression of the functions of the atomic model (its conditions, the 
+    values it assigns, and its time advance) calls a random primitive.  The state of the model
+    then holds a random number generator.
+
+    Args:
+        model (dict):   The DEVSMap dictionary data of the atomic model.
+    '''
+    def expressions(data):
+        for key, value in data.items():
+            if key != 'otherwise' and parse_for_each(key) is None:
+                yield key
+            if isinstance(value, dict):
+                yield from expressions(value)
+            elif isinstance(value, str):
+                yield value
+
+    return any(uses_random(expression) for function_kind in FUNCTION_KINDS
+               for expression in expressions(model.get(function_kind) or {}))
+
+
+def parse_for_each(key):
+    '''
+    Returns the tuple (variable, port) if key is a DEVSMap loop over a bag, of the form 
+    "for variable in port.bag()", and None otherwise.
+
+    Args:
+        key (str):  The key of a DEVSMap block (a condition, or a loop over a bag).
+    '''
+    match = FOR_EACH_PATTERN.match(key)
+    return match.groups() if match is not None else None
+
+
+def parse_assignment_target(target):
+    '''
+    Returns the name being assigned to by a DEVSMap assignment (a state variable in the
+    transition functions, or an output port in the output function).
+
+    Args:
+        target (str):   The key of the DEVSMap assignment.
+    '''
+    nodes = parse_expression(target.strip())
+    if len(nodes) != 1 or nodes[0][0] != IDENTIFIER:
+        raise ValueError(f'"{target}" is not a valid assignment target. Only state variables and output ports can be assigned.')
+    return nodes[0][1]
+
+
+def emit_expression(expression, state_variables, function_kind, bag_variables=None):
+    '''
+    Returns the C++ code for a DEVSMap expression.
+
+    Args:
+        expression (str):           The DEVSMap expression to emit.
+        state_variables (set):      The names of the state variables of the atomic model, which
+                                    are prefixed with "state.".
+        function_kind (str):        The DEVSMap function being generated (one of FUNCTION_KINDS).
+        bag_variables (dict):       Optional local variables holding the bag of each input port, 
+                                    returned by emit_bag_declarations().
+    '''
+    code = ''
+    for node in parse_expression(expression):
+        kind = node[0]
+        if kind == TEXT or kind == MEMBER:
+            code += node[1]
+        elif kind == IDENTIFIER:
+            code += 'state.' + node[1] if node[1] in state_variables else node[1]
+        elif kind == INFINITY:
+            code += infinity()
+        elif kind == RANDOM:
+            code += 'state.rng.' + RANDOM_FUNCTIONS[node[1]]
+        else:
+            if function_kind != 'delta_ext':
+                raise ValueError(f'The bag of port "{node[1]}" is used in {function_kind}, but bags can only be used in delta_ext: "{expression}"')
+            code += emit_bag_operation(node, bag_variables)
+    return code
+
+
+def emit_bag_operation(node, bag_variables=None):
+    '''
+    Returns the Cadmium C++ code for a bag operation node of the IR.
+
+    Args:
+        node (tuple):           A BAG_EMPTY, BAG_SIZE or BAG_ITEM node.
+        bag_variables (dict):   Optional local variables holding the bag of each input port, 
+                                returned by emit_bag_declarations().  Without them, the bag
+                                is looked up from the port by each operation.
+    '''
+    kind, port = node[0], node[1]
+    variables = (bag_variables or {}).get(port)
+    if kind == BAG_EMPTY:
+        if variables is not None:
+            return variables['empty'] if node[2] else '!' + variables['empty']
+        return port + '->empty()' if node[2] else '!' + port + '->empty()'
+    bag = variables['bag'] if variables is not None else port + '->getBag()'
+    if kind == BAG_SIZE:
+        return bag + '.size()'
+    index = node[2]
+    if index == -1:
+        return bag + '.back()'
+    if index < 0:
+        return bag + '[' + bag + '.size() - ' + str(-index) + ']'
+    return bag + '[' + str(index) + ']'
+
+
+def emit_bag_declarations(bag_operations, reserved_names=frozenset()):
+    '''
+    Returns a tuple (declarations, bag_variables), where declarations is the list of C++
+    statements (without indentation) that look up the bag of each port once, into a local
+    const reference, and whether it is empty, if that is tested.  bag_variables holds the
+    names of those local variables, keyed by port, to be passed to emit_expression().
+
+    Args:
+        bag_operations (dict):  The kinds of bag operation (BAG_EMPTY, BAG_SIZE, BAG_ITEM) used 
+                                on each port, keyed by port, in the order the declarations are emitted.
+        reserved_names (set):   The identifiers already used in the function, which the local
+                                variables must not shadow.
+    '''
+    used_names = set(reserved_names) | set(bag_operations)
+
+    def unique_name(name):
+        while name in used_names:
+            name += '_'
+        used_names.add(name)
+        return name
+
+    declarations = []
+    bag_variables = {}
+    for port, kinds in bag_operations.items():
+        variables = {'bag': unique_name(port + '_bag')}
+        declarations.append('const auto& ' + variables['bag'] + ' = ' + port + '->getBag();\n')
+        if BAG_EMPTY in kinds:
+            variables['empty'] = unique_name(port + '_empty')
+            declarations.append('const bool ' + variables['empty'] + ' = ' + variables['bag'] + '.empty();\n')
+        bag_variables[port] = variables
+    return declarations, bag_variables
+
+
+def emit_condition(condition, state_variables, function_kind, bag_variables=None):
+    '''
+    Returns the C++ code for a DEVSMap condition (the key of an if-else branch).
+
+    Args:
+        condition (str):            The DEVSMap condition.
+        state_variables (set):      The names of the state variables of the atomic model.
+        function_kind (str):        The DEVSMap function being generated (one of FUNCTION_KINDS).
+        bag_variables (dict):       Optional local variables holding the bag of each input port.
+    '''
+    return emit_expression(condition, state_variables, function_kind, bag_variables)
+
+
+def emit_for_each(key, bag_variables=None):
+    '''
+    Returns the header of the C++ range-based for loop (without indentation) for a DEVSMap
+    loop over the messages in a bag ("for message in port.bag()").
+
+    Args:
+        key (str):              The DEVSMap loop.
+        bag_variables (dict):   Optional local variables holding the bag of each input port.
+    '''
+    variable, port = parse_for_each(key)
+    variables = (bag_variables or {}).get(port)
+    bag = variables['bag'] if variables is not None else port + '->getBag()'
+    return 'for (const auto& ' + variable + ' : ' + bag + ') {\n'
+
+
+def emit_assignment(target, value, state_variables, function_kind, bag_variables=None):
+    '''
+    Returns the C++ statement (without indentation) for a DEVSMap assignment.  In the
+    output function, assignments to output ports become calls to addMessage().
+
+    Args:
+        target (str):               The state variable or output port being assigned.
+        value (str):                The DEVSMap expression of the value being assigned.
+        state_variables (set):      The names of the state variables of the atomic model.
+        function_kind (str):        The DEVSMap function being generated (one of FUNCTION_KINDS).
+        bag_variables (dict):       Optional local variables holding the bag of each input port.
+    '''
+    name = parse_assignment_target(target)
+    code = emit_expression(value, state_variables, function_kind, bag_variables)
+    if function_kind == 'lambda':
+        return name + '->addMessage(' + code + ');\n'
+    if name in state_variables:
+        name = 'state.' + name
+    return name + ' = ' + code + ';\n'
@@ -0,0 +1,156 @@
+# The random number generator of the atomic models, in Python, for the reference simulator
+# (see reference_simulator.py).
+#
+# DevsmapRandom draws exactly the same numbers as the C++ DevsmapRandom of devsmap_random.hpp
+# (see generate_random_hpp.py): xoshiro256**, seeded with splitmix64, with the same seed for
+# each instance of a run.  The unsigned 64 bit arithmetic of the C++ generator is done on
+# Python integers masked to 64 bits, and the floating point operations are done in the same
+# order, so a run of the reference simulator draws the same numbers as the generated
+# simulation with the same seed.
+
+import math
+
+MASK_64 = (1 << 64) - 1
+
+# The golden ratio increment of splitmix64.
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+# RAND_MAX of the C library the generated simulations are built with (glibc).
+RAND_MAX = 2147483647
+
+
+def splitmix64(value):
+    '''
+    Returns a tuple (next value, random 64 bits) of splitmix64 from value.
+
+    Args:
+        value (int):    The state of splitmix64 (an unsigned 64 bit integer).
+    '''
+    value = (value + GOLDEN_GAMMA) & MASK_64
+    z = value
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return value, z ^ (z >> 31)
+
+
+class DevsmapRandom:
+    '''
+    Random number generator (xoshiro256**) of an atomic model instance.  Its methods are the
+    DEVSMap random primitives (see RANDOM_FUNCTIONS in devsmap_expressions.py).
+    '''
+
+    def __init__(self, seed=0):
+        self.seed(seed)
+
+    def seed(self, value):
+        '''
+        Seeds the generator, by expanding value into its 256 bits of state with splitmix64.
+
+        Args:
+            value (int):    The seed (an unsigned 64 bit integer).
+        '''
+        words = []
+        value &= MASK_64
+        for _ in range(4):
+            value, word = splitmix64(value)
+            words.append(word)
+        self.words = words
+
+    def next(self):
+        '''
+        Returns the next 64 random bits.
+        '''
+        s0, s1, s2, s3 = self.words
+        x = (s1 * 5) & MASK_64
+        result = ((((x << 7) | (x >> 57)) & MASK_64) * 9) & MASK_64
+        t = (s1 << 17) & MASK_64
+        s2 ^= s0
+        s3 ^= s1
+        s1 ^= s2
+        s0 ^= s3
+        s2 ^= t
+        s3 = ((s3 << 45) | (s3 >> 19)) & MASK_64
+        self.words = [s0, s1, s2, s3]
+        return result
+
+    def rand(self):
+        '''
+        rand(): an integer in [0, RAND_MAX], as rand() of the C library.
+        '''
+        return (self.next() >> 11) % (RAND_MAX + 1)
+
+    def uniform_int(self, a, b):
+        '''
+        uniform_int(a, b): an integer in [a, b], without modulo bias.
+        '''
+        a, b = int(a), int(b)
+        span = (b - a + 1) & MASK_64
+        if span == 0:
+            return to_signed_64(self.next())
+        threshold = ((-span) & MASK_64) % span
+        value = self.next()
+        while value < threshold:
+            value = self.next()
+        return to_signed_64(a + value % span)
+
+    def uniform(self):
+        '''
+        Returns a real number in [0, 1), with 53 random bits.
+        '''
+        return (self.next() >> 11) * (1.0 / 9007199254740992.0)
+
+    def uniform_real(self, a, b):
+        '''
+        uniform_real(a, b): a real number in [a, b).
+        '''
+        return a + (b - a) * self.uniform()
+
+    def exponential(self, rate):
+        '''
+        exponential(rate): an exponentially distributed real number, with mean 1 / rate.
+        '''
+        return -math.log1p(-self.uniform()) / rate
+
+    def normal(self, mean, stddev):
+        '''
+        normal(mean, stddev): a normally distributed real number (Box-Muller transform).
+        '''
+        u1 = 1.0 - self.uniform()
+        u2 = self.uniform()
+        return mean + stddev * math.sqrt(-2.0 * math.log(u1)) * math.cos(6.283185307179586 * u2)
+
+    def bernoulli(self, p):
+        '''
+        bernoulli(p): True with probability p.
+        '''
+        return self.uniform() < p
+
+
+class RandomRun:
+    '''
+    The seeds of the instances of a run, as DevsmapRandom::startRun() and
+    DevsmapRandom::nextInstanceSeed() of devsmap_random.hpp give them: the instances that draw
+    random numbers are seeded from the seed of the run, in the order they are built.
+    '''
+
+    def __init__(self, seed=0):
+        self.run_seed = seed & MASK_64
+        self.instance_count = 0
+
+    def next_instance_seed(self):
+        '''
+        Returns the seed of the next instance built in the run.
+        '''
+        self.instance_count += 1
+        return splitmix64((self.run_seed + GOLDEN_GAMMA * self.instance_count) & MASK_64)[1]
+
+
+def to_signed_64(value):
+    '''
+    Returns the unsigned 64 bit integer value as a signed 64 bit integer (a long long).
+
+    Args:
+        value (int):    The unsigned 64 bit integer.
+    '''
+    value &= MASK_64
+    return value - (1 << 64) if value >> 63 else value
@@ -0,0 +1,141 @@
+# Library interface of the DEVSMap to Cadmium generator.
+#
+# These functions have no side effects at import time, and take their inputs as arguments
+# instead of hardcoded directories, so they can be called many times from one process
+# (for example, from a service).  generate_cadmium_code() works entirely in memory: it
+# takes the parsed DEVSMap json files, and returns the generated code of each file without
+# touching the disk.  DEVSMap_parser.py is the command line interface built on top of them.
+
+import os
+
+from parser_reading_files import (classify_json_filename, clean_output_directory, is_valid_fileset, print_file_report,
+                                  read_json_files, read_reachable_json_files, scan_json_directory,
+                                  select_reachable_json_data, sort_json_files)
+from generation_cache import load_manifest, save_manifest, write_generated_files
+from generate_build_files import UNITY_CHUNK_PREFIX
+from generate_project import generate_project_code, generate_project_files
+from pipeline_instrumentation import measure_stage
+from semantic_validation import check_json_data
+from state_layout import get_state_layout_report, print_state_layout_report
+
+
+def generate_cadmium_code(json_data, options=None, *, prune_unreachable_models=True, jobs=1, instrumentation=None):
+    '''
+    Returns a dictionary with the Cadmium C++ code of main.cpp and of the .hpp file of each
+    atomic and coupled model, keyed by the path of the file relative to the "main" directory
+    of the Cadmium project (for example, "main.cpp" and "include/counter.hpp").  Nothing is
+    read from or written to disk.
+
+    Raises a ValueError if json_data is not a valid set of DEVSMap files (see check_file_counts()),
+    and a DevsmapValidationError (a ValueError) listing every error found in the json files by
+    validate_json_data(), before any code is generated.
+
+    Args:
+        json_data (dict):                   The contents of each DEVSMap json file (already parsed
+                                            into dictionaries), keyed by filename (for example,
+                                            "counter_atomic.json").  The filenames give the file types.
+        options (dict):                     Optional generation options (see get_generation_options()).
+        prune_unreachable_models (bool):    True to only generate the models reachable from the experiment.
+        jobs (int):                         The number of worker processes used to generate the models.
+        instrumentation (dict):             Optional instrumentation returned by start_instrumentation().
+    '''
+    json_files = {filename: classify_json_filename(filename) for filename in sorted(json_data)}
+    if not is_valid_fileset(json_files):
+        raise ValueError(f"Invalid fileset: {sorted(json_data)}")
+    raw_data = {filename: json_data[filename] for filename in json_files}
+    if prune_unreachable_models:
+        raw_data = select_reachable_json_data(raw_data, json_files)
+    with measure_stage(instrumentation, 'validate_json_files'):
+        check_json_data(raw_data, json_files)
+    with measure_stage(instrumentation, 'sort_json_files'):
+        data = sort_json_files(raw_data, json_files)
+    return generate_project_code(data, options, jobs=jobs, instrumentation=instrumentation)
+
+
+def generate_cadmium_code_from_directory(directory_json_input, options=None, *, prune_unreachable_models=True, jobs=1, instrumentation=None):
+    '''
+    Returns the Cadmium C++ code generated from the DEVSMap json files in directory_json_input
+    (see generate_cadmium_code()).  Nothing is written to disk.
+
+    Args:
+        directory_json_input (str):         The directory where the json files are located.
+        options (dict):                     Optional generation options (see get_generation_options()).
+        prune_unreachable_models (bool):    True to only read and generate the models reachable from the experiment.
+        jobs (int):                         The number of worker processes used to generate the models.
+        instrumentation (dict):             Optional instrumentation returned by start_instrumentation().
+    '''
+    json_files = scan_json_directory(directory_json_input)
+    if not is_valid_fileset(json_files):
+        raise ValueError(f"Invalid fileset in {directory_json_input}")
+    with measure_stage(instrumentation, 'read_json_files'):
+        if prune_unreachable_models:
+            raw_data, _ = read_reachable_json_files(directory_json_input, json_files)
+        else:
+            raw_data = read_json_files(directory_json_input, json_files)
+    return generate_cadmium_code(raw_data, options, prune_unreachable_models=prune_unreachable_models, jobs=jobs, instrumentation=instrumentation)
+
+
+def write_cadmium_code(cadmium_code, directory_code_main_output):
+    '''
+    Writes the code returned by generate_cadmium_code() to the "main" directory of a Cadmium
+    project.  Files whose contents did not change are left untouched.
+
+    Args:
+        cadmium_code (dict):                The code of each file, keyed by its path relative to the "main" directory.
+        directory_code_main_output (str):   The "main" directory of the Cadmium project.
+    '''
+    write_generated_files(directory_code_main_output, cadmium_code)
+
+
+def generate_cadmium_project(directory_json_input, directory_code_main_output, options=None, *, incremental_generation=True,
+                             prune_unreachable_models=True, jobs=1, report_json_files=False, instrumentation=None, report_state_layouts=False):
+    '''
+    Generates main.cpp and the .hpp file of each atomic and coupled model from the DEVSMap
+    json files in directory_json_input, and writes them to the "main" directory of a Cadmium
+    project (the .hpp files are written to its "include" subdirectory).
+
+    Raises a ValueError if the input directory is not a valid set of DEVSMap files, and a
+    DevsmapValidationError (a ValueError) listing every error found in the json files by
+    validate_json_data(), before any file is written or deleted.
+
+    Args:
+        directory_json_input (str):         The directory where the json files are located.
+        directory_code_main_output (str):   The "main" directory of the Cadmium project.
+        options (dict):                     Optional generation options (see get_generation_options()).
+        incremental_generation (bool):      True to only regenerate the files whose inputs changed since the
+                                            last run.  False deletes and regenerates every file.
+        prune_unreachable_models (bool):    True to only read and generate the models reachable from the experiment.
+        jobs (int):                         The number of worker processes used to generate the models.
+        report_json_files (bool):           True to print the size and parse time of each json file.
+        instrumentation (dict):             Optional instrumentation returned by start_instrumentation().
+        report_state_layouts (bool):        True to print the estimated sizeof of the state struct of each atomic
+                                            model, with and without packing (see get_state_layout_report()).
+    '''
+    json_files = scan_json_directory(directory_json_input)
+    if not is_valid_fileset(json_files):
+        raise ValueError(f"Invalid fileset in {directory_json_input}")
+    directory_code_include_output = os.path.join(directory_code_main_output, 'include', '')
+
+    file_report = []
+    with measure_stage(instrumentation, 'read_json_files'):
+        if prune_unreachable_models:
+            raw_data, skipped_files = read_reachable_json_files(directory_json_input, json_files, file_report=file_report)
+            for filename in skipped_files:
+                print("Skipped unreachable model file: " + filename)
+        else:
+            raw_data = read_json_files(directory_json_input, json_files, file_report=file_report)
+    with measure_stage(instrumentation, 'validate_json_files'):
+        check_json_data(raw_data, json_files)
+    with measure_stage(instrumentation, 'sort_json_files'):
+        data = sort_json_files(raw_data, json_files)
+    if report_json_files:
+        print_file_report(file_report)
+    if report_state_layouts:
+        print_state_layout_report(get_state_layout_report(data))
+
+    if not incremental_generation:
+        clean_output_directory(directory_code_main_output, source_patterns=[UNITY_CHUNK_PREFIX + '*.cpp'])
+    manifest = load_manifest(directory_code_include_output) if incremental_generation else None
+    generate_project_files(data, directory_code_main_output, options, manifest=manifest, jobs=jobs, instrumentation=instrumentation)
+    if manifest is not None:
+        save_manifest(directory_code_include_output, manifest)
@@ -0,0 +1,112 @@
+# Functions for flattening a hierarchy of coupled models into a single coupled model.
+#
+# Each coupled model of the hierarchy is a Cadmium Coupled, and adds a coordinator (and a
+# routing hop for each message that crosses it) to the simulation.  Flattening replaces the
+# hierarchy under the top model by one coupled model whose components are all the atomic
+# model instances, coupled directly to each other: every internal coupling is followed
+# through the external input couplings (eic) and external output couplings (eoc) of the
+# coupled models it crosses, down to the ports of the atomic models.
+#
+# The atomic model instances of a nested coupled model are named after the ids of the
+# coupled models that contain them, joined by '_' (for example, the component
+# "counter_model" of the component "system_model" of the top model is "system_model_counter_model").
+#
+# Each coupled model is flattened once, in the topological order of the hierarchy (see
+# model_hierarchy.py), into a template whose ids are relative to the coupled model.  The
+# template of a subsystem is then reused, with the ids prefixed, by every coupled model that
+# contains it, instead of walking the subsystem again for each of its instances.
+
+from model_hierarchy import get_coupled_models, order_coupled_models
+
+
+def flatten_coupled_model(data, top_model_name):
+    '''
+    Returns the flattened coupled model of top_model_name, with the same keys as a DEVSMap
+    coupled model, except that its "components" are a list of (atomic model name, component id)
+    pairs (since an atomic model can have several instances).  Its "ic" couple the ports of
+    the atomic model instances directly, its "eic" and "eoc" couple its ports to those of the
+    atomic model instances, and its "component_paths" hold the instance path of each component
+    id in the init states (see index_init_states()).
+
+    Raises a ValueError if a coupled model contains itself, or if two atomic model instances
+    end up with the same id.
+
+    Args:
+        data (dict):            The DEVSMap json data that has been sorted into a dictionary.
+        top_model_name (str):   The name of the top model.
+    '''
+    coupled_models = get_coupled_models(data)
+    templates = {}
+    for coupled_model_name in order_coupled_models(coupled_models):
+        templates[coupled_model_name] = flatten_template(coupled_models[coupled_model_name], templates)
+    template = templates[top_model_name]
+
+    components = []
+    component_paths = {}
+    for model_name, model_id, path in template['components']:
+        if model_id in component_paths:
+            raise ValueError(f'Two atomic model instances are named "{model_id}" after flattening.')
+        components.append((model_name, model_id))
+        component_paths[model_id] = (top_model_name,) + path
+
+    internal_couplings = [{'port_from': port_from, 'port_to': port_to, 'component_from': component_from, 'component_to': component_to}
+                          for component_from, port_from, component_to, port_to in template['ic']]
+    external_input_couplings = [{'port_from': port, 'port_to': port_to, 'component_to': component_to}
+                                for port, destinations in template['inputs'].items() for component_to, port_to in destinations]
+    external_output_couplings = [{'port_from': port_from, 'port_to': port, 'component_from': component_from}
+                                 for port, sources in template['outputs'].items() for component_from, port_from in sources]
+    return dict(coupled_models[top_model_name], components=components, ic=internal_couplings, eic=external_input_couplings,
+                eoc=external_output_couplings, component_paths=component_paths)
+
+
+def flatten_template(coupled_model, templates):
+    '''
+    Returns the flattened template of a coupled model, whose ids are relative to the coupled
+    model, as a dictionary with:
+        'components':   The list of (atomic model name, component id, instance path) of each
+                        atomic model instance, where the instance path is the tuple of the ids
+                        leading to it from the coupled model.
+        'ic':           The list of (component from, port from, component to, port to) of the
+                        couplings between the ports of the atomic model instances.
+        'inputs':       The list of (component id, port) of the atomic model ports that receive
+                        the messages of each input port of the coupled model, keyed by port.
+        'outputs':      The list of (component id, port) of the atomic model ports whose messages
+                        leave through each output port of the coupled model, keyed by port.
+
+    Args:
+        coupled_model (dict):   The DEVSMap data of the coupled model.
+        templates (dict):       The templates of the coupled models of its components, keyed by
+                                coupled model name.
+    '''
+    components = []
+    internal_couplings = []
+    instances = {}
+    for model_name, model_id in coupled_model.get('components', {}).items():
+        instances[model_id] = model_name
+        template = templates.get(model_name)
+        if template is None:
+            components.append((model_name, model_id, (model_id,)))
+            continue
+        prefix = model_id + '_'
+        components.extend((name, prefix + flat_id, (model_id,) + path) for name, flat_id, path in template['components'])
+        internal_couplings.extend((prefix + component_from, port_from, prefix + component_to, port_to)
+                                  for component_from, port_from, component_to, port_to in template['ic'])
+
+    def resolve(model_id, port, direction):
+        template = templates.get(instances[model_id])
+        if template is None:
+            return [(model_id, port)]
+        return [(model_id + '_' + flat_id, flat_port) for flat_id, flat_port in template[direction].get(port, [])]
+
+    for coupling in coupled_model.get('ic', []):
+        for component_from, port_from in resolve(coupling['component_from'], coupling['port_from'], 'outputs'):
+            for component_to, port_to in resolve(coupling['component_to'], coupling['port_to'], 'inputs'):
+                internal_couplings.append((component_from, port_from, component_to, port_to))
+
+    inputs = {}
+    for coupling in coupled_model.get('eic', []):
+        inputs.setdefault(coupling['port_from'], []).extend(resolve(coupling['component_to'], coupling['port_to'], 'inputs'))
+    outputs = {}
+    for coupling in coupled_model.get('eoc', []):
+        outputs.setdefault(coupling['port_to'], []).extend(resolve(coupling['component_from'], coupling['port_from'], 'outputs'))
+    return {'components': components, 'ic': internal_couplings, 'inputs': inputs, 'outputs': outputs}
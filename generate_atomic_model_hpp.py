@@ -1,46 +1,231 @@
 # TODO module comments
 
+import re
+
 from generate_simple_statements import *
 from helper import *
-import re
+from generation_cache import compute_input_hash, get_up_to_date_check, write_generated_files
+from parallel_generation import generate_code_in_parallel
+from pipeline_instrumentation import record_model_measurements
+from devsmap_expressions import emit_bag_declarations, emit_expression, model_uses_random
+from init_state_index import index_init_states, find_initialization_values_for_model, find_reused_atomic_models
+from code_emitter import join_fragments, write_file_atomically
+from state_layout import order_state_variables
 
 
-def generate_atomic_models(directory_cpp_code, data):
+def generate_atomic_models(directory_cpp_code, data, manifest=None, jobs=1, instrumentation=None, init_state_index=None, pack_state_structs=False,
+                           split_definitions=False):
     '''
-    Loops through all atomic models and generates the .hpp file for each one.
+    Loops through all atomic models and generates the .hpp file for each one (see
+    generate_atomic_models_code()).
 
     Args:
         directory_cpp_code (str):   The output directory to place the .hpp files.
         data (dict):                The DEVSMap json data that has been sorted into a dictionary.
+        manifest (dict):            Optional manifest returned by load_manifest(directory). When given,
+                                    only the atomic models whose inputs changed are regenerated.
+        jobs (int):                 The number of worker processes used to generate the models 
+                                    (see get_number_of_jobs()). 1 generates serially.
+        instrumentation (dict):     Optional instrumentation returned by start_instrumentation(), in 
+                                    which the time and memory used to generate each model are recorded.
+        init_state_index (dict):    Optional index of the init states returned by index_init_states(data). 
+                                    The index is built if it is not given.
+        pack_state_structs (bool):  True to declare the fields of the state structs in the order that
+                                    minimizes their padding (see order_state_variables()).
+        split_definitions (bool):   True to only declare the member functions in the .hpp file of each model, 
+                                    and define them in a separate _definitions.hpp file (see 
+                                    generate_atomic_model_definitions_code()), which is compiled in a unity chunk.
+    '''
+    input_hashes = {}
+    is_up_to_date = get_up_to_date_check(directory_cpp_code, manifest, input_hashes) if manifest is not None else None
+    write_generated_files(directory_cpp_code, generate_atomic_models_code(data, jobs, instrumentation, init_state_index, pack_state_structs,
+                                                                          split_definitions, is_up_to_date),
+                          manifest, input_hashes)
+
+
+def generate_atomic_models_code(data, jobs=1, instrumentation=None, init_state_index=None, pack_state_structs=False, split_definitions=False,
+                                is_up_to_date=None):
+    '''
+    Returns a dictionary with the C++ code of the .hpp file of each atomic model, keyed by 
+    the filename of the .hpp file.  Nothing is written to disk.
+
+    Args:
+        data (dict):                The DEVSMap json data that has been sorted into a dictionary.
+        jobs (int):                 The number of worker processes used to generate the models 
+                                    (see get_number_of_jobs()). 1 generates serially.
+        instrumentation (dict):     Optional instrumentation returned by start_instrumentation(), in 
+                                    which the time and memory used to generate each model are recorded.
+        init_state_index (dict):    Optional index of the init states returned by index_init_states(data). 
+                                    The index is built if it is not given.
+        pack_state_structs (bool):  True to declare the fields of the state structs in the order that
+                                    minimizes their padding (see order_state_variables()).
+        split_definitions (bool):   True to also return the _definitions.hpp file of each model (see 
+                                    generate_atomic_model_definitions_code()).
+        is_up_to_date (func):       Optional function is_up_to_date(filename, input_hash) that returns True if
+                                    the file was already generated from inputs with that hash (see
+                                    get_up_to_date_check()).  The models whose files are all up to date are
+                                    left out.
+    '''
+    list_of_arguments = []
+    if init_state_index is None:
+        init_state_index = index_init_states(data)
+    reused_atomic_models = find_reused_atomic_models(init_state_index)
+    for atomic_model_data in data['atomic_models']:
+        atomic_model_name = list(atomic_model_data.keys())[0]
+        atomic_model = atomic_model_data[atomic_model_name]
+        initialization_values = find_initialization_values_for_model(init_state_index, atomic_model_name, atomic_model['s'].keys())
+        arguments = (initialization_values, atomic_model_name, atomic_model, pack_state_structs,
+                     atomic_model_name in reused_atomic_models, split_definitions)
+        if is_up_to_date is not None:
+            # The definitions depend on the same inputs as the .hpp file of the model.
+            input_hash = compute_input_hash(*arguments)
+            filenames = [atomic_model_name + '.hpp'] + ([get_definitions_filepath(atomic_model_name + '.hpp')] if split_definitions else [])
+            if all([is_up_to_date(filename, input_hash) for filename in filenames]):
+                continue
+        list_of_arguments.append(arguments)
+
+    measurements = [] if instrumentation is not None else None
+    codes = generate_code_in_parallel(generate_atomic_model_code, list_of_arguments, jobs, measurements=measurements)
+    atomic_models_code = {arguments[1] + '.hpp': code for arguments, code in zip(list_of_arguments, codes)}
+    if split_definitions:
+        codes = generate_code_in_parallel(generate_atomic_model_definitions_code, [arguments[1:3] for arguments in list_of_arguments], jobs,
+                                          measurements=measurements)
+        atomic_models_code.update((get_definitions_filepath(arguments[1] + '.hpp'), code) for arguments, code in zip(list_of_arguments, codes))
+    record_model_measurements(instrumentation, 'atomic', measurements or [])
+    return atomic_models_code
+
+
+def generate_atomic_model(directory, initialization_values, atomic_model_name, atomic_model, pack_state_structs=False, reuse=False,
+                          split_definitions=False):
     '''
-    number_of_atomic_models = len(data['atomic_models'])
-    for i in range(number_of_atomic_models):
-        atomic_model_name = list(data['atomic_models'][i].keys())[0]
-        atomic_model = data['atomic_models'][i][atomic_model_name]
-        generate_atomic_model(directory_cpp_code, data['init_states'], atomic_model_name, atomic_model)
+    Creates a .hpp file in directory, and generates the C++ code for the atomic model within that file.
+
+    Args:
+        directory (str):                The output directory to place the .hpp file.
+        initialization_values (dict):   The initial value of each state variable, returned by 
+                                        find_initialization_values_for_model().
+        atomic_model_name (str):        The name of the atomic model, which will also be the name of the .hpp file.
+        atomic_model (dict):            The DEVSMap data of the atomic model to generate the C++ code from.
+        pack_state_structs (bool):      True to declare the fields of the state struct in the order that
+                                        minimizes its padding (see order_state_variables()).
+        reuse (bool):                   True if the atomic model is reused with different initialization values, 
+                                        which are then passed to its constructor (see find_reused_atomic_models()).
+        split_definitions (bool):       True to only declare the member functions, and define them in a separate 
+                                        _definitions.hpp file, which is also written to directory.
+    '''
+    output_filepath = directory + atomic_model_name + '.hpp'
+    write_file_atomically(output_filepath, generate_atomic_model_code(initialization_values, atomic_model_name, atomic_model, pack_state_structs,
+                                                                      reuse, split_definitions))
+    if split_definitions:
+        write_file_atomically(get_definitions_filepath(output_filepath),
+                              generate_atomic_model_definitions_code(atomic_model_name, atomic_model))
 
 
-def generate_atomic_model(directory, init_states, atomic_model_name, atomic_model):
+def generate_atomic_model_code(initialization_values, atomic_model_name, atomic_model, pack_state_structs=False, reuse=False,
+                               split_definitions=False):
     '''
-    Creates a .hpp file in directory, and generates the C++ code for the atomic model within that file.
+    Returns the C++ code of the .hpp file for the atomic model.
+
+    Args:
+        initialization_values (dict):   The initial value of each state variable, returned by 
+                                        find_initialization_values_for_model().
+        atomic_model_name (str):        The name of the atomic model.
+        atomic_model (dict):            The DEVSMap data of the atomic model to generate the C++ code from.
+        pack_state_structs (bool):      True to declare the fields of the state struct in the order that
+                                        minimizes its padding (see order_state_variables()).
+        reuse (bool):                   True if the atomic model is reused with different initialization values, 
+                                        which are then passed to its constructor (see find_reused_atomic_models()).
+        split_definitions (bool):       True to only declare operator<< and the member functions of the class, 
+                                        which are then defined by generate_atomic_model_definitions_code().
+    '''
+    state_name = get_state_name(atomic_model_name)
+    bitshift_override_function = generate_bitshift_override_function(state_name, atomic_model)
+    if split_definitions:
+        bitshift_override_function = '#ifndef NO_LOGGING\n' + split_function_definition(strip_logging_guard(bitshift_override_function))[0] + '#endif\n\n'
+    return join_fragments([generate_file_definition(atomic_model_name),
+                           include_iostream(),
+                           include_random() if model_uses_random(atomic_model) else '',
+                           include_atomic(),
+                           cadmium_namespace(),
+                           generate_state_struct(initialization_values, state_name, atomic_model, pack_state_structs, reuse),
+                           bitshift_override_function,
+                           generate_class(atomic_model_name, state_name, atomic_model, reuse, split_definitions),
+                           '#endif'])
+
+
+def generate_atomic_model_definitions_code(atomic_model_name, atomic_model):
+    '''
+    Returns the C++ code of the _definitions.hpp file of the atomic model, which defines 
+    operator<< and the member functions of the class declared by 
+    generate_atomic_model_code(..., split_definitions=True).  Each definitions file is 
+    included by exactly one unity chunk (see generate_build_files.py), so that the models 
+    are compiled in several translation units instead of all of them in main.cpp.
+
+    The definitions do not depend on the initialization values, the layout of the state struct
+    or its constructors, so only the model is needed.
 
     Args:
-        directory (str):            The output directory to place the .hpp file.
-        atomic_model_name (str):    The name of the atomic model, which will also be the name of the .hpp file.
+        atomic_model_name (str):    The name of the atomic model.
         atomic_model (dict):        The DEVSMap data of the atomic model to generate the C++ code from.
     '''
     state_name = get_state_name(atomic_model_name)
-    output_filepath = directory + atomic_model_name + '.hpp'
-    with open(output_filepath, 'w') as file:
-        file.write(generate_file_definition(atomic_model_name))
-        file.write(include_iostream())
-        file.write(include_atomic())
-        file.write(cadmium_namespace())
-        file.write(generate_state_struct(init_states, state_name, atomic_model))
-        file.write(generate_bitshift_override_function(state_name, atomic_model))
-        file.write(generate_class(atomic_model_name, state_name, atomic_model))
-        file.write('#endif') 
-    file.close()
+    definitions = [generate_file_definition(atomic_model_name + '_definitions'),
+                   '#include "' + atomic_model_name + '.hpp"\n\n',
+                   '#ifndef NO_LOGGING\n',
+                   split_function_definition(strip_logging_guard(generate_bitshift_override_function(state_name, atomic_model)))[1].removesuffix('\n'),
+                   '#endif\n\n']
+    for member_function in generate_member_functions(state_name, atomic_model):
+        definitions.append(split_function_definition(member_function, atomic_model_name)[1])
+    definitions.append('#endif')
+    return join_fragments(definitions)
+
+
+def get_definitions_filepath(filepath):
+    '''
+    Returns the path of the _definitions.hpp file of the atomic model whose .hpp file is at filepath.
+
+    Args:
+        filepath (str):     The path of the .hpp file of the atomic model (for example, "include/counter.hpp").
+    '''
+    return filepath.removesuffix('.hpp') + '_definitions.hpp'
+
+
+def strip_logging_guard(function):
+    '''
+    Returns the code of function (operator<<) without the NO_LOGGING guard around it.
+
+    Args:
+        function (str):     The code returned by generate_bitshift_override_function().
+    '''
+    return function.removeprefix('#ifndef NO_LOGGING\n').replace('#endif\n', '')
+
+
+def split_function_definition(function, class_name=None):
+    '''
+    Returns a tuple (declaration, definition) of a function generated within a class (or the 
+    operator<< of the state struct), with the layout of the generators below: the head of 
+    the function on its first line, indented once and ending with " {", and the body indented 
+    twice.  The declaration keeps the indentation and the specifiers of the head.  The definition 
+    is out of the class: its name is qualified with class_name, the "override" specifier and the 
+    attributes are removed, and its body is indented once.
+
+    Args:
+        function (str):     The code of the function.
+        class_name (str):   The name of the class of the member function, or None for a free function.
+    '''
+    head, body = function.split('\n', 1)
+    head = head.removesuffix(' {')
+    declaration = head + ';\n'
+
+    definition_head = head.strip().replace(' override', '')
+    definition_head = re.sub(r'^\[\[\w+\]\]\s*', '', definition_head)
+    if class_name is not None:
+        definition_head = re.sub(r'(\w+)\(', class_name + r'::\1(', definition_head, count=1)
+    body_lines = body.rstrip('\n').split('\n')
+    # The closing brace of the function is its last line.
+    body_lines = [line.removeprefix('\t') for line in body_lines[:-1]]
+    definition = definition_head + ' {\n' + join_fragments(line + '\n' for line in body_lines) + '}\n\n'
+    return declaration, definition
 
 
 def include_iostream():
@@ -50,6 +235,14 @@ def include_iostream():
     return "#include <iostream>\n"
 
     
+def include_random():
+    '''
+    Returns the C++ statement to include the random number generator of the atomic models 
+    (see generate_random_hpp.py).
+    '''
+    return "#include \"devsmap_random.hpp\"\n"
+
+
 def include_atomic():
     '''
     Returns the C++ statement to include Cadmium's C++ definition of an atomic model.
@@ -68,99 +261,98 @@ def get_state_name(model_name):
     return model_name + "State"
         
 
-# TODO Only the first part is implemented, the else will be temporarily implemented 
-# to allow for code reuse of an atomic model with different initialization values 
-# (after which the if statement can be removed)
-def generate_state_struct(init_states, state_name, model):
+def generate_state_struct(initialization_values, state_name, model, pack_state_structs=False, reuse=False):
     '''
-    NOTE: Temporary function to abstract out a deferred feature (atomic model code reuse)
+    Returns the state struct for the atomic model being generated.  If the atomic model is 
+    reused with different initialization values, the state struct also has a constructor 
+    that takes the initial value of each state variable, which the coupled models call for 
+    each instance (see get_component_initial_states()).
+
+    Args:
+        initialization_values (dict):   The initial value of each state variable, returned by 
+                                        find_initialization_values_for_model().
+        state_name (str):               The name of the atomic model's state object.
+        model (dict):                   The DEVSMap dictionary data for the atomic model being generated.
+        pack_state_structs (bool):      True to declare the fields in the order that minimizes the padding
+                                        of the struct (see order_state_variables()).
+        reuse (bool):                   True if the atomic model is reused with different initialization values.
     '''
     # Apply the appropriate generator function based on whether or not the 
     # atomic model is reused with different initialization states
-    reuse = False
     if not reuse:
-        # this always happens for now
-        return generate_state_struct_no_parameters(init_states, state_name, model)
+        return generate_state_struct_no_parameters(initialization_values, state_name, model, pack_state_structs)
     else:
-        # NOT IMPLEMENTED
-        return generate_state_struct_with_parameters(state_name, model)
+        return generate_state_struct_with_parameters(initialization_values, state_name, model, pack_state_structs)
     
     
-# TODO CHANGE PARAMETER NAMES IN RECURSIVE FUNCTION
-def find_initialization_values_for_model(init_state, state_variable_names):
+def generate_state_struct_no_parameters(initialization_values, state_name, model, pack_state_structs=False):
     '''
-    Returns the initialization values of each state variable for an atomic model.
+    Generates the state struct for an atomic model whose instances all share the same 
+    initialization values, which are the values of its default constructor.
 
     Args:
-        init_states (dict):                 The DEVSMap dictionary init states data for all models. 
-                                            Given by data['init_states'].
-        state_variable_names (dict_keys):   The names of all state variables for the atomic model 
-                                            being generated. Given by model['s'].keys().
-    '''
-    def recursive_search(obj):
-        if isinstance(obj, dict):
-            if obj.keys() == state_variable_names:
-                return obj
-            for value in obj.values():
-                result = recursive_search(value)
-                if result:
-                    return result
-        elif isinstance(obj, list):
-            for item in obj:
-                result = recursive_search(item)
-                if result:
-                    return result
-        return None    
-    return recursive_search(init_state)
-
-
-def generate_state_struct_no_parameters(init_states, state_name, model):
-    '''
-    NOTE: Temporary function while atomic model code reuse is not implemented.
-    Generates the state struct for an atomic model, assuming that all atomic
-    models share the same initialization values.
-
-    Args:
-        init_states (dict): The DEVSMap dictionary init states data for all models. 
-                            Given by data['init_states']
-        state_name (str):   The name of the atomic model's state object.
-        model (dict):       The DEVSMap dictionary data for the atomic model being generated.
+        initialization_values (dict):   The initial value of each state variable, returned by 
+                                        find_initialization_values_for_model().
+        state_name (str):               The name of the atomic model's state object.
+        model (dict):                   The DEVSMap dictionary data for the atomic model being generated.
+        pack_state_structs (bool):      True to declare the fields in the order that minimizes the padding
+                                        of the struct (see order_state_variables()), instead of the order
+                                        of the DEVSMap file.  The initializer list follows the same order.
     '''
-    state_struct = ''
     state_variables = model['s'].items()
-    state_variable_names = model['s'].keys()
+    if pack_state_structs:
+        state_variables = order_state_variables(state_variables)
     
-    state_struct += 'struct ' + state_name + ' {\n'
+    state_struct = ['struct ' + state_name + ' {\n']
     
-    declarations = ''
     for variable_name, variable_type in state_variables:
-        declarations += '\t' + variable_type + ' ' + variable_name + ';\n'
-    state_struct += declarations
+        state_struct.append('\t' + variable_type + ' ' + variable_name + ';\n')
+    # The random number generator is not a state variable: it is seeded by the constructor 
+    # of the atomic model, and drawn from in the const output and time advance functions.
+    if model_uses_random(model):
+        state_struct.append('\tmutable DevsmapRandom rng;\n')
     
-    state_struct += '\n\texplicit ' + state_name + '(): '
+    state_struct.append('\n\texplicit ' + state_name + '(): ')
     
     # This is intentionally inefficient with a second for loop to allow for decoupling of the initializations later (for atomic models that are re-used with different inititalization values)
-    initialization_values = find_initialization_values_for_model(init_states, state_variable_names)
-    
-    initializations = ''
+    initializations = []
     for variable_name, variable_type in state_variables:
+        if variable_name not in initialization_values:
+            raise ValueError('No initial value was found for the state variable "' + variable_name + '" of ' + state_name + '.')
         value = initialization_values[variable_name]
 
-        initializations += ' ' + variable_name + '(' + value + '), '
+        initializations.append(' ' + variable_name + '(' + value + ')')
     
-    state_struct += initializations.rstrip(', ')
+    state_struct.append(', '.join(initializations))
     
-    state_struct += ' {\n\t}\n};\n\n'
-    state_struct = replace_inf(state_struct)
+    state_struct.append(' {\n\t}\n};\n\n')
     
-    return state_struct  
+    return replace_inf(join_fragments(state_struct))
 
 
-def generate_state_struct_with_parameters(state_name, model):
-    '''
+def generate_state_struct_with_parameters(initialization_values, state_name, model, pack_state_structs=False):
     '''
-    #TODO
-    return "Code reuse functionality is not yet implemented.  Code reuse is being attempted on the model: " + state_name.replace('State', '')
+    Generates the state struct for an atomic model that is reused with different initialization 
+    values.  The default constructor initializes the state variables with the values of the first 
+    instance (as generate_state_struct_no_parameters() does), and a second constructor takes the 
+    initial value of each state variable, in the order of the DEVSMap file.
+
+    Args:
+        initialization_values (dict):   The initial value of each state variable of the first instance, 
+                                        returned by find_initialization_values_for_model().
+        state_name (str):               The name of the atomic model's state object.
+        model (dict):                   The DEVSMap dictionary data for the atomic model being generated.
+        pack_state_structs (bool):      True to declare the fields in the order that minimizes the padding
+                                        of the struct (see order_state_variables()).
+    '''
+    state_struct = generate_state_struct_no_parameters(initialization_values, state_name, model, pack_state_structs)
+    # The initializer list follows the order of the declarations, and the parameters the order of the DEVSMap file.
+    state_variables = model['s'].items()
+    declared_variables = order_state_variables(state_variables) if pack_state_structs else state_variables
+    parameters = ', '.join(variable_type + ' ' + variable_name for variable_name, variable_type in state_variables)
+    initializations = ', '.join(' ' + variable_name + '(' + variable_name + ')' for variable_name, _ in declared_variables)
+    constructor = '\n\texplicit ' + state_name + '(' + parameters + '): ' + initializations + ' {\n\t}\n};\n\n'
+    return state_struct.removesuffix('};\n\n') + constructor
 
 
 def generate_bitshift_override_function(state_name, model):
@@ -172,28 +364,22 @@ def generate_bitshift_override_function(state_name, model):
         model (dict):       The The DEVSMap dictionary data for the atomic model being generated.
     '''
     state_variables = model['s'].keys() 
-    function = ''
-    function += '#ifndef NO_LOGGING\n'
-    function += '\tstd::ostream& operator<<(std::ostream &out, const ' + state_name + '& state) {\n'
+    function = ['#ifndef NO_LOGGING\n',
+                '\tstd::ostream& operator<<(std::ostream &out, const ' + state_name + '& state) {\n']
     
     if (len(state_variables)) > 0:
-        function += '\t\tout << "{'
-    
-        for variable_name in state_variables:
-            function += variable_name + ': " << state.' + variable_name + ' << ", '
-        function = function.rstrip(', ')
-        function += '}";\n'
-    else:
-        # Error message for state set cannot be null
-        function += ''
+        function.append('\t\tout << "{')
+        function.append(', '.join([variable_name + ': " << state.' + variable_name + ' << "' for variable_name in state_variables]))
+        function.append('}";\n')
+    # else: Error message for state set cannot be null
         
-    function += '\t\treturn out;\n'
-    function += '\t}\n#endif\n\n'
+    function.append('\t\treturn out;\n')
+    function.append('\t}\n#endif\n\n')
     
-    return function
+    return join_fragments(function)
     
     
-def generate_class(model_name, state_name, model):
+def generate_class(model_name, state_name, model, reuse=False, split_definitions=False):
     '''
     #TODO confluent function is a later item
     Returns the C++ class definition for the atomic model being generated.  This includes 
@@ -204,30 +390,48 @@ def generate_class(model_name, state_name, model):
         model_name (str):   The name of the atomic model being generated.
         state_name (str):   The name of the atomic model's state object.
         model (dict):       The The DEVSMap dictionary data for the atomic model being generated.
+        reuse (bool):       True if the atomic model is reused with different initialization values, 
+                            which are then passed to its constructor.
+        split_definitions (bool):   True to only declare the member functions (see split_function_definition()).
+    '''
+    input_ports = model['x']
+    output_ports = model['y']
+    member_functions = generate_member_functions(state_name, model)
+    if split_definitions:
+        member_functions = [split_function_definition(member_function)[0] for member_function in member_functions]
+    
+    return join_fragments(['class ' + model_name + ' : public Atomic<' + state_name + '> {\n',
+                           generate_port_declarations(input_ports, output_ports),
+                           generate_class_constructor(model_name, state_name, input_ports, output_ports, reuse, model_uses_random(model)),
+                           *member_functions,
+                           '};\n\n'])
+
+
+def generate_member_functions(state_name, model):
+    '''
+    #TODO confluent function is a later item
+    Returns the list of the member functions of the class of the atomic model being generated, 
+    as defined within the class: the internal transition function, external transition function, 
+    output function, and time advance function.
+
+    Args:
+        state_name (str):   The name of the atomic model's state object.
+        model (dict):       The DEVSMap dictionary data for the atomic model being generated.
     '''
     
     #Organize some variables to pass to the generators
     #INEFFICIENT - could pass these directly - readability vs. efficiency tradeoff
     list_of_state_variables = list(model['s'].keys())
-    input_ports = model['x']
-    output_ports = model['y']
     delta_int = model['delta_int']
     delta_ext = model['delta_ext']
     #delta_con = model['delta_con'] # not implemented
     lambda_func = model['lambda'] # lambda is a python keyword and cannot be used
     ta = model['ta']
     
-    #print(list_of_state_variables)
-    #print(delta_int)
-    #print(delta_ext)
-    #print(lambda_func)
-    #print(ta)
-    
-    class_definition = 'class ' + model_name + ' : public Atomic<' + state_name + '> {\n'
-    class_definition += generate_port_declarations(input_ports, output_ports) + generate_class_constructor(model_name, state_name, input_ports, output_ports) + generate_internal_transition(state_name, delta_int, list_of_state_variables) + generate_external_transition(state_name, delta_ext, list_of_state_variables) + generate_output_function(state_name, lambda_func, list_of_state_variables) + generate_time_advance_function(state_name, ta, list_of_state_variables)
-    class_definition += '};\n\n'
-    
-    return class_definition
+    return [generate_internal_transition(state_name, delta_int, list_of_state_variables, model['s']),
+            generate_external_transition(state_name, delta_ext, list_of_state_variables, model['s']),
+            generate_output_function(state_name, lambda_func, list_of_state_variables, model['s']),
+            generate_time_advance_function(state_name, ta, list_of_state_variables)]
 
 
 def generate_port_declarations(input_ports, output_ports):
@@ -244,21 +448,22 @@ def generate_port_declarations(input_ports, output_ports):
         output_ports (dict):    The DEVSMap dictionary data for the atomic model's input ports, 
                                 given by model_name['y']
     '''   
-    port_declarations = '\tpublic:\n'
+    port_declarations = ['\tpublic:\n']
     # input ports
-    port_declarations += '\t//input ports\n'
+    port_declarations.append('\t//input ports\n')
     for port_name in input_ports:
         data_type = input_ports[port_name]
-        port_declarations += '\tPort<' + data_type + '> ' + port_name + ';\n'
+        port_declarations.append('\tPort<' + data_type + '> ' + port_name + ';\n')
     # output ports
-    port_declarations += '\n\t//output ports\n'
+    port_declarations.append('\n\t//output ports\n')
     for port_name in output_ports:
         data_type = output_ports[port_name]
-        port_declarations += '\tPort<' + data_type + '> ' + port_name + ';\n'
-    return port_declarations + '\n'
+        port_declarations.append('\tPort<' + data_type + '> ' + port_name + ';\n')
+    port_declarations.append('\n')
+    return join_fragments(port_declarations)
 
 
-def generate_class_constructor(model_name, state_name, input_ports, output_ports):
+def generate_class_constructor(model_name, state_name, input_ports, output_ports, reuse=False, seed_random=False):
     '''
     Returns C++ code that is the constructor for the atomic model being generated.
     
@@ -269,26 +474,40 @@ def generate_class_constructor(model_name, state_name, input_ports, output_ports
                                 given by model_name['x']
         output_ports (dict):    The DEVSMap dictionary data for the atomic model's input ports, 
                                 given by model_name['y']
+        reuse (bool):           True if the atomic model is reused with different initialization values.  
+                                The constructor then takes the initial state of the instance (the 
+                                default initial state is used if it is not given).
+        seed_random (bool):     True to seed the random number generator of the state of the instance 
+                                (see DevsmapRandom::nextInstanceSeed()).
     '''   
-    port_initializations = '\t' + model_name + '(const std::string id) : Atomic<' + state_name + '>(id, ' + state_name + '()) {\n'
+    if reuse:
+        port_initializations = ['\t' + model_name + '(const std::string id, const ' + state_name + '& initialState = ' + state_name + '()) : Atomic<'
+                                + state_name + '>(id, initialState) {\n']
+    else:
+        port_initializations = ['\t' + model_name + '(const std::string id) : Atomic<' + state_name + '>(id, ' + state_name + '()) {\n']
     
     # input ports
-    port_initializations += '\t\t//input ports\n'
+    port_initializations.append('\t\t//input ports\n')
     for port_name in input_ports:
         data_type = input_ports[port_name]
-        port_initializations += '\t\t' + port_name + ' = addInPort<' + data_type + '>("' + port_name + '");\n'    
+        port_initializations.append('\t\t' + port_name + ' = addInPort<' + data_type + '>("' + port_name + '");\n')
     
     # output ports
-    port_initializations += '\n\t\t//output ports\n'
+    port_initializations.append('\n\t\t//output ports\n')
     for port_name in output_ports:
         data_type = output_ports[port_name]
-        port_initializations += '\t\t' + port_name + ' = addOutPort<' + data_type + '>("' + port_name + '");\n'
+        port_initializations.append('\t\t' + port_name + ' = addOutPort<' + data_type + '>("' + port_name + '");\n')
+
+    # random number generator
+    if seed_random:
+        port_initializations.append('\n\t\t//random number generator\n')
+        port_initializations.append('\t\tstate.rng.seed(DevsmapRandom::nextInstanceSeed());\n')
     
-    port_initializations += '\t}\n\n'
-    return port_initializations
+    port_initializations.append('\t}\n\n')
+    return join_fragments(port_initializations)
 
 
-def generate_internal_transition(state_name, delta_int, list_of_state_variables):
+def generate_internal_transition(state_name, delta_int, list_of_state_variables, state_variable_types=None):
     '''
     Returns the internal transition function for the atomic model being generated.
 
@@ -298,19 +517,21 @@ def generate_internal_transition(state_name, delta_int, list_of_state_variables)
                                                 given by model_name['delta_int']
         list_of_state_variables (dict_items):   The list of state variables of the atomic model, returned by 
                                                 atomic_model['s'].items()
+        state_variable_types (dict):            Optional C++ type of each state variable, given by atomic_model['s'].
     '''
-    internal_transition_function = '\tvoid internalTransition(' + state_name + '& state) const override {\n'
-    internal_transition_function += build_conditional_statements(delta_int, list_of_state_variables)
-    internal_transition_function += '\t}\n\n'
-    internal_transition_function = replace_inf(internal_transition_function)
-    return internal_transition_function
+    return join_fragments(['\tvoid internalTransition(' + state_name + '& state) const override {\n',
+                           build_conditional_statements(delta_int, list_of_state_variables, 'delta_int', state_variable_types=state_variable_types),
+                           '\t}\n\n'])
 
 
-def generate_external_transition(state_name, delta_ext, list_of_state_variables):
+def generate_external_transition(state_name, delta_ext, list_of_state_variables, state_variable_types=None):
     '''
-    # TODO refactor this to use a helper function, so it is structured like the generate_internal_transition() above
-
-    Returns the external transition function for the atomic model being generated.
+    Returns the external transition function for the atomic model being generated.  The JSON 
+    bag operators are converted to the Cadmium C++ functions while the conditions and 
+    assignments are emitted (for example, "port.bag(-1)" becomes "port_bag.back()").  The bag 
+    of each input port that is used is looked up once, at the top of the function, into a 
+    local const reference (port_bag), and whether it is empty is evaluated once (port_empty), 
+    so the branches reuse them instead of querying the port again.
 
     Args:
         state_name (str):                       The name of the atomic model's state object.
@@ -318,38 +539,23 @@ def generate_external_transition(state_name, delta_ext, list_of_state_variables)
                                                 given by model_name['delta_ext']
         list_of_state_variables (dict_items):   The list of state variables of the atomic model, returned by 
                                                 atomic_model['s'].items()
+        state_variable_types (dict):            Optional C++ type of each state variable, given by atomic_model['s'].
     '''
-    external_transition_function = '\tvoid externalTransition(' + state_name + '& state, double e) const override {\n'
-    
-    conditional_statements = build_conditional_statements(delta_ext, list_of_state_variables)
-    external_transition_body = ''
-    
-    # Go through the if/else structure and convert JSON bag operators to the correct C++ functions and syntax
-    for line in conditional_statements.splitlines(True): # True keeps the linebreaks in
-        # remove tabs to check what the line starts with
-        templine = line.lstrip('\t')
-        # if the line is building the condition, we are making changes based on the bag size
-        if (templine.startswith('if') or templine.startswith('else if') or templine.startswith('else') or templine.startswith('{') or templine.startswith('}')):
-            # replaces "variable_name.bagSize() != 0" with !variable_name->empty()
-            line = re.sub(r'\b([a-zA-Z_][a-zA-Z0-9_]*)\.bagSize\(\) != 0', r'!\1->empty()', line)
-            # replaces "variable_name.bagSize() == 0" with variable_name->empty()
-            line = re.sub(r'\b([a-zA-Z_][a-zA-Z0-9_]*)\.bagSize\(\) == 0', r'\1->empty()', line)
-            external_transition_body += line            
-        # if the line is an instruction, we are making changes based on getting the last value from the bag
-        else:
-            # replaces "variablename.bag(-1)" with "variablename->getBag().back()"
-            line = re.sub(r'\b([a-zA-Z_][a-zA-Z0-9_]*)\.bag\(-1\)', r'\1->getBag().back()', line)
-            external_transition_body += line
-            
-    external_transition_function += external_transition_body    
-    
-    external_transition_function += '\t}\n\n'
-    return external_transition_function
+    bag_operations, identifiers = find_bag_operations(delta_ext)
+    declarations, bag_variables = emit_bag_declarations(bag_operations, identifiers | {state_name, 'state', 'e'})
+    fragments = ['\tvoid externalTransition(' + state_name + '& state, double e) const override {\n']
+    if declarations:
+        fragments.extend('\t\t' + declaration for declaration in declarations)
+        fragments.append('\n')
+    fragments.append(build_conditional_statements(delta_ext, list_of_state_variables, 'delta_ext', bag_variables, state_variable_types))
+    fragments.append('\t}\n\n')
+    return join_fragments(fragments)
 
 
-def generate_output_function(state_name, lambda_func, list_of_state_variables):
+def generate_output_function(state_name, lambda_func, list_of_state_variables, state_variable_types=None):
     '''
-    Returns the output function for the atomic model being generated.
+    Returns the output function for the atomic model being generated.  Assignments to 
+    output ports are emitted as calls to the addMessage() function in Cadmium.
 
     Args:
         state_name (str):                       The name of the atomic model's state object.
@@ -357,38 +563,16 @@ def generate_output_function(state_name, lambda_func, list_of_state_variables):
                                                 given by model_name['lambda']
         list_of_state_variables (dict_items):   The list of state variables of the atomic model, returned by 
                                                 atomic_model['s'].items()
+        state_variable_types (dict):            Optional C++ type of each state variable, given by atomic_model['s'].
     '''
-    # READ ALL COMMENTS BEFORE EDITING
-    output_function = '\tvoid output(const ' + state_name + '& state) const override {\n'
-    
-    # Get the if-else if-else structure
-    conditional_statements = build_conditional_statements(lambda_func, list_of_state_variables)
-    output_body = ''
-    
-    # Go through the if/else structure and convert variable assignments to the correct output function syntax
-    for line in conditional_statements.splitlines(True): # True keeps the linebreaks in
-        # remove tabs to check what the line starts with
-        templine = line.lstrip('\t')
-        # if the line is building the condition, we add it to the output_body unchanged
-        # IF THIS FUNCTION IS BROKEN IT IS MOST LIKELY THE LINE BELOW, WHICH DOES NOT YET CAPTURE EVERY USE CASE
-        if (templine.startswith('if') or templine.startswith('else if') or templine.startswith('else') or templine.startswith('{') or templine.startswith('}')):
-            output_body += line
-        else:
-            # if the line is a variable assignment, we convert it to use the addMessage function in Cadmium.
-            line = line.replace(' = ', '->addMessage(')
-            line = line.replace(';', ');')
-            output_body += line
-    output_function += output_body
-    
-    output_function += '\t}\n\n'  
-    
-    return output_function
+    return join_fragments(['\tvoid output(const ' + state_name + '& state) const override {\n',
+                           build_conditional_statements(lambda_func, list_of_state_variables, 'lambda', state_variable_types=state_variable_types),
+                           '\t}\n\n'])
 
 
 def generate_time_advance_function(state_name, ta, list_of_state_variables):
     '''
-    #TODO INCOMPLETE IMPLEMENTATION: This only works for one case (return state.variable)
-    NOTE: list_of_state_variables is unused, but would be used once this is complete
+    #TODO INCOMPLETE IMPLEMENTATION: This only works for one case (return expression)
     
     Returns the time advance function for the atomic model being generated.
 
@@ -399,15 +583,10 @@ def generate_time_advance_function(state_name, ta, list_of_state_variables):
         list_of_state_variables (dict_items):   The list of state variables of the atomic model, returned by 
                                                 atomic_model['s'].items()
     '''
-    time_advance_function = '\t[[nodiscard]] double timeAdvance(const ' + state_name + '& state) const override {\n'
+    time_advance_function = ['\t[[nodiscard]] double timeAdvance(const ' + state_name + '& state) const override {\n']
     
     if len(ta) == 1:
-        time_advance_function += '\t\treturn state.' + ta['otherwise'] + ';\n'
+        time_advance_function.append('\t\treturn ' + emit_expression(ta['otherwise'], frozenset(list_of_state_variables), 'ta') + ';\n')
     
-    time_advance_function += '\t}\n\n'
-    return time_advance_function
-
-
-
-
-        
\ No newline at end of file
+    time_advance_function.append('\t}\n\n')
+    return join_fragments(time_advance_function)
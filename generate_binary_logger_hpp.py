@@ -0,0 +1,169 @@
+# Functions for generating binary_logger.hpp, a Cadmium logger that writes the log of the
+# simulation as fixed-size binary records instead of lines of text.
+#
+# Each record is 32 bytes: the time (double), the offset (uint64) and length (uint32) of its
+# string in the strings file, the model id (int32), the id of the port (uint32) and the kind
+# of record (uint32).  The records are written to the log file, and the strings (the states,
+# the messages, and the names of the models and ports the first time they appear) to the log
+# file + ".strings".  Both are buffered, and written in blocks of BLOCK_SIZE bytes.  The
+# log file starts with a 16 byte header: the magic "DEVSBIN1", a byte order mark, and the
+# size of a record.  binary_log_reader.py reads the log, and converts it to CSV.
+#
+# Cadmium's Logger interface passes the states and the messages to the logger as strings,
+# already formatted by their operator<<, so they are stored as that text: the logger saves
+# the cost of formatting and flushing a line per record, not the cost of operator<<.
+
+from generation_cache import generate_file_incrementally, compute_input_hash
+from code_emitter import write_file_atomically
+
+BINARY_LOGGER_FILENAME = 'binary_logger.hpp'
+
+# The kinds of record, which must match those of binary_log_reader.py.
+RECORD_STATE = 0
+RECORD_OUTPUT = 1
+RECORD_MODEL_NAME = 2
+RECORD_PORT_NAME = 3
+
+# The default number of bytes buffered before the records (or strings) are written.
+BLOCK_SIZE = 1 << 20
+
+
+def generate_binary_logger(directory, manifest=None):
+    '''
+    Creates binary_logger.hpp in directory, and generates the C++ code of the binary logger
+    within that file.
+
+    Args:
+        directory (str):    The output directory to place binary_logger.hpp (the "include" directory).
+        manifest (dict):    Optional manifest returned by load_manifest(directory). When given,
+                            binary_logger.hpp is only regenerated if the generator changed.
+    '''
+    output_filepath = directory + BINARY_LOGGER_FILENAME
+    if manifest is not None:
+        generate_file_incrementally(output_filepath, manifest, compute_input_hash(BINARY_LOGGER_FILENAME), generate_binary_logger_code)
+        return
+    write_file_atomically(output_filepath, generate_binary_logger_code())
+
+
+def generate_binary_logger_code():
+    '''
+    Returns the C++ code of binary_logger.hpp.  The states and messages are written as the
+    text formatted by their operator<<, which is how Cadmium passes them to every logger.
+    '''
+    return '''#ifndef BINARY_LOGGER_HPP
+#define BINARY_LOGGER_HPP
+
+#include <cstdint>
+#include <fstream>
+#include <map>
+#include <string>
+#include <unordered_set>
+#include <utility>
+#include <vector>
+#include "cadmium/simulation/logger/logger.hpp"
+
+namespace cadmium {
+	//! Logger that writes fixed-size binary records in large blocks, instead of a line of text per record.
+	//! The records are written to filepath, and their strings to filepath + ".strings".
+	//! The log can be read, or converted to CSV, with binary_log_reader.py.
+	class BinaryLogger : public Logger {
+	 public:
+		static constexpr uint32_t RECORD_STATE = ''' + str(RECORD_STATE) + ''';
+		static constexpr uint32_t RECORD_OUTPUT = ''' + str(RECORD_OUTPUT) + ''';
+		static constexpr uint32_t RECORD_MODEL_NAME = ''' + str(RECORD_MODEL_NAME) + ''';
+		static constexpr uint32_t RECORD_PORT_NAME = ''' + str(RECORD_PORT_NAME) + ''';
+
+		struct Record {
+			double time;
+			uint64_t stringOffset;
+			uint32_t stringLength;
+			int32_t modelId;
+			uint32_t portId;
+			uint32_t kind;
+		};
+		static_assert(sizeof(Record) == 32, "binary log records must be 32 bytes");
+
+	 private:
+		std::string filepath;
+		std::size_t blockSize;
+		std::ofstream recordFile;
+		std::ofstream stringFile;
+		std::vector<Record> records;
+		std::string strings;
+		uint64_t stringsWritten;
+		std::unordered_set<long> modelIds;
+		std::map<std::pair<long, std::string>, uint32_t> portIds;
+
+		void addRecord(double time, long modelId, uint32_t portId, uint32_t kind, const std::string& text) {
+			records.push_back({time, stringsWritten + strings.size(), static_cast<uint32_t>(text.size()), static_cast<int32_t>(modelId), portId, kind});
+			strings += text;
+			if (strings.size() >= blockSize) {
+				flushStrings();
+			}
+			if (records.size() * sizeof(Record) >= blockSize) {
+				flushRecords();
+			}
+		}
+
+		void addModelName(long modelId, const std::string& modelName) {
+			if (modelIds.insert(modelId).second) {
+				addRecord(0, modelId, 0, RECORD_MODEL_NAME, modelName);
+			}
+		}
+
+		uint32_t getPortId(long modelId, const std::string& portName) {
+			auto [port, inserted] = portIds.try_emplace({modelId, portName}, static_cast<uint32_t>(portIds.size()));
+			if (inserted) {
+				addRecord(0, modelId, port->second, RECORD_PORT_NAME, portName);
+			}
+			return port->second;
+		}
+
+		void flushRecords() {
+			recordFile.write(reinterpret_cast<const char*>(records.data()), static_cast<std::streamsize>(records.size() * sizeof(Record)));
+			records.clear();
+		}
+
+		void flushStrings() {
+			stringFile.write(strings.data(), static_cast<std::streamsize>(strings.size()));
+			stringsWritten += strings.size();
+			strings.clear();
+		}
+
+	 public:
+		explicit BinaryLogger(const std::string& filepath, std::size_t blockSize = ''' + str(BLOCK_SIZE) + '''):
+			Logger(), filepath(filepath), blockSize(blockSize), recordFile(), stringFile(), records(), strings(),
+			stringsWritten(0), modelIds(), portIds() {
+			records.reserve(blockSize / sizeof(Record) + 1);
+			strings.reserve(blockSize * 2);
+		}
+
+		void start() override {
+			recordFile.open(filepath, std::ios::binary | std::ios::trunc);
+			stringFile.open(filepath + ".strings", std::ios::binary | std::ios::trunc);
+			const uint32_t header[2] = {0x01020304, static_cast<uint32_t>(sizeof(Record))};
+			recordFile.write("DEVSBIN1", 8);
+			recordFile.write(reinterpret_cast<const char*>(header), sizeof(header));
+		}
+
+		void stop() override {
+			flushRecords();
+			flushStrings();
+			recordFile.close();
+			stringFile.close();
+		}
+
+		void logOutput(double time, long modelId, const std::string& modelName, const std::string& portName, const std::string& output) override {
+			addModelName(modelId, modelName);
+			addRecord(time, modelId, getPortId(modelId, portName), RECORD_OUTPUT, output);
+		}
+
+		void logState(double time, long modelId, const std::string& modelName, const std::string& state) override {
+			addModelName(modelId, modelName);
+			addRecord(time, modelId, 0, RECORD_STATE, state);
+		}
+	};
+}
+
+#endif
+'''
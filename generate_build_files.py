@@ -0,0 +1,318 @@
+# Functions for generating the build files of the Cadmium project: CMakeLists.txt, and the
+# optional precompiled header and unity chunks.
+#
+# By default, every model is defined in its .hpp file, and the whole simulation is compiled
+# as the single translation unit main.cpp, so a change to any model recompiles everything,
+# on one core.  Two options of the build options dictionary speed up the C++ build:
+#
+#   'precompiled_header' (bool):    Generates include/devsmap_pch.hpp, with the standard and
+#                                   Cadmium headers included by every model, and compiles it
+#                                   once with target_precompile_headers() (CMake 3.16 or later).
+#   'unity_chunks' (int):           Splits the definitions of the member functions of the atomic
+#                                   models out of their .hpp files (into include/X_definitions.hpp),
+#                                   and compiles them in that many unity chunks (devsmap_unity_<i>.cpp),
+#                                   each including the definitions of a contiguous group of models.
+#                                   The chunks are compiled in parallel, and only the chunks of the
+#                                   changed models are recompiled.  The coupled models stay header-only.
+#
+# The 'none' logger is disabled with the NO_LOGGING compile definition of the whole target, so
+# that main.cpp, the unity chunks and the precompiled header are all compiled with it.
+#
+# CMakeLists.txt is only generated when one of the options is enabled, when the logger is 'none',
+# or when it was generated before (it then starts with CMAKE_LISTS_MARKER).  A hand written
+# CMakeLists.txt is never overwritten: the options are generated in devsmap_options.cmake instead,
+# which it can include once the target of the simulation is created:
+#
+#     include(${CMAKE_CURRENT_LIST_DIR}/devsmap_options.cmake)
+#
+# The options are applied to the target DEVSMAP_TARGET, which defaults to the target of the
+# original CMakeLists.txt (${COMPONENT_LIB} with ESP-IDF, and Executable1 otherwise).
+
+import os
+
+from code_emitter import join_fragments
+from generation_cache import compute_input_hash, record_generated_file, write_file_if_changed
+
+CMAKE_LISTS_FILENAME = 'CMakeLists.txt'
+CMAKE_OPTIONS_FILENAME = 'devsmap_options.cmake'
+PRECOMPILED_HEADER_FILENAME = 'devsmap_pch.hpp'
+UNITY_CHUNK_PREFIX = 'devsmap_unity_'
+CMAKE_LISTS_MARKER = '# Generated by DEVSMap_parser.py, the changes to this file are overwritten.\n'
+# The CMake files that are always compared with the files on disk, instead of being recorded in the manifest.
+CMAKE_FILENAMES = (CMAKE_LISTS_FILENAME, CMAKE_OPTIONS_FILENAME)
+
+# The headers included by the generated models and main.cpp, which the precompiled header compiles once.
+PRECOMPILED_HEADERS = ['<iostream>',
+                       '<limits>',
+                       '<memory>',
+                       '<string>',
+                       '<vector>',
+                       '"cadmium/modeling/devs/atomic.hpp"',
+                       '"cadmium/modeling/devs/coupled.hpp"',
+                       '"cadmium/simulation/root_coordinator.hpp"']
+
+
+def get_build_options(build_options=None):
+    '''
+    Returns the build options dictionary with the default value of each missing option
+    (see the top of this file).
+
+    Args:
+        build_options (dict):   Optional build options, with a 'precompiled_header' and/or a 'unity_chunks'.
+    '''
+    return {'precompiled_header': False, 'unity_chunks': 0, **(build_options or {})}
+
+
+def get_unity_chunks(atomic_model_names, unity_chunks):
+    '''
+    Returns the list of the atomic model names compiled in each unity chunk: atomic_model_names
+    split into unity_chunks contiguous groups of (nearly) equal size.  There are never more
+    chunks than atomic models, and no chunks at all if unity_chunks is 0.
+
+    Args:
+        atomic_model_names (list):  The names of the atomic models, in the order of the DEVSMap data.
+        unity_chunks (int):         The number of unity chunks requested.
+    '''
+    number_of_chunks = min(unity_chunks, len(atomic_model_names))
+    chunks = []
+    start = 0
+    for i in range(number_of_chunks):
+        end = start + (len(atomic_model_names) - start) // (number_of_chunks - i)
+        chunks.append(atomic_model_names[start:end])
+        start = end
+    return chunks
+
+
+def get_unity_chunk_filename(index):
+    '''
+    Returns the filename of the unity chunk with the given index.
+
+    Args:
+        index (int):    The index of the unity chunk.
+    '''
+    return UNITY_CHUNK_PREFIX + str(index) + '.cpp'
+
+
+def get_build_filenames(data, build_options=None):
+    '''
+    Returns the set of filenames (without directory) of the precompiled header, unity chunks
+    and _definitions.hpp files generated for data.  CMakeLists.txt and devsmap_options.cmake
+    are not included, since they are not deleted when the options are disabled.
+
+    Args:
+        data (dict):            The DEVSMap json data that has been sorted into a dictionary.
+        build_options (dict):   Optional build options (see get_build_options()).
+    '''
+    build_options = get_build_options(build_options)
+    filenames = set()
+    if build_options['precompiled_header']:
+        filenames.add(PRECOMPILED_HEADER_FILENAME)
+    if build_options['unity_chunks'] > 0:
+        atomic_model_names = [list(model.keys())[0] for model in data['atomic_models']]
+        for i, _ in enumerate(get_unity_chunks(atomic_model_names, build_options['unity_chunks'])):
+            filenames.add(get_unity_chunk_filename(i))
+        for atomic_model_name in atomic_model_names:
+            filenames.add(atomic_model_name + '_definitions.hpp')
+    return filenames
+
+
+def generate_build_files(directory_code_main_output, data, manifest=None, build_options=None, no_logging=False):
+    '''
+    Generates the precompiled header in the "include" subdirectory of directory_code_main_output,
+    and the unity chunks and CMakeLists.txt (or devsmap_options.cmake) in directory_code_main_output,
+    according to build_options and no_logging.  The _definitions.hpp files are generated with the atomic models.
+
+    Args:
+        directory_code_main_output (str):   The "main" directory of the Cadmium project.
+        data (dict):                        The DEVSMap json data that has been sorted into a dictionary.
+        manifest (dict):                    Optional manifest returned by load_manifest(directory). When given,
+                                            the files are recorded in it, so that the unity chunks that are no
+                                            longer generated are removed (see remove_stale_files()).
+        build_options (dict):               Optional build options (see get_build_options()).
+        no_logging (bool):                  True if the logger is 'none', to compile the project with NO_LOGGING.
+    '''
+    directory_code_main_output = os.path.join(directory_code_main_output, '')
+    # The build files are small and depend on little more than the list of atomic models, so they
+    # are always generated, and only written if they changed.
+    for relative_path, code in generate_build_files_code(data, build_options, directory_code_main_output, no_logging).items():
+        output_filepath = directory_code_main_output + relative_path
+        write_file_if_changed(output_filepath, code)
+        if manifest is not None and relative_path not in CMAKE_FILENAMES:
+            record_generated_file(output_filepath, manifest, compute_input_hash(relative_path, code))
+
+
+def generate_build_files_code(data, build_options=None, directory_code_main_output=None, no_logging=False):
+    '''
+    Returns a dictionary with the code of the precompiled header, unity chunks and CMakeLists.txt
+    (or devsmap_options.cmake) to generate, keyed by the path of the file relative to the "main"
+    directory of the Cadmium project (for example, "devsmap_unity_0.cpp" and "include/devsmap_pch.hpp").
+
+    Args:
+        data (dict):                        The DEVSMap json data that has been sorted into a dictionary.
+        build_options (dict):               Optional build options (see get_build_options()).
+        directory_code_main_output (str):   Optional "main" directory of the Cadmium project.  If its CMakeLists.txt
+                                            was written by hand, devsmap_options.cmake is returned instead of
+                                            CMakeLists.txt.  When the options are disabled, CMakeLists.txt is only
+                                            returned if the one in this directory was generated, so that it goes
+                                            back to main.cpp alone.
+        no_logging (bool):                  True if the logger is 'none', to compile the project with NO_LOGGING.
+    '''
+    build_options = get_build_options(build_options)
+    atomic_model_names = [list(model.keys())[0] for model in data['atomic_models']]
+    chunks = get_unity_chunks(atomic_model_names, build_options['unity_chunks'])
+
+    build_files_code = {}
+    if build_options['precompiled_header']:
+        build_files_code['include/' + PRECOMPILED_HEADER_FILENAME] = generate_precompiled_header_code()
+    for i, chunk in enumerate(chunks):
+        build_files_code[get_unity_chunk_filename(i)] = generate_unity_chunk_code(chunk)
+
+    sources = ['main.cpp'] + [get_unity_chunk_filename(i) for i in range(len(chunks))]
+    uses_options = build_options['precompiled_header'] or chunks or no_logging
+    cmake_lists = read_cmake_lists(directory_code_main_output)
+    if cmake_lists is not None and not cmake_lists.startswith(CMAKE_LISTS_MARKER):
+        # Once generated, devsmap_options.cmake is kept up to date even without options, since
+        # the hand written CMakeLists.txt may include it.
+        if uses_options or os.path.isfile(os.path.join(directory_code_main_output, CMAKE_OPTIONS_FILENAME)):
+            build_files_code[CMAKE_OPTIONS_FILENAME] = generate_cmake_options_code(sources[1:], build_options['precompiled_header'], no_logging)
+            if CMAKE_OPTIONS_FILENAME not in cmake_lists:
+                print(f"The hand written {os.path.join(directory_code_main_output, CMAKE_LISTS_FILENAME)} was not changed. Add "
+                      f"\"include(${{CMAKE_CURRENT_LIST_DIR}}/{CMAKE_OPTIONS_FILENAME})\" to it, after the target of the "
+                      f"simulation is created, to build with the generated options.")
+    elif uses_options or cmake_lists is not None:
+        build_files_code[CMAKE_LISTS_FILENAME] = generate_cmake_lists_code(sources, build_options['precompiled_header'], no_logging)
+    return build_files_code
+
+
+def read_cmake_lists(directory_code_main_output):
+    '''
+    Returns the contents of the CMakeLists.txt in directory_code_main_output, or None if it
+    does not exist.  A generated CMakeLists.txt starts with CMAKE_LISTS_MARKER.
+
+    Args:
+        directory_code_main_output (str):   The "main" directory of the Cadmium project, or None.
+    '''
+    if directory_code_main_output is None:
+        return None
+    try:
+        with open(os.path.join(directory_code_main_output, CMAKE_LISTS_FILENAME), 'r') as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def generate_precompiled_header_code():
+    '''
+    Returns the C++ code of the precompiled header.
+    '''
+    code = ['#ifndef DEVSMAP_PCH_HPP\n#define DEVSMAP_PCH_HPP\n\n']
+    for header in PRECOMPILED_HEADERS:
+        code.append('#include ' + header + '\n')
+    code.append('\n#endif')
+    return join_fragments(code)
+
+
+def generate_unity_chunk_code(atomic_model_names):
+    '''
+    Returns the C++ code of a unity chunk, which includes the _definitions.hpp file of each
+    atomic model in atomic_model_names.
+
+    Args:
+        atomic_model_names (list):  The names of the atomic models compiled in the chunk.
+    '''
+    code = ['#include <limits>\n']
+    for atomic_model_name in atomic_model_names:
+        code.append('#include "' + atomic_model_name + '_definitions.hpp"\n')
+    return join_fragments(code)
+
+
+def disable_logging(target):
+    '''
+    Returns the CMake command that compiles every source of target, and its precompiled header,
+    with NO_LOGGING, which disables the logging of the simulation.  A build without CMake must
+    pass -DNO_LOGGING to the compiler instead.
+
+    Args:
+        target (str):   The CMake target of the simulation.
+    '''
+    return '    target_compile_definitions(' + target + ' PRIVATE NO_LOGGING)\n'
+
+
+def generate_cmake_options_code(unity_chunk_sources, precompiled_header=False, no_logging=False):
+    '''
+    Returns the contents of devsmap_options.cmake, which adds the unity chunks, the precompiled
+    header and NO_LOGGING to the target DEVSMAP_TARGET of a hand written CMakeLists.txt.
+
+    Args:
+        unity_chunk_sources (list): The unity chunks of the project, relative to the "main" directory.
+        precompiled_header (bool):  True to compile the precompiled header once for every source.
+        no_logging (bool):          True to compile every source with NO_LOGGING (the 'none' logger).
+    '''
+    code = [CMAKE_LISTS_MARKER,
+            '# Include this file from CMakeLists.txt after the target of the simulation is created:\n',
+            '#     include(${CMAKE_CURRENT_LIST_DIR}/' + CMAKE_OPTIONS_FILENAME + ')\n',
+            '\n',
+            'if(NOT DEFINED DEVSMAP_TARGET)\n',
+            '    if(ESP_PLATFORM)\n',
+            '        set(DEVSMAP_TARGET ${COMPONENT_LIB})\n',
+            '    else()\n',
+            '        set(DEVSMAP_TARGET Executable1)\n',
+            '    endif()\n',
+            'endif()\n']
+    if unity_chunk_sources:
+        code.append('target_sources(${DEVSMAP_TARGET} PRIVATE ' +
+                    ' '.join('"${CMAKE_CURRENT_LIST_DIR}/' + source + '"' for source in unity_chunk_sources) + ')\n')
+    if no_logging:
+        code.append(disable_logging('${DEVSMAP_TARGET}').lstrip())
+    if precompiled_header:
+        code.append('target_precompile_headers(${DEVSMAP_TARGET} PRIVATE "${CMAKE_CURRENT_LIST_DIR}/include/' + PRECOMPILED_HEADER_FILENAME + '")\n')
+    return join_fragments(code)
+
+
+def generate_cmake_lists_code(sources, precompiled_header=False, no_logging=False):
+    '''
+    Returns the contents of CMakeLists.txt, which builds the sources for the ESP32 (with ESP-IDF)
+    or as the executable Executable1 otherwise.
+
+    Args:
+        sources (list):             The .cpp files of the project, relative to the "main" directory.
+        precompiled_header (bool):  True to compile the precompiled header once for every source.
+        no_logging (bool):          True to compile every source with NO_LOGGING (the 'none' logger).
+    '''
+    esp_sources = ' '.join('"' + source + '"' for source in sources)
+    precompile = ''
+    if precompiled_header:
+        precompile = '    target_precompile_headers({target} PRIVATE "include/' + PRECOMPILED_HEADER_FILENAME + '")\n'
+    esp_no_logging = '    # target_compile_options(${COMPONENT_LIB} PRIVATE "-DNO_LOGGING")\n'
+    if no_logging:
+        esp_no_logging = disable_logging('${COMPONENT_LIB}')
+    return (CMAKE_LISTS_MARKER +
+            '\n'
+            'if(ESP_PLATFORM)\n'
+            '    idf_component_register( SRCS ' + esp_sources + ' "include/drivers/manchester_encoder.c"\n'
+            '                            REQUIRES driver\n'
+            '                            INCLUDE_DIRS "." "include" $ENV{CADMIUM})\n'
+            '\n'
+            '    target_compile_options(${COMPONENT_LIB} PUBLIC -std=gnu++2b)\n'
+            '    target_compile_options(${COMPONENT_LIB} PRIVATE "-Wno-format")\n'
+            '    target_compile_options(${COMPONENT_LIB} PRIVATE "-frtti")\n'
+            '    target_compile_options(${COMPONENT_LIB} PRIVATE "-fexceptions")\n'
+            '    target_compile_options(${COMPONENT_LIB} PRIVATE "-DRT_ESP32")\n' +
+            esp_no_logging +
+            '    # target_compile_options(${COMPONENT_LIB} PRIVATE "-DNO_LOG_STATE")\n'
+            '    # target_compile_options(${COMPONENT_LIB} PRIVATE "-DDEBUG_DELAY")\n' +
+            precompile.format(target='${COMPONENT_LIB}') +
+            'else()\n'
+            '    message(STATUS "Configuring for non-ESP32")\n'
+            '\n'
+            '    # Regular CMake project setup for non-ESP32\n'
+            '    add_executable(Executable1 ' + ' '.join(sources) + ')\n'
+            '\n'
+            '    # Add required libraries and include directories\n'
+            '    target_include_directories(Executable1 PRIVATE "." "include" $ENV{CADMIUM})\n'
+            '\n'
+            '    # Non-ESP32 specific compile options\n'
+            '    target_compile_options(Executable1 PUBLIC -std=gnu++2b)\n' +
+            (disable_logging('Executable1') if no_logging else '') +
+            precompile.format(target='Executable1') +
+            'endif()\n')
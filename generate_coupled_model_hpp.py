@@ -1,25 +1,284 @@
-# TODO module comments
+# Functions for generating the .hpp file of each coupled model.
+#
+# Each coupled model definition is generated once, in the topological order of the hierarchy
+# of the models (see model_hierarchy.py), however many times it is a component of the other
+# coupled models.  A coupled model declares its own input and output ports, and couples them
+# to the ports of its components (eic and eoc), so the coupled models can be nested at any
+# depth.  A coupled model can also be flattened into a single coupled model of all the atomic
+# model instances of its hierarchy (see flatten_hierarchy.py).
 
-from generate_simple_statements import generate_file_definition, cadmium_namespace
+from generate_simple_statements import generate_file_definition, cadmium_namespace, get_top_model_name
+from flatten_hierarchy import flatten_coupled_model
+from model_hierarchy import get_coupled_models, order_coupled_models
+from generation_cache import compute_input_hash, get_up_to_date_check, write_generated_files
+from parallel_generation import generate_code_in_parallel
+from pipeline_instrumentation import record_model_measurements
+from code_emitter import join_fragments, write_file_atomically
+from devsmap_expressions import emit_expression
+from init_state_index import index_init_states, find_initialization_values_for_instance, find_reused_atomic_models
 
 
-def generate_coupled_models(directory_cpp_code, data):
+def generate_coupled_models(directory_cpp_code, data, manifest=None, jobs=1, instrumentation=None, flatten_hierarchy=False, init_state_index=None):
     '''
-    Loops through all coupled models and generates the .hpp file for each one.
+    Loops through all coupled models and generates the .hpp file for each one (see
+    generate_coupled_models_code()).
 
     Args:
         directory_cpp_code (str):   The output directory to place the .hpp files.
         data (dict):                The DEVSMap json data that has been sorted into a dictionary.
+        manifest (dict):            Optional manifest returned by load_manifest(directory). When given,
+                                    only the coupled models whose inputs changed are regenerated.
+        jobs (int):                 The number of worker processes used to generate the models 
+                                    (see get_number_of_jobs()). 1 generates serially.
+        instrumentation (dict):     Optional instrumentation returned by start_instrumentation(), in 
+                                    which the time and memory used to generate each model are recorded.
+        flatten_hierarchy (bool):   True to generate the top model as a single coupled model of all the 
+                                    atomic model instances (see flatten_coupled_model()), instead of one 
+                                    coupled model per level of the hierarchy.
+        init_state_index (dict):    Optional index of the init states returned by index_init_states(data). 
+                                    The index is built if it is not given.
     '''
-    number_of_coupled_models = len(data['coupled_models'])
-    for i in range(number_of_coupled_models):
-        coupled_model_name = list(data['coupled_models'][i].keys())[0]
-        coupled_model = data['coupled_models'][i][coupled_model_name]
-        generate_coupled_model(directory_cpp_code, coupled_model_name, coupled_model)
+    input_hashes = {}
+    is_up_to_date = get_up_to_date_check(directory_cpp_code, manifest, input_hashes) if manifest is not None else None
+    write_generated_files(directory_cpp_code, generate_coupled_models_code(data, jobs, instrumentation, flatten_hierarchy, init_state_index,
+                                                                           is_up_to_date),
+                          manifest, input_hashes)
 
 
+def generate_coupled_models_code(data, jobs=1, instrumentation=None, flatten_hierarchy=False, init_state_index=None, is_up_to_date=None):
+    '''
+    Returns a dictionary with the C++ code of the .hpp file of each coupled model, keyed by 
+    the filename of the .hpp file.  Nothing is written to disk.
+
+    Args:
+        data (dict):                The DEVSMap json data that has been sorted into a dictionary.
+        jobs (int):                 The number of worker processes used to generate the models 
+                                    (see get_number_of_jobs()). 1 generates serially.
+        instrumentation (dict):     Optional instrumentation returned by start_instrumentation(), in 
+                                    which the time and memory used to generate each model are recorded.
+        flatten_hierarchy (bool):   True to generate the top model as a single coupled model of all the 
+                                    atomic model instances (see flatten_coupled_model()), instead of one 
+                                    coupled model per level of the hierarchy.
+        init_state_index (dict):    Optional index of the init states returned by index_init_states(data). 
+                                    The index is built if it is not given.
+        is_up_to_date (func):       Optional function is_up_to_date(filename, input_hash) that returns True if
+                                    the file was already generated from inputs with that hash (see
+                                    get_up_to_date_check()).  The models whose file is up to date are left out.
+    '''
+    list_of_arguments = get_coupled_models_to_generate(data, flatten_hierarchy, init_state_index)
+    if is_up_to_date is not None:
+        list_of_arguments = [arguments for arguments in list_of_arguments
+                             if not is_up_to_date(arguments[0] + '.hpp', compute_input_hash(*arguments))]
 
-def generate_coupled_model(directory, coupled_model_name, coupled_model):
+    measurements = [] if instrumentation is not None else None
+    codes = generate_code_in_parallel(generate_coupled_model_code, list_of_arguments, jobs, measurements=measurements)
+    record_model_measurements(instrumentation, 'coupled', measurements or [])
+    return {arguments[0] + '.hpp': code for arguments, code in zip(list_of_arguments, codes)}
+
+
+def get_coupled_models_to_generate(data, flatten_hierarchy=False, init_state_index=None):
+    '''
+    Returns the list of (coupled model name, coupled model data, component initial states, 
+    variants, component variants) tuples of the coupled models to generate: every coupled model 
+    once, in topological order (see order_coupled_models()), or only the flattened top model.  
+    variants is the number of variants the constructor of the coupled model selects from (0 if 
+    it has a single variant, see get_coupled_model_variants()), and the component initial states 
+    and component variants are returned by get_component_arguments() (or by 
+    get_component_initial_states() for the flattened top model).
+
+    Raises a ValueError if a coupled model contains itself.
+
+    Args:
+        data (dict):                The DEVSMap json data that has been sorted into a dictionary.
+        flatten_hierarchy (bool):   True to only return the flattened top model (see flatten_coupled_model()).
+        init_state_index (dict):    Optional index of the init states returned by index_init_states(data). 
+                                    The index is built if it is not given.
+    '''
+    if init_state_index is None:
+        init_state_index = index_init_states(data)
+    reused_atomic_models = find_reused_atomic_models(init_state_index)
+    top_model_name = get_top_model_name(data['experiment'])
+    sweep_points = len(init_state_index.get('sweep', []))
+    if flatten_hierarchy:
+        coupled_model = flatten_coupled_model(data, top_model_name)
+        return [(top_model_name, coupled_model, get_component_initial_states(data, init_state_index, reused_atomic_models, coupled_model),
+                 sweep_points, {})]
+
+    coupled_models = get_coupled_models(data)
+    order = order_coupled_models(coupled_models)
+    variants = get_coupled_model_variants(data, init_state_index, reused_atomic_models, coupled_models, top_model_name)
+    coupled_models_to_generate = []
+    for coupled_model_name in order:
+        coupled_model_variants = variants.get(coupled_model_name, [])
+        component_initial_states, component_variants = get_component_arguments(coupled_models[coupled_model_name], coupled_model_variants,
+                                                                               variants, coupled_models)
+        number_of_variants = len(coupled_model_variants)
+        if number_of_variants < 2 and not (coupled_model_name == top_model_name and sweep_points):
+            number_of_variants = 0
+        coupled_models_to_generate.append((coupled_model_name, coupled_models[coupled_model_name], component_initial_states,
+                                           number_of_variants, component_variants))
+    return coupled_models_to_generate
+
+
+def get_coupled_model_variants(data, init_state_index, reused_atomic_models, coupled_models, top_model_name):
+    '''
+    Returns the list of the variants of each coupled model, keyed by coupled model name (empty 
+    if no atomic model is reused with different initialization values, and there is no sweep).
+
+    A variant is a distinct combination of the initial states of the components of an instance 
+    of a coupled model: a tuple with, for each component, the index of the variant of its coupled 
+    model, or the C++ expression of the initial state of its atomic model (see 
+    get_initial_state_expression(), or None if the atomic model is not reused, or if the instance 
+    has no init states).  A coupled model that is reused at several places of the hierarchy with 
+    different init states is generated once, and each of its instances is built with the index 
+    of its variant.  The instances are walked from the top model (and from the other coupled 
+    models that are not a component of any coupled model), and each distinct variant is kept 
+    once, in the order it is found.  The top model has one variant per sweep point of the 
+    experiment, in order, so that its variant is the sweep point of the run.
+
+    Args:
+        data (dict):                    The DEVSMap json data that has been sorted into a dictionary.
+        init_state_index (dict):        The index of the init states returned by index_init_states(data).
+        reused_atomic_models (set):     The atomic models returned by find_reused_atomic_models().
+        coupled_models (dict):          The data of each coupled model, keyed by coupled model name.
+        top_model_name (str):           The name of the top model.
+    '''
+    sweep_indexes = init_state_index.get('sweep', [])
+    if not reused_atomic_models and not sweep_indexes:
+        return {}
+    atomic_models = {}
+    for atomic_model_data in data['atomic_models']:
+        atomic_model_name = list(atomic_model_data.keys())[0]
+        atomic_models[atomic_model_name] = atomic_model_data[atomic_model_name]
+
+    variants = {coupled_model_name: [] for coupled_model_name in coupled_models}
+    variant_indexes = {coupled_model_name: {} for coupled_model_name in coupled_models}
+
+    def add_variant(coupled_model_name, variant):
+        if variant not in variant_indexes[coupled_model_name]:
+            variant_indexes[coupled_model_name][variant] = len(variants[coupled_model_name])
+            variants[coupled_model_name].append(variant)
+        return variant_indexes[coupled_model_name][variant]
+
+    def find_variant(coupled_model_name, index, path):
+        variant = []
+        for model_name, model_id in coupled_models[coupled_model_name].get('components', {}).items():
+            component_path = path + (model_id,)
+            if model_name in coupled_models:
+                variant.append(add_variant(model_name, find_variant(model_name, index, component_path)))
+            elif model_name in reused_atomic_models:
+                initialization_values = find_initialization_values_for_instance(index, [component_path])
+                variant.append(None if initialization_values is None else
+                               get_initial_state_expression(model_name, model_id, atomic_models[model_name], initialization_values))
+            else:
+                variant.append(None)
+        return tuple(variant)
+
+    if top_model_name in coupled_models:
+        if sweep_indexes:
+            variants[top_model_name] = [find_variant(top_model_name, index, (top_model_name,)) for index in sweep_indexes]
+        else:
+            add_variant(top_model_name, find_variant(top_model_name, init_state_index, (top_model_name,)))
+    component_model_names = {model_name for coupled_model in coupled_models.values() for model_name in coupled_model.get('components', {})}
+    for coupled_model_name in coupled_models:
+        if coupled_model_name != top_model_name and coupled_model_name not in component_model_names:
+            add_variant(coupled_model_name, find_variant(coupled_model_name, init_state_index, (coupled_model_name,)))
+    return variants
+
+
+def get_component_arguments(coupled_model, coupled_model_variants, variants, coupled_models):
+    '''
+    Returns a tuple (component initial states, component variants) with the arguments passed to 
+    the constructor of each component of a coupled model, keyed by component id:
+        - The component initial states hold the C++ expression of the initial state of each 
+          component whose atomic model is reused with different initialization values.
+        - The component variants hold the index of the variant of each component whose coupled 
+          model has several variants (see get_coupled_model_variants()).
+    When the argument of a component changes between the variants of the coupled model, it is 
+    the list of its value in each variant instead (see generate_coupled_model_struct()).
+
+    Args:
+        coupled_model (dict):           The data of the coupled model.
+        coupled_model_variants (list):  The variants of the coupled model.
+        variants (dict):                The variants of each coupled model returned by get_coupled_model_variants().
+        coupled_models (dict):          The data of each coupled model, keyed by coupled model name.
+    '''
+    component_initial_states = {}
+    component_variants = {}
+    for i, (model_name, model_id) in enumerate(get_component_instances(coupled_model)):
+        values = [variant[i] for variant in coupled_model_variants]
+        if model_name in coupled_models:
+            if len(variants.get(model_name, [])) > 1:
+                component_variants[model_id] = values[0] if len(set(values)) == 1 else values
+        elif any(value is not None for value in values):
+            values = [model_name + 'State()' if value is None else value for value in values]
+            component_initial_states[model_id] = values[0] if len(set(values)) == 1 else values
+    return component_initial_states, component_variants
+
+
+def get_component_initial_states(data, init_state_index, reused_atomic_models, coupled_model):
+    '''
+    Returns the C++ expression of the initial state of each component of a flattened coupled 
+    model (see flatten_coupled_model()) whose atomic model is reused with different initialization 
+    values (for example, "counterState(0, 1, true, std::numeric_limits<double>::infinity())"), 
+    keyed by component id.  The arguments are the initialization values of the instance, in the 
+    order of the state variables of the atomic model.  When the experiment has sweep points, a 
+    component whose initial state changes between the sweep points has the list of its initial 
+    state at each sweep point (see generate_coupled_model_struct()).
+
+    Args:
+        data (dict):                    The DEVSMap json data that has been sorted into a dictionary.
+        init_state_index (dict):        The index of the init states returned by index_init_states(data).
+        reused_atomic_models (set):     The atomic models returned by find_reused_atomic_models().
+        coupled_model (dict):           The data of the flattened coupled model.
+    '''
+    sweep_indexes = init_state_index.get('sweep', [])
+    if not reused_atomic_models and not sweep_indexes:
+        return {}
+    atomic_models = {}
+    for atomic_model_data in data['atomic_models']:
+        atomic_model_name = list(atomic_model_data.keys())[0]
+        atomic_models[atomic_model_name] = atomic_model_data[atomic_model_name]
+
+    component_initial_states = {}
+    for component_model_name, model_id in get_component_instances(coupled_model):
+        if component_model_name not in reused_atomic_models:
+            continue
+        instance_paths = [coupled_model['component_paths'][model_id]]
+        initial_states = []
+        for index in sweep_indexes or [init_state_index]:
+            initialization_values = find_initialization_values_for_instance(index, instance_paths)
+            if initialization_values is not None:
+                initial_states.append(get_initial_state_expression(component_model_name, model_id, atomic_models[component_model_name], initialization_values))
+        if not initial_states:
+            continue
+        if len(set(initial_states)) == 1:
+            component_initial_states[model_id] = initial_states[0]
+        else:
+            component_initial_states[model_id] = initial_states
+    return component_initial_states
+
+
+def get_initial_state_expression(model_name, model_id, atomic_model, initialization_values):
+    '''
+    Returns the C++ expression of the initial state of a component (for example, 
+    "counterState(0, 1, true, std::numeric_limits<double>::infinity())").
+
+    Args:
+        model_name (str):               The name of the atomic model of the component.
+        model_id (str):                 The id of the component.
+        atomic_model (dict):            The data of the atomic model.
+        initialization_values (dict):   The initialization values of the component.
+    '''
+    arguments = []
+    for variable_name in atomic_model['s']:
+        if variable_name not in initialization_values:
+            raise ValueError('No initial value was found for the state variable "' + variable_name + '" of the component "' + model_id + '".')
+        arguments.append(emit_expression(initialization_values[variable_name], frozenset(), 'delta_int'))
+    return model_name + 'State(' + ', '.join(arguments) + ')'
+
+
+def generate_coupled_model(directory, coupled_model_name, coupled_model, component_initial_states=None, variants=0, component_variants=None):
     '''
     Creates a .hpp file in directory, and generates the C++ code for the coupled model within that file.
 
@@ -27,16 +286,34 @@ def generate_coupled_model(directory, coupled_model_name, coupled_model):
         directory (str):            The output directory to place the .hpp file.
         coupled_model_name (str):   The name of the coupled model, which will also be the name of the .hpp file.
         coupled_model (dict):       The DEVSMap data of the coupled model to generate the C++ code from.
+        component_initial_states (dict):    Optional initial state of each component, returned by 
+                                            get_component_arguments() or get_component_initial_states().
+        variants (int):             The number of variants of the coupled model (0 if it has a single variant).
+        component_variants (dict):  Optional variant of each component, returned by get_component_arguments().
     '''
     output_filepath = directory + coupled_model_name + '.hpp'
-    with open(output_filepath, 'w') as file:
-        file.write(generate_file_definition(coupled_model_name))
-        file.write(include_cadmium_coupled())
-        file.write(include_component_models(coupled_model))
-        file.write(cadmium_namespace())
-        file.write(generate_coupled_model_struct(coupled_model_name, coupled_model))
-        file.write('#endif')
-    file.close()     
+    write_file_atomically(output_filepath, generate_coupled_model_code(coupled_model_name, coupled_model, component_initial_states, variants,
+                                                                       component_variants))
+
+
+def generate_coupled_model_code(coupled_model_name, coupled_model, component_initial_states=None, variants=0, component_variants=None):
+    '''
+    Returns the C++ code of the .hpp file for the coupled model.
+
+    Args:
+        coupled_model_name (str):   The name of the coupled model.
+        coupled_model (dict):       The DEVSMap data of the coupled model to generate the C++ code from.
+        component_initial_states (dict):    Optional initial state of each component, returned by 
+                                            get_component_arguments() or get_component_initial_states().
+        variants (int):             The number of variants of the coupled model (0 if it has a single variant).
+        component_variants (dict):  Optional variant of each component, returned by get_component_arguments().
+    '''
+    return join_fragments([generate_file_definition(coupled_model_name),
+                           include_cadmium_coupled(),
+                           include_component_models(coupled_model),
+                           cadmium_namespace(),
+                           generate_coupled_model_struct(coupled_model_name, coupled_model, component_initial_states, variants, component_variants),
+                           '#endif'])
     
     
 def include_cadmium_coupled():
@@ -57,51 +334,157 @@ def get_components(coupled_model):
     return coupled_model['components']
 
 
+def get_component_instances(coupled_model):
+    '''
+    Returns the list of (model name, component id) pairs of the components of coupled_model.
+    The components of a flattened coupled model are already such a list, since an atomic model
+    can have several instances in it.
+
+    Args:
+        coupled_model (dict):   The coupled model that is currently being generated.
+    '''
+    components = get_components(coupled_model)
+    if isinstance(components, dict):
+        return list(components.items())
+    return components
+
+
 def include_component_models(coupled_model):
     '''
-    Returns the C++ include statements for all atomic models that are directly encapsulated
-    by coupled_model.
+    Returns the C++ include statements for the models (atomic or coupled) of the components
+    of coupled_model.  Each model is included once, however many instances of it there are.
 
     Args:
         coupled_model (dict):   The coupled model that is currently being generated.
     '''
-    include_files = get_components(coupled_model)
-    include_statements = ""
+    include_files = dict.fromkeys(model_name for model_name, _ in get_component_instances(coupled_model))
+    include_statements = []
     for file_name in include_files:
-        include_statements += '#include "' + file_name + '.hpp"\n'
-    include_statements += '\n'
-    return include_statements
+        include_statements.append('#include "' + file_name + '.hpp"\n')
+    include_statements.append('\n')
+    return join_fragments(include_statements)
 
 
-def generate_coupled_model_struct(model_name, model):
+def generate_coupled_model_struct(model_name, model, component_initial_states=None, variants=0, component_variants=None):
     '''
-    Returns the C++ struct for a coupled model in Cadmium. The struct contains component declarations 
-    and internal coupling between the coupled model's atomic models.
+    Returns the C++ struct for a coupled model in Cadmium. The struct contains the declarations of
+    the ports of the coupled model and of its components, the internal couplings between the 
+    components, and the external input and output couplings (eic and eoc) between the ports of 
+    the coupled model and those of its components.
 
     Args:
         model_name (str):   The name of the coupled model being generated.
         model (dict):       The data of the coupled model being generated.
+        component_initial_states (dict):    Optional initial state of each component, returned by 
+                                            get_component_arguments() or get_component_initial_states(), 
+                                            which is passed to the constructor of the component.
+        variants (int):     The number of variants of the coupled model (see get_coupled_model_variants()).
+                            When it is not 0, the constructor takes the variant to build (the sweep 
+                            point of the run, for the top model), and the arguments of the components 
+                            that change between the variants are taken from tables indexed by the variant.
+        component_variants (dict):  Optional variant of each component, returned by get_component_arguments(),
+                                    which is passed to the constructor of the component.
     '''
-    constructor = ''
+    component_initial_states = component_initial_states or {}
+    component_variants = component_variants or {}
+    constructor = []
     
     # struct header
-    constructor += 'struct ' + model_name + ' : public Coupled {\n\n'
-    constructor += '\t' + model_name + '(const std::string& id) : Coupled(id) {\n'
+    constructor.append('struct ' + model_name + ' : public Coupled {\n\n')
+    constructor.append(generate_coupled_port_declarations(model.get('x', {}), model.get('y', {})))
+    if variants:
+        constructor.append('\t' + model_name + '(const std::string& id, std::size_t variant = 0) : Coupled(id) {\n')
+    else:
+        constructor.append('\t' + model_name + '(const std::string& id) : Coupled(id) {\n')
+    constructor.append(generate_coupled_port_initializations(model.get('x', {}), model.get('y', {})))
+
+    # tables of the arguments of the components that change between the variants
+    tables = False
+    for component_model_name, model_id in get_component_instances(model):
+        initial_states = component_initial_states.get(model_id)
+        if isinstance(initial_states, list):
+            constructor.append('\t\tstatic const ' + component_model_name + 'State ' + model_id + 'InitialStates[' + str(len(initial_states)) + '] = {' +
+                               ', '.join(initial_states) + '};\n')
+            tables = True
+        indexes = component_variants.get(model_id)
+        if isinstance(indexes, list):
+            constructor.append('\t\tstatic const std::size_t ' + model_id + 'Variants[' + str(len(indexes)) + '] = {' +
+                               ', '.join(str(index) for index in indexes) + '};\n')
+            tables = True
+    if tables:
+        constructor.append('\n')
 
     # addComponent statements
-    components = get_components(model)
-    component_statements = ''
-    for model_name, model_id in components.items():
-        component_statements += '\t\tauto ' + model_id + ' = addComponent<' + model_name + '>("' + model_id + '");\n'
-    constructor += component_statements + '\n'
+    for component_model_name, model_id in get_component_instances(model):
+        arguments = '"' + model_id + '"'
+        if isinstance(component_initial_states.get(model_id), list):
+            arguments += ', ' + model_id + 'InitialStates[variant]'
+        elif model_id in component_initial_states:
+            arguments += ', ' + component_initial_states[model_id]
+        if isinstance(component_variants.get(model_id), list):
+            arguments += ', ' + model_id + 'Variants[variant]'
+        elif model_id in component_variants:
+            arguments += ', ' + str(component_variants[model_id])
+        constructor.append('\t\tauto ' + model_id + ' = addComponent<' + component_model_name + '>(' + arguments + ');\n')
+    constructor.append('\n')
         
     #addCoupling statements
-    coupling_statements = ''
     for coupling in model['ic']:
-        coupling_statements += '\t\taddCoupling(' + coupling['component_from'] + '->' + coupling['port_from'] + ', ' + coupling['component_to'] + '->' + coupling['port_to'] + ');\n'
-    constructor += coupling_statements
+        constructor.append('\t\taddCoupling(' + coupling['component_from'] + '->' + coupling['port_from'] + ', ' + coupling['component_to'] + '->' + coupling['port_to'] + ');\n')
+    for coupling in model.get('eic', []):
+        constructor.append('\t\taddCoupling(' + coupling['port_from'] + ', ' + coupling['component_to'] + '->' + coupling['port_to'] + ');\n')
+    for coupling in model.get('eoc', []):
+        constructor.append('\t\taddCoupling(' + coupling['component_from'] + '->' + coupling['port_from'] + ', ' + coupling['port_to'] + ');\n')
     
     # close struct
-    constructor += '\t}\n};\n\n'
+    constructor.append('\t}\n};\n\n')
     
-    return constructor
+    return join_fragments(constructor)
+
+
+def generate_coupled_port_declarations(input_ports, output_ports):
+    '''
+    Returns the C++ declarations of the input and output ports of a coupled model, or an empty
+    string if it has no ports.
+
+    Args:
+        input_ports (dict):     The DEVSMap dictionary data for the coupled model's input ports, 
+                                given by model['x']
+        output_ports (dict):    The DEVSMap dictionary data for the coupled model's output ports, 
+                                given by model['y']
+    '''
+    port_declarations = []
+    if input_ports:
+        port_declarations.append('\t//input ports\n')
+        port_declarations.extend('\tPort<' + data_type + '> ' + port_name + ';\n' for port_name, data_type in input_ports.items())
+        port_declarations.append('\n')
+    if output_ports:
+        port_declarations.append('\t//output ports\n')
+        port_declarations.extend('\tPort<' + data_type + '> ' + port_name + ';\n' for port_name, data_type in output_ports.items())
+        port_declarations.append('\n')
+    return join_fragments(port_declarations)
+
+
+def generate_coupled_port_initializations(input_ports, output_ports):
+    '''
+    Returns the C++ statements of the constructor of a coupled model that add its input and 
+    output ports, or an empty string if it has no ports.
+
+    Args:
+        input_ports (dict):     The DEVSMap dictionary data for the coupled model's input ports, 
+                                given by model['x']
+        output_ports (dict):    The DEVSMap dictionary data for the coupled model's output ports, 
+                                given by model['y']
+    '''
+    port_initializations = []
+    if input_ports:
+        port_initializations.append('\t\t//input ports\n')
+        port_initializations.extend('\t\t' + port_name + ' = addInPort<' + data_type + '>("' + port_name + '");\n'
+                                    for port_name, data_type in input_ports.items())
+        port_initializations.append('\n')
+    if output_ports:
+        port_initializations.append('\t\t//output ports\n')
+        port_initializations.extend('\t\t' + port_name + ' = addOutPort<' + data_type + '>("' + port_name + '");\n'
+                                    for port_name, data_type in output_ports.items())
+        port_initializations.append('\n')
+    return join_fragments(port_initializations)
@@ -1,9 +1,13 @@
 # TODO top of the file comments
 
+import os
+
 from generate_simple_statements import *
+from generation_cache import generate_file_incrementally, compute_input_hash
+from code_emitter import join_fragments, write_file_atomically
 
 
-def generate_main_cpp(directory, top_model_name, simulation_time):
+def generate_main_cpp(directory, top_model_name, simulation_time, manifest=None, logger=None, runs=None, seed_random=False):
     '''
     Creates the main.hpp file in directory, and generates the Cadmium C++ code 
     within that file that will allow for execution of the simulation.
@@ -12,28 +16,92 @@ def generate_main_cpp(directory, top_model_name, simulation_time):
         directory (str):        The output directory to place the main.hpp file.
         top_model_name (str):   The name of the top model, which is used to start the simulation.
         simulation_time (str):  The number of seconds the simulation will run for.
+        manifest (dict):        Optional manifest returned by load_manifest(directory). When given,
+                                main.cpp is only regenerated if its inputs changed.
+        logger (dict):          The settings of the logger returned by get_logger_settings(). 
+                                None uses the 'stdout' logger.
+        runs (dict):            The settings of the runs returned by get_run_settings(). None runs
+                                the simulation once.
+        seed_random (bool):     True if an atomic model draws random numbers, whose generators are then
+                                seeded from the seed of each run (see generate_random_hpp.py).
     '''
-    type_of_logger = 'STDOUTLogger'
-    #type_of_logger = 'CSVLogger'
     output_filepath = directory + "main.cpp"
-    with open(output_filepath, 'w') as file:
-        file.write(write_main_cpp_top_of_file_for_simulation(top_model_name))
-        file.write('extern "C" {\n\n')
-        file.write('\t int main() {\n')
-        file.write(initialize_simulated_model(top_model_name))
-        file.write(initialize_root_coordinator())
-        file.write(set_logger(type_of_logger))
-        file.write(run_simulation(simulation_time))
-        file.write(final_return_statement())
-        file.write('\t}\n}')
-    file.close()
+    if manifest is not None:
+        generate_file_incrementally(output_filepath, 
+                                    manifest, 
+                                    compute_input_hash(top_model_name, simulation_time, logger, runs, seed_random), 
+                                    lambda: generate_main_cpp_code(top_model_name, simulation_time, logger, runs, seed_random))
+        return
+    write_file_atomically(output_filepath, generate_main_cpp_code(top_model_name, simulation_time, logger, runs, seed_random))
+
+
+def generate_main_cpp_code(top_model_name, simulation_time, logger=None, runs=None, seed_random=False):
+    '''
+    Returns the Cadmium C++ code of the main.cpp file.
+
+    Args:
+        top_model_name (str):   The name of the top model, which is used to start the simulation.
+        simulation_time (str):  The number of seconds the simulation will run for.
+        logger (dict):          The settings of the logger returned by get_logger_settings(). 
+                                None uses the 'stdout' logger.
+        runs (dict):            The settings of the runs returned by get_run_settings(). None runs
+                                the simulation once.
+        seed_random (bool):     True to seed the random number generators of the atomic models 
+                                from the seed of the runs (see generate_random_hpp.py).
+    '''
+    if logger is None:
+        logger = {'type': 'stdout', 'path': None}
+    if runs is not None and is_multiple_runs(runs):
+        return generate_main_cpp_code_for_runs(top_model_name, simulation_time, logger, runs, seed_random)
+    return join_fragments([include_random() if seed_random else '',
+                           write_main_cpp_top_of_file_for_simulation(top_model_name, logger['type']),
+                           'extern "C" {\n\n',
+                           '\t int main() {\n',
+                           start_random_run(str((runs or {}).get('seed', 0)) + 'ULL') if seed_random else '',
+                           initialize_simulated_model(top_model_name),
+                           initialize_root_coordinator(),
+                           set_logger(logger),
+                           run_simulation(simulation_time),
+                           final_return_statement(),
+                           '\t}\n}'])
+
+
+def include_random():
+    '''
+    Returns the C++ statement to include the random number generator of the atomic models.
+    '''
+    return '#include "include/devsmap_random.hpp"\n'
 
 
-def include_loggers():
+def start_random_run(seed, indentation='\t\t'):
     '''
-    Returns the C++ statement to include Cadmium's STDout and CSV loggers.
+    Returns the C++ statement that seeds the random number generators of the atomic models 
+    built next on this thread (see DevsmapRandom::startRun()).
+
+    Args:
+        seed (str):         The C++ expression of the seed of the run.
+        indentation (str):  The indentation of the statement.
     '''
-    return '#ifndef NO_LOGGING\n\t#include "cadmium/simulation/logger/stdout.hpp"\n\t#include "cadmium/simulation/logger/csv.hpp"\n#endif\n\n'
+    return indentation + 'DevsmapRandom::startRun(' + seed + ');\n\n'
+
+
+def include_loggers(type_of_logger='stdout'):
+    '''
+    Returns the C++ statement to include the header of the logger being used.
+
+    Args:
+        type_of_logger (str):   The type of logger being used (see get_logger_settings()).
+    '''
+    match type_of_logger:
+        case 'stdout':
+            header = '"cadmium/simulation/logger/stdout.hpp"'
+        case 'csv':
+            header = '"cadmium/simulation/logger/csv.hpp"'
+        case 'binary':
+            header = '"include/binary_logger.hpp"'
+        case _:
+            return ''
+    return '#ifndef NO_LOGGING\n\t#include ' + header + '\n#endif\n\n'
 
 
 def include_root_coordinator():
@@ -43,14 +111,15 @@ def include_root_coordinator():
     return '#include "cadmium/simulation/root_coordinator.hpp"\n'
 
 
-def write_main_cpp_top_of_file_for_simulation(top_model_name):
+def write_main_cpp_top_of_file_for_simulation(top_model_name, type_of_logger='stdout'):
     '''
     Returns the C++ statements common to all main files for simulation.
 
     Args:
         top_model_name (str):   The name of the top model.
+        type_of_logger (str):   The type of logger being used (see get_logger_settings()).
     '''
-    return include_root_coordinator() + include_limits() + include_model(top_model_name) + include_loggers() + cadmium_namespace()
+    return include_root_coordinator() + include_limits() + include_model(top_model_name) + include_loggers(type_of_logger) + cadmium_namespace()
     
     
 def initialize_simulated_model(top_model_name):
@@ -70,29 +139,23 @@ def initialize_root_coordinator():
     return '\t\tauto rootCoordinator = cadmium::RootCoordinator(model);\n\n'
     
 
-def set_logger(type_of_logger):
+def set_logger(logger):
     '''
     Return the C++ code that sets the Cadmium Logger.
 
     Args:
-        type_of_logger (str):   The type of logger being used. Possible values are 
-                                'STDOUTLogger' and 'CSVLogger'.  
+        logger (dict):  The settings of the logger returned by get_logger_settings().
     '''
-    initialization_string = '\t\t#ifndef NO_LOGGING\n'
-    
-    initialization_string += '\t\t\t'
-    if type_of_logger != 'STDOUTLogger':
-        initialization_string += '//'
-    initialization_string += 'rootCoordinator.setLogger<cadmium::STDOUTLogger>(";");\n'
-    
-    initialization_string += '\t\t\t'
-    if type_of_logger != 'CSVLogger':
-        initialization_string += '//' 
-    initialization_string += 'rootCoordinator.setLogger<cadmium::CSVLogger>("logfile.csv", ";");\n'
-    
-    initialization_string += '\t\t#endif\n\n'
-    
-    return initialization_string
+    match logger['type']:
+        case 'stdout':
+            set_logger_statement = 'rootCoordinator.setLogger<cadmium::STDOUTLogger>(";");\n'
+        case 'csv':
+            set_logger_statement = 'rootCoordinator.setLogger<cadmium::CSVLogger>(' + cpp_string(logger['path']) + ', ";");\n'
+        case 'binary':
+            set_logger_statement = 'rootCoordinator.setLogger<cadmium::BinaryLogger>(' + cpp_string(logger['path']) + ');\n'
+        case _:
+            return ''
+    return '\t\t#ifndef NO_LOGGING\n\t\t\t' + set_logger_statement + '\t\t#endif\n\n'
 
 
 def run_simulation(simulation_time):
@@ -117,3 +180,169 @@ def final_return_statement():
     return '\t\treturn 0;\n'
 
 
+def generate_main_cpp_code_for_runs(top_model_name, simulation_time, logger, runs, seed_random=False):
+    '''
+    Returns the Cadmium C++ code of a main.cpp file that runs the simulation once for each 
+    replication of each sweep point, on a pool of threads.  Each run builds its own instance 
+    of the top model (at its sweep point), has its own seed (the seed of the runs plus the 
+    index of the run) and its own log file, and a summary of the runs is printed at the end.  
+    The stdout logger would mix the logs of the runs, so the csv logger is used instead.
+
+    Args:
+        top_model_name (str):   The name of the top model, which is used to start the simulation.
+        simulation_time (str):  The number of seconds each run simulates.
+        logger (dict):          The settings of the logger returned by get_logger_settings().
+        runs (dict):            The settings of the runs returned by get_run_settings().
+        seed_random (bool):     True to seed the random number generators of the atomic models 
+                                of each run from the seed of the run.
+    '''
+    if logger['type'] == 'stdout':
+        logger = {'type': 'csv', 'path': LOGGER_FILES['csv']}
+    return join_fragments([include_run_libraries(),
+                           include_random() if seed_random else '',
+                           write_main_cpp_top_of_file_for_simulation(top_model_name, logger['type']),
+                           declare_simulation_run(),
+                           define_run_simulation(top_model_name, simulation_time, logger, bool(runs['sweep']), seed_random),
+                           'extern "C" {\n\n',
+                           '\t int main() {\n',
+                           initialize_runs(logger, runs),
+                           run_simulations_in_parallel(runs['threads']),
+                           print_runs_summary(),
+                           '\t}\n}'])
+
+
+def include_run_libraries():
+    '''
+    Returns the C++ statements to include the libraries used to run the simulations in parallel.
+    '''
+    return '#include <algorithm>\n#include <atomic>\n#include <chrono>\n#include <cstdio>\n#include <exception>\n#include <string>\n#include <thread>\n#include <vector>\n\n'
+
+
+def declare_simulation_run():
+    '''
+    Returns the C++ struct of a run of the simulation, with its settings and its results.
+    '''
+    return ('struct SimulationRun {\n'
+            '\tstd::size_t index;\n'
+            '\tstd::size_t sweepPoint;\n'
+            '\tstd::size_t replication;\n'
+            '\tunsigned long long seed;\n'
+            '\tstd::string logPath;\n'
+            '\tdouble wallSeconds = 0;\n'
+            '\tstd::string error;\n'
+            '};\n\n')
+
+
+def define_run_simulation(top_model_name, simulation_time, logger, sweep, seed_random=False):
+    '''
+    Returns the C++ function that builds the top model of a run, simulates it, and records
+    the wall time of the run (or the error that stopped it).
+
+    Args:
+        top_model_name (str):   The name of the top model.
+        simulation_time (str):  The number of seconds each run simulates.
+        logger (dict):          The settings of the logger returned by get_logger_settings().
+        sweep (bool):           True if the top model takes the sweep point of the run.
+        seed_random (bool):     True to seed the random number generators of the atomic models from 
+                                the seed of the run.
+    '''
+    arguments = '"' + top_model_name + '"'
+    if sweep:
+        arguments += ', run.sweepPoint'
+    match logger['type']:
+        case 'csv':
+            set_logger_statement = 'rootCoordinator.setLogger<cadmium::CSVLogger>(run.logPath, ";");\n'
+        case 'binary':
+            set_logger_statement = 'rootCoordinator.setLogger<cadmium::BinaryLogger>(run.logPath);\n'
+        case _:
+            set_logger_statement = None
+
+    code = 'static void runSimulation(SimulationRun& run) {\n'
+    code += '\tauto start = std::chrono::steady_clock::now();\n'
+    code += '\ttry {\n'
+    if seed_random:
+        code += start_random_run('run.seed')
+    code += '\t\tstd::shared_ptr<' + top_model_name + '> model = std::make_shared<' + top_model_name + '>(' + arguments + ');\n\n'
+    code += '\t\tauto rootCoordinator = cadmium::RootCoordinator(model);\n\n'
+    if set_logger_statement is not None:
+        code += '\t\t#ifndef NO_LOGGING\n\t\t\t' + set_logger_statement + '\t\t#endif\n\n'
+    code += run_simulation(simulation_time).removesuffix('\n')
+    code += '\t} catch (const std::exception& e) {\n'
+    code += '\t\trun.error = e.what();\n'
+    code += '\t}\n'
+    code += '\trun.wallSeconds = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();\n'
+    code += '}\n\n'
+    return code
+
+
+def initialize_runs(logger, runs):
+    '''
+    Returns the C++ code that lists the runs: every replication of every sweep point, each 
+    with its seed, and its log file (the log path of the logger, with the index of the run 
+    before its extension).
+
+    Args:
+        logger (dict):  The settings of the logger returned by get_logger_settings().
+        runs (dict):    The settings of the runs returned by get_run_settings().
+    '''
+    log_root, log_extension = os.path.splitext(logger['path'] or '')
+    code = '\t\tconst std::size_t sweepPoints = ' + str(max(len(runs['sweep']), 1)) + ';\n'
+    code += '\t\tconst std::size_t replications = ' + str(runs['replications']) + ';\n'
+    code += '\t\tconst unsigned long long seed = ' + str(runs['seed']) + 'ULL;\n\n'
+    code += '\t\tstd::vector<SimulationRun> runs;\n'
+    code += '\t\tfor (std::size_t sweepPoint = 0; sweepPoint < sweepPoints; sweepPoint++) {\n'
+    code += '\t\t\tfor (std::size_t replication = 0; replication < replications; replication++) {\n'
+    code += '\t\t\t\tstd::size_t index = runs.size();\n'
+    if logger['path'] is not None:
+        log_path = 'std::string(' + cpp_string(log_root + '_run') + ') + std::to_string(index) + ' + cpp_string(log_extension)
+    else:
+        log_path = 'std::string()'
+    code += '\t\t\t\truns.push_back({index, sweepPoint, replication, seed + index, ' + log_path + '});\n'
+    code += '\t\t\t}\n'
+    code += '\t\t}\n\n'
+    return code
+
+
+def run_simulations_in_parallel(threads):
+    '''
+    Returns the C++ code that runs the simulations on a pool of threads, each taking the 
+    next run that has not started until every run is done.
+
+    Args:
+        threads (int):  The maximum number of threads (0 uses every hardware thread).
+    '''
+    if threads > 0:
+        code = '\t\tstd::size_t threads = ' + str(threads) + ';\n'
+    else:
+        code = '\t\tstd::size_t threads = std::max(1u, std::thread::hardware_concurrency());\n'
+    code += '\t\tthreads = std::min(threads, runs.size());\n'
+    code += '\t\tstd::atomic<std::size_t> nextRun(0);\n'
+    code += '\t\tstd::vector<std::thread> workers;\n'
+    code += '\t\tfor (std::size_t i = 0; i < threads; i++) {\n'
+    code += '\t\t\tworkers.emplace_back([&runs, &nextRun]() {\n'
+    code += '\t\t\t\tfor (std::size_t run = nextRun++; run < runs.size(); run = nextRun++) {\n'
+    code += '\t\t\t\t\trunSimulation(runs[run]);\n'
+    code += '\t\t\t\t}\n'
+    code += '\t\t\t});\n'
+    code += '\t\t}\n'
+    code += '\t\tfor (auto& worker : workers) {\n'
+    code += '\t\t\tworker.join();\n'
+    code += '\t\t}\n\n'
+    return code
+
+
+def print_runs_summary():
+    '''
+    Returns the C++ code that prints the summary of the runs (one line per run, separated 
+    by ";"), and returns 1 from main if a run failed, and 0 otherwise.
+    '''
+    code = '\t\tint status = 0;\n'
+    code += '\t\tstd::printf("run;sweep_point;replication;seed;log;wall_seconds;error\\n");\n'
+    code += '\t\tfor (const auto& run : runs) {\n'
+    code += '\t\t\tstd::printf("%zu;%zu;%zu;%llu;%s;%.6f;%s\\n", run.index, run.sweepPoint, run.replication, run.seed, run.logPath.c_str(), run.wallSeconds, run.error.c_str());\n'
+    code += '\t\t\tif (!run.error.empty()) {\n'
+    code += '\t\t\t\tstatus = 1;\n'
+    code += '\t\t\t}\n'
+    code += '\t\t}\n'
+    code += '\t\treturn status;\n'
+    return code
@@ -0,0 +1,183 @@
+# Functions for generating every output file of a DEVSMap project (main.cpp, and the
+# .hpp file of each atomic and coupled model) from the sorted DEVSMap data.
+#
+# generate_project_code() generates the code of the files in memory.  generate_project_files()
+# writes the code it returns, and handles the manifest of incremental generation: the files
+# whose inputs did not change are left out of the generated code, and the input hash of each
+# file written is recorded (see generation_cache.py).
+
+import os
+
+from generate_main_cpp import generate_main_cpp_code
+from generate_coupled_model_hpp import generate_coupled_models_code
+from generate_atomic_model_hpp import generate_atomic_models_code
+from generate_binary_logger_hpp import generate_binary_logger_code, BINARY_LOGGER_FILENAME
+from generate_random_hpp import generate_random_header_code, project_uses_random, RANDOM_FILENAME
+from generate_simple_statements import get_simulation_time_in_seconds, get_top_model_name, get_logger_settings, get_run_settings
+from generate_build_files import generate_build_files_code, get_build_filenames, get_build_options, CMAKE_FILENAMES
+from generation_cache import compute_input_hash, get_up_to_date_check, remove_stale_files, write_generated_files
+from pipeline_instrumentation import measure_stage
+from init_state_index import index_init_states
+
+# The options of the generated code, with their default values (see get_generation_options()).
+GENERATION_OPTIONS = {'logger': None,
+                      'flatten_hierarchy': False,
+                      'pack_state_structs': False,
+                      'build_options': None,
+                      'runs': None}
+
+
+def get_generation_options(options=None):
+    '''
+    Returns the generation options dictionary with the default value of each missing option:
+        'logger' (dict):                Optional logger settings overriding those of the experiment, with a
+                                        'type' and/or a 'path' (see get_logger_settings()).
+        'flatten_hierarchy' (bool):     True to generate the top model as a single coupled model of all the
+                                        atomic model instances, instead of one coupled model per level.
+        'pack_state_structs' (bool):    True to declare the fields of the state structs in the order that
+                                        minimizes their padding (see order_state_variables()).
+        'build_options' (dict):         Optional build options, with a 'precompiled_header' and/or a number of
+                                        'unity_chunks' (see generate_build_files.py).
+        'runs' (dict):                  Optional settings of the runs overriding those of the experiment, with
+                                        'replications', 'threads' and/or a 'seed' (see get_run_settings()).
+    The options are passed unchanged from the entry points (the command line, the library, the
+    watch and batch modes) to the generators.
+
+    Raises a ValueError if options has an unknown option.
+
+    Args:
+        options (dict):     Optional generation options.
+    '''
+    unknown_options = sorted(set(options or {}) - set(GENERATION_OPTIONS))
+    if unknown_options:
+        raise ValueError(f"Unknown generation options {unknown_options}, expected some of {list(GENERATION_OPTIONS)}")
+    return {**GENERATION_OPTIONS, **(options or {})}
+
+
+def get_expected_filenames(data, options=None):
+    '''
+    Returns the set of filenames (without directory) of every file generated for data.
+
+    Args:
+        data (dict):        The DEVSMap json data that has been sorted into a dictionary.
+        options (dict):     Optional generation options (see get_generation_options()).
+    '''
+    options = get_generation_options(options)
+    expected_filenames = {'main.cpp'} | get_build_filenames(data, options['build_options'])
+    if get_logger_settings(data['experiment'], options['logger'])['type'] == 'binary':
+        expected_filenames.add(BINARY_LOGGER_FILENAME)
+    if project_uses_random(data):
+        expected_filenames.add(RANDOM_FILENAME)
+    model_names = [list(model.keys())[0] for model in data['atomic_models'] + data['coupled_models']]
+    if options['flatten_hierarchy']:
+        model_names = [list(model.keys())[0] for model in data['atomic_models']] + [get_top_model_name(data['experiment'])]
+    for model_name in model_names:
+        expected_filenames.add(model_name + '.hpp')
+    return expected_filenames
+
+
+def generate_project_files(data, directory_code_main_output, options=None, *, manifest=None, jobs=1, instrumentation=None, init_state_index=None):
+    '''
+    Generates main.cpp in directory_code_main_output, and the .hpp file of each atomic and
+    coupled model in its "include" subdirectory, with the build files enabled by the build
+    options.  The code is generated by generate_project_code(), and only written here.
+
+    Args:
+        data (dict):                        The DEVSMap json data that has been sorted into a dictionary.
+        directory_code_main_output (str):   The "main" directory of the Cadmium project.
+        options (dict):                     Optional generation options (see get_generation_options()).
+        manifest (dict):                    Optional manifest returned by load_manifest(directory). When given,
+                                            only the files whose inputs changed are regenerated, and the
+                                            files of models that no longer exist are removed.
+        jobs (int):                         The number of worker processes used to generate the models.
+        instrumentation (dict):             Optional instrumentation returned by start_instrumentation().
+        init_state_index (dict):            Optional index of the init states returned by index_init_states(data).
+    '''
+    directory_code_include_output = os.path.join(directory_code_main_output, 'include', '')
+    directory_code_main_output = os.path.join(directory_code_main_output, '')
+    os.makedirs(directory_code_include_output, exist_ok=True)
+
+    # When generating incrementally, we remove the files of models that no
+    # longer exist in the input directory, and the files whose inputs did not
+    # change are left out of the generated code.
+    input_hashes = {}
+    is_up_to_date = None
+    if manifest is not None:
+        remove_stale_files(directory_code_main_output, directory_code_include_output, manifest, get_expected_filenames(data, options))
+        is_up_to_date = get_up_to_date_check(directory_code_main_output, manifest, input_hashes)
+
+    project_code = generate_project_code(data, options, jobs=jobs, instrumentation=instrumentation, init_state_index=init_state_index,
+                                         is_up_to_date=is_up_to_date, directory_code_main_output=directory_code_main_output)
+    with measure_stage(instrumentation, 'write_files'):
+        write_generated_files(directory_code_main_output, project_code, manifest, input_hashes)
+
+
+def generate_project_code(data, options=None, *, jobs=1, instrumentation=None, init_state_index=None, is_up_to_date=None,
+                          directory_code_main_output=None):
+    '''
+    Returns a dictionary with the code of main.cpp, of the .hpp file of each atomic and 
+    coupled model, and of the build files enabled by the build options, keyed by the path of
+    the file relative to the "main" directory of the Cadmium project (for example, "main.cpp"
+    and "include/counter.hpp").  Nothing is written to disk.
+
+    Args:
+        data (dict):                        The DEVSMap json data that has been sorted into a dictionary.
+        options (dict):                     Optional generation options (see get_generation_options()).
+        jobs (int):                         The number of worker processes used to generate the models.
+        instrumentation (dict):             Optional instrumentation returned by start_instrumentation().
+        init_state_index (dict):            Optional index of the init states returned by index_init_states(data).
+        is_up_to_date (func):               Optional function is_up_to_date(relative_path, input_hash) that returns
+                                            True if the file was already generated from inputs with that hash (see
+                                            get_up_to_date_check()).  Those files are left out of the result.
+        directory_code_main_output (str):   Optional "main" directory of the Cadmium project the code is written to,
+                                            only read to find out if its CMakeLists.txt was generated (see
+                                            generate_build_files_code()).
+    '''
+    options = get_generation_options(options)
+    build_options = get_build_options(options['build_options'])
+
+    # We obtain some key information such as the number of seconds the
+    # simulation will run for, and the name of the top model.
+    simulation_time = get_simulation_time_in_seconds(data['experiment'])
+    top_model_name = get_top_model_name(data['experiment'])
+    logger_settings = get_logger_settings(data['experiment'], options['logger'])
+    run_settings = get_run_settings(data['experiment'], options['runs'])
+    seed_random = project_uses_random(data)
+    # The init states are indexed once, for the atomic models and for the components of the coupled models.
+    if init_state_index is None:
+        init_state_index = index_init_states(data)
+
+    def is_include_file_up_to_date(filename, input_hash):
+        return is_up_to_date('include/' + filename, input_hash)
+
+    def add_file(relative_path, inputs, generate_code):
+        if is_up_to_date is None or not is_up_to_date(relative_path, compute_input_hash(*inputs)):
+            project_code[relative_path] = generate_code()
+
+    project_code = {}
+    with measure_stage(instrumentation, 'generate_main_cpp'):
+        add_file('main.cpp', (top_model_name, simulation_time, logger_settings, run_settings, seed_random),
+                 lambda: generate_main_cpp_code(top_model_name, simulation_time, logger_settings, run_settings, seed_random))
+        if logger_settings['type'] == 'binary':
+            add_file('include/' + BINARY_LOGGER_FILENAME, (BINARY_LOGGER_FILENAME,), generate_binary_logger_code)
+        if seed_random:
+            add_file('include/' + RANDOM_FILENAME, (RANDOM_FILENAME,), generate_random_header_code)
+    with measure_stage(instrumentation, 'generate_coupled_models'):
+        for filename, code in generate_coupled_models_code(data, jobs, instrumentation, options['flatten_hierarchy'], init_state_index,
+                                                           is_include_file_up_to_date if is_up_to_date is not None else None).items():
+            project_code['include/' + filename] = code
+    with measure_stage(instrumentation, 'generate_atomic_models'):
+        for filename, code in generate_atomic_models_code(data, jobs, instrumentation, init_state_index, options['pack_state_structs'],
+                                                          build_options['unity_chunks'] > 0,
+                                                          is_include_file_up_to_date if is_up_to_date is not None else None).items():
+            project_code['include/' + filename] = code
+    # The build files are small and depend on little more than the list of atomic models, so they are
+    # always generated.  CMakeLists.txt and devsmap_options.cmake are not recorded in the manifest, so they
+    # are always compared with the files on disk, which may have been written by hand.
+    for relative_path, code in generate_build_files_code(data, build_options, directory_code_main_output,
+                                                           logger_settings['type'] == 'none').items():
+        if relative_path in CMAKE_FILENAMES:
+            project_code[relative_path] = code
+        else:
+            add_file(relative_path, (relative_path, code), lambda: code)
+    return project_code
@@ -0,0 +1,170 @@
+# Functions for generating devsmap_random.hpp, the random number generator of the atomic
+# models that call a random primitive (see RANDOM_FUNCTIONS in devsmap_expressions.py).
+#
+# rand() of the C library is shared by every model of the process: it is not thread-safe,
+# so the runs of a simulation cannot be run in parallel, and it cannot be seeded per run.
+# Instead, the state of each atomic model that draws random numbers holds a DevsmapRandom
+# (xoshiro256**, seeded with splitmix64), and the random primitives are calls on it.  The
+# generator is seeded in the constructor of the atomic model, from the seed of the run (see
+# DevsmapRandom::startRun(), which main.cpp calls before building the top model) and the
+# order in which the instances of the run are built, so each instance has its own stream,
+# and a run with the same seed draws the same numbers.
+
+from generation_cache import generate_file_incrementally, compute_input_hash
+from code_emitter import write_file_atomically
+from devsmap_expressions import model_uses_random
+
+RANDOM_FILENAME = 'devsmap_random.hpp'
+
+
+def project_uses_random(data):
+    '''
+    Returns True if any atomic model of data calls a random primitive (see model_uses_random()).
+
+    Args:
+        data (dict):    The DEVSMap json data that has been sorted into a dictionary.
+    '''
+    return any(model_uses_random(atomic_model_data[list(atomic_model_data.keys())[0]]) for atomic_model_data in data['atomic_models'])
+
+
+def generate_random_header(directory, manifest=None):
+    '''
+    Creates devsmap_random.hpp in directory, and generates the C++ code of the random number
+    generator within that file.
+
+    Args:
+        directory (str):    The output directory to place devsmap_random.hpp (the "include" directory).
+        manifest (dict):    Optional manifest returned by load_manifest(directory). When given,
+                            devsmap_random.hpp is only regenerated if the generator changed.
+    '''
+    output_filepath = directory + RANDOM_FILENAME
+    if manifest is not None:
+        generate_file_incrementally(output_filepath, manifest, compute_input_hash(RANDOM_FILENAME), generate_random_header_code)
+        return
+    write_file_atomically(output_filepath, generate_random_header_code())
+
+
+def generate_random_header_code():
+    '''
+    Returns the C++ code of devsmap_random.hpp.
+    '''
+    return '''#ifndef DEVSMAP_RANDOM_HPP
+#define DEVSMAP_RANDOM_HPP
+
+#include <cmath>
+#include <cstdint>
+#include <cstdlib>
+
+//! Random number generator (xoshiro256**) of an atomic model instance, stored in its state.
+//! The DEVSMap random primitives are translated into calls to its methods.
+class DevsmapRandom {
+ public:
+	DevsmapRandom() {
+		seed(0);
+	}
+
+	//! Seeds the generator, by expanding value into its 256 bits of state with splitmix64.
+	void seed(std::uint64_t value) {
+		for (auto& word : words) {
+			word = splitmix64(value);
+		}
+	}
+
+	//! Returns the next 64 random bits.
+	std::uint64_t next() {
+		const std::uint64_t result = rotl(words[1] * 5, 7) * 9;
+		const std::uint64_t t = words[1] << 17;
+		words[2] ^= words[0];
+		words[3] ^= words[1];
+		words[1] ^= words[2];
+		words[0] ^= words[3];
+		words[2] ^= t;
+		words[3] = rotl(words[3], 45);
+		return result;
+	}
+
+	//! rand(): an integer in [0, RAND_MAX], as rand() of the C library.
+	int rand() {
+		return static_cast<int>((next() >> 11) % (static_cast<std::uint64_t>(RAND_MAX) + 1));
+	}
+
+	//! uniform_int(a, b): an integer in [a, b], without modulo bias.
+	long long uniformInt(long long a, long long b) {
+		const std::uint64_t range = static_cast<std::uint64_t>(b) - static_cast<std::uint64_t>(a) + 1;
+		if (range == 0) {
+			return static_cast<long long>(next());
+		}
+		const std::uint64_t threshold = (0 - range) % range;
+		std::uint64_t value = next();
+		while (value < threshold) {
+			value = next();
+		}
+		return static_cast<long long>(static_cast<std::uint64_t>(a) + value % range);
+	}
+
+	//! A real number in [0, 1), with 53 random bits.
+	double uniform() {
+		return static_cast<double>(next() >> 11) * (1.0 / 9007199254740992.0);
+	}
+
+	//! uniform_real(a, b): a real number in [a, b).
+	double uniformReal(double a, double b) {
+		return a + (b - a) * uniform();
+	}
+
+	//! exponential(rate): an exponentially distributed real number, with mean 1 / rate.
+	double exponential(double rate) {
+		return -std::log1p(-uniform()) / rate;
+	}
+
+	//! normal(mean, stddev): a normally distributed real number (Box-Muller transform).
+	double normal(double mean, double stddev) {
+		const double u1 = 1.0 - uniform();
+		const double u2 = uniform();
+		return mean + stddev * std::sqrt(-2.0 * std::log(u1)) * std::cos(6.283185307179586 * u2);
+	}
+
+	//! bernoulli(p): true with probability p.
+	bool bernoulli(double p) {
+		return uniform() < p;
+	}
+
+	//! Starts a run on this thread: the instances built by this thread from now on are
+	//! seeded from seed, in the order they are built.
+	static void startRun(std::uint64_t seed) {
+		runSeed() = seed;
+		instanceCount() = 0;
+	}
+
+	//! Returns the seed of the next instance built by this thread in the current run.
+	static std::uint64_t nextInstanceSeed() {
+		std::uint64_t value = runSeed() + 0x9E3779B97F4A7C15ULL * ++instanceCount();
+		return splitmix64(value);
+	}
+
+ private:
+	std::uint64_t words[4];
+
+	static std::uint64_t rotl(std::uint64_t x, int k) {
+		return (x << k) | (x >> (64 - k));
+	}
+
+	static std::uint64_t splitmix64(std::uint64_t& x) {
+		std::uint64_t z = (x += 0x9E3779B97F4A7C15ULL);
+		z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL;
+		z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL;
+		return z ^ (z >> 31);
+	}
+
+	static std::uint64_t& runSeed() {
+		thread_local std::uint64_t seed = 0;
+		return seed;
+	}
+
+	static std::uint64_t& instanceCount() {
+		thread_local std::uint64_t count = 0;
+		return count;
+	}
+};
+
+#endif'''
@@ -1,5 +1,12 @@
 # TODO top of the file comments
 
+# The types of logger that can be selected for the simulation, and the default path of 
+# their log file (None for the loggers that do not write to a file).
+LOGGER_FILES = {'stdout': None,
+                'csv': 'logfile.csv',
+                'binary': 'logfile.bin',
+                'none': None}
+
 def include_limits():
     '''
     Returns the C++ statement to include the 'limits' library.
@@ -36,6 +43,16 @@ def generate_file_definition(model_name):
     return "#ifndef "+ model_definition_name + "\n#define " + model_definition_name + "\n\n"  
 
 
+def cpp_string(text):
+    '''
+    Returns text as a C++ string literal.
+
+    Args:
+        text (str):     The text of the string.
+    '''
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
 def infinity():
     '''
     Returns the C++ syntax for infinity that is compatible with Cadmium.
@@ -72,6 +89,75 @@ def get_simulation_time_in_seconds(experiment_file):
     return experiment_file['time_span']
 
 
+def get_logger_settings(experiment_file, logger=None):
+    '''
+    Returns the settings of the logger of the simulation, as a dictionary with the 'type' of 
+    logger ('stdout', 'csv', 'binary' or 'none') and the 'path' of the log file (None for the 
+    'stdout' and 'none' loggers).  The settings in logger take precedence over the "logger" of 
+    the experiment file, which can be the type of logger, or a dictionary with its "type" and 
+    "path".  The default is the 'stdout' logger.
+
+    Args:
+        experiment_file (str):  The data corresponding to the 'XYZ_experiment.json' file, 
+                                where XYZ is the name of the top DEVS model.
+        logger (dict):          Optional settings overriding those of the experiment file (for 
+                                example, from the command line), with a 'type' and/or a 'path'.
+    '''
+    settings = experiment_file.get('logger') or {}
+    if isinstance(settings, str):
+        settings = {'type': settings}
+    logger = {key: value for key, value in (logger or {}).items() if value is not None}
+    if 'type' in logger and 'path' not in logger and logger['type'] != settings.get('type'):
+        # The path of the experiment's logger does not apply to a different type of logger.
+        settings = {}
+    settings = dict(settings, **logger)
+
+    logger_type = settings.get('type', 'stdout').lower()
+    if logger_type not in LOGGER_FILES:
+        raise ValueError(f"Unknown logger type {logger_type!r}, expected one of {', '.join(LOGGER_FILES)}")
+    path = None
+    if LOGGER_FILES[logger_type] is not None:
+        path = settings.get('path') or LOGGER_FILES[logger_type]
+    return {'type': logger_type, 'path': path}
+
+
+def get_run_settings(experiment_file, runs=None):
+    '''
+    Returns the settings of the runs of the simulation, as a dictionary with the number of 
+    'replications' of each sweep point, the maximum number of 'threads' running them at once 
+    (0 uses every hardware thread), the 'seed' of the first run (run i is seeded with seed + i), 
+    and the 'sweep' points (a list of init states overriding those of the init_state file, see 
+    index_init_states()).  The settings in runs take precedence over the "runs" of the experiment 
+    file.  The default is a single run, with no sweep.
+
+    Args:
+        experiment_file (str):  The data corresponding to the 'XYZ_experiment.json' file, 
+                                where XYZ is the name of the top DEVS model.
+        runs (dict):            Optional settings overriding those of the experiment file (for 
+                                example, from the command line), with 'replications', 'threads' 
+                                and/or 'seed'.
+    '''
+    settings = dict(experiment_file.get('runs') or {})
+    settings.update((key, value) for key, value in (runs or {}).items() if value is not None)
+    run_settings = {'replications': int(settings.get('replications', 1)),
+                    'threads': int(settings.get('threads', 0)),
+                    'seed': int(settings.get('seed', 0)),
+                    'sweep': list(settings.get('sweep') or [])}
+    if run_settings['replications'] < 1 or run_settings['threads'] < 0:
+        raise ValueError(f"Invalid runs {settings!r}, expected at least 1 replication and 0 or more threads")
+    return run_settings
+
+
+def is_multiple_runs(run_settings):
+    '''
+    Returns True if the run settings describe more than one run of the simulation.
+
+    Args:
+        run_settings (dict):    The settings of the runs returned by get_run_settings().
+    '''
+    return run_settings['replications'] > 1 or bool(run_settings['sweep'])
+
+
 def get_top_model_name(experiment_file):
     '''
     Returns the name of the top DEVS model.
@@ -87,11 +173,16 @@ def get_top_model(data, top_model_name):
     '''
     Returns the data of the top model.
 
+    Raises a ValueError if the top model is not a coupled model of data.
+
     Args:
         data (dict):            The data of all of the json files, read in by the function 
                                 read_json_files(directory), and sorted by the function 
                                 sort_json_files(json_data).
         top_model_name (str):   The name of the top DEVS model.
     '''
-    return data['coupled_models'][0][top_model_name]
+    for coupled_model in data['coupled_models']:
+        if top_model_name in coupled_model:
+            return coupled_model[top_model_name]
+    raise ValueError(f'The top model "{top_model_name}" is not a coupled model.')
 
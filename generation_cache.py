@@ -0,0 +1,238 @@
+# Functions for incremental regeneration of the Cadmium output files.
+#
+# Each generated file is recorded in a manifest together with a hash of the DEVSMap
+# data it was generated from and the version of the generator.  On the next run,
+# files whose inputs have not changed are left untouched (same bytes, same mtime),
+# so CMake/make only recompiles what actually changed.
+
+import glob
+import hashlib
+import json
+import os
+
+from code_emitter import write_file_atomically
+
+MANIFEST_FILENAME = '.devsmap_manifest.json'
+
+# The generator modules whose source contributes to the generator version.  Editing
+# any of these files invalidates every entry in the manifest.
+GENERATOR_MODULES = ['generate_main_cpp.py',
+                     'generate_coupled_model_hpp.py',
+                     'generate_atomic_model_hpp.py',
+                     'generate_simple_statements.py',
+                     'helper.py',
+                     'devsmap_expressions.py',
+                     'init_state_index.py',
+                     'generation_cache.py',
+                     'parallel_generation.py',
+                     'code_emitter.py',
+                     'generate_project.py',
+                     'generate_binary_logger_hpp.py',
+                     'state_layout.py',
+                     'generate_build_files.py',
+                     'generate_random_hpp.py',
+                     'conditional_optimization.py',
+                     'flatten_hierarchy.py',
+                     'model_hierarchy.py']
+
+_generator_version = None
+
+
+def generator_version():
+    '''
+    Returns a hash of the source code of the generator modules.  This is used as the
+    generator version, so that any change to the generator forces a full regeneration.
+    '''
+    global _generator_version
+    if _generator_version is None:
+        hasher = hashlib.sha256()
+        generator_directory = os.path.dirname(os.path.abspath(__file__))
+        for module_filename in GENERATOR_MODULES:
+            module_path = os.path.join(generator_directory, module_filename)
+            hasher.update(module_filename.encode('utf-8'))
+            if os.path.isfile(module_path):
+                with open(module_path, 'rb') as file:
+                    hasher.update(file.read())
+        _generator_version = hasher.hexdigest()
+    return _generator_version
+
+
+def compute_input_hash(*inputs):
+    '''
+    Returns a hash of the DEVSMap data that a generated file depends on, combined
+    with the generator version.
+
+    Args:
+        *inputs:    Any JSON serializable data that the generated file depends on
+                    (for example, the model name, the model data and the init states).
+    '''
+    hasher = hashlib.sha256()
+    hasher.update(generator_version().encode('utf-8'))
+    hasher.update(json.dumps(inputs, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def load_manifest(directory):
+    '''
+    Returns the manifest of previously generated files stored in directory. An empty
+    manifest is returned if there is no manifest, or if it cannot be read.
+
+    Args:
+        directory (str):    The directory where the manifest file is located.
+    '''
+    manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, 'r') as file:
+            try:
+                manifest = json.load(file)
+                if isinstance(manifest.get('files'), dict):
+                    return manifest
+            except (json.JSONDecodeError, AttributeError) as e:
+                print(f"Ignoring unreadable manifest {manifest_path}: {e}")
+    return {'generator_version': generator_version(), 'files': {}}
+
+
+def save_manifest(directory, manifest):
+    '''
+    Writes the manifest of generated files to directory.
+
+    Args:
+        directory (str):    The directory where the manifest file is located.
+        manifest (dict):    The manifest returned by load_manifest(directory), and updated
+                            by generate_file_incrementally().
+    '''
+    manifest['generator_version'] = generator_version()
+    manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+    write_file_if_changed(manifest_path, json.dumps(manifest, indent=4, sort_keys=True))
+
+
+def write_file_if_changed(filepath, text):
+    '''
+    Writes text to filepath (see write_file_atomically()), unless the file already contains 
+    exactly the same bytes. Returns True if the file was written.
+
+    Args:
+        filepath (str): The path of the file to write.
+        text (str):     The contents of the file.
+    '''
+    if os.path.isfile(filepath):
+        with open(filepath, 'rb') as file:
+            if file.read() == text.encode('utf-8'):
+                return False
+    write_file_atomically(filepath, text)
+    return True
+
+
+def is_file_up_to_date(filepath, manifest, input_hash):
+    '''
+    Returns True if the file at filepath exists and was generated from inputs with the 
+    same hash as input_hash.
+
+    Args:
+        filepath (str):         The path of the generated file.
+        manifest (dict):        The manifest returned by load_manifest(directory).
+        input_hash (str):       The hash of the inputs of the file, returned by compute_input_hash().
+    '''
+    filename = os.path.basename(filepath)
+    return manifest['files'].get(filename) == input_hash and os.path.isfile(filepath)
+
+
+def record_generated_file(filepath, manifest, input_hash):
+    '''
+    Records in the manifest that the file at filepath was generated from inputs with the 
+    hash input_hash.
+
+    Args:
+        filepath (str):         The path of the generated file.
+        manifest (dict):        The manifest returned by load_manifest(directory).
+        input_hash (str):       The hash of the inputs of the file, returned by compute_input_hash().
+    '''
+    manifest['files'][os.path.basename(filepath)] = input_hash
+
+
+def generate_file_incrementally(filepath, manifest, input_hash, generate_code):
+    '''
+    Generates the file at filepath only if input_hash differs from the hash recorded
+    in the manifest, or if the file does not exist. Returns True if the file was written.
+
+    Args:
+        filepath (str):         The path of the file to generate.
+        manifest (dict):        The manifest returned by load_manifest(directory).
+        input_hash (str):       The hash of the inputs of the file, returned by compute_input_hash().
+        generate_code (func):   A function with no arguments that returns the contents of the file.
+    '''
+    if is_file_up_to_date(filepath, manifest, input_hash):
+        return False
+    written = write_file_if_changed(filepath, generate_code())
+    record_generated_file(filepath, manifest, input_hash)
+    return written
+
+
+def get_up_to_date_check(directory, manifest, input_hashes):
+    '''
+    Returns a function is_up_to_date(relative_path, input_hash) for the generators of the code
+    (see generate_project_code()), which records input_hash in input_hashes[relative_path], and
+    returns True if the file at relative_path in directory was generated from inputs with the
+    same hash (so that the generators leave it out).
+
+    Args:
+        directory (str):        The directory the relative paths are relative to.
+        manifest (dict):        The manifest returned by load_manifest(directory).
+        input_hashes (dict):    The dictionary to record the input hash of each file in, keyed by
+                                relative path (see write_generated_files()).
+    '''
+    def is_up_to_date(relative_path, input_hash):
+        input_hashes[relative_path] = input_hash
+        return is_file_up_to_date(os.path.join(directory, relative_path), manifest, input_hash)
+    return is_up_to_date
+
+
+def write_generated_files(directory, generated_code, manifest=None, input_hashes=None):
+    '''
+    Writes the code of each generated file to directory (see write_file_if_changed()), and records
+    in the manifest the input hash of each file that has one in input_hashes.
+
+    Args:
+        directory (str):        The directory the relative paths are relative to.
+        generated_code (dict):  The code of each file, keyed by its path relative to directory.
+        manifest (dict):        Optional manifest returned by load_manifest(directory).
+        input_hashes (dict):    Optional input hash of each file, keyed by relative path (see
+                                get_up_to_date_check()).
+    '''
+    for relative_path, code in generated_code.items():
+        output_filepath = os.path.join(directory, relative_path)
+        os.makedirs(os.path.dirname(output_filepath), exist_ok=True)
+        write_file_if_changed(output_filepath, code)
+        if manifest is not None and relative_path in (input_hashes or {}):
+            record_generated_file(output_filepath, manifest, input_hashes[relative_path])
+
+
+def remove_stale_files(main_directory, include_directory, manifest, expected_filenames):
+    '''
+    Deletes the .hpp files in include_directory, and the generated .cpp files in
+    main_directory, that are not going to be generated, and removes them from the manifest.  This is the incremental counterpart of
+    clean_output_directory(), for models that were deleted from the input directory.
+
+    Args:
+        main_directory (str):       The output "main" directory.
+        include_directory (str):    The output "main/include" directory.
+        manifest (dict):            The manifest returned by load_manifest(directory).
+        expected_filenames (set):   The filenames (without directory) of every file that
+                                    will be generated by this run.
+    '''
+    for hpp_file in glob.glob(os.path.join(include_directory, '*.hpp')):
+        if os.path.basename(hpp_file) not in expected_filenames:
+            os.remove(hpp_file)
+            print("Deleted: " + hpp_file)
+    main_cpp_path = os.path.join(main_directory, 'main.cpp')
+    if 'main.cpp' not in expected_filenames and os.path.isfile(main_cpp_path):
+        os.remove(main_cpp_path)
+        print(f"Deleted: {main_cpp_path}")
+    for filename in list(manifest['files']):
+        if filename not in expected_filenames:
+            # The other .cpp files of main_directory are the unity chunks (see generate_build_files.py).
+            cpp_path = os.path.join(main_directory, filename)
+            if filename.endswith('.cpp') and os.path.isfile(cpp_path):
+                os.remove(cpp_path)
+                print(f"Deleted: {cpp_path}")
+            del manifest['files'][filename]
@@ -1,32 +1,20 @@
-def prefix_states(text, list_of_state_variables):
-    '''
-    Replaces each instance of "variable" by "state.variable" in text, when "variable" is followed 
-    by a space or semicolon.  This restriction prevents replacing substrings that are not 
-    state variables (For example, we would avoid replacing "targetnumber" by "targetstate.number" 
-    if there was also a state variable called "number"). This replacement occurs for all state 
-    variables in list_of_state_variables.
-
-    Args:
-        text (str):                             The input text which we are requiring to prefix the 
-                                                state variable names with "state."
-        list_of_state_variables (dict_items):   The list of state variables of the atomic model, returned by 
-                                                atomic_model['s'].items()
-    '''
-    for state_variable in list_of_state_variables:
-        text = text.replace(state_variable + ' ', 'state.' + state_variable + ' ')
-        text = text.replace(state_variable + ';', 'state.' + state_variable + ';')
-    return text
+from devsmap_expressions import (emit_assignment, emit_condition, emit_for_each, parse_expression, parse_for_each,
+                                 BAG_EMPTY, BAG_SIZE, BAG_ITEM, IDENTIFIER)
+from code_emitter import join_fragments
+from conditional_optimization import find_switch, optimize_branches
 
 
-def build_conditional_statements(data, list_of_state_variables):
+def build_conditional_statements(data, list_of_state_variables, function_kind='delta_int', bag_variables=None, state_variable_types=None):
     '''
     Constructs and returns if-else statements from dictionaries where the keys are conditional 
     statements and the values are instructions to execute when the conditional statement is true.
     In Cadmium, this is used to generate the bodies of the internal transition function, external 
     transition function, confluent function, output function, etc.
 
-    This function uses the prefix_states() function to ensure that all state variables are properly
-    syntaxed in C++, meaning they are of the form "state.variable_name".
+    The conditions and assignments are emitted from their parsed expressions (see 
+    devsmap_expressions.py), which ensures that all state variables are properly syntaxed 
+    in C++, meaning they are of the form "state.variable_name", and converts the DEVSMap 
+    operators to C++ according to function_kind.
 
     Possible cases are listed below:
 
@@ -36,7 +24,12 @@ def build_conditional_statements(data, list_of_state_variables):
         statement will not be nested in an if-else structure.
 
     3.  If there are keys defined that are not called "otherwise", the if-else structure will be generated 
-        via the build_conditional_statements_helper() function.
+        via the build_conditional_statements_helper() function, which first optimizes it (constant 
+        conditions are folded and branches with the same body are merged), and emits a switch for 
+        the chains that compare an integer or enum state variable to constants.
+
+    In the external transition function, a key of the form "for message in port.bag()" is a loop 
+    that executes its instructions once for each message in the bag of port.
 
     Args:
         data (dict):                            The DEVSMap dictionary containing the conditions as keys, 
@@ -44,89 +37,226 @@ def build_conditional_statements(data, list_of_state_variables):
                                                 to an if-else C++ structure.
         list_of_state_variables (dict_items):   The list of state variables for the atomic model currently 
                                                 being generated.  This is returned by atomic_model['s'].items().
+        function_kind (str):                    The DEVSMap function being generated ('delta_int', 'delta_ext' 
+                                                or 'lambda').
+        bag_variables (dict):                   Optional local variables holding the bag of each input port, 
+                                                returned by emit_bag_declarations().
+        state_variable_types (dict):            Optional C++ type of each state variable, given by atomic_model['s'], 
+                                                used to find the chains that can be emitted as a switch.
+    '''
+    state_variables = frozenset(list_of_state_variables)
+    if len(data) == 1 and 'otherwise' in data and len(data['otherwise']) == 0:
+        return '\t\t// Not implemented\n'
+    return build_block_body(data, state_variables, function_kind, 2, bag_variables, state_variable_types)
+
+
+def build_block_body(data, state_variables=frozenset(), function_kind='delta_int', indent=2, bag_variables=None, state_variable_types=None):
+    '''
+    Returns the C++ statements of the body of a block: an assignment for each key whose value 
+    is an expression, a loop for each "for message in port.bag()" key, and an if-else structure 
+    (see build_conditional_statements_helper()) for each run of consecutive conditions.
+
+    Args:
+        data (dict):                The DEVSMap dictionary of the body of the block.
+        state_variables (set):      The names of the state variables of the atomic model.
+        function_kind (str):        The DEVSMap function being generated.
+        indent (int):               The number of indentations of the statements.
+        bag_variables (dict):       Optional local variables holding the bag of each input port.
+        state_variable_types (dict):    Optional C++ type of each state variable.
     '''
-    #print(data)
-    #print(list_of_state_variables)
-    conditional_statements = ''
-    if len(data) == 1:
-        data = data['otherwise']
-        if len(data) == 0:
-            return '\t\t// Not implemented\n'
-        for key in data:
-            #print(key)
-            #print(data)
-            conditional_statements += simple_conditional_statement(key, data[key])
-    else:
-        conditional_statements = build_conditional_statements_helper(data)
-    return prefix_states(conditional_statements, list_of_state_variables)
-
-
-def simple_conditional_statement(key, value):
+    INDENT = "\t"
+    statements = []
+    conditions = {}
+    for key, value in data.items():
+        if isinstance(value, dict) and parse_for_each(key) is None:
+            conditions[key] = value
+            continue
+        if conditions:
+            statements.append(build_conditional_statements_helper(conditions, state_variables, function_kind, indent, bag_variables,
+                                                                  state_variable_types))
+            conditions = {}
+        if isinstance(value, dict):
+            statements.append(build_for_each_statement(key, value, state_variables, function_kind, indent, bag_variables, state_variable_types))
+        else:
+            statements.append(INDENT * indent + emit_assignment(key, value, state_variables, function_kind, bag_variables))
+    if conditions:
+        statements.append(build_conditional_statements_helper(conditions, state_variables, function_kind, indent, bag_variables,
+                                                              state_variable_types))
+    return join_fragments(statements)
+
+
+def build_for_each_statement(key, data, state_variables=frozenset(), function_kind='delta_int', indent=2, bag_variables=None,
+                             state_variable_types=None):
     '''
-    Returns an assignment statement in C++ syntax that assigns value to a variable named key.
+    Returns the C++ range-based for loop for a DEVSMap loop over the messages in a bag 
+    ("for message in port.bag()"), whose body is data.
 
     Args:
-        key (str):      The state variable being assigned.
-        value (str):    The value to assign to the state variable.
+        key (str):                  The DEVSMap loop.
+        data (dict):                The DEVSMap dictionary of the body of the loop.
+        state_variables (set):      The names of the state variables of the atomic model.
+        function_kind (str):        The DEVSMap function being generated.
+        indent (int):               The number of indentations of the loop.
+        bag_variables (dict):       Optional local variables holding the bag of each input port.
+        state_variable_types (dict):    Optional C++ type of each state variable.
     '''
-    return '\t\t' + key + ' = ' + value + ';\n'
+    variable, port = parse_for_each(key)
+    if function_kind != 'delta_ext':
+        raise ValueError(f'The bag of port "{port}" is iterated in {function_kind}, but bags can only be used in delta_ext: "{key}"')
+    if variable in state_variables:
+        raise ValueError(f'The loop variable "{variable}" has the same name as a state variable: "{key}"')
+    INDENT = "\t"
+    return join_fragments([INDENT * indent + emit_for_each(key, bag_variables),
+                           build_block_body(data, state_variables, function_kind, indent + 1, bag_variables, state_variable_types),
+                           INDENT * indent + '}\n'])
+
+
+def find_bag_operations(data):
+    '''
+    Returns a tuple (bag_operations, identifiers), where bag_operations holds the set of the 
+    kinds of bag operation (BAG_EMPTY, BAG_SIZE, BAG_ITEM) used on each port, keyed by port 
+    in the order the ports are first used, and identifiers is the set of every other identifier 
+    used in the conditions, loops and assignments of data.  The branches that are removed when 
+    the chains are optimized (see optimize_branches()) are skipped.
+
+    Args:
+        data (dict):    The DEVSMap dictionary of a function (for example, model['delta_ext']).
+    '''
+    bag_operations = {}
+    identifiers = set()
+
+    def find_in_expression(expression):
+        for node in parse_expression(expression):
+            if node[0] in (BAG_EMPTY, BAG_SIZE, BAG_ITEM):
+                bag_operations.setdefault(node[1], set()).add(node[0])
+            elif node[0] == IDENTIFIER:
+                identifiers.add(node[1])
+
+    def find_in_chain(chain):
+        for guards, body in optimize_branches(chain):
+            for guard in guards or []:
+                find_in_expression(guard)
+            find_in_block(body)
+
+    def find_in_block(block):
+        chain = {}
+        for key, value in block.items():
+            if isinstance(value, dict) and parse_for_each(key) is None:
+                chain[key] = value
+                continue
+            find_in_chain(chain)
+            chain = {}
+            for_each = parse_for_each(key)
+            if for_each is not None:
+                identifiers.add(for_each[0])
+                bag_operations.setdefault(for_each[1], set()).add(BAG_ITEM)
+                find_in_block(value)
+            else:
+                identifiers.add(key.strip())
+                find_in_expression(value)
+        find_in_chain(chain)
+
+    find_in_block(data)
+    return bag_operations, identifiers
 
 
 # Recursive function to write conditional blocks based on nested JSON structure
-def build_conditional_statements_helper(data, indent=2):
+def build_conditional_statements_helper(data, state_variables=frozenset(), function_kind='delta_int', indent=2, bag_variables=None,
+                                        state_variable_types=None):
     '''
     Helper function for build_conditional_statements().  This function generates the if-else 
-    structures, and handles indentation.
+    structures, and handles indentation.  The chain is first optimized (see optimize_branches()): 
+    constant conditions are folded, branches with the same body are merged, and empty "otherwise" 
+    branches are removed.  A chain that compares an integer or enum state variable to constants 
+    is emitted as a switch (see find_switch()).
 
     Args:
-        data (dict):    The DEVSMap dictionary containing the conditions as keys, 
-                        and the execution instructions as values, to be converted 
-                        to an if-else C++ structure.
-        indent (int):   The number of initial indentations.  In our case, the default is 2, 
-                        because we assume in an atomic model we are working within a function 
-                        (indent #1), that is within a class definition (indent #2).
+        data (dict):                The DEVSMap dictionary containing the conditions as keys, 
+                                    and the execution instructions as values, to be converted 
+                                    to an if-else C++ structure.
+        state_variables (set):      The names of the state variables of the atomic model.
+        function_kind (str):        The DEVSMap function being generated.
+        indent (int):               The number of initial indentations.  In our case, the default is 2, 
+                                    because we assume in an atomic model we are working within a function 
+                                    (indent #1), that is within a class definition (indent #2).
+        bag_variables (dict):       Optional local variables holding the bag of each input port.
+        state_variable_types (dict):    Optional C++ type of each state variable, used to find the 
+                                        chains that can be emitted as a switch.
     '''
-    conditions = ''
     INDENT = "\t"  # Tab character used for indentation
-    keys = list(data.keys())
+    branches = optimize_branches(data)
+    if not branches:
+        return ''
+    if branches[0][0] is None:
+        # Only the "otherwise" branch is left, so its body is not nested in an if-else structure.
+        return build_block_body(branches[0][1], state_variables, function_kind, indent, bag_variables, state_variable_types)
 
-    for i, key in enumerate(keys):
-        value = data[key]
-        is_last = (i == len(keys) - 1)
-        is_otherwise = (key == "otherwise")
+    switch = find_switch(branches, state_variable_types)
+    if switch is not None:
+        return build_switch_statement(switch, state_variables, function_kind, indent, bag_variables, state_variable_types)
 
+    conditions = []
+    for i, (guards, body) in enumerate(branches):
         # Write the condition header
-        if is_otherwise:
-            conditions += 'else {\n'  # Special case for "otherwise" treated as "else"
-        elif i == 0:
-            conditions += INDENT * indent + 'if (' + key + ') {\n'  # First condition: "if"
+        if guards is None:
+            conditions.append('else {\n')  # Special case for "otherwise" treated as "else"
         else:
-            conditions +='else if (' + key + ') {\n'  # Subsequent conditions: "else if"
-
-        # Write the body of the block
-        if isinstance(value, dict):
-            # If all values are non-dictionaries, write assignments
-            if all(not isinstance(v, dict) for v in value.values()):
-                for var, expr in value.items():
-                    conditions += INDENT * (indent + 1) + var + ' = ' + expr +';\n'
+            condition = emit_guards(guards, state_variables, function_kind, bag_variables)
+            if i == 0:
+                conditions.append(INDENT * indent + 'if (' + condition + ') {\n')  # First condition: "if"
             else:
-                # Otherwise, recursively handle nested conditions
-                conditions += write_conditions(value, indent + 1)
-        else:
-            # Single assignment if value is not a dict
-            conditions += INDENT * (indent + 1) + key + ' = ' + value + ';\n'
-
-        # Write the block closing brace
-        if i < len(keys) - 1:
-            next_key = keys[i + 1]
-            # If another block follows (assumed to be an "else"/"else if"), keep closing brace on same line
-            if next_key == "otherwise" or True:  # Always true: forces inline formatting
-                conditions += INDENT * indent + '} '
-            else:
-                conditions += INDENT * indent + '}\n'  # Default to newline
+                conditions.append('else if (' + condition + ') {\n')  # Subsequent conditions: "else if"
+
+        # Write the body of the block (assignments, loops over bags, and nested conditions)
+        conditions.append(build_block_body(body, state_variables, function_kind, indent + 1, bag_variables, state_variable_types))
+
+        # Write the block closing brace, on the same line as the next "else" or "else if"
+        if i < len(branches) - 1:
+            conditions.append(INDENT * indent + '} ')
         else:
-            # Last block: close normally
-            conditions += INDENT * indent + '}\n'
-            #Remove the else block if it is empty
-            conditions = conditions.replace(' else {\n\t\t}\n', '\n')
-            return conditions
\ No newline at end of file
+            conditions.append(INDENT * indent + '}\n')
+    return join_fragments(conditions)
+
+
+def build_switch_statement(switch, state_variables=frozenset(), function_kind='delta_int', indent=2, bag_variables=None,
+                           state_variable_types=None):
+    '''
+    Returns a C++ switch statement for a chain that compares a state variable to constants.
+
+    Args:
+        switch (tuple):             The tuple (variable, cases, default) returned by find_switch().
+        state_variables (set):      The names of the state variables of the atomic model.
+        function_kind (str):        The DEVSMap function being generated.
+        indent (int):               The number of indentations of the switch.
+        bag_variables (dict):       Optional local variables holding the bag of each input port.
+        state_variable_types (dict):    Optional C++ type of each state variable.
+    '''
+    INDENT = "\t"
+    variable, cases, default = switch
+    statements = [INDENT * indent + 'switch (' + emit_condition(variable, state_variables, function_kind, bag_variables) + ') {\n']
+    for constants, body in cases:
+        statements.extend(INDENT * (indent + 1) + 'case ' + constant + ':\n' for constant in constants)
+        statements.append(build_block_body(body, state_variables, function_kind, indent + 2, bag_variables, state_variable_types))
+        statements.append(INDENT * (indent + 2) + 'break;\n')
+    if default:
+        statements.append(INDENT * (indent + 1) + 'default:\n')
+        statements.append(build_block_body(default, state_variables, function_kind, indent + 2, bag_variables, state_variable_types))
+        statements.append(INDENT * (indent + 2) + 'break;\n')
+    statements.append(INDENT * indent + '}\n')
+    return join_fragments(statements)
+
+
+def emit_guards(guards, state_variables=frozenset(), function_kind='delta_int', bag_variables=None):
+    '''
+    Returns the C++ condition of a branch selected by any of guards (the conditions of the 
+    branches that were merged by optimize_branches()).
+
+    Args:
+        guards (list):              The DEVSMap conditions of the branch.
+        state_variables (set):      The names of the state variables of the atomic model.
+        function_kind (str):        The DEVSMap function being generated.
+        bag_variables (dict):       Optional local variables holding the bag of each input port.
+    '''
+    if len(guards) == 1:
+        return emit_condition(guards[0], state_variables, function_kind, bag_variables)
+    return ' || '.join('(' + emit_condition(guard, state_variables, function_kind, bag_variables) + ')' for guard in guards)
@@ -0,0 +1,197 @@
+# Functions for indexing the DEVSMap init states.
+#
+# The init_state file nests the initial values of every atomic model instance under the
+# ids used in the "components" of the coupled models, starting from the top model.  For
+# example, the initial values of the component "counter_model" of the coupled model
+# "counter_system" are found at init_states['counter_system']['counter_model'].
+#
+# The index is built once per generation, so that finding the initial values of an
+# atomic model is a dictionary lookup instead of a walk over the whole init_states tree.
+
+from generate_simple_statements import get_run_settings
+
+
+def index_init_states(data):
+    '''
+    Returns an index of the init states, with the following keys:
+        'by_path':  The initial values of each instance, keyed by the tuple of component ids
+                    leading to it (for example, ('counter_system', 'counter_model')).
+        'by_model': The list of instance paths of each atomic model, keyed by the atomic model
+                    name, in the order they are found in the coupled models.
+        'by_shape': The initial values of the first instance found with each set of state
+                    variable names, for atomic models that are not a component of any coupled model.
+        'by_component': The list of instance paths of each component, keyed by the tuple 
+                    (coupled model name, component id), in the order they are found.
+        'sweep':    The index of the init states of each sweep point of the experiment (see 
+                    get_run_settings()), with the same keys except 'sweep'.  The init states of 
+                    a sweep point are those of the init_state file, overridden by the sweep point 
+                    (see merge_init_states()).  Empty if the experiment has no sweep.
+
+    Args:
+        data (dict):    The DEVSMap json data that has been sorted into a dictionary.
+    '''
+    init_states = data['init_states'] or {}
+    by_path, by_shape = index_init_state_values(init_states)
+    by_model, by_component = index_component_instances(data)
+
+    sweep = []
+    for sweep_point in get_run_settings(data.get('experiment') or {})['sweep']:
+        sweep_by_path, sweep_by_shape = index_init_state_values(merge_init_states(init_states, sweep_point))
+        sweep.append({'by_path': sweep_by_path,
+                      'by_model': by_model,
+                      'by_shape': sweep_by_shape,
+                      'by_component': by_component})
+    return {'by_path': by_path,
+            'by_model': by_model,
+            'by_shape': by_shape,
+            'by_component': by_component,
+            'sweep': sweep}
+
+
+def index_init_state_values(init_states):
+    '''
+    Returns a tuple (by_path, by_shape) with the initial values of each instance in init_states, 
+    keyed by instance path and by set of state variable names (see index_init_states()).
+
+    Args:
+        init_states (dict):     The DEVSMap init states.
+    '''
+    by_path = {}
+    by_shape = {}
+
+    def index_values(obj, path):
+        if isinstance(obj, dict):
+            if obj and all(not isinstance(value, (dict, list)) for value in obj.values()):
+                by_path[path] = obj
+                by_shape.setdefault(frozenset(obj.keys()), obj)
+                return
+            for key, value in obj.items():
+                index_values(value, path + (key,))
+        elif isinstance(obj, list):
+            for item in obj:
+                index_values(item, path)
+
+    index_values(init_states, ())
+    return by_path, by_shape
+
+
+def merge_init_states(init_states, overrides):
+    '''
+    Returns a copy of init_states in which the values found in overrides replace those at the 
+    same place.  The dictionaries are merged recursively, so a sweep point only needs to give 
+    the values it changes (for example, {"counter_system": {"counter_model": {"increment": 2}}}).
+
+    Args:
+        init_states (dict):     The DEVSMap init states.
+        overrides (dict):       The init states to merge into init_states.
+    '''
+    merged = dict(init_states)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_init_states(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def index_component_instances(data):
+    '''
+    Returns a tuple (by_model, by_component), where by_model holds the list of instance paths 
+    of each atomic model, keyed by the atomic model name, and by_component holds the list of 
+    instance paths of each component of a coupled model, keyed by the tuple (coupled model name, 
+    component id).  The paths start at the coupled models that are not a component of another 
+    coupled model.
+
+    Args:
+        data (dict):    The DEVSMap json data that has been sorted into a dictionary.
+    '''
+    coupled_models = {}
+    for coupled_model_data in data['coupled_models']:
+        coupled_model_name = list(coupled_model_data.keys())[0]
+        coupled_models[coupled_model_name] = coupled_model_data[coupled_model_name]
+    atomic_model_names = {list(atomic_model_data.keys())[0] for atomic_model_data in data['atomic_models']}
+
+    component_model_names = set()
+    for coupled_model in coupled_models.values():
+        component_model_names.update(coupled_model.get('components', {}).keys())
+
+    by_model = {}
+    by_component = {}
+
+    def index_components(coupled_model_name, path, ancestors):
+        components = coupled_models[coupled_model_name].get('components', {})
+        for model_name, model_id in components.items():
+            component_path = path + (model_id,)
+            by_component.setdefault((coupled_model_name, model_id), []).append(component_path)
+            if model_name in coupled_models and model_name not in ancestors:
+                index_components(model_name, component_path, ancestors | {model_name})
+            elif model_name in atomic_model_names:
+                by_model.setdefault(model_name, []).append(component_path)
+
+    for coupled_model_name in coupled_models:
+        if coupled_model_name not in component_model_names:
+            index_components(coupled_model_name, (coupled_model_name,), {coupled_model_name})
+    return by_model, by_component
+
+
+def find_initialization_values_for_model(init_state_index, atomic_model_name, state_variable_names):
+    '''
+    Returns the initialization values of each state variable for an atomic model.  The values
+    of the first instance of the atomic model in the coupled models are used.  If the atomic
+    model is not a component of any coupled model, the first instance in the init states with
+    the same state variable names is used.
+
+    Args:
+        init_state_index (dict):            The index of the init states, returned by index_init_states(data).
+        atomic_model_name (str):            The name of the atomic model being generated.
+        state_variable_names (dict_keys):   The names of all state variables for the atomic model
+                                            being generated. Given by model['s'].keys().
+    '''
+    for instance_path in init_state_index['by_model'].get(atomic_model_name, []):
+        initialization_values = init_state_index['by_path'].get(instance_path)
+        if initialization_values is not None:
+            return initialization_values
+    initialization_values = init_state_index['by_shape'].get(frozenset(state_variable_names))
+    if initialization_values is None:
+        raise ValueError(f'No init states were found for the atomic model "{atomic_model_name}".')
+    return initialization_values
+
+
+def find_initialization_values_for_instance(init_state_index, instance_paths):
+    '''
+    Returns the initialization values of the first of instance_paths found in the init states,
+    or None if none of them is found.
+
+    Args:
+        init_state_index (dict):    The index of the init states, returned by index_init_states(data).
+        instance_paths (list):      The instance paths of an atomic model instance (see index_init_states()).
+    '''
+    for instance_path in instance_paths:
+        initialization_values = init_state_index['by_path'].get(instance_path)
+        if initialization_values is not None:
+            return initialization_values
+    return None
+
+
+def find_reused_atomic_models(init_state_index):
+    '''
+    Returns the set of the names of the atomic models whose instances have different
+    initialization values, or whose initialization values change between the sweep points.  
+    The state struct of these models takes the initial values as constructor arguments, 
+    which each coupled model passes to its instances.
+
+    Args:
+        init_state_index (dict):    The index of the init states, returned by index_init_states(data).
+    '''
+    reused_atomic_models = set()
+    by_paths = [init_state_index['by_path']] + [sweep_index['by_path'] for sweep_index in init_state_index.get('sweep', [])]
+    for atomic_model_name, instance_paths in init_state_index['by_model'].items():
+        distinct_values = set()
+        for instance_path in instance_paths:
+            for by_path in by_paths:
+                initialization_values = by_path.get(instance_path)
+                if initialization_values is not None:
+                    distinct_values.add(tuple(sorted(initialization_values.items())))
+        if len(distinct_values) > 1:
+            reused_atomic_models.add(atomic_model_name)
+    return reused_atomic_models
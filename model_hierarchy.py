@@ -0,0 +1,83 @@
+# Functions for ordering the hierarchy of the DEVSMap models.
+#
+# The "components" of the coupled models form a directed acyclic graph (DAG) of model
+# definitions: a subsystem used by several coupled models, at different depths, is a single
+# node of the graph, however many instances of it the simulation has.  Each definition is
+# therefore generated once, in topological order (the components of a coupled model before
+# the coupled model), and the work done for a coupled model (for example, flattening it, see
+# flatten_hierarchy.py) is done once and reused by every coupled model that contains it.
+#
+# A coupled model that contains itself, directly or through its components, cannot be
+# generated (its C++ struct would have to include itself), so the cycles are reported.
+
+
+def get_coupled_models(data):
+    '''
+    Returns the data of each coupled model, keyed by coupled model name, in the order of the
+    DEVSMap data.
+
+    Args:
+        data (dict):    The DEVSMap json data that has been sorted into a dictionary.
+    '''
+    coupled_models = {}
+    for coupled_model_data in data['coupled_models']:
+        coupled_model_name = list(coupled_model_data.keys())[0]
+        coupled_models[coupled_model_name] = coupled_model_data[coupled_model_name]
+    return coupled_models
+
+
+def find_topological_order(component_models):
+    '''
+    Returns a tuple (order, cycle), where order is the list of the coupled model names in
+    topological order (every coupled model comes after the coupled models of its components),
+    and cycle is None, or the list of the coupled model names of the first cycle found,
+    starting and ending with the same name (for example, ['a', 'b', 'a']).  When there is a
+    cycle, order is incomplete.  The graph is walked iteratively, so deep hierarchies do not
+    exhaust the Python stack, and each model and component is visited once.
+
+    Args:
+        component_models (dict):    The model names of the components of each coupled model,
+                                    keyed by coupled model name.  The components that are not
+                                    coupled models (the atomic models) are ignored.
+    '''
+    VISITING, VISITED = 1, 2
+    states = {}
+    order = []
+    for root_name in component_models:
+        if root_name in states:
+            continue
+        states[root_name] = VISITING
+        path = [root_name]
+        stack = [iter(component_models[root_name])]
+        while stack:
+            for model_name in stack[-1]:
+                if model_name not in component_models:
+                    continue
+                if states.get(model_name) == VISITING:
+                    return order, path[path.index(model_name):] + [model_name]
+                if model_name not in states:
+                    states[model_name] = VISITING
+                    path.append(model_name)
+                    stack.append(iter(component_models[model_name]))
+                    break
+            else:
+                stack.pop()
+                states[path[-1]] = VISITED
+                order.append(path.pop())
+    return order, None
+
+
+def order_coupled_models(coupled_models):
+    '''
+    Returns the list of the coupled model names in topological order (see find_topological_order()).
+
+    Raises a ValueError if a coupled model contains itself.
+
+    Args:
+        coupled_models (dict):  The data of each coupled model, keyed by coupled model name.
+    '''
+    order, cycle = find_topological_order({coupled_model_name: coupled_model.get('components', {})
+                                           for coupled_model_name, coupled_model in coupled_models.items()})
+    if cycle is not None:
+        raise ValueError(f'The coupled model "{cycle[0]}" contains itself: {" -> ".join(cycle)}.')
+    return order
@@ -0,0 +1,33 @@
+#include "include/devsmap_random.hpp"
+#include "cadmium/simulation/root_coordinator.hpp"
+#include <limits>
+#include "include/counter_system.hpp"
+
+#ifndef NO_LOGGING
+	#include "cadmium/simulation/logger/stdout.hpp"
+#endif
+
+using namespace cadmium;
+
+extern "C" {
+
+	 int main() {
+		DevsmapRandom::startRun(0ULL);
+
+		std::shared_ptr<counter_system> model = std::make_shared<counter_system>("counter_system");
+
+		auto rootCoordinator = cadmium::RootCoordinator(model);
+
+		#ifndef NO_LOGGING
+			rootCoordinator.setLogger<cadmium::STDOUTLogger>(";");
+		#endif
+
+		rootCoordinator.start();
+
+		rootCoordinator.simulate(50.0);
+
+		rootCoordinator.stop();
+
+		return 0;
+	}
+}
\ No newline at end of file
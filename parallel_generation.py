@@ -0,0 +1,93 @@
+# Functions for generating the code of many independent models across a pool of
+# worker processes.
+#
+# Once the init states are resolved, every atomic and coupled model can be generated
+# independently of the others, so the generation of the C++ code is fanned out to
+# worker processes.  Writing the files stays in the main process, in the original
+# order of the models, so the output is identical to a serial run.
+
+import math
+import os
+from functools import partial
+
+from pipeline_instrumentation import measure_call
+
+
+def get_number_of_jobs(jobs):
+    '''
+    Returns the number of worker processes to use.
+
+    Args:
+        jobs (int):     The requested number of worker processes.  0 or None uses one
+                        worker per CPU, and 1 generates serially in the current process.
+    '''
+    if not jobs:
+        return os.cpu_count() or 1
+    return max(1, jobs)
+
+
+def generate_code_in_parallel(generate_code, list_of_arguments, jobs=1, shared_arguments=(), measurements=None):
+    '''
+    Returns a list with the result of generate_code(*shared_arguments, *arguments) for each
+    arguments tuple in list_of_arguments, in the same order as list_of_arguments.
+
+    The calls are distributed over a pool of worker processes when more than one job is
+    requested.  If there is only one job, only one model, or worker processes cannot be
+    started on this platform, the code is generated serially.
+
+    Args:
+        generate_code (func):       A module level function that returns the code of one model
+                                    (for example, generate_atomic_model_code).
+        list_of_arguments (list):   A list of argument tuples, one per model to generate.
+        jobs (int):                 The requested number of worker processes (see get_number_of_jobs()).
+        shared_arguments (tuple):   Arguments common to every call (for example, the init states).
+                                    These are sent once per chunk of models instead of once per model.
+        measurements (list):        Optional list, to which the measurement of each call (see 
+                                    pipeline_instrumentation.measure_call()) is appended, in order. 
+                                    Each measurement is named after the first string in its arguments.
+    '''
+    function = partial(generate_code, *shared_arguments)
+    if measurements is not None:
+        function = partial(_measure_call_with_arguments, function)
+    number_of_jobs = min(get_number_of_jobs(jobs), len(list_of_arguments))
+    if number_of_jobs <= 1:
+        results = [function(*arguments) for arguments in list_of_arguments]
+    else:
+        # A few chunks per worker keeps the workers busy when the model sizes are uneven,
+        # without paying the inter-process overhead for every single model.
+        chunksize = max(1, math.ceil(len(list_of_arguments) / (number_of_jobs * 4)))
+        # The process pool is only imported when it is used, since importing it (and
+        # multiprocessing) costs more than generating a small project serially.
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+        try:
+            with ProcessPoolExecutor(max_workers=number_of_jobs) as executor:
+                results = list(executor.map(_call_with_arguments,
+                                            [function] * len(list_of_arguments),
+                                            list_of_arguments,
+                                            chunksize=chunksize))
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            print(f"Parallel generation is unavailable ({e}), generating serially.")
+            results = [function(*arguments) for arguments in list_of_arguments]
+
+    if measurements is None:
+        return results
+    measurements.extend(measurement for _, measurement in results)
+    return [result for result, _ in results]
+
+
+def _call_with_arguments(function, arguments):
+    '''
+    Calls function with the tuple of arguments.  This must be a module level function so
+    that it can be sent to the worker processes.
+    '''
+    return function(*arguments)
+
+
+def _measure_call_with_arguments(function, *arguments):
+    '''
+    Calls function with arguments, and returns the result together with its measurement.
+    The model name is the first argument that is a string.
+    '''
+    name = next((argument for argument in arguments if isinstance(argument, str)), '')
+    return measure_call(name, function, *arguments)
@@ -6,8 +6,62 @@
 import json
 import os
 import glob
+import time
 
-def check_file_counts(directory):
+# Use a faster JSON decoder when one is installed, and fall back to the standard 
+# library otherwise.  Both decode from bytes, and both raise a subclass of ValueError 
+# on invalid JSON (json.JSONDecodeError is itself a subclass of ValueError).
+try:
+    import orjson
+    json_loads = orjson.loads
+    JSON_DECODER = 'orjson'
+except ImportError:
+    json_loads = json.loads
+    JSON_DECODER = 'json'
+
+# The DEVSMap file types, keyed by the suffix of the filename.
+FILE_TYPE_SUFFIXES = {'_atomic.json': 'atomic',
+                      '_coupled.json': 'coupled',
+                      '_experiment.json': 'experiment',
+                      '_init_state.json': 'state',
+                      '_definition.json': 'definition',
+                      '_param.json': 'param',
+                      '_metadata.json': 'metadata'}
+
+
+def classify_json_filename(filename):
+    '''
+    Returns the DEVSMap file type of filename (the last word of the filename before ".json", 
+    for example "atomic" for "counter_atomic.json", or "state" for "XYZ_init_state.json").
+
+    Args:
+        filename (str):     The name of the json file.
+    '''
+    for suffix, file_type in FILE_TYPE_SUFFIXES.items():
+        if filename.endswith(suffix):
+            return file_type
+    return filename.removesuffix('.json').split('_')[-1]
+
+
+def scan_json_directory(directory):
+    '''
+    Returns a dictionary of the json files in directory, where the keys are the filenames and 
+    the values are the DEVSMap file type of each file (see classify_json_filename()).  The 
+    directory is scanned once, and the result can be passed to check_file_counts(), 
+    read_json_files() and sort_json_files() so they do not list the directory again.
+
+    Args:
+        directory (str):    The directory where the json files are located.
+    '''
+    json_files = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json') and entry.is_file():
+                json_files[entry.name] = classify_json_filename(entry.name)
+    return dict(sorted(json_files.items()))
+
+
+def check_file_counts(directory, json_files=None):
     '''
     Returns true if the file counts are valid based on the DEVSMap specification.
     This means that there is at least one atomic model, at least one coupled model, 
@@ -15,28 +69,13 @@ def check_file_counts(directory):
 
     Args:
         directory (str):    The directory where the json files are located.
+        json_files (dict):  Optional result of scan_json_directory(directory), to avoid 
+                            scanning the directory again.
     '''
-    # One or more required
-    has_atomic = False
-    has_coupled = False
-    # Specific number required
-    experiment_filecount = 0
-    init_states_filecount = 0
-
-    for filename in os.listdir(directory):
-        full_path = os.path.join(directory, filename)
-        if os.path.isfile(full_path):
-
-            if filename.endswith("_atomic.json"):
-                has_atomic = True
-            if filename.endswith("_coupled.json"):
-                has_coupled = True
-            if filename.endswith("_experiment.json"):
-                experiment_filecount += 1
-            if filename.endswith("_init_state.json"):
-                init_states_filecount += 1
+    if json_files is None:
+        json_files = scan_json_directory(directory)
 
-    valid_fileset = has_atomic and has_coupled and experiment_filecount == 1 and init_states_filecount == 1
+    valid_fileset = is_valid_fileset(json_files)
 
     if not valid_fileset:
         #TODO handle this case after working on GUI
@@ -45,7 +84,37 @@ def check_file_counts(directory):
     return valid_fileset
 
 
-def clean_output_directory(main_directory, include_directory='include'):
+def is_valid_fileset(json_files):
+    '''
+    Returns true if the file counts are valid based on the DEVSMap specification (see 
+    check_file_counts()), without printing anything.
+
+    Args:
+        json_files (dict):  The DEVSMap file type of each json file, keyed by filename.
+    '''
+    file_types = list(json_files.values())
+    
+    # One or more required
+    has_atomic = 'atomic' in file_types
+    has_coupled = 'coupled' in file_types
+    # Specific number required
+    experiment_filecount = file_types.count('experiment')
+    init_states_filecount = sum(1 for filename in json_files if filename.endswith('_init_state.json'))
+
+    return has_atomic and has_coupled and experiment_filecount == 1 and init_states_filecount == 1
+
+
+def clean_output_directory(main_directory, include_directory='include', source_patterns=()):
+    '''
+    Deletes the generated main.cpp, the other generated sources and the .hpp files of the
+    Cadmium project.
+
+    Args:
+        main_directory (str):       The "main" directory of the Cadmium project.
+        include_directory (str):    The subdirectory of main_directory with the .hpp files.
+        source_patterns (list):     The glob patterns of the other generated sources in main_directory
+                                    (for example, the unity chunks).
+    '''
     main_cpp_path = os.path.join(main_directory, 'main.cpp')
     
     # Delete main.cpp
@@ -55,6 +124,12 @@ def clean_output_directory(main_directory, include_directory='include'):
     else:
         print("main.cpp not found.")
 
+    # Delete the other generated sources
+    for source_pattern in source_patterns:
+        for source in glob.glob(os.path.join(main_directory, source_pattern)):
+            os.remove(source)
+            print("Deleted: " + source)
+
     # Change this if there is ever a need for embedded systems with 
     # a different file structure
     include_path = os.path.join(main_directory, include_directory)
@@ -69,27 +144,229 @@ def clean_output_directory(main_directory, include_directory='include'):
         print("Subdirectory '" + include_directory +"' not found.")
 
 
-def read_json_files(directory):
+def read_json_files(directory, json_files=None, jobs=None, file_report=None):
     '''
-    Returns the raw data read in from the DEVSMap json files as a dictionary.
+    Returns the raw data read in from the DEVSMap json files as a dictionary.  The files are 
+    read and parsed concurrently on a pool of threads.
 
     Args:
-        directory (str):    The directory where the json files are located.
+        directory (str):        The directory where the json files are located.
+        json_files (dict):      Optional result of scan_json_directory(directory), to avoid 
+                                scanning the directory again.
+        jobs (int):             The number of threads used to read the files.  None uses the 
+                                default of ThreadPoolExecutor, and 1 reads the files serially.
+        file_report (list):     Optional list, to which a dictionary with the filename, the 
+                                number of bytes and the parse time in seconds is appended for 
+                                each file (see print_file_report()).
     '''
+    if json_files is None:
+        json_files = scan_json_directory(directory)
+    filenames = list(json_files)
+    file_paths = [os.path.join(directory, filename) for filename in filenames]
+
+    if jobs == 1 or len(filenames) <= 1:
+        results = [read_json_file(file_path) for file_path in file_paths]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(read_json_file, file_paths))
+
     temp_data = {}
-    for filename in os.listdir(directory):
-        if filename.endswith(".json"):
-            file_path = os.path.join(directory, filename)
-            with open(file_path, 'r') as file:
-                try: 
-                    data = json.load(file)
-                    temp_data[filename] = data
-                except json.JSONDecodeError as e:
-                    print(f"Error decoding JSON in file {filename}: {e}")
+    for filename, (data, number_of_bytes, seconds, error) in zip(filenames, results):
+        if error is not None:
+            print(f"Error decoding JSON in file {filename}: {error}")
+        else:
+            temp_data[filename] = data
+        if file_report is not None:
+            file_report.append({'file': filename, 'bytes': number_of_bytes, 'seconds': seconds})
     return temp_data
 
 
-def sort_json_files(json_data):
+def read_json_file(file_path):
+    '''
+    Returns a tuple (data, number_of_bytes, seconds, error) for the json file at file_path, 
+    where seconds is the time taken to read and parse the file.  If the file is not valid 
+    JSON, data is None and error is the decoding error.
+
+    Args:
+        file_path (str):    The path of the json file.
+    '''
+    start_time = time.perf_counter()
+    with open(file_path, 'rb') as file:
+        content = file.read()
+    try:
+        data = json_loads(content)
+        error = None
+    except ValueError as e:
+        data = None
+        error = e
+    return data, len(content), time.perf_counter() - start_time, error
+
+
+def print_file_report(file_report):
+    '''
+    Prints the number of bytes and the parse time of each json file, and the totals.
+
+    Args:
+        file_report (list):     The file report filled in by read_json_files().
+    '''
+    total_bytes = sum(entry['bytes'] for entry in file_report)
+    total_seconds = sum(entry['seconds'] for entry in file_report)
+    print(f"Read {len(file_report)} json files ({total_bytes} bytes) in {total_seconds * 1000:.2f} ms using {JSON_DECODER}:")
+    for entry in sorted(file_report, key=lambda entry: entry['seconds'], reverse=True):
+        print(f"\t{entry['file']}: {entry['bytes']} bytes, {entry['seconds'] * 1000:.3f} ms")
+
+
+def read_reachable_json_files(directory, json_files=None, jobs=None, file_report=None):
+    '''
+    Returns a tuple (raw_data, skipped_files), where raw_data is the raw data of the DEVSMap json 
+    files that are needed by the experiment (as returned by read_json_files()), and skipped_files 
+    is the list of model files that were not read because they are not reachable from the 
+    experiment's model_under_test.
+
+    The experiment file is read first, then the model under test, and then the components of 
+    each coupled model, one level of the hierarchy at a time.  The file of a component is found 
+    by the DEVSMap naming convention ("name_coupled.json" or "name_atomic.json").  If a component 
+    does not follow the convention, the remaining model files are read to find it.  All of the 
+    files that are not models (experiment, init_state, etc.) are always read.
+
+    Args:
+        directory (str):        The directory where the json files are located.
+        json_files (dict):      Optional result of scan_json_directory(directory).
+        jobs (int):             The number of threads used to read the files (see read_json_files()).
+        file_report (list):     Optional list to fill in with the size and parse time of each file.
+    '''
+    if json_files is None:
+        json_files = scan_json_directory(directory)
+    model_files = {filename: file_type for filename, file_type in json_files.items() if file_type in ('atomic', 'coupled')}
+    other_files = {filename: file_type for filename, file_type in json_files.items() if filename not in model_files}
+
+    raw_data = read_json_files(directory, other_files, jobs, file_report)
+    experiments = [raw_data[filename] for filename, file_type in other_files.items() if file_type == 'experiment' and filename in raw_data]
+    top_model_filename = experiments[0]['model_under_test']['model'] if len(experiments) == 1 else None
+    if top_model_filename not in model_files:
+        print(f"The model under test {top_model_filename} was not found, reading every model file.")
+        raw_data.update(read_json_files(directory, model_files, jobs, file_report))
+        return raw_data, []
+
+    # The model files that do not follow the naming convention are read (once) only if 
+    # a component cannot be found by its filename.
+    unconventional_files = None
+    visited = {top_model_filename}
+    frontier = [top_model_filename]
+    while frontier:
+        unread_files = {filename: model_files[filename] for filename in frontier if filename not in raw_data}
+        raw_data.update(read_json_files(directory, unread_files, jobs, file_report))
+        next_frontier = []
+        for filename in frontier:
+            if model_files[filename] != 'coupled' or filename not in raw_data:
+                continue
+            for component_name in get_component_names(raw_data[filename]):
+                component_filename = find_model_filename(component_name, model_files)
+                if component_filename is None:
+                    if unconventional_files is None:
+                        unconventional_files = read_json_files(directory, {name: model_files[name] for name in model_files if name not in raw_data}, jobs, file_report)
+                        raw_data.update(unconventional_files)
+                    component_filename = find_model_filename(component_name, model_files, unconventional_files)
+                if component_filename is None:
+                    print(f"The component model {component_name} of {filename} was not found.")
+                elif component_filename not in visited:
+                    visited.add(component_filename)
+                    next_frontier.append(component_filename)
+        frontier = next_frontier
+
+    skipped_files = [filename for filename in model_files if filename not in visited]
+    for filename in skipped_files:
+        raw_data.pop(filename, None)
+    return raw_data, skipped_files
+
+
+def find_reachable_model_files(raw_data, json_files):
+    '''
+    Returns the set of model files in raw_data that are reachable from the experiment's 
+    model_under_test, following the components of the coupled models, or None if the 
+    model under test is not in raw_data.  This is the in-memory counterpart of 
+    read_reachable_json_files(), for json files that have already been read.
+
+    Args:
+        raw_data (dict):    The raw data of the DEVSMap json files, keyed by filename.
+        json_files (dict):  The DEVSMap file type of each file, keyed by filename.
+    '''
+    model_files = {filename: file_type for filename, file_type in json_files.items() if file_type in ('atomic', 'coupled') and filename in raw_data}
+    experiments = [raw_data[filename] for filename, file_type in json_files.items() if file_type == 'experiment' and filename in raw_data]
+    top_model_filename = experiments[0]['model_under_test']['model'] if len(experiments) == 1 else None
+    if top_model_filename not in model_files:
+        return None
+
+    model_data = {filename: raw_data[filename] for filename in model_files}
+    visited = {top_model_filename}
+    frontier = [top_model_filename]
+    while frontier:
+        filename = frontier.pop()
+        if model_files[filename] != 'coupled':
+            continue
+        for component_name in get_component_names(raw_data[filename]):
+            component_filename = find_model_filename(component_name, model_files, model_data)
+            if component_filename is not None and component_filename not in visited:
+                visited.add(component_filename)
+                frontier.append(component_filename)
+    return visited
+
+
+def select_reachable_json_data(raw_data, json_files):
+    '''
+    Returns raw_data without the model files that are not reachable from the experiment's 
+    model_under_test (see find_reachable_model_files()).  Every model file is kept if the 
+    model under test is not in raw_data.
+
+    Args:
+        raw_data (dict):    The raw data of the DEVSMap json files, keyed by filename.
+        json_files (dict):  The DEVSMap file type of each file, keyed by filename.
+    '''
+    reachable_model_files = find_reachable_model_files(raw_data, json_files)
+    if reachable_model_files is None:
+        return raw_data
+    return {filename: file_data for filename, file_data in raw_data.items()
+            if json_files[filename] not in ('atomic', 'coupled') or filename in reachable_model_files}
+
+
+def get_component_names(coupled_model_file):
+    '''
+    Returns the names of the component models of the coupled model defined in a 
+    coupled.json file.
+
+    Args:
+        coupled_model_file (dict):  The raw data of the coupled.json file.
+    '''
+    component_names = []
+    for model in coupled_model_file.values():
+        if isinstance(model, dict):
+            component_names.extend(model.get('components', {}))
+    return component_names
+
+
+def find_model_filename(model_name, model_files, model_data=None):
+    '''
+    Returns the name of the json file that defines the model model_name, or None if it is 
+    not found.  Files that follow the naming convention ("name_coupled.json" or 
+    "name_atomic.json") are found by name, and otherwise the already read model_data is 
+    searched.
+
+    Args:
+        model_name (str):       The name of the atomic or coupled model.
+        model_files (dict):     The atomic and coupled model files from scan_json_directory().
+        model_data (dict):      Optional raw data of model files, keyed by filename.
+    '''
+    for filename in (model_name + '_coupled.json', model_name + '_atomic.json'):
+        if filename in model_files:
+            return filename
+    for filename, data in (model_data or {}).items():
+        if model_name in data:
+            return filename
+    return None
+
+
+def sort_json_files(json_data, json_files=None):
     '''
     Returns a dictionary of DEVSMap data sorted by the filename suffix 
     (the type of DEVSMap file).
@@ -97,6 +374,8 @@ def sort_json_files(json_data):
     Args:
         json_data (dict):   The raw data read in from the DEVSMap json files. This data is 
                             obtained via the read_json_files(directory) function.
+        json_files (dict):  Optional result of scan_json_directory(directory), which already 
+                            holds the file type of each file.
     '''
     data = {'atomic_models': [],    # 1 or more atomic models
             'coupled_models': [],   # 1 or more coupled models
@@ -106,8 +385,10 @@ def sort_json_files(json_data):
             'param': None,          # 0 or 1 param files
             'metadata': None}       # 0 or 1 metadata files #TODO
     for key in json_data:
-        words = key.split('_')
-        file_type = words[len(words) - 1].split('.')[0]
+        if json_files is not None and key in json_files:
+            file_type = json_files[key]
+        else:
+            file_type = classify_json_filename(key)
         match file_type:
             case "atomic":
                 data["atomic_models"].append(json_data[key])
@@ -0,0 +1,197 @@
+# Functions for the optional instrumentation of the generation pipeline.
+#
+# When instrumentation is enabled, the wall time, CPU time and peak memory allocated by
+# Python (traced with tracemalloc) are recorded for each stage of the pipeline and for
+# each model generated.  The measurements are written as a json report, and the pipeline
+# can also be profiled with cProfile.  When instrumentation is disabled (None is passed
+# instead of an instrumentation dictionary), none of this has any cost, and cProfile and
+# platform are not even imported.
+
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+
+
+def start_instrumentation(profile=False):
+    '''
+    Returns a new instrumentation dictionary, and starts tracing memory allocations (and
+    profiling, if profile is True).
+
+    Args:
+        profile (bool):     True to profile the pipeline with cProfile.
+    '''
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    instrumentation = {'stages': [], 'models': [], 'profiler': None, 'start_time': time.perf_counter()}
+    if profile:
+        import cProfile
+        instrumentation['profiler'] = cProfile.Profile()
+        instrumentation['profiler'].enable()
+    return instrumentation
+
+
+def stop_instrumentation(instrumentation):
+    '''
+    Stops profiling and tracing memory allocations.
+
+    Args:
+        instrumentation (dict):     The instrumentation returned by start_instrumentation().
+    '''
+    if instrumentation['profiler'] is not None:
+        instrumentation['profiler'].disable()
+    instrumentation['total_seconds'] = time.perf_counter() - instrumentation['start_time']
+    tracemalloc.stop()
+
+
+def start_measurement():
+    '''
+    Returns the starting point of a measurement of wall time, CPU time and peak memory.
+    The peak of the traced memory is reset, so it only covers this measurement.
+    '''
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    return time.perf_counter(), time.process_time()
+
+
+def finish_measurement(name, start):
+    '''
+    Returns a dictionary with the wall time, CPU time and peak traced memory since start.
+
+    Args:
+        name (str):         The name of the stage or model being measured.
+        start (tuple):      The starting point returned by start_measurement().
+    '''
+    peak_memory = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+    return {'name': name,
+            'wall_seconds': time.perf_counter() - start[0],
+            'cpu_seconds': time.process_time() - start[1],
+            'peak_memory_bytes': peak_memory,
+            'pid': os.getpid()}
+
+
+def measure_call(name, function, *args):
+    '''
+    Returns a tuple (result, measurement) with the result of function(*args), and the
+    measurement of the call (see finish_measurement()).  Memory allocations are traced
+    from the first call in each process, so this also measures the calls made in the
+    worker processes of parallel generation.
+
+    Args:
+        name (str):         The name of the model being generated.
+        function (func):    The function that generates the model.
+    '''
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    start = start_measurement()
+    result = function(*args)
+    return result, finish_measurement(name, start)
+
+
+@contextlib.contextmanager
+def measure_stage(instrumentation, stage_name):
+    '''
+    Context manager that records the wall time, CPU time and peak memory of a stage of the
+    pipeline.  Nothing is measured if instrumentation is None.
+
+    Args:
+        instrumentation (dict):     The instrumentation returned by start_instrumentation(), or None.
+        stage_name (str):           The name of the stage (for example, 'read_json_files').
+    '''
+    if instrumentation is None:
+        yield
+        return
+    start = start_measurement()
+    number_of_models = len(instrumentation['models'])
+    try:
+        yield
+    finally:
+        measurement = finish_measurement(stage_name, start)
+        # The models measured in this process during the stage reset the peak memory, 
+        # so the peak of the stage is the highest of their peaks and its own.
+        for model in instrumentation['models'][number_of_models:]:
+            if model['peak_memory_bytes'] is not None and model['pid'] == os.getpid():
+                measurement['peak_memory_bytes'] = max(measurement['peak_memory_bytes'] or 0, model['peak_memory_bytes'])
+        instrumentation['stages'].append(measurement)
+
+
+def record_model_measurements(instrumentation, model_kind, measurements):
+    '''
+    Records the measurements of the models generated by a stage of the pipeline.
+
+    Args:
+        instrumentation (dict):     The instrumentation returned by start_instrumentation(), or None.
+        model_kind (str):           The kind of model ('atomic' or 'coupled').
+        measurements (list):        The measurements returned by finish_measurement() for each model.
+    '''
+    if instrumentation is None:
+        return
+    for measurement in measurements:
+        instrumentation['models'].append(dict(measurement, kind=model_kind))
+
+
+def get_slowest_models(instrumentation, number_of_models=10):
+    '''
+    Returns the measurements of the number_of_models models that took the longest to generate.
+
+    Args:
+        instrumentation (dict):     The instrumentation returned by start_instrumentation().
+        number_of_models (int):     The number of models to return.
+    '''
+    return sorted(instrumentation['models'], key=lambda model: model['wall_seconds'], reverse=True)[:number_of_models]
+
+
+def write_instrumentation_report(instrumentation, report_filepath=None, profile_filepath=None):
+    '''
+    Writes the json report of the measurements to report_filepath, and the cProfile
+    statistics to profile_filepath (which can be read with the pstats module or snakeviz).
+
+    Args:
+        instrumentation (dict):     The instrumentation returned by start_instrumentation().
+        report_filepath (str):      The path of the json report, or None.
+        profile_filepath (str):     The path of the cProfile statistics, or None.
+    '''
+    if report_filepath:
+        import platform
+        report = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                  'python': platform.python_version(),
+                  'pid': os.getpid(),
+                  'total_seconds': instrumentation.get('total_seconds'),
+                  'stages': instrumentation['stages'],
+                  'models': instrumentation['models'],
+                  'slowest_models': [model['name'] for model in get_slowest_models(instrumentation)]}
+        with open(report_filepath, 'w') as file:
+            json.dump(report, file, indent=4)
+    if profile_filepath and instrumentation['profiler'] is not None:
+        instrumentation['profiler'].dump_stats(profile_filepath)
+
+
+def print_instrumentation_summary(instrumentation, number_of_models=5):
+    '''
+    Prints the measurements of each stage, and of the slowest models.
+
+    Args:
+        instrumentation (dict):     The instrumentation returned by start_instrumentation().
+        number_of_models (int):     The number of slowest models to print.
+    '''
+    print('Stage                                     wall (ms)   cpu (ms)   peak memory (KiB)')
+    for stage in instrumentation['stages']:
+        print(format_measurement(stage))
+    slowest_models = get_slowest_models(instrumentation, number_of_models)
+    if slowest_models:
+        print('Slowest models:')
+        for model in slowest_models:
+            print(format_measurement(dict(model, name=model['name'] + ' (' + model['kind'] + ')')))
+
+
+def format_measurement(measurement):
+    '''
+    Returns one line of the instrumentation summary.
+
+    Args:
+        measurement (dict):     A measurement returned by finish_measurement().
+    '''
+    peak_memory = measurement['peak_memory_bytes']
+    peak_memory = f"{peak_memory / 1024:18.1f}" if peak_memory is not None else f"{'-':>18}"
+    return f"\t{measurement['name']:<36}{measurement['wall_seconds'] * 1000:10.2f} {measurement['cpu_seconds'] * 1000:10.2f} {peak_memory}"
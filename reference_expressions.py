@@ -0,0 +1,677 @@
+# Functions for compiling the functions of the DEVSMap atomic models to Python, for the
+# reference simulator (see reference_simulator.py).
+#
+# The DEVSMap expressions are C++ expressions.  Each expression is parsed from its IR (see
+# devsmap_expressions.py) with the precedence of the C++ operators, and translated to a
+# Python expression with the same value: the division and remainder of two integers
+# truncate toward zero, "&&", "||" and "!" give booleans, the conditional operator "?:"
+# becomes a conditional expression, and the value assigned to a state variable (or sent on
+# an output port) is converted to its C++ type, as the implicit conversions of C++ do.  The
+# kind of each expression (INT, DOUBLE, BOOL or STRING) is known from the types of the state
+# variables and ports, so the conversions are only emitted where the kinds differ.
+#
+# The functions of an atomic model (delta_int, delta_ext, lambda, ta, and the text of its
+# state in the log) are emitted as the source of Python functions, which is compiled once
+# per atomic model, however many instances it has.  The if-else chains are optimized as they
+# are for C++ (see optimize_branches()), so the Python and C++ functions take the same
+# branches, and draw the same random numbers.
+#
+# The integers are not truncated to the width of their C++ type: an integer overflow, which
+# is undefined behaviour in C++, does not wrap around.
+
+import ast
+import math
+from functools import lru_cache
+
+from conditional_optimization import SWITCH_TYPES, optimize_branches
+from devsmap_expressions import (model_uses_random, parse_assignment_target, parse_expression, parse_for_each, uses_random,
+                                 TOKEN_PATTERN, TEXT, IDENTIFIER, MEMBER, INFINITY, BAG_EMPTY, BAG_SIZE, BAG_ITEM, RANDOM)
+
+# The kinds of value of the expressions.
+INT = 'int'
+DOUBLE = 'double'
+BOOL = 'bool'
+STRING = 'string'
+
+DOUBLE_TYPES = frozenset(['double', 'float', 'long double'])
+STRING_TYPES = frozenset(['string', 'std::string'])
+
+# The Python function that converts a value to each kind (see convert_value()).
+CONVERSIONS = {INT: 'int', DOUBLE: 'float', BOOL: 'bool'}
+
+# The printf format of each kind, which gives the same text as the operator<< of C++
+# (a double is printed with 6 significant digits, and a bool as 1 or 0).
+FORMATS = {INT: '%d', DOUBLE: '%g', BOOL: '%d', STRING: '%s'}
+
+# The precedence of the binary operators of C++ (higher binds tighter).
+BINARY_PRECEDENCE = {'||': 1, '&&': 2, '|': 3, '^': 4, '&': 5, '==': 6, '!=': 6, '<': 7, '<=': 7, '>': 7, '>=': 7,
+                     '<<': 8, '>>': 8, '+': 9, '-': 9, '*': 10, '/': 10, '%': 10}
+COMPARISON_OPERATORS = frozenset(['==', '!=', '<', '<=', '>', '>='])
+
+# The kind of the value of each random primitive (see RANDOM_FUNCTIONS in devsmap_expressions.py),
+# whose methods have the same names in the Python DevsmapRandom (see devsmap_random.py).
+RANDOM_KINDS = {'rand': INT, 'uniform_int': INT, 'uniform_real': DOUBLE, 'exponential': DOUBLE, 'normal': DOUBLE, 'bernoulli': BOOL}
+
+# The functions of the C++ standard library that the expressions can call (with or without
+# "std::"): the Python function of each one, and the kind of its value (None for the kind of
+# its arguments).
+FUNCTIONS = {'abs': ('abs', None),
+             'fabs': ('math.fabs', DOUBLE),
+             'min': ('min', None),
+             'max': ('max', None),
+             'sqrt': ('math.sqrt', DOUBLE),
+             'pow': ('math.pow', DOUBLE),
+             'exp': ('math.exp', DOUBLE),
+             'log': ('math.log', DOUBLE),
+             'floor': ('c_floor', DOUBLE),
+             'ceil': ('c_ceil', DOUBLE),
+             'round': ('c_round', DOUBLE),
+             'sin': ('math.sin', DOUBLE),
+             'cos': ('math.cos', DOUBLE),
+             'tan': ('math.tan', DOUBLE),
+             'atan2': ('math.atan2', DOUBLE),
+             'fmod': ('math.fmod', DOUBLE)}
+
+
+def c_div(a, b):
+    '''
+    Returns the quotient of the integers a and b, truncated toward zero as in C++.
+    '''
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+
+def c_mod(a, b):
+    '''
+    Returns the remainder of the integers a and b, with the sign of a as in C++.
+    '''
+    remainder = abs(a) % abs(b)
+    return -remainder if a < 0 else remainder
+
+
+def c_fdiv(a, b):
+    '''
+    Returns the quotient of the real numbers a and b, which is infinite (or NaN) if b is 0, as in C++.
+    '''
+    if b:
+        return a / b
+    if a != a or a == 0:
+        return math.nan
+    return math.copysign(math.inf, a) * math.copysign(1.0, b)
+
+
+def c_floor(x):
+    '''
+    Returns std::floor(x), a double (which is infinite or NaN if x is).
+    '''
+    return float(math.floor(x)) if math.isfinite(x) else float(x)
+
+
+def c_ceil(x):
+    '''
+    Returns std::ceil(x), a double (which is infinite or NaN if x is).
+    '''
+    return float(math.ceil(x)) if math.isfinite(x) else float(x)
+
+
+def c_round(x):
+    '''
+    Returns std::round(x), a double rounded half away from zero.
+    '''
+    if not math.isfinite(x):
+        return float(x)
+    return math.copysign(math.floor(abs(x) + 0.5), x)
+
+
+# The names the compiled functions can use, besides their arguments.
+RUNTIME = {'math': math, 'INF': math.inf, 'c_div': c_div, 'c_mod': c_mod, 'c_fdiv': c_fdiv,
+           'c_floor': c_floor, 'c_ceil': c_ceil, 'c_round': c_round}
+
+
+def get_value_kind(cpp_type):
+    '''
+    Returns the kind of value (INT, DOUBLE, BOOL or STRING) of a C++ type.
+
+    Raises a ValueError if the reference simulator cannot simulate values of that type.
+
+    Args:
+        cpp_type (str):     The C++ type of a state variable or port (for example, "int").
+    '''
+    cpp_type = ' '.join(cpp_type.split())
+    if cpp_type in SWITCH_TYPES:
+        return INT
+    if cpp_type in DOUBLE_TYPES:
+        return DOUBLE
+    if cpp_type == 'bool':
+        return BOOL
+    if cpp_type in STRING_TYPES:
+        return STRING
+    raise ValueError(f'The C++ type "{cpp_type}" is not supported by the reference simulator.')
+
+
+def convert_value(code, kind, target_kind, expression):
+    '''
+    Returns the Python code that converts the value of code, of the given kind, to target_kind,
+    as the implicit conversions of C++ do (a double is truncated toward zero to an integer).
+
+    Args:
+        code (str):         The Python code of the value.
+        kind (str):         The kind of the value.
+        target_kind (str):  The kind to convert it to.
+        expression (str):   The DEVSMap expression of the value, for the error messages.
+    '''
+    if kind == target_kind:
+        return code
+    if STRING in (kind, target_kind):
+        raise ValueError(f'The value of "{expression}" ({kind}) cannot be converted to {target_kind}.')
+    return CONVERSIONS[target_kind] + '(' + code + ')'
+
+
+def tokenize_expression(expression):
+    '''
+    Returns the list of the tokens of a DEVSMap expression: the nodes of its IR (see
+    parse_expression()), where each TEXT node is split with the tokenizer of the IR (TOKEN_PATTERN)
+    into ('operator', text), ('number', text), ('string', text) and ('character', text) tokens,
+    without the whitespace.
+
+    Args:
+        expression (str):   The DEVSMap expression.
+    '''
+    tokens = []
+    for node in parse_expression(expression):
+        if node[0] != TEXT:
+            tokens.append(node)
+            continue
+        for match in TOKEN_PATTERN.finditer(node[1]):
+            if match.lastgroup != 'whitespace':
+                tokens.append((match.lastgroup, match.group(0)))
+    return tokens
+
+
+def translate_number(text, expression):
+    '''
+    Returns a tuple (code, kind) with the Python literal of a C++ number literal.
+
+    Args:
+        text (str):         The C++ literal (for example, "0x1F", "017", "2.5f" or "1e-3").
+        expression (str):   The DEVSMap expression of the literal, for the error messages.
+    '''
+    try:
+        if text[:2].lower() == '0x':
+            return repr(int(text.rstrip('uUlL'), 16)), INT
+        if any(character in text for character in '.eE'):
+            value = float(text.rstrip('fFlL'))
+            return ('INF' if math.isinf(value) else repr(value)), DOUBLE
+        text = text.rstrip('uUlL')
+        return repr(int(text, 8) if len(text) > 1 and text.startswith('0') else int(text)), INT
+    except ValueError:
+        raise ValueError(f'Unable to read the number "{text}" in the DEVSMap expression "{expression}".') from None
+
+
+def translate_expression(expression, names, function_kind='delta_int', bag_ports=None):
+    '''
+    Returns a tuple (code, kind) with the Python code of a DEVSMap expression, and the kind of
+    its value (see the top of this file).
+
+    Raises a ValueError if the expression uses an unknown name, or a construct of C++ that the
+    reference simulator does not translate.
+
+    Args:
+        expression (str):       The DEVSMap expression.
+        names (dict):           The Python code and the kind of each name the expression can use
+                                (the state variables, the loop variables and the elapsed time e).
+        function_kind (str):    The DEVSMap function of the expression (one of FUNCTION_KINDS).
+        bag_ports (dict):       The Python code of the bag and the kind of each input port, keyed
+                                by port, in delta_ext.
+    '''
+    tokens = tokenize_expression(expression)
+    position = 0
+
+    def error(message):
+        return ValueError(f'{message} in the DEVSMap expression "{expression}".')
+
+    def peek(offset=0):
+        return tokens[position + offset] if position + offset < len(tokens) else None
+
+    def is_operator(token, text):
+        return token is not None and token[0] == 'operator' and token[1] == text
+
+    def advance():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def expect(text):
+        if not is_operator(peek(), text):
+            raise error(f'Expected "{text}"')
+        advance()
+
+    def parse_conditional():
+        condition = parse_binary(1)
+        if not is_operator(peek(), '?'):
+            return condition
+        advance()
+        if_true = parse_conditional()
+        expect(':')
+        if_false = parse_conditional()
+        kind = if_true[1]
+        if if_true[1] != if_false[1]:
+            kind = DOUBLE if DOUBLE in (if_true[1], if_false[1]) else INT
+        return ('(' + convert_value(if_true[0], if_true[1], kind, expression) + ' if ' + condition[0] + ' else ' +
+                convert_value(if_false[0], if_false[1], kind, expression) + ')', kind)
+
+    def parse_binary(minimum_precedence):
+        left = parse_unary()
+        while True:
+            token = peek()
+            if token is None or token[0] != 'operator' or BINARY_PRECEDENCE.get(token[1], 0) < minimum_precedence:
+                return left
+            advance()
+            right = parse_binary(BINARY_PRECEDENCE[token[1]] + 1)
+            left = translate_binary(token[1], left, right)
+
+    def translate_binary(operator, left, right):
+        (left_code, left_kind), (right_code, right_kind) = left, right
+        if operator in ('&&', '||'):
+            return ('(' + as_bool(left_code, left_kind) + (' and ' if operator == '&&' else ' or ') + as_bool(right_code, right_kind) + ')', BOOL)
+        if operator in COMPARISON_OPERATORS:
+            return '(' + left_code + ' ' + operator + ' ' + right_code + ')', BOOL
+        if STRING in (left_kind, right_kind):
+            if operator == '+' and left_kind == right_kind:
+                return '(' + left_code + ' + ' + right_code + ')', STRING
+            raise error(f'The operator "{operator}" cannot be applied to a string')
+        if operator in ('&', '|', '^', '<<', '>>', '%'):
+            if DOUBLE in (left_kind, right_kind):
+                raise error(f'The operator "{operator}" cannot be applied to a double')
+            if operator == '%':
+                return 'c_mod(' + left_code + ', ' + right_code + ')', INT
+            kind = BOOL if left_kind == right_kind == BOOL and operator in ('&', '|', '^') else INT
+            return '(' + left_code + ' ' + operator + ' ' + right_code + ')', kind
+        kind = DOUBLE if DOUBLE in (left_kind, right_kind) else INT
+        if operator == '/':
+            if kind == INT:
+                return 'c_div(' + left_code + ', ' + right_code + ')', INT
+            if not is_nonzero_literal(right_code):
+                return 'c_fdiv(' + left_code + ', ' + right_code + ')', DOUBLE
+        return '(' + left_code + ' ' + operator + ' ' + right_code + ')', kind
+
+    def parse_unary():
+        token = peek()
+        if token is not None and token[0] == 'operator':
+            if token[1] == '!':
+                advance()
+                code, kind = parse_unary()
+                return '(not ' + code + ')', BOOL
+            if token[1] in ('-', '+', '~'):
+                advance()
+                code, kind = parse_unary()
+                if kind == STRING or (token[1] == '~' and kind == DOUBLE):
+                    raise error(f'The operator "{token[1]}" cannot be applied to a {kind}')
+                if token[1] == '+':
+                    return convert_value(code, kind, INT, expression) if kind == BOOL else code, INT if kind == BOOL else kind
+                return '(' + token[1] + code + ')', INT if kind == BOOL else kind
+            if token[1] == '(':
+                cast_kind, length = find_cast(position + 1)
+                if cast_kind is not None:
+                    advance_by(length + 1)
+                    code, kind = parse_unary()
+                    return convert_value(code, kind, cast_kind, expression), cast_kind
+        return parse_postfix()
+
+    def advance_by(count):
+        nonlocal position
+        position += count
+
+    def find_cast(start):
+        # A C-style cast: "(" followed by a type and ")".
+        words = []
+        index = start
+        while index < len(tokens) and not is_operator(tokens[index], ')'):
+            token = tokens[index]
+            if token[0] in (IDENTIFIER, MEMBER):
+                words.append(token[1])
+            elif is_operator(token, '::'):
+                words.append('::')
+            else:
+                return None, 0
+            index += 1
+        type_name = ' '.join(words).replace(' :: ', '::')
+        if index >= len(tokens) or type_name not in SWITCH_TYPES | DOUBLE_TYPES | {'bool'}:
+            return None, 0
+        return get_value_kind(type_name), index - start + 1
+
+    def parse_postfix():
+        value = parse_primary()
+        token = peek()
+        if token is not None and token[0] == 'operator' and token[1] in ('.', '->', '[', '++', '--'):
+            raise error(f'The operator "{token[1]}" is not supported by the reference simulator')
+        return value
+
+    def parse_arguments():
+        expect('(')
+        arguments = []
+        if is_operator(peek(), ')'):
+            advance()
+            return arguments
+        while True:
+            arguments.append(parse_conditional())
+            if is_operator(peek(), ','):
+                advance()
+                continue
+            expect(')')
+            return arguments
+
+    def parse_primary():
+        token = peek()
+        if token is None:
+            raise error('Unexpected end')
+        advance()
+        kind = token[0]
+        if kind == 'number':
+            return translate_number(token[1], expression)
+        if kind == 'string':
+            return token[1], STRING
+        if kind == 'character':
+            return repr(ord(ast.literal_eval(token[1]))), INT
+        if kind == INFINITY:
+            return 'INF', DOUBLE
+        if kind == 'operator' and token[1] == '(':
+            value = parse_conditional()
+            expect(')')
+            return '(' + value[0] + ')', value[1]
+        if kind == RANDOM:
+            arguments = parse_arguments()
+            return 'r.' + token[1] + '(' + ', '.join(code for code, _ in arguments) + ')', RANDOM_KINDS[token[1]]
+        if kind in (BAG_EMPTY, BAG_SIZE, BAG_ITEM):
+            return translate_bag_operation(token)
+        if kind == IDENTIFIER:
+            return translate_identifier(token[1])
+        raise error(f'Unexpected "{token[1]}"')
+
+    def translate_identifier(name):
+        if name in ('true', 'false'):
+            return ('True' if name == 'true' else 'False'), BOOL
+        if name == 'static_cast':
+            expect('<')
+            words = []
+            while peek() is not None and not is_operator(peek(), '>'):
+                words.append(advance()[1])
+            expect('>')
+            cast_kind = get_value_kind(' '.join(words).replace(' :: ', '::'))
+            expect('(')
+            code, kind = parse_conditional()
+            expect(')')
+            return convert_value(code, kind, cast_kind, expression), cast_kind
+        if name == 'std' and is_operator(peek(), '::') and peek(1) is not None and peek(1)[0] == MEMBER:
+            advance()
+            name = advance()[1]
+            if not is_operator(peek(), '('):
+                raise error(f'"std::{name}" is not supported by the reference simulator')
+        if is_operator(peek(), '('):
+            if name not in FUNCTIONS:
+                raise error(f'The function "{name}" is not supported by the reference simulator')
+            function, kind = FUNCTIONS[name]
+            arguments = parse_arguments()
+            if kind is None:
+                kinds = {argument_kind for _, argument_kind in arguments}
+                kind = DOUBLE if DOUBLE in kinds else INT
+            return function + '(' + ', '.join(code for code, _ in arguments) + ')', kind
+        if name not in names:
+            raise error(f'Unknown name "{name}"')
+        return names[name]
+
+    def translate_bag_operation(token):
+        port = token[1]
+        if function_kind != 'delta_ext':
+            raise ValueError(f'The bag of port "{port}" is used in {function_kind}, but bags can only be used in delta_ext: "{expression}"')
+        if bag_ports is None or port not in bag_ports:
+            raise error(f'"{port}" is not an input port')
+        bag, kind = bag_ports[port]
+        if token[0] == BAG_EMPTY:
+            return ('(not ' + bag + ')' if token[2] else '(len(' + bag + ') != 0)'), BOOL
+        if token[0] == BAG_SIZE:
+            return 'len(' + bag + ')', INT
+        return bag + '[' + str(token[2]) + ']', kind
+
+    value = parse_conditional()
+    if position != len(tokens):
+        raise error(f'Unexpected "{tokens[position][-1]}"')
+    return value
+
+
+def as_bool(code, kind):
+    '''
+    Returns the Python code of the value of code as a bool.
+
+    Args:
+        code (str):     The Python code of the value.
+        kind (str):     The kind of the value.
+    '''
+    return code if kind == BOOL else 'bool(' + code + ')'
+
+
+def is_nonzero_literal(code):
+    '''
+    Returns True if code is a Python number literal other than 0.
+
+    Args:
+        code (str):     The Python code of a value.
+    '''
+    try:
+        return float(code) != 0
+    except ValueError:
+        return False
+
+
+@lru_cache(maxsize=None)
+def evaluate_initial_value(expression, cpp_type):
+    '''
+    Returns the Python value of the initial value of a state variable in the init states (a
+    C++ expression, such as "true" or "inf"), converted to the kind of its C++ type.  The
+    result is memoized, since many instances share the same initial values.
+
+    Args:
+        expression (str):   The initial value in the init states.
+        cpp_type (str):     The C++ type of the state variable.
+    '''
+    kind = get_value_kind(cpp_type)
+    if uses_random(str(expression)):
+        raise ValueError(f'The random primitives cannot be used in the init states: "{expression}"')
+    code, value_kind = translate_expression(str(expression), {})
+    return eval(convert_value(code, value_kind, kind, expression), dict(RUNTIME))
+
+
+def compile_atomic_model(atomic_model_name, atomic_model):
+    '''
+    Returns the compiled atomic model, as a dictionary with:
+        'name':             The name of the atomic model.
+        'state_variables':  The list of the names of the state variables, in the order of the
+                            state of an instance (a list of their values).
+        'state_types':      The list of the C++ types of the state variables.
+        'input_ports':      The list of the names of the input ports, in the order of the bags
+                            passed to delta_ext.
+        'output_ports':     The list of the names of the output ports.
+        'output_formats':   The printf format of the messages of each output port (see FORMATS).
+        'uses_random':      True if the functions draw random numbers (see model_uses_random()).
+        'delta_int', 'delta_ext', 'output', 'time_advance', 'format_state':
+                            The compiled functions (see compile_atomic_model_source()).
+        'source':           Their Python source.
+
+    Raises a ValueError if a function of the atomic model cannot be translated.
+
+    Args:
+        atomic_model_name (str):    The name of the atomic model.
+        atomic_model (dict):        The DEVSMap data of the atomic model.
+    '''
+    source = compile_atomic_model_source(atomic_model_name, atomic_model)
+    namespace = dict(RUNTIME)
+    exec(compile(source, '<' + atomic_model_name + '>', 'exec'), namespace)
+    return {'name': atomic_model_name,
+            'state_variables': list(atomic_model['s']),
+            'state_types': list(atomic_model['s'].values()),
+            'input_ports': list(atomic_model['x']),
+            'output_ports': list(atomic_model['y']),
+            'output_formats': [FORMATS[get_value_kind(port_type)] for port_type in atomic_model['y'].values()],
+            'uses_random': model_uses_random(atomic_model),
+            'delta_int': namespace['delta_int'],
+            'delta_ext': namespace['delta_ext'],
+            'output': namespace['output'],
+            'time_advance': namespace['time_advance'],
+            'format_state': namespace['format_state'],
+            'source': source}
+
+
+def compile_atomic_model_source(atomic_model_name, atomic_model):
+    '''
+    Returns the Python source of the functions of an atomic model, where s is the list of the
+    values of the state variables of an instance, and r its random number generator (or None):
+        delta_int(s, r):            The internal transition function, which updates s.
+        delta_ext(s, r, e, bags):   The external transition function, where e is the elapsed time,
+                                    and bags the list of the messages of each input port.
+        output(s, r):               The output function, which returns the list of the messages
+                                    (output port index, value) in the order they are sent.
+        time_advance(s, r):         The time advance function.
+        format_state(s):            The text of the state in the log, as its C++ operator<< prints it.
+
+    Args:
+        atomic_model_name (str):    The name of the atomic model.
+        atomic_model (dict):        The DEVSMap data of the atomic model.
+    '''
+    state_kinds = {name: get_value_kind(variable_type) for name, variable_type in atomic_model['s'].items()}
+    state_names = {name: ('s[' + str(i) + ']', kind) for i, (name, kind) in enumerate(state_kinds.items())}
+    context = {'state_variables': {name: (i, kind) for i, (name, kind) in enumerate(state_kinds.items())},
+               'output_ports': {name: (i, get_value_kind(port_type)) for i, (name, port_type) in enumerate(atomic_model['y'].items())},
+               'bag_ports': {name: ('bags[' + str(i) + ']', get_value_kind(port_type)) for i, (name, port_type) in enumerate(atomic_model['x'].items())}}
+
+    ta = atomic_model['ta']
+    if list(ta) != ['otherwise'] or not isinstance(ta['otherwise'], str):
+        raise ValueError(f'The time advance function of "{atomic_model_name}" must be a single "otherwise" expression.')
+    time_advance, kind = translate_expression(ta['otherwise'], state_names, 'ta')
+
+    lines = ['def delta_int(s, r):']
+    lines.extend(compile_block(atomic_model['delta_int'], dict(context, names=state_names, function_kind='delta_int'), 1) or ['    pass'])
+    lines.append('')
+    lines.append('def delta_ext(s, r, e, bags):')
+    lines.extend(compile_block(atomic_model['delta_ext'], dict(context, names=dict({'e': ('e', DOUBLE)}, **state_names), function_kind='delta_ext'), 1)
+                 or ['    pass'])
+    lines.append('')
+    lines.append('def output(s, r):')
+    lines.append('    out = []')
+    lines.extend(compile_block(atomic_model['lambda'], dict(context, names=state_names, function_kind='lambda'), 1))
+    lines.append('    return out')
+    lines.append('')
+    lines.append('def time_advance(s, r):')
+    lines.append('    return ' + convert_value(time_advance, kind, DOUBLE, ta['otherwise']))
+    lines.append('')
+    lines.append('def format_state(s):')
+    if state_kinds:
+        state_format = '{' + ', '.join(name + ': ' + FORMATS[kind] for name, kind in state_kinds.items()) + '}'
+        lines.append('    return ' + repr(state_format) + ' % (' + ', '.join('s[' + str(i) + ']' for i in range(len(state_kinds))) + ',)')
+    else:
+        lines.append("    return ''")
+    return '\n'.join(lines) + '\n'
+
+
+def compile_block(data, context, indent):
+    '''
+    Returns the lines of Python of the body of a DEVSMap block, as build_block_body() emits them
+    in C++: an assignment for each key whose value is an expression, a loop for each "for message
+    in port.bag()" key, and an if-else chain for each run of consecutive conditions.
+
+    Args:
+        data (dict):        The DEVSMap dictionary of the body of the block.
+        context (dict):     The 'names', 'function_kind', 'state_variables', 'output_ports' and
+                            'bag_ports' of the function (see compile_atomic_model_source()).
+        indent (int):       The number of indentations of the lines.
+    '''
+    lines = []
+    chain = {}
+    for key, value in data.items():
+        if isinstance(value, dict) and parse_for_each(key) is None:
+            chain[key] = value
+            continue
+        if chain:
+            lines.extend(compile_chain(chain, context, indent))
+            chain = {}
+        if isinstance(value, dict):
+            lines.extend(compile_for_each(key, value, context, indent))
+        else:
+            lines.append('    ' * indent + compile_assignment(key, value, context))
+    if chain:
+        lines.extend(compile_chain(chain, context, indent))
+    return lines
+
+
+def compile_chain(chain, context, indent):
+    '''
+    Returns the lines of Python of an if-else chain, after it is optimized (see optimize_branches()).
+
+    Args:
+        chain (dict):       The DEVSMap dictionary with the conditions of the chain as keys, and
+                            the bodies of the branches as values.
+        context (dict):     The context of the function (see compile_block()).
+        indent (int):       The number of indentations of the lines.
+    '''
+    branches = optimize_branches(chain)
+    if not branches:
+        return []
+    if branches[0][0] is None:
+        return compile_block(branches[0][1], context, indent)
+    lines = []
+    for i, (guards, body) in enumerate(branches):
+        if guards is None:
+            lines.append('    ' * indent + 'else:')
+        else:
+            conditions = [translate_expression(guard, context['names'], context['function_kind'], context['bag_ports'])[0] for guard in guards]
+            lines.append('    ' * indent + ('if ' if i == 0 else 'elif ') + ' or '.join(conditions) + ':')
+        lines.extend(compile_block(body, context, indent + 1) or ['    ' * (indent + 1) + 'pass'])
+    return lines
+
+
+def compile_for_each(key, data, context, indent):
+    '''
+    Returns the lines of Python of a DEVSMap loop over the messages in a bag ("for message in
+    port.bag()"), whose body is data.
+
+    Args:
+        key (str):          The DEVSMap loop.
+        data (dict):        The DEVSMap dictionary of the body of the loop.
+        context (dict):     The context of the function (see compile_block()).
+        indent (int):       The number of indentations of the lines.
+    '''
+    variable, port = parse_for_each(key)
+    if context['function_kind'] != 'delta_ext':
+        raise ValueError(f'The bag of port "{port}" is iterated in {context["function_kind"]}, but bags can only be used in delta_ext: "{key}"')
+    if port not in context['bag_ports']:
+        raise ValueError(f'"{port}" is not an input port: "{key}"')
+    bag, kind = context['bag_ports'][port]
+    loop_variable = 'v_' + variable
+    while loop_variable in RUNTIME:
+        loop_variable += '_'
+    names = dict(context['names'], **{variable: (loop_variable, kind)})
+    return (['    ' * indent + 'for ' + loop_variable + ' in ' + bag + ':'] +
+            (compile_block(data, dict(context, names=names), indent + 1) or ['    ' * (indent + 1) + 'pass']))
+
+
+def compile_assignment(target, value, context):
+    '''
+    Returns the Python statement of a DEVSMap assignment: the state variable is assigned the value,
+    converted to its kind, or in the output function, the message is appended to the list of messages.
+
+    Args:
+        target (str):       The state variable or output port being assigned.
+        value (str):        The DEVSMap expression of the value being assigned.
+        context (dict):     The context of the function (see compile_block()).
+    '''
+    name = parse_assignment_target(target)
+    function_kind = context['function_kind']
+    code, kind = translate_expression(value, context['names'], function_kind, context['bag_ports'])
+    if function_kind == 'lambda':
+        if name not in context['output_ports']:
+            raise ValueError(f'"{name}" is not an output port, and only output ports can be assigned in lambda.')
+        index, port_kind = context['output_ports'][name]
+        return 'out.append((' + str(index) + ', ' + convert_value(code, kind, port_kind, value) + '))'
+    if name not in context['state_variables']:
+        raise ValueError(f'"{name}" is not a state variable, and only state variables can be assigned in {function_kind}.')
+    index, state_kind = context['state_variables'][name]
+    return 's[' + str(index) + '] = ' + convert_value(code, kind, state_kind, value)
@@ -0,0 +1,383 @@
+# A reference DEVS simulator, in pure Python, which runs the DEVSMap models directly,
+# without generating, building and running the Cadmium C++ code.
+#
+# It is meant for iterating quickly on the models, and for differential testing of the
+# generator: it writes the same log as the generated simulation (the columns of Cadmium's
+# stdout and csv loggers, see binary_log_reader.py), and draws the same random numbers (see
+# devsmap_random.py), so the log of a run can be compared line by line with the log of the
+# generated simulation with the same seed.
+#
+# The functions of each atomic model are compiled to Python once, however many instances it
+# has (see reference_expressions.py).  The hierarchy of coupled models is flattened (see
+# flatten_hierarchy.py), so each message goes directly from the output port of an atomic
+# model to the input ports it is coupled to.  The model ids and names in the log are those
+# of Cadmium: the models are numbered in the order they are built (the top model is 0, then
+# each of its components, depth first), and an atomic model is named after its component id
+# (or the id of the flattened component, to compare with a simulation generated with
+# flatten_hierarchy).
+#
+# The internal events are scheduled in a heap of (time of the next internal event, instance
+# index).  When the time of an instance changes, its previous entry is left in the heap and
+# skipped when it is popped, so each transition costs O(log n) instead of a scan of every
+# instance.  As in Cadmium, at each time the imminent instances first send their outputs,
+# which are routed to the bags of the input ports (in the order of the couplings), then each
+# imminent instance and each instance that received a message makes its transition, in the
+# order of the model ids: internal, external (with the elapsed time), or confluent (the
+# internal transition, then the external transition with an elapsed time of 0).  The
+# simulation stops at the first time that is not before the end of the time span.
+#
+# Usage (from the repository root):
+#     python reference_simulator.py [-i INPUT] [--log-path PATH] [--run N] [--flatten] [...]
+# writes the log of the simulation to stdout, or to the csv file PATH.
+
+import argparse
+import heapq
+import math
+import sys
+import time
+
+from parser_reading_files import is_valid_fileset, read_reachable_json_files, scan_json_directory, sort_json_files
+from semantic_validation import check_json_data
+from generate_simple_statements import get_simulation_time_in_seconds, get_top_model, get_top_model_name, get_run_settings
+from init_state_index import index_init_states, find_initialization_values_for_instance, find_initialization_values_for_model
+from flatten_hierarchy import flatten_coupled_model
+from model_hierarchy import get_coupled_models
+from reference_expressions import compile_atomic_model, evaluate_initial_value
+from devsmap_random import DevsmapRandom, RandomRun
+
+LOG_HEADER = 'time;model_id;model_name;port_name;data\n'
+
+
+def simulate_directory(directory_json_input, log_file=None, run=0, time_span=None, flatten_hierarchy=False):
+    '''
+    Reads and validates the DEVSMap json files in directory_json_input (only the models reachable
+    from the experiment), and simulates them (see simulate()).
+
+    Raises a ValueError if the input directory is not a valid set of DEVSMap files, and a
+    DevsmapValidationError (a ValueError) listing every error found in the json files by
+    validate_json_data().
+
+    Args:
+        directory_json_input (str):     The directory where the json files are located.
+        log_file (file):                Optional text file to write the log to.
+        run (int):                      The index of the run (see find_run()).
+        time_span (float):              Optional time span overriding the "time_span" of the experiment.
+        flatten_hierarchy (bool):       True to name and number the models as the flattened top model does.
+    '''
+    json_files = scan_json_directory(directory_json_input)
+    if not is_valid_fileset(json_files):
+        raise ValueError(f"Invalid fileset in {directory_json_input}")
+    raw_data, _ = read_reachable_json_files(directory_json_input, json_files)
+    check_json_data(raw_data, json_files)
+    return simulate(sort_json_files(raw_data, json_files), log_file, run, time_span, flatten_hierarchy)
+
+
+def simulate(data, log_file=None, run=0, time_span=None, flatten_hierarchy=False):
+    '''
+    Simulates the top model of data for the time span of the experiment, and returns the
+    statistics of the simulation (see run_simulation()).
+
+    Args:
+        data (dict):                The DEVSMap json data that has been sorted into a dictionary.
+        log_file (file):            Optional text file to write the log to, with the columns of
+                                    Cadmium's csv logger.  Nothing is logged if it is None.
+        run (int):                  The index of the run, in the runs of the experiment (see find_run()).
+        time_span (float):          Optional time span overriding the "time_span" of the experiment.
+        flatten_hierarchy (bool):   True to name and number the models as the flattened top model does
+                                    (see flatten_coupled_model()), instead of as the hierarchy does.
+    '''
+    if time_span is None:
+        time_span = float(get_simulation_time_in_seconds(data['experiment']))
+    simulation = build_simulation(data, run, flatten_hierarchy)
+    return run_simulation(simulation, time_span, log_file)
+
+
+def find_run(run_settings, run):
+    '''
+    Returns a tuple (sweep point, seed) of a run, as the generated main.cpp lists the runs: run i
+    is replication i % replications of sweep point i // replications, and is seeded with seed + i.
+
+    Raises a ValueError if there is no such run.
+
+    Args:
+        run_settings (dict):    The settings of the runs returned by get_run_settings().
+        run (int):              The index of the run.
+    '''
+    number_of_runs = max(len(run_settings['sweep']), 1) * run_settings['replications']
+    if not 0 <= run < number_of_runs:
+        raise ValueError(f'There is no run {run}, the experiment has {number_of_runs} run(s).')
+    return run // run_settings['replications'], run_settings['seed'] + run
+
+
+def number_models(coupled_models, top_model_name):
+    '''
+    Returns the model id of each model instance, keyed by instance path (see index_init_states()),
+    in the order Cadmium numbers them: the top model is 0, and the components of each coupled
+    model follow it, depth first.
+
+    Args:
+        coupled_models (dict):  The data of each coupled model, keyed by coupled model name.
+        top_model_name (str):   The name of the top model.
+    '''
+    model_ids = {}
+    stack = [(top_model_name, (top_model_name,))]
+    while stack:
+        model_name, path = stack.pop()
+        model_ids[path] = len(model_ids)
+        if model_name in coupled_models:
+            components = list(coupled_models[model_name].get('components', {}).items())
+            stack.extend((component_model_name, path + (component_id,)) for component_model_name, component_id in reversed(components))
+    return model_ids
+
+
+def build_simulation(data, run=0, flatten_hierarchy=False):
+    '''
+    Returns the simulation of the top model of data, as a dictionary with the lists below, which
+    hold the values of each atomic model instance, in the order of the model ids:
+        'models':       The compiled atomic model (see compile_atomic_model()).
+        'states':       The state (the list of the values of the state variables).
+        'rngs':         The random number generator (or None if the model draws no random numbers).
+        'model_ids':    The model id in the log.
+        'names':        The model name in the log (the component id).
+        'routes':       The list of the couplings of each output port, as tuples (coupling index,
+                        destination instance index, destination input port index).
+    The instances are built (and their random number generators seeded) in the order Cadmium
+    builds them.  The compiled atomic models are shared by their instances.
+
+    Raises a ValueError if an atomic model cannot be compiled, or an initial value is missing.
+
+    Args:
+        data (dict):                The DEVSMap json data that has been sorted into a dictionary.
+        run (int):                  The index of the run (see find_run()).
+        flatten_hierarchy (bool):   True to name and number the models as the flattened top model does.
+    '''
+    experiment = data['experiment']
+    top_model_name = get_top_model_name(experiment)
+    get_top_model(data, top_model_name)
+    run_settings = get_run_settings(experiment)
+    sweep_point, seed = find_run(run_settings, run)
+    init_state_index = index_init_states(data)
+    run_init_state_index = init_state_index['sweep'][sweep_point] if run_settings['sweep'] else init_state_index
+
+    atomic_models = {}
+    for atomic_model_data in data['atomic_models']:
+        atomic_model_name = list(atomic_model_data.keys())[0]
+        atomic_models[atomic_model_name] = atomic_model_data[atomic_model_name]
+    coupled_model = flatten_coupled_model(data, top_model_name)
+    model_ids = number_models(get_coupled_models(data), top_model_name)
+
+    simulation = {'models': [], 'states': [], 'rngs': [], 'model_ids': [], 'names': [], 'routes': []}
+    compiled_models = {}
+    random_run = RandomRun(seed)
+    instance_indexes = {}
+    for model_name, component_id in coupled_model['components']:
+        if model_name not in atomic_models:
+            raise ValueError(f'The component "{component_id}" is an instance of "{model_name}", which is not an atomic model.')
+        atomic_model = atomic_models[model_name]
+        if model_name not in compiled_models:
+            compiled_models[model_name] = compile_atomic_model(model_name, atomic_model)
+        model = compiled_models[model_name]
+        path = coupled_model['component_paths'][component_id]
+        initialization_values = find_initialization_values_for_instance(run_init_state_index, [path])
+        if initialization_values is None:
+            initialization_values = find_initialization_values_for_model(init_state_index, model_name, atomic_model['s'].keys())
+        state = []
+        for variable_name, variable_type in atomic_model['s'].items():
+            if variable_name not in initialization_values:
+                raise ValueError('No initial value was found for the state variable "' + variable_name + '" of the component "' + component_id + '".')
+            state.append(evaluate_initial_value(initialization_values[variable_name], variable_type))
+
+        instance_indexes[component_id] = len(simulation['models'])
+        simulation['models'].append(model)
+        simulation['states'].append(state)
+        simulation['rngs'].append(DevsmapRandom(random_run.next_instance_seed()) if model['uses_random'] else None)
+        simulation['model_ids'].append(len(simulation['model_ids']) + 1 if flatten_hierarchy else model_ids[path])
+        simulation['names'].append(component_id if flatten_hierarchy else path[-1])
+        simulation['routes'].append([[] for _ in model['output_ports']])
+
+    for coupling_index, coupling in enumerate(coupled_model['ic']):
+        source = instance_indexes[coupling['component_from']]
+        destination = instance_indexes[coupling['component_to']]
+        source_port = find_port(simulation['models'][source]['output_ports'], coupling['port_from'], coupling['component_from'])
+        destination_port = find_port(simulation['models'][destination]['input_ports'], coupling['port_to'], coupling['component_to'])
+        simulation['routes'][source][source_port].append((coupling_index, destination, destination_port))
+    return simulation
+
+
+def find_port(ports, port, component_id):
+    '''
+    Returns the index of port in the list of the ports of a component.
+
+    Raises a ValueError if the component has no such port.
+
+    Args:
+        ports (list):           The names of the input (or output) ports of the atomic model of the component.
+        port (str):             The name of the port.
+        component_id (str):     The id of the component, for the error message.
+    '''
+    if port not in ports:
+        raise ValueError(f'The component "{component_id}" has no port "{port}".')
+    return ports.index(port)
+
+
+def run_simulation(simulation, time_span, log_file=None):
+    '''
+    Runs the simulation returned by build_simulation() from time 0 for time_span, and returns the
+    statistics of the simulation, as a dictionary with the number of 'steps' (the distinct times
+    of the events), 'transitions' (of the atomic model instances) and 'messages' (delivered to
+    an input port), and the 'time' of the last event.
+
+    Raises a ValueError if a function of an atomic model fails (for example, an integer division
+    by zero, or the last message of an empty bag).
+
+    Args:
+        simulation (dict):  The simulation returned by build_simulation().
+        time_span (float):  The time the simulation runs for.
+        log_file (file):    Optional text file to write the log to.  Nothing is logged if it is None.
+    '''
+    models = simulation['models']
+    states = simulation['states']
+    rngs = simulation['rngs']
+    routes = simulation['routes']
+    number_of_instances = len(models)
+    state_prefixes = [';' + str(model_id) + ';' + name + ';;' for model_id, name in zip(simulation['model_ids'], simulation['names'])]
+    output_prefixes = [[';' + str(model_id) + ';' + name + ';' + port + ';' for port in model['output_ports']]
+                       for model_id, name, model in zip(simulation['model_ids'], simulation['names'], models)]
+
+    time_last = [0.0] * number_of_instances
+    time_next = [0.0] * number_of_instances
+    versions = [0] * number_of_instances
+    heap = []
+    log = []
+    statistics = {'steps': 0, 'transitions': 0, 'messages': 0, 'time': 0.0}
+    instance = None
+    function = 'time_advance'
+    try:
+        for instance in range(number_of_instances):
+            time_next[instance] = models[instance]['time_advance'](states[instance], rngs[instance])
+            if time_next[instance] < math.inf:
+                heap.append((time_next[instance], instance, 0))
+            if log_file is not None:
+                log.append('0' + state_prefixes[instance] + models[instance]['format_state'](states[instance]) + '\n')
+        heapq.heapify(heap)
+        if log_file is not None:
+            log_file.write(LOG_HEADER + ''.join(log))
+            log = []
+
+        while heap and heap[0][0] < time_span:
+            now = heap[0][0]
+            imminent = []
+            while heap and heap[0][0] == now:
+                _, instance, version = heapq.heappop(heap)
+                if version == versions[instance]:
+                    imminent.append(instance)
+            if not imminent:
+                continue
+            imminent.sort()
+
+            # The imminent instances send their outputs, which are routed to the input ports.
+            function = 'output'
+            outputs = {}
+            deliveries = []
+            for instance in imminent:
+                messages = models[instance]['output'](states[instance], rngs[instance])
+                outputs[instance] = messages
+                instance_routes = routes[instance]
+                for port, value in messages:
+                    deliveries.extend((coupling_index, destination, destination_port, value)
+                                      for coupling_index, destination, destination_port in instance_routes[port])
+            bags = {}
+            if deliveries:
+                deliveries.sort(key=lambda delivery: delivery[0])
+                for _, destination, destination_port, value in deliveries:
+                    if destination not in bags:
+                        bags[destination] = [[] for _ in models[destination]['input_ports']]
+                    bags[destination][destination_port].append(value)
+                statistics['messages'] += len(deliveries)
+                active = sorted(set(imminent).union(bags))
+            else:
+                active = imminent
+
+            # Each imminent instance, and each instance that received a message, makes its transition.
+            if log_file is not None:
+                time_text = '%g' % now
+            for instance in active:
+                model = models[instance]
+                state = states[instance]
+                rng = rngs[instance]
+                instance_bags = bags.get(instance)
+                if instance_bags is None:
+                    function = 'delta_int'
+                    model['delta_int'](state, rng)
+                elif time_next[instance] == now:
+                    function = 'delta_int'
+                    model['delta_int'](state, rng)
+                    function = 'delta_ext'
+                    model['delta_ext'](state, rng, 0.0, instance_bags)
+                else:
+                    function = 'delta_ext'
+                    model['delta_ext'](state, rng, now - time_last[instance], instance_bags)
+                if log_file is not None:
+                    if time_next[instance] == now:
+                        prefixes = output_prefixes[instance]
+                        formats = model['output_formats']
+                        for port in range(len(prefixes)):
+                            log.extend(time_text + prefixes[port] + formats[port] % value + '\n'
+                                       for message_port, value in outputs[instance] if message_port == port)
+                    log.append(time_text + state_prefixes[instance] + model['format_state'](state) + '\n')
+                function = 'time_advance'
+                time_last[instance] = now
+                time_next[instance] = now + model['time_advance'](state, rng)
+                versions[instance] += 1
+                if time_next[instance] < math.inf:
+                    heapq.heappush(heap, (time_next[instance], instance, versions[instance]))
+            if log:
+                log_file.write(''.join(log))
+                log = []
+            statistics['steps'] += 1
+            statistics['transitions'] += len(active)
+            statistics['time'] = now
+    except (ArithmeticError, IndexError, ValueError) as error:
+        raise ValueError(f'The {function} function of the component "{simulation["names"][instance]}" '
+                         f'(model id {simulation["model_ids"][instance]}) failed: {error}') from error
+    return statistics
+
+
+def main():
+    '''
+    Simulates the DEVSMap json files of the input directory, with the options of the command
+    line, and returns the exit status (1 if the json files are invalid, or the simulation fails).
+    '''
+    argument_parser = argparse.ArgumentParser(description='Simulates DEVSMap json files directly, without generating Cadmium C++ code.')
+    argument_parser.add_argument('-i', '--input', default='./input/', help='directory of the DEVSMap json files')
+    argument_parser.add_argument('--log-path', help='csv file to write the log to (the log is written to stdout if it is not given)')
+    argument_parser.add_argument('--no-log', action='store_true', help='do not write the log')
+    argument_parser.add_argument('--run', type=int, default=0,
+                                 help='index of the run, in the replications and sweep points of the experiment (run i is seeded with seed + i)')
+    argument_parser.add_argument('--time', type=float, help='time span of the simulation, instead of the "time_span" of the experiment')
+    argument_parser.add_argument('--flatten', action='store_true',
+                                 help='name and number the models as the flattened top model does (see DEVSMap_parser.py --flatten)')
+    argument_parser.add_argument('--summary', action='store_true', help='print the number of transitions and the wall time to stderr')
+    arguments = argument_parser.parse_args()
+
+    start_time = time.perf_counter()
+    try:
+        if arguments.no_log:
+            statistics = simulate_directory(arguments.input, None, arguments.run, arguments.time, arguments.flatten)
+        elif arguments.log_path is not None:
+            with open(arguments.log_path, 'w') as log_file:
+                statistics = simulate_directory(arguments.input, log_file, arguments.run, arguments.time, arguments.flatten)
+        else:
+            statistics = simulate_directory(arguments.input, sys.stdout, arguments.run, arguments.time, arguments.flatten)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 1
+    wall_seconds = time.perf_counter() - start_time
+    if arguments.summary:
+        print(f"{statistics['transitions']} transitions and {statistics['messages']} messages in {statistics['steps']} steps "
+              f"(last event at {statistics['time']:g}), {wall_seconds:.3f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,512 @@
+# Functions for validating the DEVSMap json files before any code is generated.
+#
+# A misspelled port in a coupling, a component of a model that does not exist, or a state
+# variable that is not declared is otherwise only found when the generated C++ code fails to
+# compile.  The validation first indexes every model once (its input and output ports with
+# their types, its state variables and the ids of its components, keyed by model name), and
+# then checks each coupling, init state and expression against the index with dictionary
+# lookups, so it takes time proportional to the size of the json files.  Every error is
+# reported, with the file and the JSON path of the value at fault (for example,
+# "counter_system_coupled.json: counter_system.ic[1].port_to: ...").
+#
+# The expressions are checked from their IR (see devsmap_expressions.py): every identifier
+# must be a state variable, a port or a parameter of the atomic model, the variable of an
+# enclosing "for message in port.bag()" loop, or the elapsed time "e" in delta_ext.  The names
+# of functions (followed by "(") and of scopes (followed by "::"), the C++ keywords of
+# CPP_KEYWORDS and the macros (in upper case, such as M_PI or INT_MAX) are left to the compiler.
+
+import json
+import re
+
+from devsmap_expressions import (parse_assignment_target, parse_expression, parse_for_each, FUNCTION_KINDS,
+                                 BAG_EMPTY, BAG_SIZE, BAG_ITEM, IDENTIFIER, TEXT)
+from generate_simple_statements import get_run_settings, get_top_model_name
+from model_hierarchy import find_topological_order
+from parser_reading_files import classify_json_filename
+
+IDENTIFIER_PATTERN = re.compile(r'[A-Za-z_]\w*')
+MACRO_PATTERN = re.compile(r'[A-Z][A-Z0-9_]+')
+
+# The C++ keywords that can appear in a DEVSMap expression.
+CPP_KEYWORDS = frozenset(['true', 'false', 'nullptr', 'sizeof', 'alignof', 'static_cast', 'const_cast', 'reinterpret_cast',
+                          'dynamic_cast', 'auto', 'const', 'bool', 'char', 'short', 'int', 'long', 'float', 'double',
+                          'signed', 'unsigned'])
+
+# The two ends of each kind of coupling: the key of the component (None for the coupled model
+# itself), the key of the port, and the ports of the component or coupled model ('x' or 'y')
+# that the port must be one of.
+COUPLING_ENDS = {'ic': (('component_from', 'port_from', 'y'), ('component_to', 'port_to', 'x')),
+                 'eic': ((None, 'port_from', 'x'), ('component_to', 'port_to', 'x')),
+                 'eoc': (('component_from', 'port_from', 'y'), (None, 'port_to', 'y'))}
+PORT_KINDS = {'x': 'input', 'y': 'output'}
+
+
+class DevsmapValidationError(ValueError):
+    '''
+    Raised by check_json_data() when the DEVSMap json files are not valid.  The errors
+    attribute holds the list of every error found (see validate_json_data()).
+    '''
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} error(s) in the DEVSMap json files:\n" + format_validation_errors(errors))
+
+
+def check_json_data(raw_data, json_files=None):
+    '''
+    Raises a DevsmapValidationError listing every error found in the DEVSMap json files
+    (see validate_json_data()), and does nothing if they are valid.
+
+    Args:
+        raw_data (dict):    The raw data of the DEVSMap json files, keyed by filename.
+        json_files (dict):  Optional DEVSMap file type of each file, keyed by filename.
+    '''
+    errors = validate_json_data(raw_data, json_files)
+    if errors:
+        raise DevsmapValidationError(errors)
+
+
+def format_validation_errors(errors):
+    '''
+    Returns the errors returned by validate_json_data() as text, one error per line.
+
+    Args:
+        errors (list):  The errors returned by validate_json_data().
+    '''
+    return '\n'.join(error['file'] + ': ' + error['path'] + ': ' + error['message'] for error in errors)
+
+
+def format_json_path(keys):
+    '''
+    Returns the JSON path of a value from the keys (and list indexes) leading to it from the
+    top of its file, for example 'counter_system.ic[1].port_to', or
+    'counter.delta_int["countUp == true"].count' for keys that are not identifiers.
+
+    Args:
+        keys (tuple):   The keys (str) and list indexes (int) leading to the value.
+    '''
+    path = ''
+    for key in keys:
+        if isinstance(key, int):
+            path += '[' + str(key) + ']'
+        elif IDENTIFIER_PATTERN.fullmatch(key):
+            path += ('.' if path else '') + key
+        else:
+            path += '[' + json.dumps(key) + ']'
+    return path
+
+
+def validate_json_data(raw_data, json_files=None):
+    '''
+    Returns the list of the errors found in the DEVSMap json files (empty if they are valid),
+    in the order of the files.  Each error is a dictionary with the 'file', the JSON 'path' of
+    the value at fault in the file (see format_json_path()) and a 'message'.  The following are
+    checked:
+        - The ports and state variables of the models are objects of names to C++ types.
+        - The components of the coupled models are known models, with distinct ids, and no
+          coupled model contains itself.
+        - The ic, eic and eoc couple existing components and ports, of the same type.
+        - The expressions of the atomic models only use their state variables, ports and
+          parameters, assign state variables (output ports in lambda), and only use bags of
+          input ports in delta_ext.
+        - The init states (and the sweep points of the experiment) only give values to the
+          state variables of existing components, and give one to every state variable.
+        - The model under test of the experiment is a coupled model.
+
+    Args:
+        raw_data (dict):    The raw data of the DEVSMap json files, keyed by filename.
+        json_files (dict):  Optional DEVSMap file type of each file, keyed by filename.  By
+                            default, the file types are found from the filenames.
+    '''
+    errors = []
+
+    def report(filename, keys, message):
+        errors.append({'file': filename, 'path': format_json_path(keys), 'message': message})
+
+    file_types = {filename: (json_files or {}).get(filename) or classify_json_filename(filename) for filename in sorted(raw_data)}
+    models = index_models(raw_data, file_types, report)
+    for model in models.values():
+        if model['kind'] == 'atomic':
+            validate_atomic_model(model, report)
+        else:
+            validate_coupled_model(model, models, report)
+    _, cycle = find_topological_order({model['name']: model['components'].values() for model in models.values() if model['kind'] == 'coupled'})
+    if cycle is not None:
+        report(models[cycle[0]]['file'], (cycle[0], 'components', cycle[1]), f'The coupled model "{cycle[0]}" contains itself: {" -> ".join(cycle)}.')
+
+    for filename, file_type in file_types.items():
+        if file_type == 'experiment':
+            validate_experiment(raw_data[filename], filename, models, report)
+        elif file_type == 'state':
+            init_states = raw_data[filename].get('init_states') if isinstance(raw_data[filename], dict) else None
+            if not isinstance(init_states, dict):
+                report(filename, ('init_states',), 'The init_state file must have an "init_states" object.')
+            else:
+                validate_init_states(init_states, filename, ('init_states',), models, report)
+    return errors
+
+
+def index_models(raw_data, file_types, report):
+    '''
+    Returns the index of the atomic and coupled models of the DEVSMap json files, keyed by
+    model name.  Each model is a dictionary with its 'kind' ('atomic' or 'coupled'), 'name',
+    'file' and DEVSMap 'data', its input ports 'x' and output ports 'y' (the C++ type of each
+    port, keyed by port name), and:
+        - for an atomic model, its state variables 's' (the C++ type of each state variable)
+          and the names of its 'parameters'.
+        - for a coupled model, its 'components' (the model name of each component, keyed by id).
+    The errors in the declarations of the models are reported.
+
+    Args:
+        raw_data (dict):        The raw data of the DEVSMap json files, keyed by filename.
+        file_types (dict):      The DEVSMap file type of each file, keyed by filename.
+        report (function):      Reports an error, from the filename, the keys leading to the
+                                value at fault and a message.
+    '''
+    models = {}
+    for filename, file_type in file_types.items():
+        if file_type not in ('atomic', 'coupled'):
+            continue
+        file_data = raw_data[filename]
+        if not isinstance(file_data, dict) or not file_data or not isinstance(next(iter(file_data.values())), dict):
+            report(filename, (), f'The {file_type} model file must be an object whose first key is the name of the model.')
+            continue
+        model_name = list(file_data.keys())[0]
+        model_data = file_data[model_name]
+        if model_name in models:
+            report(filename, (model_name,), f'The model "{model_name}" is also defined in {models[model_name]["file"]}.')
+            continue
+        if not IDENTIFIER_PATTERN.fullmatch(model_name):
+            report(filename, (model_name,), f'The model name "{model_name}" is not a valid C++ identifier.')
+
+        model = {'kind': file_type, 'name': model_name, 'file': filename, 'data': model_data}
+        required = file_type == 'atomic'
+        model['x'] = index_declarations(model, 'x', 'input port', required, report)
+        model['y'] = index_declarations(model, 'y', 'output port', required, report)
+        if file_type == 'atomic':
+            model['s'] = index_declarations(model, 's', 'state variable', True, report)
+            parameters = file_data.get('parameters')
+            model['parameters'] = set(parameters) if isinstance(parameters, dict) else set()
+        else:
+            model['components'] = index_components(model, report)
+        models[model_name] = model
+    return models
+
+
+def index_declarations(model, key, kind, required, report):
+    '''
+    Returns the C++ type of each name declared in model['data'][key] (the input ports 'x', the
+    output ports 'y' or the state variables 's'), keyed by name.  The names that are not valid
+    C++ identifiers, and the types that are not strings, are reported.
+
+    Args:
+        model (dict):       The model being indexed (see index_models()).
+        key (str):          The key of the declarations in the DEVSMap data of the model.
+        kind (str):         The kind of the names declared, used in the error messages.
+        required (bool):    True if the declarations must be present.
+        report (function):  Reports an error (see index_models()).
+    '''
+    declarations = model['data'].get(key)
+    if declarations is None and not required:
+        return {}
+    if not isinstance(declarations, dict):
+        report(model['file'], (model['name'], key), f'The {kind}s of {model["name"]} must be an object of names to C++ types.')
+        return {}
+    for name, declared_type in declarations.items():
+        if not IDENTIFIER_PATTERN.fullmatch(name):
+            report(model['file'], (model['name'], key, name), f'The {kind} name "{name}" is not a valid C++ identifier.')
+        if not isinstance(declared_type, str) or not declared_type.strip():
+            report(model['file'], (model['name'], key, name), f'The type of the {kind} "{name}" must be a C++ type name.')
+    return {name: declared_type for name, declared_type in declarations.items() if isinstance(declared_type, str)}
+
+
+def index_components(model, report):
+    '''
+    Returns the model name of each component of a coupled model, keyed by component id.  The
+    component ids that are not valid C++ identifiers, or that are used twice, are reported.
+
+    Args:
+        model (dict):       The coupled model being indexed (see index_models()).
+        report (function):  Reports an error (see index_models()).
+    '''
+    components = model['data'].get('components')
+    if not isinstance(components, dict):
+        report(model['file'], (model['name'], 'components'), f'The components of {model["name"]} must be an object of model names to ids.')
+        return {}
+    component_models = {}
+    for model_name, model_id in components.items():
+        keys = (model['name'], 'components', model_name)
+        if not isinstance(model_id, str) or not IDENTIFIER_PATTERN.fullmatch(model_id):
+            report(model['file'], keys, f'The id of the component {model_name} must be a valid C++ identifier, not {model_id!r}.')
+        elif model_id in component_models:
+            report(model['file'], keys, f'The component id "{model_id}" is already used by the component {component_models[model_id]}.')
+        else:
+            component_models[model_id] = model_name
+    return component_models
+
+
+def validate_coupled_model(model, models, report):
+    '''
+    Reports the components of a coupled model that are not known models, and the couplings
+    (ic, eic and eoc) between components, ports or types that do not match.
+
+    Args:
+        model (dict):       The coupled model (see index_models()).
+        models (dict):      The index of the models returned by index_models().
+        report (function):  Reports an error (see index_models()).
+    '''
+    for model_id, model_name in model['components'].items():
+        if model_name not in models:
+            report(model['file'], (model['name'], 'components', model_name),
+                   f'The component "{model_id}" is an instance of {model_name}, which is not an atomic or coupled model.')
+
+    for section, ends in COUPLING_ENDS.items():
+        couplings = model['data'].get(section)
+        if couplings is None and section != 'ic':
+            continue
+        if not isinstance(couplings, list):
+            report(model['file'], (model['name'], section), f'The {section} of {model["name"]} must be a list of couplings.')
+            continue
+        for i, coupling in enumerate(couplings):
+            if not isinstance(coupling, dict):
+                report(model['file'], (model['name'], section, i), 'The coupling must be an object.')
+                continue
+            port_types = [validate_coupling_end(model, models, section, i, coupling, end, report) for end in ends]
+            if None not in port_types and ' '.join(port_types[0].split()) != ' '.join(port_types[1].split()):
+                report(model['file'], (model['name'], section, i),
+                       f'The port {coupling[ends[0][1]]} ({port_types[0]}) is coupled to the port {coupling[ends[1][1]]} ({port_types[1]}) of another type.')
+
+
+def validate_coupling_end(model, models, section, index, coupling, end, report):
+    '''
+    Returns the C++ type of the port at one end of a coupling, or None if the component or
+    the port is not found (which is reported).
+
+    Args:
+        model (dict):       The coupled model of the coupling (see index_models()).
+        models (dict):      The index of the models returned by index_models().
+        section (str):      The kind of the coupling ('ic', 'eic' or 'eoc').
+        index (int):        The index of the coupling in its section.
+        coupling (dict):    The DEVSMap coupling.
+        end (tuple):        The end of the coupling (see COUPLING_ENDS).
+        report (function):  Reports an error (see index_models()).
+    '''
+    component_key, port_key, direction = end
+    keys = (model['name'], section, index)
+    owner = model
+    description = 'The coupled model ' + model['name']
+    if component_key is not None:
+        model_id = coupling.get(component_key)
+        if model_id is None:
+            report(model['file'], keys, f'The coupling has no "{component_key}".')
+            return None
+        if model_id not in model['components']:
+            report(model['file'], keys + (component_key,), f'{model["name"]} has no component "{model_id}".')
+            return None
+        owner = models.get(model['components'][model_id])
+        if owner is None:
+            return None
+        description = f'The component "{model_id}" ({owner["name"]})'
+
+    port = coupling.get(port_key)
+    if port is None:
+        report(model['file'], keys, f'The coupling has no "{port_key}".')
+        return None
+    if port not in owner[direction]:
+        report(model['file'], keys + (port_key,), f'{description} has no {PORT_KINDS[direction]} port "{port}".')
+        return None
+    return owner[direction][port]
+
+
+def validate_atomic_model(model, report):
+    '''
+    Reports the errors in the functions of an atomic model: missing functions, assignments to
+    names that are not state variables (or output ports in lambda), bags of ports that are not
+    input ports or used outside of delta_ext, and unknown identifiers in the expressions.
+
+    Args:
+        model (dict):       The atomic model (see index_models()).
+        report (function):  Reports an error (see index_models()).
+    '''
+    known_names = set(model['s']) | set(model['x']) | set(model['y']) | model['parameters']
+    for function_kind in FUNCTION_KINDS:
+        function = model['data'].get(function_kind)
+        keys = (model['name'], function_kind)
+        if not isinstance(function, dict):
+            report(model['file'], keys, f'The {function_kind} function of {model["name"]} must be an object of conditions to blocks.')
+        elif function_kind == 'ta':
+            for condition, value in function.items():
+                if condition != 'otherwise':
+                    validate_expression(model, condition, function_kind, known_names, keys + (condition,), report)
+                if isinstance(value, str):
+                    validate_expression(model, value, function_kind, known_names, keys + (condition,), report)
+                else:
+                    report(model['file'], keys + (condition,), 'The time advance must be an expression.')
+        else:
+            validate_block(model, function, function_kind, known_names, keys, report)
+
+
+def validate_block(model, block, function_kind, known_names, keys, report):
+    '''
+    Reports the errors in a block of a function of an atomic model (see validate_atomic_model()):
+    its assignments, its loops over bags, and its conditions, with the blocks nested in them.
+
+    Args:
+        model (dict):           The atomic model (see index_models()).
+        block (dict):           The DEVSMap dictionary of the block.
+        function_kind (str):    The DEVSMap function of the block (one of FUNCTION_KINDS).
+        known_names (set):      The identifiers that can be used in the expressions of the block.
+        keys (tuple):           The keys leading to the block in the file of the model.
+        report (function):      Reports an error (see index_models()).
+    '''
+    for key, value in block.items():
+        for_each = parse_for_each(key)
+        if isinstance(value, dict) and for_each is not None:
+            variable, port = for_each
+            if function_kind != 'delta_ext':
+                report(model['file'], keys + (key,), f'The bag of port "{port}" is iterated in {function_kind}, but bags can only be used in delta_ext.')
+            elif port not in model['x']:
+                report(model['file'], keys + (key,), f'{model["name"]} has no input port "{port}".')
+            if variable in model['s']:
+                report(model['file'], keys + (key,), f'The loop variable "{variable}" has the same name as a state variable.')
+            validate_block(model, value, function_kind, known_names | {variable}, keys + (key,), report)
+        elif isinstance(value, dict):
+            if key != 'otherwise':
+                validate_expression(model, key, function_kind, known_names, keys + (key,), report)
+            validate_block(model, value, function_kind, known_names, keys + (key,), report)
+        elif isinstance(value, str):
+            try:
+                target = parse_assignment_target(key)
+            except ValueError as e:
+                report(model['file'], keys + (key,), str(e))
+            else:
+                if function_kind == 'lambda' and target not in model['y']:
+                    report(model['file'], keys + (key,), f'"{target}" is assigned in lambda, but it is not an output port of {model["name"]}.')
+                elif function_kind != 'lambda' and target not in model['s']:
+                    report(model['file'], keys + (key,), f'"{target}" is assigned in {function_kind}, but it is not a state variable of {model["name"]}.')
+            validate_expression(model, value, function_kind, known_names, keys + (key,), report)
+        else:
+            report(model['file'], keys + (key,), 'The value must be an expression, or the object of a block.')
+
+
+def validate_expression(model, expression, function_kind, known_names, keys, report):
+    '''
+    Reports the errors in a DEVSMap expression of an atomic model: a syntax error, a bag
+    operation outside of delta_ext or on a port that is not an input port, and the identifiers
+    that are not known names (see the top of this file).
+
+    Args:
+        model (dict):           The atomic model (see index_models()).
+        expression (str):       The DEVSMap expression.
+        function_kind (str):    The DEVSMap function of the expression (one of FUNCTION_KINDS).
+        known_names (set):      The identifiers that can be used in the expression.
+        keys (tuple):           The keys leading to the expression in the file of the model.
+        report (function):      Reports an error (see index_models()).
+    '''
+    try:
+        nodes = parse_expression(expression)
+    except ValueError as e:
+        report(model['file'], keys, str(e))
+        return
+    for i, node in enumerate(nodes):
+        if node[0] in (BAG_EMPTY, BAG_SIZE, BAG_ITEM):
+            if function_kind != 'delta_ext':
+                report(model['file'], keys, f'The bag of port "{node[1]}" is used in {function_kind}, but bags can only be used in delta_ext: "{expression}"')
+            elif node[1] not in model['x']:
+                report(model['file'], keys, f'{model["name"]} has no input port "{node[1]}": "{expression}"')
+        elif node[0] == IDENTIFIER and not is_known_identifier(node[1], nodes[i + 1] if i + 1 < len(nodes) else None, function_kind, known_names):
+            report(model['file'], keys, f'"{node[1]}" is not a state variable, port or parameter of {model["name"]}: "{expression}"')
+
+
+def is_known_identifier(name, next_node, function_kind, known_names):
+    '''
+    Returns True if the identifier name of an expression is known (see the top of this file).
+
+    Args:
+        name (str):             The identifier.
+        next_node (tuple):      The node of the IR after the identifier, or None.
+        function_kind (str):    The DEVSMap function of the expression (one of FUNCTION_KINDS).
+        known_names (set):      The identifiers that can be used in the expression.
+    '''
+    if name in known_names or name in CPP_KEYWORDS or MACRO_PATTERN.fullmatch(name):
+        return True
+    if function_kind == 'delta_ext' and name == 'e':
+        return True
+    return next_node is not None and next_node[0] == TEXT and next_node[1].lstrip().startswith(('(', '::'))
+
+
+def validate_experiment(experiment, filename, models, report):
+    '''
+    Reports the errors of the experiment file: a model under test that is not a coupled model,
+    invalid runs, and sweep points that do not match the components (see validate_init_states()).
+
+    Args:
+        experiment (dict):  The data of the experiment file.
+        filename (str):     The name of the experiment file.
+        models (dict):      The index of the models returned by index_models().
+        report (function):  Reports an error (see index_models()).
+    '''
+    model_under_test = experiment.get('model_under_test') if isinstance(experiment, dict) else None
+    if not isinstance(model_under_test, dict) or not isinstance(model_under_test.get('model'), str):
+        report(filename, ('model_under_test', 'model'), 'The experiment must give the file of its model under test.')
+    else:
+        top_model_name = get_top_model_name(experiment)
+        if models.get(top_model_name, {}).get('kind') != 'coupled':
+            report(filename, ('model_under_test', 'model'), f'The model under test "{top_model_name}" is not a coupled model.')
+    if not isinstance(experiment, dict):
+        return
+
+    try:
+        sweep = get_run_settings(experiment)['sweep']
+    except (TypeError, ValueError) as e:
+        report(filename, ('runs',), str(e))
+        return
+    for i, sweep_point in enumerate(sweep):
+        if not isinstance(sweep_point, dict):
+            report(filename, ('runs', 'sweep', i), 'The sweep point must be an object of init states.')
+        else:
+            validate_init_states(sweep_point, filename, ('runs', 'sweep', i), models, report, partial=True)
+
+
+def validate_init_states(init_states, filename, keys, models, report, partial=False):
+    '''
+    Reports the errors of the init states: the coupled models and component ids that do not
+    exist, the values of names that are not state variables, and the instances that do not
+    give a value to every state variable (unless partial).
+
+    Args:
+        init_states (dict):     The DEVSMap init states, keyed by coupled model name.
+        filename (str):         The name of the file of the init states.
+        keys (tuple):           The keys leading to the init states in the file.
+        models (dict):          The index of the models returned by index_models().
+        report (function):      Reports an error (see index_models()).
+        partial (bool):         True if the init states only override some values (a sweep point).
+    '''
+    def validate_instance(model, values, keys):
+        if not isinstance(values, dict):
+            report(filename, keys, f'The init states of an instance of {model["name"]} must be an object.')
+        elif model['kind'] == 'coupled':
+            for model_id, component_values in values.items():
+                if model_id not in model['components']:
+                    report(filename, keys + (model_id,), f'{model["name"]} has no component "{model_id}".')
+                elif model['components'][model_id] in models:
+                    validate_instance(models[model['components'][model_id]], component_values, keys + (model_id,))
+        else:
+            for variable_name, value in values.items():
+                if variable_name not in model['s']:
+                    report(filename, keys + (variable_name,), f'"{variable_name}" is not a state variable of {model["name"]}.')
+                elif isinstance(value, (dict, list)):
+                    report(filename, keys + (variable_name,), 'The initial value must be an expression.')
+                elif isinstance(value, str):
+                    try:
+                        parse_expression(value)
+                    except ValueError as e:
+                        report(filename, keys + (variable_name,), str(e))
+            missing_variables = [variable_name for variable_name in model['s'] if variable_name not in values]
+            if missing_variables and not partial:
+                report(filename, keys, f'No initial value is given to the state variables {", ".join(missing_variables)} of {model["name"]}.')
+
+    for coupled_model_name, values in init_states.items():
+        if models.get(coupled_model_name, {}).get('kind') != 'coupled':
+            report(filename, keys + (coupled_model_name,), f'"{coupled_model_name}" is not a coupled model.')
+        else:
+            validate_instance(models[coupled_model_name], values, keys + (coupled_model_name,))
@@ -0,0 +1,133 @@
+# Functions for laying out the fields of the state struct of the atomic models.
+#
+# The state struct declares its fields in the order of the state variables of the DEVSMap
+# file.  A C++ compiler cannot reorder them, so a mix of bool, int and double fields in that
+# order leaves padding between them (for example, bool, double, bool takes 24 bytes instead
+# of 16).  Cadmium copies the state of a model for every event and every log line, so the
+# layout pass declares the fields in order of decreasing alignment and size instead.  Only
+# the declarations (and the initializer list of the constructor, which must follow them)
+# are reordered: operator<< keeps the order of the DEVSMap file, so the logs do not change.
+#
+# The sizes and alignments are those of the usual 64-bit ABIs (LP64).  Types not found in
+# STATE_TYPE_LAYOUTS (for example, user defined types) are assumed to be 8 bytes, aligned
+# on 8 bytes, so the sizes reported are estimates.
+
+# The (size, alignment) in bytes of the C++ types used for state variables.
+STATE_TYPE_LAYOUTS = {
+    'bool': (1, 1),
+    'char': (1, 1),
+    'signed char': (1, 1),
+    'unsigned char': (1, 1),
+    'int8_t': (1, 1),
+    'uint8_t': (1, 1),
+    'std::int8_t': (1, 1),
+    'std::uint8_t': (1, 1),
+    'short': (2, 2),
+    'unsigned short': (2, 2),
+    'int16_t': (2, 2),
+    'uint16_t': (2, 2),
+    'std::int16_t': (2, 2),
+    'std::uint16_t': (2, 2),
+    'int': (4, 4),
+    'unsigned': (4, 4),
+    'unsigned int': (4, 4),
+    'float': (4, 4),
+    'int32_t': (4, 4),
+    'uint32_t': (4, 4),
+    'std::int32_t': (4, 4),
+    'std::uint32_t': (4, 4),
+    'long': (8, 8),
+    'unsigned long': (8, 8),
+    'long long': (8, 8),
+    'unsigned long long': (8, 8),
+    'double': (8, 8),
+    'int64_t': (8, 8),
+    'uint64_t': (8, 8),
+    'std::int64_t': (8, 8),
+    'std::uint64_t': (8, 8),
+    'size_t': (8, 8),
+    'std::size_t': (8, 8),
+    'long double': (16, 16),
+    'std::string': (32, 8),
+}
+
+DEFAULT_TYPE_LAYOUT = (8, 8)
+
+
+def get_type_layout(variable_type):
+    '''
+    Returns the (size, alignment) in bytes of a C++ type (see STATE_TYPE_LAYOUTS).
+
+    Args:
+        variable_type (str):    The C++ type of a state variable, as written in the DEVSMap file.
+    '''
+    return STATE_TYPE_LAYOUTS.get(' '.join(variable_type.split()), DEFAULT_TYPE_LAYOUT)
+
+
+def estimate_struct_size(variable_types):
+    '''
+    Returns the estimated sizeof of a struct whose fields have the types in variable_types,
+    declared in that order.
+
+    Args:
+        variable_types (list):  The C++ types of the fields of the struct.
+    '''
+    offset = 0
+    struct_alignment = 1
+    for variable_type in variable_types:
+        size, alignment = get_type_layout(variable_type)
+        offset = -(-offset // alignment) * alignment + size
+        struct_alignment = max(struct_alignment, alignment)
+    # An empty struct still takes one byte.
+    return max(-(-offset // struct_alignment) * struct_alignment, 1)
+
+
+def order_state_variables(state_variables):
+    '''
+    Returns the list of (variable name, variable type) pairs of state_variables in the order
+    that minimizes the padding of the state struct: by decreasing alignment, then decreasing
+    size.  Variables with the same alignment and size keep the order of the DEVSMap file.
+
+    Args:
+        state_variables (dict_items):   The state variables of the atomic model, returned by
+                                        atomic_model['s'].items()
+    '''
+    def layout_key(variable):
+        size, alignment = get_type_layout(variable[1])
+        return -alignment, -size
+    return sorted(state_variables, key=layout_key)
+
+
+def get_state_layout_report(data):
+    '''
+    Returns a list with a dictionary for each atomic model of data, with its 'model' name, the
+    estimated sizeof of its state struct with the fields in the order of the DEVSMap file
+    ('declared_size') and in the order of order_state_variables() ('packed_size').
+
+    Args:
+        data (dict):    The DEVSMap json data that has been sorted into a dictionary.
+    '''
+    report = []
+    for atomic_model_data in data['atomic_models']:
+        atomic_model_name = list(atomic_model_data.keys())[0]
+        state_variables = atomic_model_data[atomic_model_name]['s'].items()
+        report.append({'model': atomic_model_name,
+                       'declared_size': estimate_struct_size([variable_type for _, variable_type in state_variables]),
+                       'packed_size': estimate_struct_size([variable_type for _, variable_type in order_state_variables(state_variables)])})
+    return report
+
+
+def print_state_layout_report(report):
+    '''
+    Prints the estimated sizeof of the state struct of each atomic model, before and after
+    the layout pass, and the total over every atomic model.
+
+    Args:
+        report (list):  The report returned by get_state_layout_report().
+    '''
+    print("Estimated sizeof of the state structs (declared order -> packed order):")
+    for entry in report:
+        print(f"\t{entry['model']:<40}{entry['declared_size']:6} -> {entry['packed_size']:6} bytes")
+    declared_total = sum(entry['declared_size'] for entry in report)
+    packed_total = sum(entry['packed_size'] for entry in report)
+    print(f"\t{'total':<40}{declared_total:6} -> {packed_total:6} bytes")
@@ -0,0 +1,151 @@
+# Shared fixtures of the tests.  The generator is a set of top level modules run from the
+# repository root, so the root is added to the import path.
+
+import concurrent.futures
+import copy
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+# A small DEVSMap project: the coupled model "blinker_system" with one "blinker" atomic model,
+# whose output is the output of the system.
+BLINKER_PROJECT = {
+    'blinker_atomic.json': {
+        'blinker': {
+            's': {'on': 'bool', 'sigma': 'double'},
+            'x': {'toggle_in': 'bool'},
+            'y': {'on_out': 'bool'},
+            'delta_int': {'otherwise': {'on': '!on'}},
+            'delta_ext': {'otherwise': {'on': 'toggle_in.bag(-1)', 'sigma': '0.0'}},
+            'lambda': {'otherwise': {'on_out': '!on'}},
+            'ta': {'otherwise': 'sigma'}
+        },
+        'include_sets': [],
+        'parameters': {}
+    },
+    'blinker_system_coupled.json': {
+        'blinker_system': {
+            'x': {'toggle': 'bool'},
+            'y': {'light': 'bool'},
+            'components': {'blinker': 'blinker_model'},
+            'eic': [{'port_from': 'toggle', 'port_to': 'toggle_in', 'component_to': 'blinker_model'}],
+            'eoc': [{'port_from': 'on_out', 'port_to': 'light', 'component_from': 'blinker_model'}],
+            'ic': []
+        },
+        'include_sets': []
+    },
+    'blinker_system_experiment.json': {
+        'model_under_test': {
+            'model': 'blinker_system_coupled.json',
+            'initial_state': 'blinker_system_init_state.json',
+            'parameters': ''
+        },
+        'experimental_frame': {},
+        'cpic': {},
+        'pocc': {},
+        'time_span': '10.0'
+    },
+    'blinker_system_init_state.json': {
+        'init_states': {
+            'blinker_system': {
+                'blinker_model': {'on': 'false', 'sigma': '1.0'}
+            }
+        }
+    }
+}
+
+
+# The blinker system nested in the coupled model "plant", next to a second blinker instance
+# ("echo_model") with other initial values, which toggles the system and is toggled by it.
+PLANT_PROJECT = {
+    'blinker_atomic.json': BLINKER_PROJECT['blinker_atomic.json'],
+    'blinker_system_coupled.json': BLINKER_PROJECT['blinker_system_coupled.json'],
+    'plant_coupled.json': {
+        'plant': {
+            'x': {'start': 'bool'},
+            'y': {'light': 'bool', 'echo': 'bool'},
+            'components': {'blinker_system': 'system_model', 'blinker': 'echo_model'},
+            'eic': [{'port_from': 'start', 'port_to': 'toggle', 'component_to': 'system_model'}],
+            'eoc': [{'port_from': 'light', 'port_to': 'light', 'component_from': 'system_model'},
+                    {'port_from': 'on_out', 'port_to': 'echo', 'component_from': 'echo_model'}],
+            'ic': [{'port_from': 'light', 'port_to': 'toggle_in', 'component_from': 'system_model', 'component_to': 'echo_model'},
+                   {'port_from': 'on_out', 'port_to': 'toggle', 'component_from': 'echo_model', 'component_to': 'system_model'}]
+        },
+        'include_sets': []
+    },
+    'plant_experiment.json': dict(BLINKER_PROJECT['blinker_system_experiment.json'],
+                                  model_under_test={'model': 'plant_coupled.json',
+                                                    'initial_state': 'plant_init_state.json',
+                                                    'parameters': ''}),
+    'plant_init_state.json': {
+        'init_states': {
+            'plant': {
+                'system_model': {
+                    'blinker_model': {'on': 'false', 'sigma': '1.0'}
+                },
+                'echo_model': {'on': 'true', 'sigma': '2.5'}
+            }
+        }
+    }
+}
+
+
+@pytest.fixture
+def blinker_project():
+    '''
+    Returns a copy of the json files of the blinker project, keyed by filename, which a test
+    can change before generating it.
+    '''
+    return copy.deepcopy(BLINKER_PROJECT)
+
+
+@pytest.fixture
+def plant_project():
+    '''
+    Returns a copy of the json files of the plant project (see PLANT_PROJECT), keyed by filename.
+    '''
+    return copy.deepcopy(PLANT_PROJECT)
+
+
+@pytest.fixture
+def write_project(tmp_path):
+    '''
+    Returns a function write_project(project, directory=tmp_path) that writes the json files of
+    a project (keyed by filename) to directory, and returns directory.
+    '''
+    def write(project, directory=tmp_path):
+        os.makedirs(directory, exist_ok=True)
+        for filename, data in project.items():
+            with open(os.path.join(directory, filename), 'w') as file:
+                json.dump(data, file)
+        return str(directory)
+    return write
+
+
+@pytest.fixture
+def broken_process_pool(monkeypatch):
+    '''
+    Replaces the process pool with one whose worker processes die (as when one is killed by
+    the out-of-memory killer), so that every map() raises BrokenProcessPool.
+    '''
+    from concurrent.futures.process import BrokenProcessPool
+
+    class BrokenProcessPoolExecutor:
+        def __init__(self, max_workers=None):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exception):
+            return False
+
+        def map(self, *arguments, **keyword_arguments):
+            raise BrokenProcessPool('A process in the process pool was terminated abruptly.')
+
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', BrokenProcessPoolExecutor)
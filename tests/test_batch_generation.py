@@ -0,0 +1,37 @@
+import os
+
+from batch_generation import generate_batch, read_batch_json_files
+from parser_reading_files import scan_json_directory
+
+
+def test_every_project_is_generated_in_its_own_directory(blinker_project, plant_project, write_project, tmp_path):
+    project_directories = [write_project(blinker_project, tmp_path / 'projects' / 'blinker'),
+                           write_project(plant_project, tmp_path / 'projects' / 'plant')]
+    del plant_project['plant_experiment.json']
+    project_directories.append(write_project(plant_project, tmp_path / 'projects' / 'broken'))
+
+    results = generate_batch(project_directories, str(tmp_path / 'output'), jobs=1)
+
+    assert [(os.path.basename(result['project']), result['status'], result['files']) for result in results] == [('blinker', 'generated', 3),
+                                                                                                               ('plant', 'generated', 4),
+                                                                                                               ('broken', 'invalid', 0)]
+    assert os.path.isfile(tmp_path / 'output' / 'blinker' / 'include' / 'blinker_system.hpp')
+    assert os.path.isfile(tmp_path / 'output' / 'plant' / 'include' / 'plant.hpp')
+    assert not os.path.exists(tmp_path / 'output' / 'broken' / 'main.cpp')
+
+
+def test_identical_files_are_parsed_once(blinker_project, plant_project, write_project, tmp_path):
+    project_directories = [write_project(blinker_project, tmp_path / 'blinker'), write_project(plant_project, tmp_path / 'plant')]
+    batch_json_data = read_batch_json_files({directory: scan_json_directory(directory) for directory in project_directories})
+
+    blinker_data, plant_data = (batch_json_data[directory] for directory in project_directories)
+    assert blinker_data['blinker_atomic.json'] is plant_data['blinker_atomic.json']
+    assert plant_data['plant_coupled.json'] == plant_project['plant_coupled.json']
+
+
+def test_a_broken_process_pool_falls_back_to_serial_generation(blinker_project, plant_project, write_project, tmp_path, broken_process_pool):
+    project_directories = [write_project(blinker_project, tmp_path / 'blinker'), write_project(plant_project, tmp_path / 'plant')]
+
+    results = generate_batch(project_directories, str(tmp_path / 'output'), jobs=2)
+
+    assert [result['status'] for result in results] == ['generated', 'generated']
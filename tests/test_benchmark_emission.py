@@ -0,0 +1,12 @@
+from benchmarks.benchmark_emission import print_result, run_benchmark
+
+
+def test_the_emission_benchmark_measures_time_and_memory(capsys):
+    result = run_benchmark(number_of_state_variables=20, number_of_conditions=20, repeat=1)
+    assert result['code_length'] > 0
+    assert result['generation_seconds'] > 0
+    assert result['peak_memory_bytes'] > 0
+    assert result['write_seconds'] >= 0
+
+    print_result(result)
+    assert capsys.readouterr().out.startswith('20 state variables, 20 conditions, ')
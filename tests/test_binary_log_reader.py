@@ -0,0 +1,119 @@
+import io
+import os
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+from binary_log_reader import HEADER_SIZE, MAGIC, RECORD_FORMAT, convert_binary_log_to_csv, read_binary_log
+from generate_binary_logger_hpp import RECORD_MODEL_NAME, RECORD_OUTPUT, RECORD_PORT_NAME, RECORD_STATE, generate_binary_logger
+
+# A minimal Cadmium Logger, with the same virtual functions as cadmium/simulation/logger/logger.hpp.
+LOGGER_HPP = '''#pragma once
+#include <string>
+namespace cadmium {
+	struct Logger {
+		virtual ~Logger() = default;
+		virtual void start() = 0;
+		virtual void stop() = 0;
+		virtual void logOutput(double time, long modelId, const std::string& modelName, const std::string& portName, const std::string& output) = 0;
+		virtual void logState(double time, long modelId, const std::string& modelName, const std::string& state) = 0;
+	};
+}
+'''
+
+# Logs the same records as write_log(), through the generated BinaryLogger, with a block
+# size small enough that the records and strings are written in several blocks.
+MAIN_CPP = '''#include "binary_logger.hpp"
+int main(int argc, char** argv) {
+	cadmium::BinaryLogger logger(argv[1], 64);
+	logger.start();
+	logger.logState(0.0, 1, "blinker", "<on: 0, sigma: 1>");
+	logger.logOutput(1.0, 1, "blinker", "on_out", "1");
+	logger.logState(1.0, 1, "blinker", "<on: 1, sigma: 1>");
+	logger.logOutput(1.5, 2, "echo", "on_out", "0");
+	logger.logState(2.0, 1, "blinker", "<on: 0, sigma: 1>");
+	logger.stop();
+}
+'''
+
+EXPECTED_RECORDS = [(0.0, 1, 'blinker', None, '<on: 0, sigma: 1>'),
+                    (1.0, 1, 'blinker', 'on_out', '1'),
+                    (1.0, 1, 'blinker', None, '<on: 1, sigma: 1>'),
+                    (1.5, 2, 'echo', 'on_out', '0'),
+                    (2.0, 1, 'blinker', None, '<on: 0, sigma: 1>')]
+
+
+def write_log(filepath):
+    '''
+    Writes a binary log laid out as the generated BinaryLogger writes it: the name of each
+    model and port is recorded before its first record.
+    '''
+    records = []
+    strings = b''
+
+    def add_record(time, model_id, port_id, kind, text):
+        nonlocal strings
+        records.append(struct.pack('<' + RECORD_FORMAT, time, len(strings), len(text), model_id, port_id, kind))
+        strings += text.encode('utf-8')
+
+    add_record(0, 1, 0, RECORD_MODEL_NAME, 'blinker')
+    add_record(0.0, 1, 0, RECORD_STATE, '<on: 0, sigma: 1>')
+    add_record(0, 1, 0, RECORD_PORT_NAME, 'on_out')
+    add_record(1.0, 1, 0, RECORD_OUTPUT, '1')
+    add_record(1.0, 1, 0, RECORD_STATE, '<on: 1, sigma: 1>')
+    add_record(0, 2, 0, RECORD_MODEL_NAME, 'echo')
+    add_record(0, 2, 1, RECORD_PORT_NAME, 'on_out')
+    add_record(1.5, 2, 1, RECORD_OUTPUT, '0')
+    add_record(2.0, 1, 0, RECORD_STATE, '<on: 0, sigma: 1>')
+    with open(filepath, 'wb') as file:
+        file.write(MAGIC + struct.pack('<II', 0x01020304, struct.calcsize('<' + RECORD_FORMAT)) + b''.join(records))
+    with open(filepath + '.strings', 'wb') as file:
+        file.write(strings)
+
+
+def test_the_records_are_read_back(tmp_path):
+    filepath = str(tmp_path / 'log.bin')
+    write_log(filepath)
+    assert os.path.getsize(filepath) == HEADER_SIZE + 9 * 32
+    assert list(read_binary_log(filepath)) == EXPECTED_RECORDS
+
+
+def test_the_log_is_converted_to_csv(tmp_path):
+    filepath = str(tmp_path / 'log.bin')
+    write_log(filepath)
+    csv_file = io.StringIO()
+    convert_binary_log_to_csv(filepath, csv_file)
+    assert csv_file.getvalue().splitlines()[:3] == ['time;model_id;model_name;port_name;data',
+                                                    '0;1;blinker;;<on: 0, sigma: 1>',
+                                                    '1;1;blinker;on_out;1']
+
+
+def test_a_file_that_is_not_a_binary_log_is_rejected(tmp_path):
+    filepath = str(tmp_path / 'log.bin')
+    write_log(filepath)
+    with open(filepath, 'r+b') as file:
+        file.write(b'DEVSTXT1')
+    with pytest.raises(ValueError):
+        list(read_binary_log(filepath))
+
+
+@pytest.mark.skipif(shutil.which('g++') is None, reason='needs a C++ compiler')
+def test_the_log_of_the_generated_logger_is_read_back(tmp_path):
+    os.makedirs(tmp_path / 'cadmium' / 'simulation' / 'logger')
+    with open(tmp_path / 'cadmium' / 'simulation' / 'logger' / 'logger.hpp', 'w') as file:
+        file.write(LOGGER_HPP)
+    with open(tmp_path / 'main.cpp', 'w') as file:
+        file.write(MAIN_CPP)
+    generate_binary_logger(str(tmp_path) + os.sep)
+    subprocess.run(['g++', '-std=c++17', '-I', str(tmp_path), '-o', str(tmp_path / 'main'), str(tmp_path / 'main.cpp')], check=True)
+
+    filepath = str(tmp_path / 'log.bin')
+    subprocess.run([str(tmp_path / 'main'), filepath], check=True)
+
+    assert list(read_binary_log(filepath)) == EXPECTED_RECORDS
+    write_log(str(tmp_path / 'expected.bin'))
+    for suffix in ('', '.strings'):
+        with open(filepath + suffix, 'rb') as file, open(str(tmp_path / 'expected.bin') + suffix, 'rb') as expected_file:
+            assert file.read() == expected_file.read()
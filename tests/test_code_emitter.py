@@ -0,0 +1,16 @@
+import os
+
+from code_emitter import write_file_atomically
+
+
+def test_files_are_replaced_with_the_permissions_of_open(tmp_path):
+    filepath = str(tmp_path / 'model.hpp')
+    with open(str(tmp_path / 'reference.hpp'), 'w') as file:
+        file.write('reference')
+    write_file_atomically(filepath, 'first')
+    write_file_atomically(filepath, 'second')
+
+    with open(filepath, 'r') as file:
+        assert file.read() == 'second'
+    assert os.stat(filepath).st_mode & 0o777 == os.stat(str(tmp_path / 'reference.hpp')).st_mode & 0o777
+    assert sorted(os.listdir(str(tmp_path))) == ['model.hpp', 'reference.hpp']
@@ -0,0 +1,97 @@
+from conditional_optimization import find_switch, fold_condition, optimize_branches
+from devsmap_to_cadmium import generate_cadmium_code
+
+
+def test_fold_condition():
+    assert fold_condition('true') is True
+    assert fold_condition('(!false)') is True
+    assert fold_condition('0') is False
+    assert fold_condition('!(1)') is False
+    assert fold_condition('(a) && (b)') is None
+    assert fold_condition('count > 0') is None
+
+
+def test_consecutive_branches_with_the_same_body_are_merged():
+    branches = optimize_branches({'a > 1': {'x': '1'},
+                                  'a < 0': {'x': '1'},
+                                  'a == 0': {'x': '2'},
+                                  'b': {'x': '1'},
+                                  'otherwise': {'x': '3'}})
+    # The last "a" and "b" branches are not consecutive, so they are not merged.
+    assert branches == [(['a > 1', 'a < 0'], {'x': '1'}),
+                        (['a == 0'], {'x': '2'}),
+                        (['b'], {'x': '1'}),
+                        (None, {'x': '3'})]
+
+
+def test_constant_guards_are_folded():
+    branches = optimize_branches({'false': {'x': '1'},
+                                  'a': {'x': '2'},
+                                  '(true)': {'x': '3'},
+                                  'b': {'x': '4'}})
+    assert branches == [(['a'], {'x': '2'}), (None, {'x': '3'})]
+
+
+def test_branches_like_the_otherwise_branch_are_removed():
+    assert optimize_branches({'a': {'x': '1'}, 'b': {'x': '2'}, 'otherwise': {'x': '2'}}) == [(['a'], {'x': '1'}), (None, {'x': '2'})]
+    assert optimize_branches({'a': {'x': '1'}, 'b': {}, 'otherwise': {}}) == [(['a'], {'x': '1'})]
+
+
+def test_branches_that_draw_random_numbers_are_kept():
+    branches = optimize_branches({'uniform_real(0.0, 1.0) < 0.5': {}, 'otherwise': {}})
+    assert branches == [(['uniform_real(0.0, 1.0) < 0.5'], {})]
+
+
+def test_switch_on_an_integer_state_variable():
+    branches = optimize_branches({'mode == 0': {'x': '1'},
+                                  'mode == 1': {'x': '2'},
+                                  '2 == mode': {'x': '2'},
+                                  'mode == 0x0': {'x': '3'},
+                                  'otherwise': {'x': '4'}})
+    variable, cases, default = find_switch(branches, {'mode': 'int', 'x': 'int'})
+    assert variable == 'mode'
+    # 0x0 was already compared by the first branch, so its branch is never taken.
+    assert cases == [(['0'], {'x': '1'}), (['1', '2'], {'x': '2'})]
+    assert default == {'x': '4'}
+
+
+def test_switch_on_an_enum_state_variable():
+    branches = optimize_branches({'phase == Phase::Idle': {'x': '1'},
+                                  'phase == Phase::Busy': {'x': '2'},
+                                  'phase == Phase::Done': {'x': '3'}})
+    variable, cases, default = find_switch(branches, {'phase': 'Phase'})
+    assert variable == 'phase'
+    assert [constants for constants, _ in cases] == [['Phase::Idle'], ['Phase::Busy'], ['Phase::Done']]
+    assert default is None
+
+
+def test_no_switch():
+    chain = {'mode == 0': {}, 'mode == 1': {}, 'mode == 2': {'x': '1'}}
+    # Too few cases, a non integer variable, guards on different variables, and a guard that is not an equality.
+    assert find_switch(optimize_branches({'mode == 0': {'x': '1'}, 'mode == 1': {'x': '2'}}), {'mode': 'int'}) is None
+    assert find_switch(optimize_branches(chain), {'mode': 'double'}) is None
+    assert find_switch(optimize_branches(dict(chain, **{'other == 3': {'x': '2'}})), {'mode': 'int', 'other': 'int'}) is None
+    assert find_switch(optimize_branches({'mode == 0': {'x': '1'}, 'mode > 1': {'x': '2'}, 'mode == 2': {'x': '3'}}), {'mode': 'int'}) is None
+
+
+def test_emitted_transitions(blinker_project):
+    model = blinker_project['blinker_atomic.json']['blinker']
+    model['s']['mode'] = 'int'
+    model['delta_int'] = {'mode == 0': {'mode': '1'}, 'mode == 1': {'mode': '2'}, 'mode == 2': {'mode': '0'}, 'otherwise': {}}
+    model['delta_ext'] = {'toggle_in.bagSize() > 1': {'on': 'true'},
+                          'toggle_in.bagSize() == 1': {'on': 'true'},
+                          'false': {'on': 'false'},
+                          'otherwise': {'sigma': '1.0'}}
+    blinker_project['blinker_system_init_state.json']['init_states']['blinker_system']['blinker_model']['mode'] = '0'
+    code = generate_cadmium_code(blinker_project)['include/blinker.hpp']
+
+    assert ('\t\tswitch (state.mode) {\n'
+            '\t\t\tcase 0:\n'
+            '\t\t\t\tstate.mode = 1;\n'
+            '\t\t\t\tbreak;\n') in code
+    assert ('\t\tif ((toggle_in_bag.size() > 1) || (toggle_in_bag.size() == 1)) {\n'
+            '\t\t\tstate.on = true;\n'
+            '\t\t} else {\n'
+            '\t\t\tstate.sigma = 1.0;\n'
+            '\t\t}\n') in code
+    assert 'state.on = false;' not in code
@@ -0,0 +1,89 @@
+import pytest
+
+from devsmap_expressions import (BAG_EMPTY, BAG_ITEM, BAG_SIZE, FUNCTION_KINDS, emit_assignment, emit_bag_declarations,
+                                 emit_condition, emit_expression, parse_expression)
+
+STATE_VARIABLES = {'count', 'count_max', 'sigma'}
+
+
+@pytest.mark.parametrize('function_kind', FUNCTION_KINDS)
+def test_state_variables_are_prefixed(function_kind):
+    assert emit_expression('count + count_max', STATE_VARIABLES, function_kind) == 'state.count + state.count_max'
+    assert emit_expression('max(count, count_max) + f(count)', STATE_VARIABLES, function_kind) == \
+        'max(state.count, state.count_max) + f(state.count)'
+    assert emit_condition('count < count_max && other.count > 0', STATE_VARIABLES, function_kind) == \
+        'state.count < state.count_max && other.count > 0'
+
+
+def test_names_that_contain_a_state_variable_are_not_prefixed():
+    assert emit_expression('my_count + count_maximum + account', STATE_VARIABLES, 'delta_int') == 'my_count + count_maximum + account'
+    assert emit_expression('"count" + \'c\' + 1e5', STATE_VARIABLES, 'delta_int') == '"count" + \'c\' + 1e5'
+
+
+def test_inf_is_emitted_as_the_infinity_of_double():
+    assert emit_expression('inf', STATE_VARIABLES, 'ta') == 'std::numeric_limits<double>::infinity()'
+    assert emit_expression('infinite + inf', STATE_VARIABLES, 'ta') == 'infinite + std::numeric_limits<double>::infinity()'
+
+
+def test_the_random_primitives_draw_from_the_generator_of_the_instance():
+    assert emit_expression('rand() + uniform_real(0.0, sigma)', STATE_VARIABLES, 'ta') == \
+        'state.rng.rand() + state.rng.uniformReal(0.0, state.sigma)'
+    assert emit_expression('uniform_int(1, 6) + exponential(2.0) + normal(0.0, 1.0) + bernoulli(0.5)', STATE_VARIABLES, 'delta_int') == \
+        'state.rng.uniformInt(1, 6) + state.rng.exponential(2.0) + state.rng.normal(0.0, 1.0) + state.rng.bernoulli(0.5)'
+    # Only calls are random primitives, and a member named like one is left alone.
+    assert emit_expression('normal + other.rand()', STATE_VARIABLES, 'delta_int') == 'normal + other.rand()'
+
+
+def test_bag_items():
+    assert emit_expression('p.bag(-1) + p.bag(0) + p.bag(- 2)', STATE_VARIABLES, 'delta_ext') == \
+        'p->getBag().back() + p->getBag()[0] + p->getBag()[p->getBag().size() - 2]'
+    declarations, bag_variables = emit_bag_declarations({'p': {BAG_ITEM, BAG_EMPTY}}, {'p_bag'})
+    assert declarations == ['const auto& p_bag_ = p->getBag();\n', 'const bool p_empty = p_bag_.empty();\n']
+    assert emit_expression('p.bag(-1)', STATE_VARIABLES, 'delta_ext', bag_variables) == 'p_bag_.back()'
+    assert emit_condition('p.bagSize() == 0', STATE_VARIABLES, 'delta_ext', bag_variables) == 'p_empty'
+    with pytest.raises(ValueError):
+        parse_expression('p.bag(count)')
+
+
+@pytest.mark.parametrize('function_kind', ['delta_int', 'lambda', 'ta'])
+def test_bags_are_only_allowed_in_delta_ext(function_kind):
+    with pytest.raises(ValueError):
+        emit_expression('p.bag(-1)', STATE_VARIABLES, function_kind)
+    with pytest.raises(ValueError):
+        emit_condition('p.bagSize() != 0', STATE_VARIABLES, function_kind)
+
+
+@pytest.mark.parametrize('function_kind', ['delta_int', 'delta_ext'])
+def test_assignments_to_state_variables(function_kind):
+    assert emit_assignment('count', 'count + 1', STATE_VARIABLES, function_kind) == 'state.count = state.count + 1;\n'
+    assert emit_assignment(' sigma ', 'inf', STATE_VARIABLES, function_kind) == 'state.sigma = std::numeric_limits<double>::infinity();\n'
+
+
+def test_assignments_in_the_output_function_add_messages():
+    assert emit_assignment('count_out', 'count', STATE_VARIABLES, 'lambda') == 'count_out->addMessage(state.count);\n'
+    with pytest.raises(ValueError):
+        emit_assignment('count + 1', '0', STATE_VARIABLES, 'delta_int')
+
+
+def test_each_expression_is_parsed_once():
+    parse_expression.cache_clear()
+    for function_kind in FUNCTION_KINDS:
+        emit_expression('count * 2 + offset', STATE_VARIABLES, function_kind)
+        emit_expression('count * 2 + offset', {'offset'}, function_kind)
+    cache_info = parse_expression.cache_info()
+    assert (cache_info.misses, cache_info.hits) == (1, 2 * len(FUNCTION_KINDS) - 1)
+
+
+def test_whole_bag_size_comparisons_become_empty_tests():
+    assert emit_condition('p.bagSize() == 0', set(), 'delta_ext') == 'p->empty()'
+    assert emit_condition('p.bagSize() != 0', set(), 'delta_ext') == '!p->empty()'
+    assert emit_condition('(p.bagSize() > 0) && !q.bagSize() == 0', set(), 'delta_ext') == '(!p->empty()) && !q->empty()'
+    assert emit_condition('a || p.bagSize() != 0 || b', set(), 'delta_ext') == 'a || !p->empty() || b'
+
+
+def test_bag_size_operands_of_other_operators_are_not_folded():
+    assert emit_condition('n + p.bagSize() != 0', {'n'}, 'delta_ext') == 'state.n + p->getBag().size() != 0'
+    assert emit_condition('p.bagSize() == 0 + 1', set(), 'delta_ext') == 'p->getBag().size() == 0 + 1'
+    assert emit_condition('x * p.bagSize() > 0', set(), 'delta_ext') == 'x * p->getBag().size() > 0'
+    assert parse_expression('n + p.bagSize() != 0')[2] == (BAG_SIZE, 'p')
+    assert parse_expression('p.bagSize() != 0')[0] == (BAG_EMPTY, 'p', False)
@@ -0,0 +1,94 @@
+import shutil
+import subprocess
+
+import pytest
+
+from devsmap_random import GOLDEN_GAMMA, DevsmapRandom, RandomRun, splitmix64
+from generate_random_hpp import generate_random_header_code
+
+# The first outputs of splitmix64 seeded with 0, as given by its reference implementation.
+SPLITMIX64_OUTPUTS = [0xE220A8397B1DCDAF, 0x6E789E6AA1B965F4, 0x06C45D188009454F, 0xF88BB8A8724C81EC]
+
+# The first outputs of xoshiro256** seeded with 42, and then the random primitives drawn in order.
+XOSHIRO256_OUTPUTS = [0x15780B2E0C2EC716, 0x6104D9866D113A7E, 0xAE17533239E499A1, 0xECB8AD4703B360A1]
+PRIMITIVE_OUTPUTS = [268197259, 1, 0.71925857787791558, 0.94858813960509769, -1.4659604229447887, False]
+
+# The seeds of the first three instances of the run seeded with 7.
+INSTANCE_SEEDS = [0x044C3CD7F43C661C, 0xE6984080BAB12A02, 0x953AEB70673E29CB]
+
+# Draws the same numbers as test_the_generator_draws_the_pinned_numbers() with the generated header.
+PARITY_CPP = '''#include <cstdio>
+#include "devsmap_random.hpp"
+int main() {
+	DevsmapRandom random;
+	random.seed(42);
+	for (int i = 0; i < 4; i++) {
+		std::printf("%llu\\n", static_cast<unsigned long long>(random.next()));
+	}
+	std::printf("%d\\n", random.rand());
+	std::printf("%lld\\n", random.uniformInt(1, 6));
+	std::printf("%.17g\\n", random.uniformReal(0.0, 1.0));
+	std::printf("%.17g\\n", random.exponential(2.0));
+	std::printf("%.17g\\n", random.normal(0.0, 1.0));
+	std::printf("%d\\n", random.bernoulli(0.5) ? 1 : 0);
+	DevsmapRandom::startRun(7);
+	for (int i = 0; i < 3; i++) {
+		std::printf("%llu\\n", static_cast<unsigned long long>(DevsmapRandom::nextInstanceSeed()));
+	}
+}
+'''
+
+
+def draw_primitives(random):
+    return [random.rand(), random.uniform_int(1, 6), random.uniform_real(0.0, 1.0), random.exponential(2.0),
+            random.normal(0.0, 1.0), random.bernoulli(0.5)]
+
+
+def test_splitmix64_gives_the_reference_outputs():
+    value = 0
+    outputs = []
+    for _ in range(4):
+        value, output = splitmix64(value)
+        outputs.append(output)
+    assert outputs == SPLITMIX64_OUTPUTS
+    assert DevsmapRandom(0).words == SPLITMIX64_OUTPUTS
+
+
+def test_the_generator_draws_the_pinned_numbers():
+    random = DevsmapRandom(42)
+    assert [random.next() for _ in range(4)] == XOSHIRO256_OUTPUTS
+    assert draw_primitives(random) == PRIMITIVE_OUTPUTS
+
+
+def test_the_instances_of_a_run_are_seeded_in_order():
+    run = RandomRun(7)
+    assert [run.next_instance_seed() for _ in range(3)] == INSTANCE_SEEDS
+    # The n-th instance (counting from 1) of the run with seed s is seeded with the output of
+    # splitmix64 from s + n * GOLDEN_GAMMA.
+    assert INSTANCE_SEEDS[2] == splitmix64(7 + 3 * GOLDEN_GAMMA)[1]
+    assert RandomRun(7 + (1 << 64)).next_instance_seed() == INSTANCE_SEEDS[0]
+
+
+def test_the_generated_header_uses_the_same_constants():
+    code = generate_random_header_code()
+    for constant in ('0x9E3779B97F4A7C15ULL', '0xBF58476D1CE4E5B9ULL', '0x94D049BB133111EBULL',
+                     'rotl(words[1] * 5, 7) * 9', 'words[1] << 17', 'rotl(words[3], 45)',
+                     '(z ^ (z >> 30))', '(z ^ (z >> 27))', 'z ^ (z >> 31)',
+                     '(1.0 / 9007199254740992.0)', '6.283185307179586'):
+        assert constant in code
+    assert GOLDEN_GAMMA == 0x9E3779B97F4A7C15
+
+
+@pytest.mark.skipif(shutil.which('g++') is None, reason='needs a C++ compiler')
+def test_the_generated_header_draws_the_same_numbers(tmp_path):
+    with open(tmp_path / 'devsmap_random.hpp', 'w') as file:
+        file.write(generate_random_header_code())
+    with open(tmp_path / 'parity.cpp', 'w') as file:
+        file.write(PARITY_CPP)
+    subprocess.run(['g++', '-std=c++17', '-I', str(tmp_path), '-o', str(tmp_path / 'parity'), str(tmp_path / 'parity.cpp')], check=True)
+
+    lines = subprocess.run([str(tmp_path / 'parity')], check=True, capture_output=True, text=True).stdout.split()
+
+    assert [int(line) for line in lines[:4]] == XOSHIRO256_OUTPUTS
+    assert [int(lines[4]), int(lines[5]), float(lines[6]), float(lines[7]), float(lines[8]), lines[9] == '1'] == PRIMITIVE_OUTPUTS
+    assert [int(line) for line in lines[10:]] == INSTANCE_SEEDS
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from devsmap_to_cadmium import generate_cadmium_code, generate_cadmium_code_from_directory, generate_cadmium_project
+
+
+def test_the_code_is_generated_in_memory(plant_project, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    code = generate_cadmium_code(plant_project)
+
+    assert sorted(code) == ['include/blinker.hpp', 'include/blinker_system.hpp', 'include/plant.hpp', 'main.cpp']
+    assert '#include "include/plant.hpp"' in code['main.cpp']
+    assert os.listdir(tmp_path) == []
+
+
+def test_the_files_and_the_directory_give_the_same_code(plant_project, write_project, tmp_path):
+    input_directory = write_project(plant_project, tmp_path / 'input')
+    code = generate_cadmium_code(plant_project)
+
+    assert generate_cadmium_code_from_directory(input_directory) == code
+    output_directory = os.path.join(tmp_path, 'main', '')
+    os.makedirs(os.path.join(output_directory, 'include'))
+    generate_cadmium_project(input_directory, output_directory, incremental_generation=False)
+    for relative_path, file_code in code.items():
+        with open(os.path.join(output_directory, relative_path)) as file:
+            assert file.read() == file_code
+
+
+def test_an_invalid_fileset_is_reported(plant_project):
+    del plant_project['plant_experiment.json']
+    with pytest.raises(ValueError, match='Invalid fileset'):
+        generate_cadmium_code(plant_project)
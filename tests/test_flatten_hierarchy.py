@@ -0,0 +1,88 @@
+import pytest
+
+from devsmap_to_cadmium import generate_cadmium_code
+from flatten_hierarchy import flatten_coupled_model
+from parser_reading_files import sort_json_files
+
+
+def add_site_model(project):
+    '''
+    Adds the coupled model "site" to project, with the plant and a blinker ("source_model")
+    whose output goes to the input of the plant, two levels above the blinker that receives it.
+    '''
+    project['site_coupled.json'] = {
+        'site': {
+            'x': {},
+            'y': {'light': 'bool'},
+            'components': {'plant': 'plant_model', 'blinker': 'source_model'},
+            'eic': [],
+            'eoc': [{'port_from': 'light', 'port_to': 'light', 'component_from': 'plant_model'}],
+            'ic': [{'port_from': 'on_out', 'port_to': 'start', 'component_from': 'source_model', 'component_to': 'plant_model'}]
+        },
+        'include_sets': []
+    }
+
+
+def test_couplings_are_resolved_through_the_nested_coupled_models(plant_project):
+    flat_model = flatten_coupled_model(sort_json_files(plant_project), 'plant')
+
+    assert flat_model['components'] == [('blinker', 'system_model_blinker_model'), ('blinker', 'echo_model')]
+    assert flat_model['component_paths'] == {'system_model_blinker_model': ('plant', 'system_model', 'blinker_model'),
+                                             'echo_model': ('plant', 'echo_model')}
+    # The couplings to and from "system_model" go through its eic and eoc to the blinker inside it.
+    assert flat_model['ic'] == [
+        {'port_from': 'on_out', 'port_to': 'toggle_in', 'component_from': 'system_model_blinker_model', 'component_to': 'echo_model'},
+        {'port_from': 'on_out', 'port_to': 'toggle_in', 'component_from': 'echo_model', 'component_to': 'system_model_blinker_model'}]
+    assert flat_model['eic'] == [{'port_from': 'start', 'port_to': 'toggle_in', 'component_to': 'system_model_blinker_model'}]
+    assert flat_model['eoc'] == [{'port_from': 'on_out', 'port_to': 'light', 'component_from': 'system_model_blinker_model'},
+                                 {'port_from': 'on_out', 'port_to': 'echo', 'component_from': 'echo_model'}]
+
+
+def test_couplings_are_resolved_through_several_levels(plant_project):
+    add_site_model(plant_project)
+    flat_model = flatten_coupled_model(sort_json_files(plant_project), 'site')
+
+    assert [model_id for _, model_id in flat_model['components']] == ['plant_model_system_model_blinker_model', 'plant_model_echo_model',
+                                                                      'source_model']
+    assert {'port_from': 'on_out', 'port_to': 'toggle_in',
+            'component_from': 'source_model', 'component_to': 'plant_model_system_model_blinker_model'} in flat_model['ic']
+    assert len(flat_model['ic']) == 3
+    assert flat_model['eoc'] == [{'port_from': 'on_out', 'port_to': 'light', 'component_from': 'plant_model_system_model_blinker_model'}]
+
+
+def test_unconnected_ports_of_a_nested_coupled_model_are_dropped(plant_project):
+    plant_project['blinker_system_coupled.json']['blinker_system']['eoc'] = []
+    flat_model = flatten_coupled_model(sort_json_files(plant_project), 'plant')
+
+    assert flat_model['ic'] == [
+        {'port_from': 'on_out', 'port_to': 'toggle_in', 'component_from': 'echo_model', 'component_to': 'system_model_blinker_model'}]
+    assert flat_model['eoc'] == [{'port_from': 'on_out', 'port_to': 'echo', 'component_from': 'echo_model'}]
+
+
+def test_duplicate_flattened_ids_are_reported(plant_project):
+    plant = plant_project['plant_coupled.json']['plant']
+    plant['components']['blinker'] = 'system_model_blinker_model'
+    plant['eoc'] = plant['eoc'][:1]
+    plant['ic'] = []
+    with pytest.raises(ValueError, match='"system_model_blinker_model"'):
+        flatten_coupled_model(sort_json_files(plant_project), 'plant')
+
+
+def test_a_coupled_model_that_contains_itself_is_reported(plant_project):
+    plant_project['blinker_system_coupled.json']['blinker_system']['components']['plant'] = 'plant_model'
+    with pytest.raises(ValueError, match='contains itself'):
+        flatten_coupled_model(sort_json_files(plant_project), 'plant')
+
+
+def test_emitted_flat_coupled_model(plant_project):
+    code = generate_cadmium_code(plant_project, {'flatten_hierarchy': True})
+
+    assert 'include/blinker_system.hpp' not in code
+    plant = code['include/plant.hpp']
+    assert '#include "blinker_system.hpp"' not in plant
+    assert ('\t\tauto system_model_blinker_model = addComponent<blinker>("system_model_blinker_model", blinkerState(false, 1.0));\n'
+            '\t\tauto echo_model = addComponent<blinker>("echo_model", blinkerState(true, 2.5));\n') in plant
+    assert '\t\taddCoupling(system_model_blinker_model->on_out, echo_model->toggle_in);\n' in plant
+    assert '\t\taddCoupling(echo_model->on_out, system_model_blinker_model->toggle_in);\n' in plant
+    assert '\t\taddCoupling(start, system_model_blinker_model->toggle_in);\n' in plant
+    assert '\t\taddCoupling(system_model_blinker_model->on_out, light);\n' in plant
@@ -0,0 +1,89 @@
+import pytest
+
+from devsmap_to_cadmium import generate_cadmium_code
+
+
+def get_function(code, name, next_name):
+    '''
+    Returns the code of the member function name of a generated atomic model, up to the
+    member function next_name.
+    '''
+    return code[code.index('void ' + name):code.index(next_name)]
+
+
+def add_counter(project):
+    '''
+    Adds the state variable "count" (initially 0) to the blinker of project, and returns the
+    DEVSMap data of the blinker.
+    '''
+    model = project['blinker_atomic.json']['blinker']
+    model['s']['count'] = 'int'
+    project['blinker_system_init_state.json']['init_states']['blinker_system']['blinker_model']['count'] = '0'
+    return model
+
+
+def test_the_bags_are_looked_up_once(blinker_project):
+    model = add_counter(blinker_project)
+    model['delta_ext'] = {'toggle_in.bagSize() != 0': {'for message in toggle_in.bag()': {'count': 'count + 1',
+                                                                                          'message == true': {'on': 'message'}},
+                                                       'sigma': '0.0'},
+                          'otherwise': {'on': 'toggle_in.bag(-1)'}}
+    external_transition = get_function(generate_cadmium_code(blinker_project)['include/blinker.hpp'], 'externalTransition', 'void output')
+
+    assert external_transition.count('toggle_in->getBag()') == 1
+    assert ('\t\tconst auto& toggle_in_bag = toggle_in->getBag();\n'
+            '\t\tconst bool toggle_in_empty = toggle_in_bag.empty();\n'
+            '\n'
+            '\t\tif (!toggle_in_empty) {\n'
+            '\t\t\tfor (const auto& message : toggle_in_bag) {\n'
+            '\t\t\t\tstate.count = state.count + 1;\n'
+            '\t\t\t\tif (message == true) {\n'
+            '\t\t\t\t\tstate.on = message;\n'
+            '\t\t\t\t}\n'
+            '\t\t\t}\n'
+            '\t\t\tstate.sigma = 0.0;\n'
+            '\t\t} else {\n'
+            '\t\t\tstate.on = toggle_in_bag.back();\n'
+            '\t\t}\n') in external_transition
+
+
+def test_bag_loops_are_only_allowed_in_delta_ext(blinker_project):
+    model = add_counter(blinker_project)
+    model['delta_int'] = {'for message in toggle_in.bag()': {'count': 'count + 1'}}
+    with pytest.raises(ValueError):
+        generate_cadmium_code(blinker_project)
+
+
+def test_a_loop_variable_cannot_hide_a_state_variable(blinker_project):
+    model = add_counter(blinker_project)
+    model['delta_ext'] = {'for count in toggle_in.bag()': {'on': 'count'}}
+    with pytest.raises(ValueError):
+        generate_cadmium_code(blinker_project)
+
+
+def get_state_struct(code):
+    '''
+    Returns the declarations of the members of the state struct of a generated atomic model.
+    '''
+    members = code[code.index('struct blinkerState {\n') + len('struct blinkerState {\n'):code.index('\n\n\texplicit')]
+    return [member.strip() for member in members.split('\n')]
+
+
+def get_stream_operator(code):
+    '''
+    Returns the definition of operator<< of the state of a generated atomic model.
+    '''
+    return code[code.index('std::ostream& operator<<'):code.index('#endif', code.index('std::ostream& operator<<'))]
+
+
+def test_packing_only_changes_the_order_of_the_members(blinker_project):
+    blinker_project['blinker_atomic.json']['blinker']['s'] = {'on': 'bool', 'sigma': 'double', 'count': 'int', 'lit': 'bool', 'total': 'long long'}
+    blinker_project['blinker_system_init_state.json']['init_states']['blinker_system']['blinker_model'].update(count='0', lit='true', total='0')
+    code = generate_cadmium_code(blinker_project)['include/blinker.hpp']
+    packed_code = generate_cadmium_code(blinker_project, {'pack_state_structs': True})['include/blinker.hpp']
+
+    assert get_state_struct(code) == ['bool on;', 'double sigma;', 'int count;', 'bool lit;', 'long long total;']
+    assert get_state_struct(packed_code) == ['double sigma;', 'long long total;', 'int count;', 'bool on;', 'bool lit;']
+    # The state is logged in the DEVSMap order, so the logs do not depend on the layout.
+    assert get_stream_operator(packed_code) == get_stream_operator(code)
+    assert 'out << "{on: " << state.on << ", sigma: " << state.sigma << ", count: " << state.count' in get_stream_operator(packed_code)
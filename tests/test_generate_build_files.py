@@ -0,0 +1,94 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from devsmap_to_cadmium import generate_cadmium_code, generate_cadmium_project
+from generate_build_files import CMAKE_LISTS_FILENAME, CMAKE_OPTIONS_FILENAME, get_unity_chunks
+
+# The hand written CMakeLists.txt of output/main, reduced to its non-ESP32 branch.
+HAND_WRITTEN_CMAKE_LISTS = '''cmake_minimum_required(VERSION 3.16)
+project(blinker CXX)
+add_executable(Executable1 main.cpp)
+target_include_directories(Executable1 PRIVATE "." "include")
+'''
+
+
+NO_LOGGING_DEFINITION = 'target_compile_definitions(Executable1 PRIVATE NO_LOGGING)'
+
+
+@pytest.mark.parametrize('build_options', [{'precompiled_header': True},
+                                           {'unity_chunks': 2},
+                                           {'precompiled_header': True, 'unity_chunks': 2},
+                                           None])
+def test_no_logging_is_defined_for_the_whole_target(blinker_project, build_options):
+    code = generate_cadmium_code(blinker_project, {'logger': {'type': 'none'}, 'build_options': build_options})
+    cmake_lists = code[CMAKE_LISTS_FILENAME]
+    assert NO_LOGGING_DEFINITION in cmake_lists
+    assert 'target_compile_definitions(${COMPONENT_LIB} PRIVATE NO_LOGGING)' in cmake_lists
+    # A definition in main.cpp alone would not reach the precompiled header or the unity chunks.
+    assert '#define NO_LOGGING' not in code['main.cpp']
+
+
+def test_logging_builds_do_not_define_no_logging(blinker_project):
+    code = generate_cadmium_code(blinker_project, {'logger': {'type': 'stdout'}, 'build_options': {'unity_chunks': 2}})
+    assert NO_LOGGING_DEFINITION not in code[CMAKE_LISTS_FILENAME]
+    assert 'devsmap_unity_0.cpp' in code
+
+
+def test_cmake_lists_is_only_generated_when_needed(blinker_project):
+    assert CMAKE_LISTS_FILENAME not in generate_cadmium_code(blinker_project)
+
+
+def test_unity_chunks_are_contiguous_and_balanced():
+    assert get_unity_chunks(['a', 'b', 'c', 'd', 'e'], 2) == [['a', 'b'], ['c', 'd', 'e']]
+    assert get_unity_chunks(['a', 'b'], 4) == [['a'], ['b']]
+    assert get_unity_chunks(['a', 'b'], 0) == []
+
+
+def write_hand_written_cmake_lists(directory, cmake_lists=HAND_WRITTEN_CMAKE_LISTS):
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, CMAKE_LISTS_FILENAME), 'w') as file:
+        file.write(cmake_lists)
+
+
+def read_file(filepath):
+    with open(filepath, 'r') as file:
+        return file.read()
+
+
+def test_a_hand_written_cmake_lists_is_not_overwritten(blinker_project, write_project, tmp_path, capsys):
+    output_directory = str(tmp_path / 'main')
+    write_hand_written_cmake_lists(output_directory)
+
+    generate_cadmium_project(write_project(blinker_project, tmp_path / 'input'), output_directory,
+                             {'logger': {'type': 'none'}, 'build_options': {'unity_chunks': 1}})
+
+    assert read_file(os.path.join(output_directory, CMAKE_LISTS_FILENAME)) == HAND_WRITTEN_CMAKE_LISTS
+    cmake_options = read_file(os.path.join(output_directory, CMAKE_OPTIONS_FILENAME))
+    assert 'target_compile_definitions(${DEVSMAP_TARGET} PRIVATE NO_LOGGING)' in cmake_options
+    assert 'target_sources(${DEVSMAP_TARGET} PRIVATE "${CMAKE_CURRENT_LIST_DIR}/devsmap_unity_0.cpp")' in cmake_options
+    assert 'include(${CMAKE_CURRENT_LIST_DIR}/devsmap_options.cmake)' in capsys.readouterr().out
+
+
+def test_the_cmake_options_are_kept_up_to_date_once_generated(blinker_project, write_project, tmp_path, capsys):
+    output_directory = str(tmp_path / 'main')
+    write_hand_written_cmake_lists(output_directory, HAND_WRITTEN_CMAKE_LISTS + 'include(${CMAKE_CURRENT_LIST_DIR}/devsmap_options.cmake)\n')
+    input_directory = write_project(blinker_project, tmp_path / 'input')
+
+    generate_cadmium_project(input_directory, output_directory, {'logger': {'type': 'none'}})
+    generate_cadmium_project(input_directory, output_directory, {'logger': {'type': 'stdout'}})
+
+    assert 'NO_LOGGING' not in read_file(os.path.join(output_directory, CMAKE_OPTIONS_FILENAME))
+    assert CMAKE_OPTIONS_FILENAME not in capsys.readouterr().out
+
+
+@pytest.mark.skipif(shutil.which('cmake') is None, reason='needs CMake')
+def test_the_cmake_options_configure(blinker_project, write_project, tmp_path):
+    output_directory = str(tmp_path / 'main')
+    write_hand_written_cmake_lists(output_directory, HAND_WRITTEN_CMAKE_LISTS + 'include(${CMAKE_CURRENT_LIST_DIR}/devsmap_options.cmake)\n')
+    generate_cadmium_project(write_project(blinker_project, tmp_path / 'input'), output_directory,
+                             {'logger': {'type': 'none'}, 'build_options': {'precompiled_header': True, 'unity_chunks': 1}})
+
+    subprocess.run(['cmake', '-S', output_directory, '-B', str(tmp_path / 'build')], check=True, capture_output=True)
@@ -0,0 +1,31 @@
+from devsmap_to_cadmium import generate_cadmium_code
+
+
+def test_a_single_run(blinker_project):
+    main_cpp = generate_cadmium_code(blinker_project)['main.cpp']
+
+    assert '\t\tstd::shared_ptr<blinker_system> model = std::make_shared<blinker_system>("blinker_system");\n' in main_cpp
+    assert '\t\trootCoordinator.simulate(10.0);\n' in main_cpp
+    assert 'std::thread' not in main_cpp
+
+
+def test_replications_and_sweep_points_run_on_a_pool_of_threads(blinker_project):
+    blinker_project['blinker_system_experiment.json']['runs'] = {'replications': 3,
+                                                                 'threads': 2,
+                                                                 'seed': 7,
+                                                                 'sweep': [{'blinker_system': {'blinker_model': {'sigma': '2.0'}}}, {}]}
+    code = generate_cadmium_code(blinker_project)
+    main_cpp = code['main.cpp']
+
+    assert ('\t\tconst std::size_t sweepPoints = 2;\n'
+            '\t\tconst std::size_t replications = 3;\n'
+            '\t\tconst unsigned long long seed = 7ULL;\n') in main_cpp
+    assert '\t\tstd::size_t threads = 2;\n' in main_cpp
+    assert 'std::make_shared<blinker_system>("blinker_system", run.sweepPoint);' in main_cpp
+    # Each run gets its own log file, so the runs do not write to the same file.
+    assert 'std::string("logfile_run") + std::to_string(index) + ".csv"' in main_cpp
+    # The top model builds its components from the init states of the sweep point of the run.
+    coupled_model = code['include/blinker_system.hpp']
+    assert 'blinker_system(const std::string& id, std::size_t variant = 0) : Coupled(id) {' in coupled_model
+    assert 'blinker_modelInitialStates[2] = {blinkerState(false, 2.0), blinkerState(false, 1.0)};' in coupled_model
+    assert 'addComponent<blinker>("blinker_model", blinker_modelInitialStates[variant]);' in coupled_model
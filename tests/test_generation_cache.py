@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+import generation_cache
+from devsmap_to_cadmium import generate_cadmium_project
+from generation_cache import GENERATOR_MODULES, MANIFEST_FILENAME, generator_version, load_manifest, write_file_if_changed
+
+PLANT_FILES = ['include/.devsmap_manifest.json', 'include/blinker.hpp', 'include/blinker_system.hpp', 'include/plant.hpp', 'main.cpp']
+
+
+@pytest.fixture
+def written_files(monkeypatch, tmp_path):
+    '''
+    Returns the list of the files written by the incremental generation, relative to tmp_path / "main".
+    '''
+    written = []
+    write_file_atomically = generation_cache.write_file_atomically
+
+    def record_write(filepath, text):
+        written.append(os.path.relpath(filepath, str(tmp_path / 'main')).replace(os.sep, '/'))
+        write_file_atomically(filepath, text)
+
+    monkeypatch.setattr(generation_cache, 'write_file_atomically', record_write)
+    return written
+
+
+def generate(project, write_project, tmp_path):
+    input_directory = tmp_path / 'input'
+    if input_directory.is_dir():
+        for filename in os.listdir(input_directory):
+            os.remove(input_directory / filename)
+    generate_cadmium_project(write_project(project, input_directory), str(tmp_path / 'main'))
+
+
+def test_a_second_run_writes_nothing(plant_project, write_project, tmp_path, written_files):
+    generate(plant_project, write_project, tmp_path)
+    assert sorted(written_files) == PLANT_FILES
+    written_files.clear()
+
+    generate(plant_project, write_project, tmp_path)
+    assert written_files == []
+
+
+def test_an_edited_model_only_rewrites_its_own_file(plant_project, write_project, tmp_path, written_files):
+    generate(plant_project, write_project, tmp_path)
+    written_files.clear()
+
+    plant_project['blinker_atomic.json']['blinker']['ta'] = {'otherwise': 'sigma + 0.0'}
+    generate(plant_project, write_project, tmp_path)
+    assert written_files == ['include/blinker.hpp', 'include/' + MANIFEST_FILENAME]
+    written_files.clear()
+
+    del plant_project['plant_coupled.json']['plant']['eoc'][1]
+    del plant_project['plant_coupled.json']['plant']['y']['echo']
+    generate(plant_project, write_project, tmp_path)
+    assert written_files == ['include/plant.hpp', 'include/' + MANIFEST_FILENAME]
+
+
+def test_the_file_of_a_removed_model_is_deleted(plant_project, write_project, tmp_path):
+    generate(plant_project, write_project, tmp_path)
+    assert os.path.isfile(tmp_path / 'main' / 'include' / 'blinker_system.hpp')
+
+    plant = plant_project['plant_coupled.json']['plant']
+    del plant['components']['blinker_system']
+    plant['eic'] = []
+    plant['eoc'] = [coupling for coupling in plant['eoc'] if coupling['component_from'] != 'system_model']
+    plant['ic'] = []
+    del plant['y']['light']
+    del plant_project['plant_init_state.json']['init_states']['plant']['system_model']
+    generate(plant_project, write_project, tmp_path)
+
+    assert not os.path.exists(tmp_path / 'main' / 'include' / 'blinker_system.hpp')
+    assert 'blinker_system.hpp' not in load_manifest(str(tmp_path / 'main' / 'include'))['files']
+
+
+def test_a_change_to_the_generator_regenerates_everything(plant_project, write_project, tmp_path, monkeypatch):
+    generate(plant_project, write_project, tmp_path)
+    hashes = load_manifest(str(tmp_path / 'main' / 'include'))['files']
+
+    monkeypatch.setattr(generation_cache, '_generator_version', 'edited')
+    generate(plant_project, write_project, tmp_path)
+
+    new_hashes = load_manifest(str(tmp_path / 'main' / 'include'))['files']
+    assert sorted(new_hashes) == sorted(hashes)
+    assert all(new_hashes[filename] != input_hash for filename, input_hash in hashes.items())
+
+
+def test_the_generator_version_is_a_hash_of_the_generator_source(tmp_path, monkeypatch):
+    module_path = tmp_path / 'generator_module.py'
+    versions = []
+    for source in ('x = 1\n', 'x = 2\n', 'x = 1\n'):
+        with open(module_path, 'w') as file:
+            file.write(source)
+        monkeypatch.setattr(generation_cache, '_generator_version', None)
+        monkeypatch.setattr(generation_cache, 'GENERATOR_MODULES', GENERATOR_MODULES + [str(module_path)])
+        versions.append(generator_version())
+    assert versions[0] != versions[1]
+    assert versions[0] == versions[2]
+
+
+def test_files_are_compared_byte_for_byte(tmp_path):
+    filepath = str(tmp_path / 'main.cpp')
+    with open(filepath, 'wb') as file:
+        file.write(b'int main() {\r\n}\r\n')
+    # Reading the file as text would translate the line endings, and find it unchanged.
+    assert write_file_if_changed(filepath, 'int main() {\n}\n')
+    assert not write_file_if_changed(filepath, 'int main() {\n}\n')
+    with open(filepath, 'rb') as file:
+        assert file.read() == b'int main() {\n}\n'
@@ -0,0 +1,72 @@
+import pytest
+
+from devsmap_to_cadmium import generate_cadmium_code
+from init_state_index import (find_initialization_values_for_instance, find_initialization_values_for_model, find_reused_atomic_models,
+                              index_init_states)
+from parser_reading_files import sort_json_files
+
+
+def test_the_instances_are_indexed_by_path(plant_project):
+    init_state_index = index_init_states(sort_json_files(plant_project))
+
+    assert init_state_index['by_path'] == {('plant', 'system_model', 'blinker_model'): {'on': 'false', 'sigma': '1.0'},
+                                           ('plant', 'echo_model'): {'on': 'true', 'sigma': '2.5'}}
+    assert init_state_index['by_model'] == {'blinker': [('plant', 'system_model', 'blinker_model'), ('plant', 'echo_model')]}
+    assert init_state_index['by_component'] == {('plant', 'system_model'): [('plant', 'system_model')],
+                                                ('blinker_system', 'blinker_model'): [('plant', 'system_model', 'blinker_model')],
+                                                ('plant', 'echo_model'): [('plant', 'echo_model')]}
+
+
+def test_the_values_of_the_first_instance_are_found(plant_project):
+    init_state_index = index_init_states(sort_json_files(plant_project))
+
+    assert find_initialization_values_for_model(init_state_index, 'blinker', {'on': 'bool', 'sigma': 'double'}.keys()) == {'on': 'false', 'sigma': '1.0'}
+    assert find_initialization_values_for_instance(init_state_index, [('plant', 'missing_model'), ('plant', 'echo_model')]) == {'on': 'true', 'sigma': '2.5'}
+    assert find_initialization_values_for_instance(init_state_index, [('plant', 'missing_model')]) is None
+
+
+def test_a_model_outside_the_coupled_models_is_found_by_its_state_variables(plant_project):
+    init_state_index = index_init_states(sort_json_files(plant_project))
+
+    assert find_initialization_values_for_model(init_state_index, 'spare', ['sigma', 'on']) == {'on': 'false', 'sigma': '1.0'}
+    with pytest.raises(ValueError, match='"spare"'):
+        find_initialization_values_for_model(init_state_index, 'spare', ['sigma', 'count'])
+
+
+def test_models_whose_instances_have_different_values_are_reused(plant_project):
+    assert find_reused_atomic_models(index_init_states(sort_json_files(plant_project))) == {'blinker'}
+
+    plant_project['plant_init_state.json']['init_states']['plant']['echo_model'] = {'on': 'false', 'sigma': '1.0'}
+    assert find_reused_atomic_models(index_init_states(sort_json_files(plant_project))) == set()
+
+
+def test_each_instance_of_a_reused_model_gets_its_values(plant_project):
+    code = generate_cadmium_code(plant_project)
+
+    assert '\texplicit blinkerState(bool on, double sigma):  on(on),  sigma(sigma) {\n' in code['include/blinker.hpp']
+    assert 'addComponent<blinker>("blinker_model", blinkerState(false, 1.0));' in code['include/blinker_system.hpp']
+    assert 'addComponent<blinker>("echo_model", blinkerState(true, 2.5));' in code['include/plant.hpp']
+
+
+def test_a_model_with_the_same_values_everywhere_is_not_reused(blinker_project):
+    code = generate_cadmium_code(blinker_project)
+
+    assert 'explicit blinkerState(bool on, double sigma)' not in code['include/blinker.hpp']
+    assert 'addComponent<blinker>("blinker_model");' in code['include/blinker_system.hpp']
+
+
+def test_the_sweep_points_are_merged_into_the_init_states(plant_project):
+    plant_project['plant_experiment.json']['runs'] = {'sweep': [{'plant': {'echo_model': {'sigma': '5.0'}}}]}
+    init_state_index = index_init_states(sort_json_files(plant_project))
+
+    sweep_by_path = init_state_index['sweep'][0]['by_path']
+    assert sweep_by_path[('plant', 'echo_model')] == {'on': 'true', 'sigma': '5.0'}
+    assert sweep_by_path[('plant', 'system_model', 'blinker_model')] == {'on': 'false', 'sigma': '1.0'}
+    assert init_state_index['by_path'][('plant', 'echo_model')] == {'on': 'true', 'sigma': '2.5'}
+
+
+def test_models_whose_values_change_between_the_sweep_points_are_reused(blinker_project):
+    assert find_reused_atomic_models(index_init_states(sort_json_files(blinker_project))) == set()
+
+    blinker_project['blinker_system_experiment.json']['runs'] = {'sweep': [{'blinker_system': {'blinker_model': {'sigma': '2.0'}}}]}
+    assert find_reused_atomic_models(index_init_states(sort_json_files(blinker_project))) == {'blinker'}
@@ -0,0 +1,90 @@
+import pytest
+
+import generate_coupled_model_hpp
+from devsmap_to_cadmium import generate_cadmium_code
+from model_hierarchy import find_topological_order, order_coupled_models
+
+
+def add_site_model(project):
+    '''
+    Makes the coupled model "site" the model under test of the plant project.  The site has the
+    plant, and a rack with a second instance of the blinker system, with other initial values.
+    '''
+    project['rack_coupled.json'] = {
+        'rack': {
+            'x': {},
+            'y': {'light': 'bool'},
+            'components': {'blinker_system': 'spare_system'},
+            'eic': [],
+            'eoc': [{'port_from': 'light', 'port_to': 'light', 'component_from': 'spare_system'}],
+            'ic': []
+        },
+        'include_sets': []
+    }
+    project['site_coupled.json'] = {
+        'site': {'x': {}, 'y': {}, 'components': {'plant': 'plant_model', 'rack': 'rack_model'}, 'eic': [], 'eoc': [], 'ic': []},
+        'include_sets': []
+    }
+    project['site_experiment.json'] = dict(project.pop('plant_experiment.json'),
+                                           model_under_test={'model': 'site_coupled.json', 'initial_state': 'site_init_state.json', 'parameters': ''})
+    plant_init_states = project.pop('plant_init_state.json')['init_states']['plant']
+    project['site_init_state.json'] = {
+        'init_states': {
+            'site': {
+                'plant_model': plant_init_states,
+                'rack_model': {'spare_system': {'blinker_model': {'on': 'true', 'sigma': '4.0'}}}
+            }
+        }
+    }
+
+
+def test_topological_order():
+    order, cycle = find_topological_order({'site': ['plant', 'rack', 'blinker'], 'plant': ['system', 'blinker'],
+                                           'rack': ['system'], 'system': ['blinker']})
+    assert cycle is None
+    assert order == ['system', 'plant', 'rack', 'site']
+
+
+def test_the_first_cycle_is_returned():
+    _, cycle = find_topological_order({'site': ['plant'], 'plant': ['system'], 'system': ['plant']})
+    assert cycle == ['plant', 'system', 'plant']
+    with pytest.raises(ValueError, match='plant -> system -> plant'):
+        order_coupled_models({'site': {'components': {'plant': 'plant_model'}},
+                              'plant': {'components': {'system': 'system_model'}},
+                              'system': {'components': {'plant': 'plant_model'}}})
+
+
+def test_deep_hierarchies_do_not_exhaust_the_stack():
+    depth = 10000
+    order, cycle = find_topological_order({'level' + str(i): ['level' + str(i + 1)] for i in range(depth)})
+    assert cycle is None
+    assert order[0] == 'level' + str(depth - 1) and order[-1] == 'level0'
+
+
+def test_a_shared_subsystem_is_generated_once(plant_project, monkeypatch):
+    add_site_model(plant_project)
+    generated_models = []
+
+    def generate_coupled_model_code(coupled_model_name, *arguments):
+        generated_models.append(coupled_model_name)
+        return original_generate_coupled_model_code(coupled_model_name, *arguments)
+
+    original_generate_coupled_model_code = generate_coupled_model_hpp.generate_coupled_model_code
+    monkeypatch.setattr(generate_coupled_model_hpp, 'generate_coupled_model_code', generate_coupled_model_code)
+    code = generate_cadmium_code(plant_project)
+
+    assert generated_models == ['blinker_system', 'plant', 'rack', 'site']
+    # The two instances of the blinker system select their initial states by variant.
+    assert ('static const blinkerState blinker_modelInitialStates[2] = {blinkerState(false, 1.0), blinkerState(true, 4.0)};'
+            in code['include/blinker_system.hpp'])
+    assert 'auto system_model = addComponent<blinker_system>("system_model", 0);' in code['include/plant.hpp']
+    assert 'auto spare_system = addComponent<blinker_system>("spare_system", 1);' in code['include/rack.hpp']
+
+
+def test_the_couplings_of_nested_coupled_models_are_emitted(plant_project):
+    code = generate_cadmium_code(plant_project)
+
+    assert '\t\ttoggle = addInPort<bool>("toggle");\n' in code['include/blinker_system.hpp']
+    assert '\t\taddCoupling(toggle, blinker_model->toggle_in);\n' in code['include/blinker_system.hpp']
+    assert '\t\taddCoupling(blinker_model->on_out, light);\n' in code['include/blinker_system.hpp']
+    assert '\t\taddCoupling(start, system_model->toggle);\n' in code['include/plant.hpp']
@@ -0,0 +1,6 @@
+from parallel_generation import generate_code_in_parallel
+
+
+def test_a_broken_process_pool_falls_back_to_serial_generation(broken_process_pool, capsys):
+    assert generate_code_in_parallel(max, [(1, 2), (4, 3), (5, 6)], jobs=3) == [2, 4, 6]
+    assert 'generating serially' in capsys.readouterr().out
@@ -0,0 +1,47 @@
+import os
+
+from parser_reading_files import clean_output_directory, read_reachable_json_files
+
+
+SPARE_MODEL = {'spare': {'s': {'sigma': 'double'}, 'x': {}, 'y': {}, 'delta_int': {}, 'delta_ext': {}, 'lambda': {}, 'ta': {'otherwise': 'sigma'}},
+               'include_sets': [],
+               'parameters': {}}
+
+
+def test_only_the_models_reachable_from_the_experiment_are_read(plant_project, write_project):
+    plant_project['spare_atomic.json'] = SPARE_MODEL
+    raw_data, skipped_files = read_reachable_json_files(write_project(plant_project))
+
+    assert sorted(raw_data) == ['blinker_atomic.json', 'blinker_system_coupled.json', 'plant_coupled.json',
+                                'plant_experiment.json', 'plant_init_state.json']
+    assert skipped_files == ['spare_atomic.json']
+
+
+def test_a_component_outside_the_naming_convention_is_found(plant_project, write_project):
+    plant_project['lamp_atomic.json'] = plant_project.pop('blinker_atomic.json')
+    plant_project['spare_atomic.json'] = SPARE_MODEL
+    raw_data, skipped_files = read_reachable_json_files(write_project(plant_project))
+
+    assert 'lamp_atomic.json' in raw_data
+    assert skipped_files == ['spare_atomic.json']
+
+
+def test_every_model_is_read_if_the_model_under_test_is_missing(plant_project, write_project):
+    plant_project['plant_experiment.json']['model_under_test']['model'] = 'missing_coupled.json'
+    plant_project['spare_atomic.json'] = SPARE_MODEL
+    raw_data, skipped_files = read_reachable_json_files(write_project(plant_project))
+
+    assert 'spare_atomic.json' in raw_data
+    assert skipped_files == []
+
+
+def test_the_output_directory_is_cleaned_of_the_given_sources(tmp_path):
+    os.makedirs(tmp_path / 'include')
+    for relative_path in ('main.cpp', 'devsmap_unity_0.cpp', 'helper.cpp', 'include/blinker.hpp'):
+        with open(tmp_path / relative_path, 'w') as file:
+            file.write('')
+
+    clean_output_directory(str(tmp_path), source_patterns=['devsmap_unity_*.cpp'])
+
+    assert sorted(os.listdir(tmp_path)) == ['helper.cpp', 'include']
+    assert os.listdir(tmp_path / 'include') == []
@@ -0,0 +1,68 @@
+import pytest
+
+from devsmap_to_cadmium import generate_cadmium_code
+from semantic_validation import DevsmapValidationError, format_json_path, validate_json_data
+
+
+def test_valid_projects(blinker_project, plant_project):
+    assert validate_json_data(blinker_project) == []
+    assert validate_json_data(plant_project) == []
+
+
+def test_format_json_path():
+    assert format_json_path(('counter_system', 'ic', 1, 'port_to')) == 'counter_system.ic[1].port_to'
+    assert format_json_path(('counter', 'delta_int', 'countUp == true', 'count')) == 'counter.delta_int["countUp == true"].count'
+
+
+def test_every_error_is_reported(blinker_project):
+    system = blinker_project['blinker_system_coupled.json']['blinker_system']
+    system['eic'][0]['port_to'] = 'toogle_in'
+    system['y']['light'] = 'int'
+    model = blinker_project['blinker_atomic.json']['blinker']
+    model['delta_int'] = {'otherwise': {'on': '!of', 'count': '1'}}
+    model['lambda'] = {'otherwise': {'on_out': 'toggle_in.bagSize()'}}
+    del blinker_project['blinker_system_init_state.json']['init_states']['blinker_system']['blinker_model']['sigma']
+
+    errors = [(error['file'], error['path']) for error in validate_json_data(blinker_project)]
+    assert errors == [('blinker_atomic.json', 'blinker.delta_int.otherwise.on'),
+                      ('blinker_atomic.json', 'blinker.delta_int.otherwise.count'),
+                      ('blinker_atomic.json', 'blinker.lambda.otherwise.on_out'),
+                      ('blinker_system_coupled.json', 'blinker_system.eic[0].port_to'),
+                      ('blinker_system_coupled.json', 'blinker_system.eoc[0]'),
+                      ('blinker_system_init_state.json', 'init_states.blinker_system.blinker_model')]
+
+
+def test_unknown_component_and_port(plant_project):
+    plant = plant_project['plant_coupled.json']['plant']
+    plant['ic'][0]['component_to'] = 'missing_model'
+    plant['ic'][1]['port_from'] = 'off_out'
+
+    messages = {error['path']: error['message'] for error in validate_json_data(plant_project)}
+    assert messages == {'plant.ic[0].component_to': 'plant has no component "missing_model".',
+                        'plant.ic[1].port_from': 'The component "echo_model" (blinker) has no output port "off_out".'}
+
+
+def test_a_coupled_model_that_contains_itself_is_reported(plant_project):
+    plant_project['blinker_system_coupled.json']['blinker_system']['components']['plant'] = 'plant_model'
+
+    errors = validate_json_data(plant_project)
+    assert [(error['file'], error['path']) for error in errors] == [('blinker_system_coupled.json', 'blinker_system.components.plant')]
+    assert errors[0]['message'] == 'The coupled model "blinker_system" contains itself: blinker_system -> plant -> blinker_system.'
+
+
+def test_a_direct_cycle_is_reported(blinker_project):
+    blinker_project['blinker_system_coupled.json']['blinker_system']['components']['blinker_system'] = 'inner_model'
+
+    messages = [error['message'] for error in validate_json_data(blinker_project)]
+    assert 'The coupled model "blinker_system" contains itself: blinker_system -> blinker_system.' in messages
+
+
+def test_the_errors_are_raised_before_generating(plant_project):
+    plant_project['blinker_system_coupled.json']['blinker_system']['components']['plant'] = 'plant_model'
+    plant_project['plant_coupled.json']['plant']['eic'][0]['port_to'] = 'toogle'
+
+    with pytest.raises(DevsmapValidationError) as error:
+        generate_cadmium_code(plant_project)
+    assert len(error.value.errors) == 2
+    assert 'plant_coupled.json: plant.eic[0].port_to: ' in str(error.value)
+    assert isinstance(error.value, ValueError)
@@ -0,0 +1,40 @@
+import json
+import os
+
+from watch_mode import start_watch_state, update_watch_state
+
+
+def test_only_the_changed_files_are_read_and_regenerated(blinker_project, write_project, tmp_path):
+    input_directory = write_project(blinker_project, tmp_path / 'input')
+    output_directory = os.path.join(tmp_path, 'main', '')
+    os.makedirs(os.path.join(output_directory, 'include'))
+    watch_state = start_watch_state(input_directory, output_directory)
+
+    assert update_watch_state(watch_state) == sorted(blinker_project)
+    atomic_model_path = os.path.join(output_directory, 'include', 'blinker.hpp')
+    coupled_model_path = os.path.join(output_directory, 'include', 'blinker_system.hpp')
+    coupled_model_stamp = os.stat(coupled_model_path).st_mtime_ns
+    assert update_watch_state(watch_state) == []
+
+    blinker_project['blinker_atomic.json']['blinker']['delta_int'] = {'otherwise': {'on': '!on', 'sigma': '3.0'}}
+    with open(os.path.join(input_directory, 'blinker_atomic.json'), 'w') as file:
+        json.dump(blinker_project['blinker_atomic.json'], file)
+
+    assert update_watch_state(watch_state) == ['blinker_atomic.json']
+    with open(atomic_model_path) as file:
+        assert 'state.sigma = 3.0;' in file.read()
+    assert os.stat(coupled_model_path).st_mtime_ns == coupled_model_stamp
+
+
+def test_an_invalid_file_does_not_stop_the_watch(blinker_project, write_project, tmp_path):
+    input_directory = write_project(blinker_project, tmp_path / 'input')
+    output_directory = os.path.join(tmp_path, 'main', '')
+    os.makedirs(os.path.join(output_directory, 'include'))
+    watch_state = start_watch_state(input_directory, output_directory)
+    update_watch_state(watch_state)
+
+    with open(os.path.join(input_directory, 'blinker_atomic.json'), 'w') as file:
+        file.write('{"blinker": ')
+    assert update_watch_state(watch_state) == ['blinker_atomic.json']
+    # The data of the file before the change is kept until it can be parsed again.
+    assert watch_state['raw_data']['blinker_atomic.json'] == blinker_project['blinker_atomic.json']
@@ -0,0 +1,157 @@
+# Functions for watching the input directory, and regenerating the Cadmium code as soon
+# as the DEVSMap json files change.
+#
+# The parsed json files, the init state index and the manifest of the generated files are
+# kept in memory between regenerations.  When a file changes, only that file is read and
+# parsed again, and only the models whose inputs changed are generated and written again
+# (see generation_cache.py).  The input directory is polled, since it only requires one
+# os.scandir() per interval and works the same on every platform.
+
+import os
+import time
+
+from parser_reading_files import check_file_counts, classify_json_filename, read_json_files, select_reachable_json_data, sort_json_files
+from init_state_index import index_init_states
+from generation_cache import load_manifest, save_manifest
+from generate_project import generate_project_files, get_generation_options
+from semantic_validation import format_validation_errors, validate_json_data
+
+
+def scan_input_stamps(directory):
+    '''
+    Returns a dictionary with the (modification time, size) of each json file in directory,
+    keyed by filename.
+
+    Args:
+        directory (str):    The directory where the json files are located.
+    '''
+    stamps = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json') and entry.is_file():
+                stat = entry.stat()
+                stamps[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return stamps
+
+
+def start_watch_state(directory_json_input, directory_code_main_output, options=None, *, jobs=1, prune_unreachable_models=True):
+    '''
+    Returns the watch state of a project: the in-memory caches that are kept between
+    regenerations.  Nothing is read until the first call to update_watch_state().
+
+    Args:
+        directory_json_input (str):         The directory where the json files are located.
+        directory_code_main_output (str):   The "main" directory of the Cadmium project.
+        options (dict):                     Optional generation options (see get_generation_options()).
+        jobs (int):                         The number of worker processes used to generate the models.
+        prune_unreachable_models (bool):    True to only generate the models reachable from the experiment.
+    '''
+    directory_code_include_output = os.path.join(directory_code_main_output, 'include', '')
+    return {'directory_json_input': directory_json_input,
+            'directory_code_main_output': directory_code_main_output,
+            'directory_code_include_output': directory_code_include_output,
+            'jobs': jobs,
+            'prune_unreachable_models': prune_unreachable_models,
+            'options': get_generation_options(options),
+            'stamps': {},
+            'json_files': {},
+            'raw_data': {},
+            'init_state_index': None,
+            'manifest': load_manifest(directory_code_include_output)}
+
+
+def update_watch_state(watch_state):
+    '''
+    Reads the json files that were added or modified since the last update, forgets the
+    files that were removed, and regenerates the models that depend on them.  Returns the
+    sorted list of the filenames that changed (empty if nothing changed).
+
+    Args:
+        watch_state (dict):     The watch state returned by start_watch_state().
+    '''
+    directory = watch_state['directory_json_input']
+    stamps = scan_input_stamps(directory)
+    changed_files = {filename: classify_json_filename(filename) for filename, stamp in stamps.items()
+                     if watch_state['stamps'].get(filename) != stamp}
+    removed_files = [filename for filename in watch_state['stamps'] if filename not in stamps]
+    if not changed_files and not removed_files:
+        return []
+    watch_state['stamps'] = stamps
+
+    # A file that cannot be parsed (for example, while it is being saved) keeps its
+    # previous data, so its models are not removed from the output in the meantime.
+    watch_state['raw_data'].update(read_json_files(directory, changed_files))
+    for filename in removed_files:
+        watch_state['raw_data'].pop(filename, None)
+    watch_state['json_files'] = {filename: classify_json_filename(filename) for filename in sorted(stamps)}
+
+    # The init state index depends on the init states, on the components of the coupled
+    # models, and on the sweep of the experiment, so it is only rebuilt when one of those
+    # files changes.
+    changed_types = {classify_json_filename(filename) for filename in list(changed_files) + removed_files}
+    if changed_types & {'state', 'coupled', 'experiment'}:
+        watch_state['init_state_index'] = None
+
+    if check_file_counts(directory, watch_state['json_files']):
+        regenerate_watched_project(watch_state)
+    return sorted(list(changed_files) + removed_files)
+
+
+def regenerate_watched_project(watch_state):
+    '''
+    Generates the code of the project from the json data cached in the watch state.  Only
+    the files whose inputs changed since the previous generation are written.  If the json
+    files have errors (see validate_json_data()), they are printed and nothing is generated.
+
+    Args:
+        watch_state (dict):     The watch state returned by start_watch_state().
+    '''
+    json_files = watch_state['json_files']
+    raw_data = {filename: watch_state['raw_data'][filename] for filename in json_files if filename in watch_state['raw_data']}
+    if watch_state['prune_unreachable_models']:
+        raw_data = select_reachable_json_data(raw_data, json_files)
+    errors = validate_json_data(raw_data, json_files)
+    if errors:
+        print("Could not generate the code:\n" + format_validation_errors(errors))
+        return
+
+    data = sort_json_files(raw_data, json_files)
+    if watch_state['init_state_index'] is None:
+        watch_state['init_state_index'] = index_init_states(data)
+    try:
+        generate_project_files(data, watch_state['directory_code_main_output'], watch_state['options'], manifest=watch_state['manifest'],
+                               jobs=watch_state['jobs'], init_state_index=watch_state['init_state_index'])
+    except (KeyError, TypeError, ValueError) as e:
+        # The files being edited may be incomplete, so the error is reported and the
+        # next change is waited for.
+        print(f"Could not generate the code: {e!r}")
+    save_manifest(watch_state['directory_code_include_output'], watch_state['manifest'])
+
+
+def watch_directory(directory_json_input, directory_code_main_output, options=None, *, jobs=1, prune_unreachable_models=True, interval=0.5):
+    '''
+    Generates the code of the project, then polls the input directory every interval seconds
+    and regenerates the code whenever a json file is added, modified or removed.  This runs
+    until it is interrupted (with Ctrl+C).
+
+    Args:
+        directory_json_input (str):         The directory where the json files are located.
+        directory_code_main_output (str):   The "main" directory of the Cadmium project.
+        options (dict):                     Optional generation options (see get_generation_options()).
+        jobs (int):                         The number of worker processes used to generate the models.
+        prune_unreachable_models (bool):    True to only generate the models reachable from the experiment.
+        interval (float):                   The number of seconds between two polls of the input directory.
+    '''
+    watch_state = start_watch_state(directory_json_input, directory_code_main_output, options, jobs=jobs,
+                                    prune_unreachable_models=prune_unreachable_models)
+    update_watch_state(watch_state)
+    print(f"Watching {directory_json_input} for changes (press Ctrl+C to stop).")
+    try:
+        while True:
+            time.sleep(interval)
+            start_time = time.perf_counter()
+            changed_files = update_watch_state(watch_state)
+            if changed_files:
+                print(f"Regenerated after changes to {', '.join(changed_files)} in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+    except KeyboardInterrupt:
+        print("Stopped watching.")